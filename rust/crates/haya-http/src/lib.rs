@@ -1,10 +1,16 @@
+use std::time::{Duration, Instant};
+
 use async_trait::async_trait;
-use futures_util::StreamExt;
-use haya::{ByteRange, ByteStream, RangeSource, SourceError, SourceErrorKind};
+use futures_util::{StreamExt, stream::FuturesUnordered};
+use haya::{
+    ByteRange, ByteStream, OpenedRange, RangeSource, SourceError, SourceErrorKind,
+    file::ResourceIdentity,
+};
 use reqwest::{
     Client, Request, StatusCode, Url,
     header::{
-        ACCEPT_ENCODING, CONTENT_ENCODING, CONTENT_RANGE, HeaderMap, HeaderValue, IF_RANGE, RANGE,
+        ACCEPT_ENCODING, CONTENT_ENCODING, CONTENT_RANGE, ETAG, HeaderMap, HeaderValue, IF_RANGE,
+        LAST_MODIFIED, RANGE,
     },
 };
 
@@ -45,40 +51,55 @@ impl HttpRangeSource {
                 ),
             ));
         }
-        let mut request = self
-            .client
-            .get(self.url.clone())
-            .headers(self.headers.clone())
-            .build()
-            .map_err(classify_reqwest_error)?;
-        request
-            .headers_mut()
-            .insert(ACCEPT_ENCODING, HeaderValue::from_static("identity"));
-        request.headers_mut().insert(
-            RANGE,
-            HeaderValue::from_str(&format!("bytes={}-{}", range.start, range.end - 1)).map_err(
-                |error| {
-                    SourceError::new(
-                        SourceErrorKind::Protocol,
-                        format!("invalid generated Range header: {error}"),
-                    )
-                },
-            )?,
-        );
-        // This removes per-source values. Client defaults are applied later by
-        // reqwest and are therefore excluded by `new`'s documented precondition.
-        request.headers_mut().remove(IF_RANGE);
-        Ok(request)
+        range_request(&self.client, &self.url, &self.headers, range)
     }
 }
 
-/// Probes the size of a media resource without consuming its response body.
+fn range_request(
+    client: &Client,
+    url: &Url,
+    headers: &HeaderMap,
+    range: ByteRange,
+) -> Result<Request, SourceError> {
+    let mut request = client
+        .get(url.clone())
+        .headers(headers.clone())
+        .build()
+        .map_err(classify_reqwest_error)?;
+    request
+        .headers_mut()
+        .insert(ACCEPT_ENCODING, HeaderValue::from_static("identity"));
+    request.headers_mut().insert(
+        RANGE,
+        HeaderValue::from_str(&format!("bytes={}-{}", range.start, range.end - 1)).map_err(
+            |error| {
+                SourceError::new(
+                    SourceErrorKind::Protocol,
+                    format!("invalid generated Range header: {error}"),
+                )
+            },
+        )?,
+    );
+    // This removes per-source values. Client defaults are applied later by
+    // reqwest and are therefore excluded by `HttpRangeSource::new`'s
+    // documented precondition.
+    request.headers_mut().remove(IF_RANGE);
+    Ok(request)
+}
+
+/// Probes the size and validator of a media resource without consuming its
+/// response body.
 ///
 /// A valid probe response is an identity-encoded `206` for bytes `0-1` with a
 /// known total in `Content-Range`. Other HTTP responses are treated as an
-/// unavailable size; request failures retain their source error.
+/// unavailable resource; request failures retain their source error. The
+/// validator is the response's `ETag`, or its `Last-Modified` date when it has
+/// no ETag.
 /// The client must have reqwest's automatic response decompression disabled.
-pub async fn probe_size(client: &Client, url: Url) -> Result<Option<u64>, SourceError> {
+pub async fn probe_resource(
+    client: &Client,
+    url: Url,
+) -> Result<Option<ResourceIdentity>, SourceError> {
     let request = client
         .get(url)
         .header(ACCEPT_ENCODING, HeaderValue::from_static("identity"))
@@ -92,16 +113,153 @@ pub async fn probe_size(client: &Client, url: Url) -> Result<Option<u64>, Source
     if response.status() != StatusCode::PARTIAL_CONTENT {
         return Ok(None);
     }
-    Ok(size_from_probe_headers(response.headers()))
+    Ok(identity_from_probe_headers(response.headers()))
+}
+
+/// Opens `requested` of a resource whose size is not known yet, on whichever
+/// of `urls` answers first, and learns the size and validator from that
+/// response instead of from a separate probe.
+///
+/// The URLs are tried in order: the next one starts once the previous ones
+/// have taken `stagger` without answering, or as soon as one fails, so a
+/// healthy first mirror is the only one asked for the range. The first
+/// successful response wins and any later attempts are dropped. The range is
+/// clamped to the end of the resource and is meant for
+/// `Downloader::with_opened_range`, with `source` indexing `urls`; start it at
+/// the sink's committed offset, such as `haya::file::journaled_offset`, so a
+/// resumed transfer does not fetch bytes it already has. When every URL
+/// fails, the error of the last one to fail is returned. The client
+/// requirements of `HttpRangeSource::new` apply.
+///
+/// The validator is the winning mirror's, so mirrors that report different
+/// ETags for the same object restart a journaled resume whenever another one
+/// wins; see `validator`.
+pub async fn open_first_range(
+    client: &Client,
+    urls: &[Url],
+    headers: &HeaderMap,
+    requested: ByteRange,
+    stagger: Duration,
+) -> Result<(ResourceIdentity, OpenedRange), SourceError> {
+    let attempt = |source: usize| async move {
+        let started = Instant::now();
+        let (identity, range, stream) =
+            open_unsized(client, &urls[source], headers, requested).await?;
+        let opened = OpenedRange {
+            source,
+            range,
+            stream,
+            latency: started.elapsed(),
+        };
+        Ok::<_, SourceError>((identity, opened))
+    };
+    let mut attempts = FuturesUnordered::new();
+    let mut next = 0;
+    let mut last_error = None;
+    loop {
+        if attempts.is_empty() {
+            if next == urls.len() {
+                break;
+            }
+            attempts.push(attempt(next));
+            next += 1;
+        }
+        tokio::select! {
+            biased;
+            Some(result) = attempts.next() => match result {
+                Ok(opened) => return Ok(opened),
+                Err(error) => {
+                    last_error = Some(error);
+                    // A failed mirror hands over to the next one right away.
+                    if next < urls.len() {
+                        attempts.push(attempt(next));
+                        next += 1;
+                    }
+                }
+            },
+            _ = tokio::time::sleep(stagger), if next < urls.len() => {
+                attempts.push(attempt(next));
+                next += 1;
+            }
+        }
+    }
+    Err(last_error
+        .unwrap_or_else(|| SourceError::new(SourceErrorKind::Protocol, "no source to open")))
+}
+
+async fn open_unsized(
+    client: &Client,
+    url: &Url,
+    headers: &HeaderMap,
+    requested: ByteRange,
+) -> Result<(ResourceIdentity, ByteRange, ByteStream), SourceError> {
+    let response = client
+        .execute(range_request(client, url, headers, requested)?)
+        .await
+        .map_err(classify_reqwest_error)?;
+    if response.status() != StatusCode::PARTIAL_CONTENT {
+        return Err(status_error(response.status()));
+    }
+
+    validate_content_encoding(response.headers())?;
+    let content_range = satisfied_content_range(response.headers())?;
+    let total = content_range.total.ok_or_else(|| {
+        SourceError::new(
+            SourceErrorKind::Protocol,
+            "Content-Range does not state the resource size",
+        )
+    })?;
+    let range = ByteRange {
+        start: requested.start,
+        end: requested.end.min(total),
+    };
+    if content_range.start != range.start || content_range.end.checked_add(1) != Some(range.end) {
+        return Err(SourceError::new(
+            SourceErrorKind::Protocol,
+            format!(
+                "requested {requested:?}, got Content-Range {}-{}/{total}",
+                content_range.start, content_range.end
+            ),
+        ));
+    }
+    let identity = ResourceIdentity::new(total, validator(response.headers()));
+
+    Ok((
+        identity,
+        range,
+        Box::pin(
+            response
+                .bytes_stream()
+                .map(|chunk| chunk.map_err(classify_reqwest_error)),
+        ),
+    ))
 }
 
-fn size_from_probe_headers(headers: &HeaderMap) -> Option<u64> {
+fn identity_from_probe_headers(headers: &HeaderMap) -> Option<ResourceIdentity> {
     validate_content_encoding(headers).ok()?;
     let content_range = satisfied_content_range(headers).ok()?;
     if content_range.start != 0 || content_range.end != 1 {
         return None;
     }
-    content_range.total
+    Some(ResourceIdentity::new(
+        content_range.total?,
+        validator(headers),
+    ))
+}
+
+/// The response's `ETag`, or its `Last-Modified` date when it has no ETag.
+///
+/// The validator is per mirror: CDNs that serve the same object under
+/// different ETags yield different identities, and a journaled resume then
+/// restarts from empty whenever the first range is won by a mirror other than
+/// the one that started the file.
+fn validator(headers: &HeaderMap) -> Option<String> {
+    [ETAG, LAST_MODIFIED].into_iter().find_map(|name| {
+        headers
+            .get(name)
+            .and_then(|value| value.to_str().ok())
+            .map(str::to_owned)
+    })
 }
 
 #[async_trait]
@@ -257,14 +415,14 @@ fn classify_reqwest_error(error: reqwest::Error) -> SourceError {
 }
 
 fn status_error(status: StatusCode) -> SourceError {
-    let kind = if status.is_server_error()
-        || status == StatusCode::REQUEST_TIMEOUT
-        || status == StatusCode::TOO_MANY_REQUESTS
-    {
-        SourceErrorKind::Other
-    } else {
-        SourceErrorKind::Protocol
-    };
+    let kind =
+        if status == StatusCode::TOO_MANY_REQUESTS || status == StatusCode::SERVICE_UNAVAILABLE {
+            SourceErrorKind::Throttled
+        } else if status.is_server_error() || status == StatusCode::REQUEST_TIMEOUT {
+            SourceErrorKind::Other
+        } else {
+            SourceErrorKind::Protocol
+        };
     SourceError::new(kind, format!("expected HTTP 206, got {status}"))
 }
 
@@ -273,8 +431,11 @@ mod tests {
     use std::time::Duration;
 
     use reqwest::{
-        Client, Url,
-        header::{ACCEPT_ENCODING, CONTENT_ENCODING, CONTENT_RANGE, HeaderMap, IF_RANGE, RANGE},
+        Client, StatusCode, Url,
+        header::{
+            ACCEPT_ENCODING, CONTENT_ENCODING, CONTENT_RANGE, ETAG, HeaderMap, IF_RANGE,
+            LAST_MODIFIED, RANGE,
+        },
     };
     use tokio::{
         io::{AsyncReadExt, AsyncWriteExt},
@@ -284,10 +445,10 @@ mod tests {
     };
 
     use super::{
-        HttpRangeSource, probe_size, satisfied_content_range, size_from_probe_headers,
-        validate_content_encoding,
+        HttpRangeSource, identity_from_probe_headers, probe_resource, satisfied_content_range,
+        status_error, validate_content_encoding,
     };
-    use haya::ByteRange;
+    use haya::{ByteRange, SourceErrorKind};
 
     fn install_rustls_provider() {
         let _ = rustls::crypto::ring::default_provider().install_default();
@@ -400,6 +561,26 @@ mod tests {
         assert!(satisfied_content_range(&headers).is_err());
     }
 
+    #[test]
+    fn classifies_backpressure_statuses_as_throttled() {
+        assert_eq!(
+            status_error(StatusCode::TOO_MANY_REQUESTS).kind,
+            SourceErrorKind::Throttled
+        );
+        assert_eq!(
+            status_error(StatusCode::SERVICE_UNAVAILABLE).kind,
+            SourceErrorKind::Throttled
+        );
+        assert_eq!(
+            status_error(StatusCode::BAD_GATEWAY).kind,
+            SourceErrorKind::Other
+        );
+        assert_eq!(
+            status_error(StatusCode::NOT_FOUND).kind,
+            SourceErrorKind::Protocol
+        );
+    }
+
     #[test]
     fn rejects_non_identity_content_encoding() {
         let mut headers = HeaderMap::new();
@@ -412,21 +593,43 @@ mod tests {
 
     #[test]
     fn size_probe_requires_the_requested_range_and_known_total() {
+        let size = |headers: &HeaderMap| identity_from_probe_headers(headers).map(|id| id.size);
         let mut headers = HeaderMap::new();
-        assert_eq!(size_from_probe_headers(&headers), None);
+        assert_eq!(size(&headers), None);
 
         headers.insert(CONTENT_RANGE, "bytes 0-1/9".parse().expect("header"));
-        assert_eq!(size_from_probe_headers(&headers), Some(9));
+        assert_eq!(size(&headers), Some(9));
 
         headers.insert(CONTENT_RANGE, "bytes 1-2/9".parse().expect("header"));
-        assert_eq!(size_from_probe_headers(&headers), None);
+        assert_eq!(size(&headers), None);
 
         headers.insert(CONTENT_RANGE, "bytes 0-1/*".parse().expect("header"));
-        assert_eq!(size_from_probe_headers(&headers), None);
+        assert_eq!(size(&headers), None);
 
         headers.insert(CONTENT_RANGE, "bytes 0-1/9".parse().expect("header"));
         headers.insert(CONTENT_ENCODING, "gzip".parse().expect("header"));
-        assert_eq!(size_from_probe_headers(&headers), None);
+        assert_eq!(size(&headers), None);
+    }
+
+    #[test]
+    fn size_probe_prefers_the_etag_as_validator() {
+        let validator =
+            |headers: &HeaderMap| identity_from_probe_headers(headers).and_then(|id| id.validator);
+        let mut headers = HeaderMap::new();
+        headers.insert(CONTENT_RANGE, "bytes 0-1/9".parse().expect("header"));
+        assert_eq!(validator(&headers), None);
+
+        headers.insert(
+            LAST_MODIFIED,
+            "Wed, 21 Oct 2015 07:28:00 GMT".parse().expect("header"),
+        );
+        assert_eq!(
+            validator(&headers).as_deref(),
+            Some("Wed, 21 Oct 2015 07:28:00 GMT")
+        );
+
+        headers.insert(ETAG, "\"abc\"".parse().expect("header"));
+        assert_eq!(validator(&headers).as_deref(), Some("\"abc\""));
     }
 
     #[tokio::test]
@@ -434,13 +637,13 @@ mod tests {
         install_rustls_provider();
         let (url, request, _held_body) = serve_ignored_range_headers().await;
 
-        let size = timeout(Duration::from_secs(1), probe_size(&probe_client(), url))
+        let identity = timeout(Duration::from_secs(1), probe_resource(&probe_client(), url))
             .await
             .expect("probe waited for the ignored full response body")
             .expect("probe request");
         let request = request.await.expect("captured request");
 
-        assert_eq!(size, None);
+        assert_eq!(identity, None);
         assert!(request.contains("range: bytes=0-1\r\n"));
         assert!(request.contains("accept-encoding: identity\r\n"));
     }
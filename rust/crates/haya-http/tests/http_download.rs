@@ -7,7 +7,7 @@ use haya::{
     CommitSink, DownloadSpec, Downloader, RangeSource, SourceErrorKind,
     file::{FileOpenMode, FileSink},
 };
-use haya_http::HttpRangeSource;
+use haya_http::{HttpRangeSource, open_first_range};
 use reqwest::{Client, Url, header::HeaderMap};
 use tokio::{
     io::{AsyncReadExt, AsyncWriteExt},
@@ -248,6 +248,124 @@ async fn downloads_to_a_file_and_resumes_from_an_unaligned_length() {
     );
 }
 
+#[tokio::test]
+async fn learns_the_size_from_the_first_range_of_a_working_mirror() {
+    let expected = payload(20 * 1024 + 17);
+    let broken = FaultServer::spawn(expected.clone(), Behavior::Disconnect).await;
+    let good = FaultServer::spawn(expected.clone(), Behavior::Normal).await;
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    install_rustls_provider();
+    let client = Client::new();
+
+    // The broken mirror hands over as soon as it fails, long before the stagger.
+    let (identity, opened) = tokio::time::timeout(
+        Duration::from_secs(5),
+        open_first_range(
+            &client,
+            &[broken.url.clone(), good.url.clone()],
+            &HeaderMap::new(),
+            haya::ByteRange::new(0, 4 * 1024).expect("range"),
+            Duration::from_secs(60),
+        ),
+    )
+    .await
+    .expect("no stagger wait")
+    .expect("a mirror answers");
+    assert_eq!(identity.size, expected.len() as u64);
+    assert_eq!(opened.source, 1);
+    assert_eq!(
+        opened.range,
+        haya::ByteRange::new(0, 4 * 1024).expect("range")
+    );
+
+    let sink = Arc::new(
+        FileSink::open(&path, FileOpenMode::Overwrite)
+            .await
+            .expect("open file sink"),
+    );
+    Downloader::new(
+        spec(identity.size),
+        vec![broken.source(identity.size), good.source(identity.size)],
+        sink.clone(),
+    )
+    .expect("valid downloader")
+    .with_opened_range(opened)
+    .run()
+    .await
+    .expect("download succeeds");
+    sink.close().await.expect("close output");
+
+    assert_eq!(tokio::fs::read(path).await.expect("read output"), expected);
+    let requested = [broken.requested_ranges(), good.requested_ranges()].concat();
+    assert_eq!(
+        requested
+            .iter()
+            .filter(|range| range.starts_with("bytes=0-"))
+            .count(),
+        2
+    );
+}
+
+#[tokio::test]
+async fn asks_only_a_healthy_first_mirror_for_the_first_range() {
+    let expected = payload(20 * 1024);
+    let first = FaultServer::spawn(expected.clone(), Behavior::Normal).await;
+    let second = FaultServer::spawn(expected.clone(), Behavior::Normal).await;
+    install_rustls_provider();
+
+    let (identity, opened) = open_first_range(
+        &Client::new(),
+        &[first.url.clone(), second.url.clone()],
+        &HeaderMap::new(),
+        haya::ByteRange::new(8 * 1024, 12 * 1024).expect("range"),
+        Duration::from_secs(60),
+    )
+    .await
+    .expect("the first mirror answers");
+
+    assert_eq!(identity.size, expected.len() as u64);
+    assert_eq!(opened.source, 0);
+    assert_eq!(
+        opened.range,
+        haya::ByteRange::new(8 * 1024, 12 * 1024).expect("range")
+    );
+    assert_eq!(first.requested_ranges(), ["bytes=8192-12287"]);
+    assert!(second.requested_ranges().is_empty());
+}
+
+#[tokio::test]
+async fn clamps_the_first_range_to_a_smaller_resource() {
+    let server = FaultServer::spawn(payload(1000), Behavior::Normal).await;
+    install_rustls_provider();
+
+    let (identity, opened) = open_first_range(
+        &Client::new(),
+        &[server.url.clone()],
+        &HeaderMap::new(),
+        haya::ByteRange::new(0, 4096).expect("range"),
+        Duration::ZERO,
+    )
+    .await
+    .expect("the server answers");
+
+    assert_eq!(identity.size, 1000);
+    assert_eq!(opened.range, haya::ByteRange::new(0, 1000).expect("range"));
+    let missing = FaultServer::spawn(payload(1000), Behavior::IgnoreRange).await;
+    let result = open_first_range(
+        &Client::new(),
+        &[missing.url.clone()],
+        &HeaderMap::new(),
+        haya::ByteRange::new(0, 4096).expect("range"),
+        Duration::ZERO,
+    )
+    .await;
+    assert!(matches!(
+        result,
+        Err(error) if error.kind == SourceErrorKind::Protocol
+    ));
+}
+
 #[tokio::test]
 async fn switches_to_a_mirror_after_wrong_content_range() {
     let expected = payload(12 * 1024 + 3);
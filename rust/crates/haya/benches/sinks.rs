@@ -0,0 +1,165 @@
+//! Compares the file sinks.
+//!
+//! Run with `cargo bench -p haya --bench sinks`. The download benchmarks
+//! serve an in-memory payload with a deterministic per-range delay and an
+//! occasional straggler, which is where the ordered window stalls dispatch.
+//! The append benchmarks commit page-sized chunks in batches to several sinks
+//! at once, as concurrent transfers do, once per `FileBackend`.
+
+use std::{
+    sync::Arc,
+    time::{Duration, Instant},
+};
+
+use async_trait::async_trait;
+use bytes::Bytes;
+use futures_util::stream;
+use haya::{
+    ByteRange, ByteStream, CommitBatch, CommitSink, DownloadSpec, Downloader, RangeSource,
+    SourceError,
+    file::{
+        FileBackend, FileOpenMode, FileSink, FileSinkOptions, PositionalFileSink, ResourceIdentity,
+    },
+};
+use tokio::task::JoinSet;
+
+const PAYLOAD_SIZE: usize = 64 * 1024 * 1024;
+const ROUNDS: usize = 3;
+
+struct JitteredSource {
+    payload: Bytes,
+}
+
+impl JitteredSource {
+    fn delay(range: ByteRange) -> Duration {
+        let block = range.start / DownloadSpec::DEFAULT_BLOCK_SIZE as u64;
+        if block % 16 == 3 {
+            return Duration::from_millis(250);
+        }
+        let jitter = block.wrapping_mul(0x9e37_79b9_7f4a_7c15) >> 59;
+        Duration::from_millis(5 + jitter)
+    }
+}
+
+#[async_trait]
+impl RangeSource for JitteredSource {
+    async fn open(&self, range: ByteRange) -> Result<ByteStream, SourceError> {
+        tokio::time::sleep(Self::delay(range)).await;
+        let body = self.payload.slice(range.start as usize..range.end as usize);
+        Ok(Box::pin(stream::iter([Ok(body)])))
+    }
+}
+
+async fn run_once(sink: Arc<dyn CommitSink>, payload: &Bytes) -> Duration {
+    let source = Arc::new(JitteredSource {
+        payload: payload.clone(),
+    });
+    let downloader = Downloader::new(
+        DownloadSpec::new(payload.len() as u64),
+        vec![source],
+        sink.clone(),
+    )
+    .expect("valid downloader");
+    let started = Instant::now();
+    downloader.run().await.expect("download succeeds");
+    sink.close().await.expect("close sink");
+    started.elapsed()
+}
+
+async fn bench_download(name: &str, payload: &Bytes, positional: bool) {
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    let mut timings = Vec::with_capacity(ROUNDS);
+    for _ in 0..ROUNDS {
+        let identity = ResourceIdentity::new(payload.len() as u64, None);
+        let sink: Arc<dyn CommitSink> = if positional {
+            Arc::new(
+                PositionalFileSink::open(&path, FileOpenMode::Overwrite, identity)
+                    .await
+                    .expect("open sink"),
+            )
+        } else {
+            Arc::new(
+                FileSink::open_journaled(&path, FileOpenMode::Overwrite, identity)
+                    .await
+                    .expect("open sink"),
+            )
+        };
+        timings.push(run_once(sink, payload).await);
+    }
+    report(name, timings, payload.len());
+}
+
+async fn append_all(path: std::path::PathBuf, payload: Bytes, backend: FileBackend) {
+    let options = FileSinkOptions {
+        backend,
+        ..FileSinkOptions::default()
+    };
+    let sink = FileSink::open_with(&path, FileOpenMode::Overwrite, options)
+        .await
+        .expect("open sink");
+    let batch_size = sink
+        .append_batch_size_hint()
+        .map_or(payload.len(), |size| size.get());
+    let page_size = DownloadSpec::DEFAULT_PAGE_SIZE;
+    for start in (0..payload.len()).step_by(batch_size) {
+        let end = (start + batch_size).min(payload.len());
+        let chunks = (start..end)
+            .step_by(page_size)
+            .map(|page| payload.slice(page..(page + page_size).min(end)))
+            .collect();
+        let batch = CommitBatch::new(start as u64, chunks).expect("valid batch");
+        sink.append_batch(batch).await.expect("append batch");
+    }
+    sink.close().await.expect("close sink");
+}
+
+async fn bench_appends(name: &str, payload: &Bytes, backend: FileBackend, sinks: usize) {
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let mut timings = Vec::with_capacity(ROUNDS);
+    for _ in 0..ROUNDS {
+        let started = Instant::now();
+        let mut appends = JoinSet::new();
+        for index in 0..sinks {
+            let path = directory.path().join(format!("output-{index}.bin"));
+            appends.spawn(append_all(path, payload.clone(), backend));
+        }
+        appends.join_all().await;
+        timings.push(started.elapsed());
+    }
+    report(name, timings, payload.len() * sinks);
+}
+
+fn report(name: &str, mut timings: Vec<Duration>, bytes: usize) {
+    timings.sort();
+    let median = timings[timings.len() / 2];
+    let throughput = bytes as f64 / median.as_secs_f64() / (1024.0 * 1024.0);
+    println!("{name:<24} median {median:>10.2?}  {throughput:>8.1} MiB/s");
+}
+
+#[tokio::main]
+async fn main() {
+    let payload = Bytes::from(
+        (0..PAYLOAD_SIZE)
+            .map(|index| (index % 251) as u8)
+            .collect::<Vec<_>>(),
+    );
+    bench_download("download/ordered", &payload, false).await;
+    bench_download("download/positional", &payload, true).await;
+    for sinks in [1, 4] {
+        bench_appends(
+            &format!("append/tokio x{sinks}"),
+            &payload,
+            FileBackend::Tokio,
+            sinks,
+        )
+        .await;
+        bench_appends(
+            &format!("append/writer-thread x{sinks}"),
+            &payload,
+            FileBackend::WriterThread,
+            sinks,
+        )
+        .await;
+    }
+}
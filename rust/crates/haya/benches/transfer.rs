@@ -0,0 +1,474 @@
+//! Measures the transfer engine against simulated sources.
+//!
+//! Run with `cargo bench -p haya --bench transfer`, optionally followed by
+//! `-- <filter>` to run only the cases whose name contains the filter. Each
+//! source serves an in-memory payload over its own simulated link: every
+//! request waits out the source's latency plus a deterministic jitter, then
+//! the body is paced by the source's bandwidth, which all of its concurrent
+//! requests share. The cases sweep workers, block size and window pages one
+//! at a time around the defaults, committing to an in-memory sink and, for
+//! the defaults, to a journaled `FileSink`.
+//!
+//! For each case the median of the rounds is reported for:
+//!
+//! - throughput of the whole download;
+//! - peak bytes held in the ordered window;
+//! - p50 and p99 commit latency, from a range's last byte arriving to the
+//!   sink appending it;
+//! - process CPU time per GiB (Linux only).
+
+use std::{
+    collections::HashMap,
+    sync::{
+        Arc, Mutex,
+        atomic::{AtomicUsize, Ordering},
+    },
+    time::{Duration, Instant},
+};
+
+use async_trait::async_trait;
+use bytes::Bytes;
+use futures_util::{StreamExt, stream};
+use haya::{
+    ByteRange, ByteStream, CommitBatch, CommitSink, DownloadSnapshot, DownloadSpec, Downloader,
+    ProgressSink, RangeSource, SinkError, SourceError,
+    file::{FileOpenMode, FileSink, ResourceIdentity},
+};
+
+const PAYLOAD_SIZE: usize = 32 * 1024 * 1024;
+const ROUNDS: usize = 3;
+const MIB: f64 = 1024.0 * 1024.0;
+
+#[derive(Clone, Copy)]
+struct SourceProfile {
+    latency: Duration,
+    /// Bytes per second shared by every request open on the source.
+    bandwidth: u64,
+    /// Upper bound of the extra latency added to each request.
+    jitter: Duration,
+}
+
+const SOURCES: [SourceProfile; 3] = [
+    SourceProfile {
+        latency: Duration::from_millis(15),
+        bandwidth: 48 * 1024 * 1024,
+        jitter: Duration::from_millis(5),
+    },
+    SourceProfile {
+        latency: Duration::from_millis(40),
+        bandwidth: 24 * 1024 * 1024,
+        jitter: Duration::from_millis(20),
+    },
+    SourceProfile {
+        latency: Duration::from_millis(80),
+        bandwidth: 8 * 1024 * 1024,
+        jitter: Duration::from_millis(120),
+    },
+];
+
+/// When each range's last byte left a source, shared by all sources of a run.
+#[derive(Default)]
+struct Deliveries {
+    delivered: Mutex<HashMap<u64, Instant>>,
+}
+
+impl Deliveries {
+    fn record(&self, end: u64) {
+        self.delivered
+            .lock()
+            .expect("deliveries lock poisoned")
+            .entry(end)
+            .or_insert_with(Instant::now);
+    }
+}
+
+/// A source's link, which every request open on the source shares.
+struct Link {
+    bandwidth: u64,
+    /// When the link finishes sending what it already accepted.
+    free_at: Mutex<Instant>,
+}
+
+impl Link {
+    /// Queues `bytes` behind earlier chunks and returns when they finish arriving.
+    fn transmit(&self, bytes: usize) -> Instant {
+        let duration = Duration::from_secs_f64(bytes as f64 / self.bandwidth as f64);
+        let mut free_at = self.free_at.lock().expect("link lock poisoned");
+        let finish = (*free_at).max(Instant::now()) + duration;
+        *free_at = finish;
+        finish
+    }
+}
+
+struct SimulatedSource {
+    payload: Bytes,
+    profile: SourceProfile,
+    seed: u64,
+    link: Arc<Link>,
+    deliveries: Arc<Deliveries>,
+}
+
+impl SimulatedSource {
+    fn new(payload: Bytes, profile: SourceProfile, seed: u64, deliveries: Arc<Deliveries>) -> Self {
+        Self {
+            payload,
+            profile,
+            seed,
+            link: Arc::new(Link {
+                bandwidth: profile.bandwidth,
+                free_at: Mutex::new(Instant::now()),
+            }),
+            deliveries,
+        }
+    }
+
+    fn first_byte_delay(&self, range: ByteRange) -> Duration {
+        let jitter = self.profile.jitter.as_micros() as u64;
+        if jitter == 0 {
+            return self.profile.latency;
+        }
+        let hash = (range.start ^ self.seed).wrapping_mul(0x9e37_79b9_7f4a_7c15) >> 32;
+        self.profile.latency + Duration::from_micros(hash % jitter)
+    }
+}
+
+#[async_trait]
+impl RangeSource for SimulatedSource {
+    async fn open(&self, range: ByteRange) -> Result<ByteStream, SourceError> {
+        tokio::time::sleep(self.first_byte_delay(range)).await;
+        let body = self.payload.slice(range.start as usize..range.end as usize);
+        let page_size = DownloadSpec::DEFAULT_PAGE_SIZE;
+        let chunks = (0..body.len())
+            .step_by(page_size)
+            .map(|start| body.slice(start..(start + page_size).min(body.len())))
+            .collect::<Vec<_>>();
+        let last = chunks.len() - 1;
+        let link = self.link.clone();
+        let deliveries = self.deliveries.clone();
+        let stream = stream::iter(chunks.into_iter().enumerate()).then(move |(index, chunk)| {
+            let link = link.clone();
+            let deliveries = deliveries.clone();
+            async move {
+                tokio::time::sleep_until(link.transmit(chunk.len()).into()).await;
+                if index == last {
+                    deliveries.record(range.end);
+                }
+                Ok(chunk)
+            }
+        });
+        Ok(Box::pin(stream))
+    }
+}
+
+/// Commits to memory, checking only that appends are contiguous.
+#[derive(Default)]
+struct MemorySink {
+    committed: Mutex<u64>,
+}
+
+#[async_trait]
+impl CommitSink for MemorySink {
+    async fn committed_offset(&self) -> Result<u64, SinkError> {
+        Ok(*self.committed.lock().expect("sink lock poisoned"))
+    }
+
+    async fn append(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        let mut committed = self.committed.lock().expect("sink lock poisoned");
+        if offset != *committed {
+            return Err(SinkError::new(format!(
+                "expected an append at {committed}, got {offset}"
+            )));
+        }
+        *committed += data.len() as u64;
+        Ok(())
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        Ok(())
+    }
+}
+
+/// Records when each append finished committing to the wrapped sink.
+struct TimedSink {
+    inner: Arc<dyn CommitSink>,
+    commits: Mutex<Vec<(u64, Instant)>>,
+}
+
+impl TimedSink {
+    fn new(inner: Arc<dyn CommitSink>) -> Self {
+        Self {
+            inner,
+            commits: Mutex::new(Vec::new()),
+        }
+    }
+
+    fn record(&self, end: u64) {
+        self.commits
+            .lock()
+            .expect("commits lock poisoned")
+            .push((end, Instant::now()));
+    }
+
+    /// The time from each delivered range's last byte to the append that committed it.
+    fn commit_latencies(&self, deliveries: &Deliveries) -> Vec<Duration> {
+        let commits = self.commits.lock().expect("commits lock poisoned");
+        let delivered = deliveries
+            .delivered
+            .lock()
+            .expect("deliveries lock poisoned");
+        let mut latencies = delivered
+            .iter()
+            .filter_map(|(&end, &arrived)| {
+                let index = commits.partition_point(|&(committed, _)| committed < end);
+                commits
+                    .get(index)
+                    .map(|&(_, at)| at.saturating_duration_since(arrived))
+            })
+            .collect::<Vec<_>>();
+        latencies.sort();
+        latencies
+    }
+}
+
+#[async_trait]
+impl CommitSink for TimedSink {
+    async fn committed_offset(&self) -> Result<u64, SinkError> {
+        self.inner.committed_offset().await
+    }
+
+    async fn append(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        let end = offset + data.len() as u64;
+        self.inner.append(offset, data).await?;
+        self.record(end);
+        Ok(())
+    }
+
+    fn append_batch_size_hint(&self) -> Option<std::num::NonZeroUsize> {
+        self.inner.append_batch_size_hint()
+    }
+
+    async fn append_batch(&self, batch: CommitBatch) -> Result<(), SinkError> {
+        let end = batch.end_offset();
+        self.inner.append_batch(batch).await?;
+        self.record(end);
+        Ok(())
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        self.inner.flush().await
+    }
+
+    async fn close(&self) -> Result<(), SinkError> {
+        self.inner.close().await
+    }
+}
+
+/// Tracks the most pages the ordered window held at once.
+#[derive(Default)]
+struct PeakBuffered {
+    pages: AtomicUsize,
+}
+
+impl ProgressSink for PeakBuffered {
+    fn update(&self, snapshot: DownloadSnapshot) {
+        self.pages
+            .fetch_max(snapshot.buffered_pages, Ordering::Relaxed);
+    }
+}
+
+#[derive(Clone, Copy)]
+enum SinkKind {
+    Memory,
+    Journaled,
+}
+
+struct Case {
+    name: String,
+    spec: DownloadSpec,
+    sink: SinkKind,
+}
+
+fn cases() -> Vec<Case> {
+    let spec = DownloadSpec::new(PAYLOAD_SIZE as u64);
+    let mut cases = vec![Case {
+        name: "defaults".into(),
+        spec: spec.clone(),
+        sink: SinkKind::Memory,
+    }];
+    for workers in [1, 4, 16] {
+        cases.push(Case {
+            name: format!("workers/{workers}"),
+            spec: DownloadSpec {
+                workers,
+                ..spec.clone()
+            },
+            sink: SinkKind::Memory,
+        });
+    }
+    for block_kib in [128, 2048] {
+        cases.push(Case {
+            name: format!("block/{block_kib}KiB"),
+            spec: DownloadSpec {
+                block_size: block_kib * 1024,
+                ..spec.clone()
+            },
+            sink: SinkKind::Memory,
+        });
+    }
+    for window_pages in [32, 512] {
+        cases.push(Case {
+            name: format!("window/{window_pages}"),
+            spec: DownloadSpec {
+                window_pages,
+                ..spec.clone()
+            },
+            sink: SinkKind::Memory,
+        });
+    }
+    cases.push(Case {
+        name: "defaults/journaled-file".into(),
+        spec,
+        sink: SinkKind::Journaled,
+    });
+    cases
+}
+
+struct Measurement {
+    elapsed: Duration,
+    peak_buffered: usize,
+    commit_p50: Duration,
+    commit_p99: Duration,
+    cpu: Option<Duration>,
+}
+
+async fn run_once(case: &Case, payload: &Bytes, directory: &std::path::Path) -> Measurement {
+    let deliveries = Arc::new(Deliveries::default());
+    let sources = SOURCES
+        .iter()
+        .enumerate()
+        .map(|(index, &profile)| {
+            Arc::new(SimulatedSource::new(
+                payload.clone(),
+                profile,
+                index as u64,
+                deliveries.clone(),
+            )) as Arc<dyn RangeSource>
+        })
+        .collect();
+    let inner: Arc<dyn CommitSink> = match case.sink {
+        SinkKind::Memory => Arc::new(MemorySink::default()),
+        SinkKind::Journaled => Arc::new(
+            FileSink::open_journaled(
+                directory.join("output.bin"),
+                FileOpenMode::Overwrite,
+                ResourceIdentity::new(payload.len() as u64, None),
+            )
+            .await
+            .expect("open sink"),
+        ),
+    };
+    let sink = Arc::new(TimedSink::new(inner));
+    let peak = Arc::new(PeakBuffered::default());
+    let downloader = Downloader::new(case.spec.clone(), sources, sink.clone())
+        .expect("valid downloader")
+        .with_progress_sink(peak.clone());
+
+    let cpu_started = cpu_time();
+    let started = Instant::now();
+    downloader.run().await.expect("download succeeds");
+    sink.close().await.expect("close sink");
+    let elapsed = started.elapsed();
+    let cpu = cpu_started
+        .zip(cpu_time())
+        .map(|(started, finished)| finished.saturating_sub(started));
+
+    let latencies = sink.commit_latencies(&deliveries);
+    let percentile = |fraction: f64| {
+        latencies
+            .get(
+                ((latencies.len() as f64 * fraction) as usize)
+                    .min(latencies.len().saturating_sub(1)),
+            )
+            .copied()
+            .unwrap_or_default()
+    };
+    Measurement {
+        elapsed,
+        peak_buffered: peak.pages.load(Ordering::Relaxed) * case.spec.page_size,
+        commit_p50: percentile(0.5),
+        commit_p99: percentile(0.99),
+        cpu,
+    }
+}
+
+/// User and system CPU time of the whole process.
+#[cfg(target_os = "linux")]
+fn cpu_time() -> Option<Duration> {
+    let mut usage = std::mem::MaybeUninit::<libc::rusage>::uninit();
+    // SAFETY: `getrusage` fills the struct when it succeeds.
+    if unsafe { libc::getrusage(libc::RUSAGE_SELF, usage.as_mut_ptr()) } != 0 {
+        return None;
+    }
+    // SAFETY: checked above.
+    let usage = unsafe { usage.assume_init() };
+    let micros = |time: libc::timeval| time.tv_sec as u64 * 1_000_000 + time.tv_usec as u64;
+    Some(Duration::from_micros(
+        micros(usage.ru_utime) + micros(usage.ru_stime),
+    ))
+}
+
+#[cfg(not(target_os = "linux"))]
+fn cpu_time() -> Option<Duration> {
+    None
+}
+
+fn median<T: Copy + Ord>(mut values: Vec<T>) -> T {
+    values.sort();
+    values[values.len() / 2]
+}
+
+fn report(name: &str, measurements: Vec<Measurement>, bytes: usize) {
+    let elapsed = median(measurements.iter().map(|m| m.elapsed).collect());
+    let peak = median(measurements.iter().map(|m| m.peak_buffered).collect());
+    let p50 = median(measurements.iter().map(|m| m.commit_p50).collect());
+    let p99 = median(measurements.iter().map(|m| m.commit_p99).collect());
+    let throughput = bytes as f64 / elapsed.as_secs_f64() / MIB;
+    let cpu = measurements
+        .iter()
+        .map(|m| m.cpu)
+        .collect::<Option<Vec<_>>>()
+        .map(|cpu| {
+            let per_gib = median(cpu).as_secs_f64() * (1024.0 * MIB) / bytes as f64;
+            format!("{per_gib:.2}s/GiB")
+        })
+        .unwrap_or_else(|| "n/a".into());
+    println!(
+        "{name:<24} {throughput:>7.1} MiB/s  peak {:>6.1} MiB  commit p50 {p50:>9.2?} p99 {p99:>9.2?}  cpu {cpu}",
+        peak as f64 / MIB,
+    );
+}
+
+#[tokio::main]
+async fn main() {
+    // `cargo bench` passes `--bench`; the first other argument filters the cases.
+    let filter = std::env::args().skip(1).find(|arg| !arg.starts_with('-'));
+    let payload = Bytes::from(
+        (0..PAYLOAD_SIZE)
+            .map(|index| (index % 251) as u8)
+            .collect::<Vec<_>>(),
+    );
+    let directory = tempfile::tempdir().expect("temporary directory");
+    for case in cases() {
+        if filter
+            .as_deref()
+            .is_some_and(|filter| !case.name.contains(filter))
+        {
+            continue;
+        }
+        let mut measurements = Vec::with_capacity(ROUNDS);
+        for _ in 0..ROUNDS {
+            measurements.push(run_once(&case, &payload, directory.path()).await);
+        }
+        report(&case.name, measurements, payload.len());
+    }
+}
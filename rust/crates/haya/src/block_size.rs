@@ -0,0 +1,121 @@
+use std::time::Duration;
+
+use crate::{DownloadError, source_pool::SourceEstimate};
+
+/// Sizes each range from the selected source's measured throughput and latency
+/// so that one request takes roughly `target_duration`.
+///
+/// Ranges stay page aligned. A source without measurements starts from
+/// `DownloadSpec::block_size`.
+#[derive(Clone, Debug, Eq, PartialEq)]
+pub struct AdaptiveBlockSize {
+    pub target_duration: Duration,
+    pub min_block_size: usize,
+    pub max_block_size: usize,
+}
+
+impl AdaptiveBlockSize {
+    pub const DEFAULT_TARGET_DURATION: Duration = Duration::from_secs(1);
+    pub const DEFAULT_MAX_BLOCK_SIZE: usize = 16 * 1024 * 1024;
+
+    pub fn new() -> Self {
+        Self {
+            target_duration: Self::DEFAULT_TARGET_DURATION,
+            min_block_size: 1,
+            max_block_size: Self::DEFAULT_MAX_BLOCK_SIZE,
+        }
+    }
+
+    pub(crate) fn validate(&self) -> Result<(), DownloadError> {
+        if self.target_duration.is_zero() {
+            return Err(DownloadError::InvalidSpec(
+                "adaptive block target_duration must be positive".into(),
+            ));
+        }
+        if self.min_block_size == 0 || self.max_block_size < self.min_block_size {
+            return Err(DownloadError::InvalidSpec(
+                "adaptive block sizes must satisfy 0 < min_block_size <= max_block_size".into(),
+            ));
+        }
+        Ok(())
+    }
+
+    /// Returns a page-aligned range length for the next request to a source.
+    pub(crate) fn block_len(
+        &self,
+        estimate: Option<SourceEstimate>,
+        fallback: usize,
+        page_size: usize,
+        window_pages: usize,
+    ) -> u64 {
+        let max_pages = (self.max_block_size / page_size).clamp(1, window_pages);
+        let min_pages = self.min_block_size.div_ceil(page_size).clamp(1, max_pages);
+        let pages = match estimate {
+            Some(estimate) => {
+                // Leave the request its full latency on top of the transfer
+                // time, but never spend more than half the target on latency.
+                let budget = self
+                    .target_duration
+                    .saturating_sub(estimate.latency)
+                    .max(self.target_duration / 2);
+                let bytes = estimate.throughput * budget.as_secs_f64();
+                (bytes / page_size as f64) as usize
+            }
+            None => fallback / page_size,
+        };
+        (pages.clamp(min_pages, max_pages) * page_size) as u64
+    }
+}
+
+impl Default for AdaptiveBlockSize {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn sizing() -> AdaptiveBlockSize {
+        AdaptiveBlockSize {
+            target_duration: Duration::from_secs(1),
+            min_block_size: 2048,
+            max_block_size: 64 * 1024,
+        }
+    }
+
+    #[test]
+    fn uses_the_configured_block_size_before_any_measurement() {
+        assert_eq!(sizing().block_len(None, 8 * 1024, 1024, 128), 8 * 1024);
+    }
+
+    #[test]
+    fn targets_a_fixed_request_time_from_throughput_and_latency() {
+        let estimate = SourceEstimate {
+            throughput: 20.0 * 1024.0,
+            latency: Duration::from_millis(250),
+        };
+
+        assert_eq!(
+            sizing().block_len(Some(estimate), 1024, 1024, 128),
+            15 * 1024
+        );
+    }
+
+    #[test]
+    fn clamps_to_the_configured_bounds_and_the_window() {
+        let fast = SourceEstimate {
+            throughput: 1e9,
+            latency: Duration::ZERO,
+        };
+        let slow = SourceEstimate {
+            throughput: 10.0,
+            latency: Duration::from_secs(5),
+        };
+
+        assert_eq!(sizing().block_len(Some(fast), 1024, 1024, 128), 64 * 1024);
+        assert_eq!(sizing().block_len(Some(fast), 1024, 1024, 16), 16 * 1024);
+        assert_eq!(sizing().block_len(Some(slow), 1024, 1024, 128), 2 * 1024);
+    }
+}
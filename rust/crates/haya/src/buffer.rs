@@ -116,6 +116,36 @@ impl OrderedBuffer {
             .map(Some)
             .map_err(Into::into)
     }
+
+    /// Takes every buffered page, grouped into contiguous batches, and leaves
+    /// the buffer empty.
+    pub fn take_buffered(&mut self) -> Result<Vec<CommitBatch>, DownloadError> {
+        let mut batches = Vec::new();
+        let mut run: Option<(u64, Vec<Bytes>)> = None;
+        for page in self.head..self.head + self.slots.len() as u64 {
+            let slot = page as usize % self.slots.len();
+            match (self.slots[slot].take(), &mut run) {
+                (Some(data), Some((_, chunks))) => {
+                    self.ready -= 1;
+                    chunks.push(data);
+                }
+                (Some(data), None) => {
+                    self.ready -= 1;
+                    let offset = self.origin + page * self.page_size as u64;
+                    run = Some((offset, vec![data]));
+                }
+                (None, _) => {
+                    if let Some((offset, chunks)) = run.take() {
+                        batches.push(CommitBatch::new(offset, chunks)?);
+                    }
+                }
+            }
+        }
+        if let Some((offset, chunks)) = run {
+            batches.push(CommitBatch::new(offset, chunks)?);
+        }
+        Ok(batches)
+    }
 }
 
 #[cfg(test)]
@@ -189,4 +219,23 @@ mod tests {
                 .is_none()
         );
     }
+
+    #[test]
+    fn takes_buffered_pages_as_contiguous_batches() {
+        let mut buffer = OrderedBuffer::new(100, 4, 5).expect("valid buffer");
+        for offset in [104, 108, 116] {
+            buffer
+                .insert(offset, Bytes::from_static(b"page"))
+                .expect("page fits");
+        }
+
+        let batches = buffer.take_buffered().expect("valid batches");
+
+        let ranges: Vec<_> = batches
+            .iter()
+            .map(|batch| (batch.offset(), batch.len()))
+            .collect();
+        assert_eq!(ranges, [(104, 8), (116, 4)]);
+        assert_eq!(buffer.ready_pages(), 0);
+    }
 }
@@ -0,0 +1,319 @@
+use std::time::Duration;
+
+use tokio::time::Instant;
+
+use crate::{DownloadError, SourceErrorKind};
+
+/// Lets a downloader grow or shrink its own concurrency between `min_workers`
+/// and `DownloadSpec::workers` from measured goodput.
+///
+/// Concurrency grows by one worker per sample while goodput keeps improving.
+/// It halves on timeouts and throttling responses, and shrinks by a quarter
+/// when an extra worker stops paying off. After such a plateau it holds for a
+/// few samples and then probes one worker upward again; a probe that does not
+/// pay off only steps back to where it started, so a stable link settles
+/// around its plateau instead of decaying towards `min_workers`.
+#[derive(Clone, Debug, Eq, PartialEq)]
+pub struct AdaptiveConcurrency {
+    pub initial_workers: usize,
+    pub min_workers: usize,
+    pub sample_interval: Duration,
+}
+
+impl AdaptiveConcurrency {
+    pub const DEFAULT_INITIAL_WORKERS: usize = 4;
+    pub const DEFAULT_SAMPLE_INTERVAL: Duration = Duration::from_millis(500);
+
+    pub fn new() -> Self {
+        Self {
+            initial_workers: Self::DEFAULT_INITIAL_WORKERS,
+            min_workers: 1,
+            sample_interval: Self::DEFAULT_SAMPLE_INTERVAL,
+        }
+    }
+
+    fn validate(&self) -> Result<(), DownloadError> {
+        if self.min_workers == 0 {
+            return Err(DownloadError::InvalidSpec(
+                "adaptive min_workers must be positive".into(),
+            ));
+        }
+        if self.initial_workers < self.min_workers {
+            return Err(DownloadError::InvalidSpec(
+                "adaptive initial_workers must be at least min_workers".into(),
+            ));
+        }
+        if self.sample_interval.is_zero() {
+            return Err(DownloadError::InvalidSpec(
+                "adaptive sample_interval must be positive".into(),
+            ));
+        }
+        Ok(())
+    }
+}
+
+impl Default for AdaptiveConcurrency {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+/// Relative goodput change treated as a real gain rather than noise.
+const GOODPUT_GAIN: f64 = 0.05;
+/// Samples to hold after a plateau before probing upward again.
+const PLATEAU_HOLD_SAMPLES: usize = 4;
+
+#[derive(Debug)]
+pub(crate) struct ConcurrencyController {
+    limit: usize,
+    min: usize,
+    max: usize,
+    adaptive: Option<Sampling>,
+}
+
+#[derive(Debug)]
+struct Sampling {
+    interval: Duration,
+    started: Instant,
+    bytes: u64,
+    saturated: bool,
+    previous_goodput: Option<f64>,
+    hold: usize,
+    /// The limit a plateau settled on, while probing upward from it.
+    probe_from: Option<usize>,
+    last_decrease: Option<Instant>,
+}
+
+impl ConcurrencyController {
+    pub fn fixed(workers: usize) -> Self {
+        Self {
+            limit: workers,
+            min: workers,
+            max: workers,
+            adaptive: None,
+        }
+    }
+
+    pub fn adaptive(config: &AdaptiveConcurrency, max: usize) -> Result<Self, DownloadError> {
+        config.validate()?;
+        let min = config.min_workers.min(max);
+        Ok(Self {
+            limit: config.initial_workers.clamp(min, max),
+            min,
+            max,
+            adaptive: Some(Sampling {
+                interval: config.sample_interval,
+                started: Instant::now(),
+                bytes: 0,
+                saturated: false,
+                previous_goodput: None,
+                hold: 0,
+                probe_from: None,
+                last_decrease: None,
+            }),
+        })
+    }
+
+    pub fn limit(&self) -> usize {
+        self.limit
+    }
+
+    /// Records whether this transfer is using its whole allowance.
+    ///
+    /// Growth is only judged on samples that were actually limited by
+    /// concurrency, not by the window, the shared worker budget or a rate limit.
+    pub fn observe(&mut self, in_flight: usize, rate_limited: bool) {
+        if let Some(sampling) = &mut self.adaptive {
+            if in_flight >= self.limit && !rate_limited {
+                sampling.saturated = true;
+            }
+        }
+    }
+
+    pub fn record_success(&mut self, bytes: u64, now: Instant) {
+        if let Some(sampling) = &mut self.adaptive {
+            sampling.bytes = sampling.bytes.saturating_add(bytes);
+        }
+        self.adjust(now);
+    }
+
+    pub fn record_failure(&mut self, kind: SourceErrorKind, now: Instant) {
+        let Some(sampling) = &mut self.adaptive else {
+            return;
+        };
+        if matches!(kind, SourceErrorKind::Timeout | SourceErrorKind::Throttled) {
+            let recently_decreased = sampling
+                .last_decrease
+                .is_some_and(|at| now.saturating_duration_since(at) < sampling.interval);
+            if !recently_decreased {
+                let limit = (self.limit / 2).max(self.min);
+                self.decrease_to(limit, 0, now);
+                return;
+            }
+        }
+        self.adjust(now);
+    }
+
+    fn adjust(&mut self, now: Instant) {
+        let Some(sampling) = &mut self.adaptive else {
+            return;
+        };
+        let elapsed = now.saturating_duration_since(sampling.started);
+        if elapsed < sampling.interval {
+            return;
+        }
+        let goodput = sampling.bytes as f64 / elapsed.as_secs_f64();
+        let saturated = sampling.saturated;
+        sampling.started = now;
+        sampling.bytes = 0;
+        sampling.saturated = false;
+        if !saturated {
+            sampling.previous_goodput = None;
+            return;
+        }
+        if sampling.hold > 0 {
+            // The first sample after the hold has nothing to compare against,
+            // so it probes upward from the reduced limit.
+            sampling.hold -= 1;
+            return;
+        }
+        match sampling.previous_goodput {
+            Some(previous) if goodput < previous * (1.0 + GOODPUT_GAIN) => {
+                let limit = match sampling.probe_from {
+                    Some(from) if from < self.limit => from,
+                    _ => self
+                        .limit
+                        .saturating_sub((self.limit / 4).max(1))
+                        .max(self.min),
+                };
+                self.decrease_to(limit, PLATEAU_HOLD_SAMPLES, now);
+            }
+            _ => {
+                if sampling.previous_goodput.is_some() {
+                    // The probe paid off; the plateau is behind.
+                    sampling.probe_from = None;
+                }
+                sampling.previous_goodput = Some(goodput);
+                self.limit = (self.limit + 1).min(self.max);
+            }
+        }
+    }
+
+    fn decrease_to(&mut self, limit: usize, hold: usize, now: Instant) {
+        self.limit = limit;
+        if let Some(sampling) = &mut self.adaptive {
+            sampling.started = now;
+            sampling.bytes = 0;
+            sampling.saturated = false;
+            sampling.previous_goodput = None;
+            sampling.hold = hold;
+            // Only a plateau is probed from; congestion starts over.
+            sampling.probe_from = (hold > 0).then_some(limit);
+            sampling.last_decrease = Some(now);
+        }
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn controller(initial_workers: usize, max: usize) -> ConcurrencyController {
+        ConcurrencyController::adaptive(
+            &AdaptiveConcurrency {
+                initial_workers,
+                min_workers: 1,
+                sample_interval: Duration::from_secs(1),
+            },
+            max,
+        )
+        .expect("valid configuration")
+    }
+
+    fn sample(controller: &mut ConcurrencyController, now: &mut Instant, bytes: u64) {
+        controller.observe(controller.limit(), false);
+        *now += Duration::from_secs(1);
+        controller.record_success(bytes, *now);
+    }
+
+    #[test]
+    fn grows_additively_while_goodput_improves() {
+        let mut now = Instant::now();
+        let mut controller = controller(2, 4);
+        controller.adaptive.as_mut().expect("adaptive").started = now;
+
+        sample(&mut controller, &mut now, 100);
+        assert_eq!(controller.limit(), 3);
+        sample(&mut controller, &mut now, 150);
+        assert_eq!(controller.limit(), 4);
+        sample(&mut controller, &mut now, 200);
+        assert_eq!(controller.limit(), 4);
+    }
+
+    #[test]
+    fn backs_off_on_a_plateau_and_holds_before_probing_again() {
+        let mut now = Instant::now();
+        let mut controller = controller(8, 16);
+        controller.adaptive.as_mut().expect("adaptive").started = now;
+
+        sample(&mut controller, &mut now, 100);
+        assert_eq!(controller.limit(), 9);
+        sample(&mut controller, &mut now, 101);
+        assert_eq!(controller.limit(), 7);
+        for _ in 0..PLATEAU_HOLD_SAMPLES {
+            sample(&mut controller, &mut now, 100);
+            assert_eq!(controller.limit(), 7);
+        }
+        sample(&mut controller, &mut now, 100);
+        assert_eq!(controller.limit(), 8);
+        sample(&mut controller, &mut now, 120);
+        assert_eq!(controller.limit(), 9);
+    }
+
+    #[test]
+    fn settles_around_the_plateau_of_a_stable_link() {
+        let mut now = Instant::now();
+        let mut controller = controller(8, 16);
+        controller.adaptive.as_mut().expect("adaptive").started = now;
+
+        let mut limits = Vec::new();
+        for _ in 0..100 {
+            sample(&mut controller, &mut now, 100);
+            limits.push(controller.limit());
+        }
+
+        // One quarter off the first failed probe, then only one-worker probes.
+        assert_eq!(limits[1], 7);
+        assert!(
+            limits[1..].iter().all(|limit| (7..=8).contains(limit)),
+            "{limits:?}"
+        );
+    }
+
+    #[test]
+    fn halves_once_per_interval_on_congestion() {
+        let now = Instant::now();
+        let mut controller = controller(8, 8);
+
+        controller.record_failure(SourceErrorKind::Throttled, now);
+        controller.record_failure(SourceErrorKind::Timeout, now);
+        assert_eq!(controller.limit(), 4);
+        controller.record_failure(SourceErrorKind::Timeout, now + Duration::from_secs(1));
+        assert_eq!(controller.limit(), 2);
+        controller.record_failure(SourceErrorKind::Transport, now + Duration::from_secs(3));
+        assert_eq!(controller.limit(), 2);
+    }
+
+    #[test]
+    fn ignores_samples_limited_by_something_else() {
+        let mut now = Instant::now();
+        let mut controller = controller(2, 4);
+        controller.adaptive.as_mut().expect("adaptive").started = now;
+
+        controller.observe(2, true);
+        controller.observe(1, false);
+        now += Duration::from_secs(1);
+        controller.record_success(100, now);
+        assert_eq!(controller.limit(), 2);
+    }
+}
@@ -0,0 +1,108 @@
+use std::fmt;
+
+use sha2::{Digest as _, Sha256};
+use xxhash_rust::xxh3::Xxh3;
+
+/// How a sink hashes the bytes it commits.
+#[derive(Clone, Copy, Debug, Eq, Hash, PartialEq)]
+pub enum HashAlgorithm {
+    /// 64-bit XXH3: fast enough to keep up with any disk, but not
+    /// cryptographic.
+    Xxh3,
+    Sha256,
+}
+
+impl HashAlgorithm {
+    pub fn name(self) -> &'static str {
+        match self {
+            Self::Xxh3 => "xxh3",
+            Self::Sha256 => "sha256",
+        }
+    }
+}
+
+/// The hash of a sink's committed bytes, in offset order.
+#[derive(Clone, Debug, Eq, Hash, PartialEq)]
+pub struct ContentDigest {
+    pub algorithm: HashAlgorithm,
+    pub value: Vec<u8>,
+}
+
+impl ContentDigest {
+    pub fn to_hex(&self) -> String {
+        self.value
+            .iter()
+            .map(|byte| format!("{byte:02x}"))
+            .collect()
+    }
+}
+
+impl fmt::Display for ContentDigest {
+    /// Formats the digest as `algorithm:hex`.
+    fn fmt(&self, formatter: &mut fmt::Formatter<'_>) -> fmt::Result {
+        write!(formatter, "{}:{}", self.algorithm.name(), self.to_hex())
+    }
+}
+
+/// A rolling hash that is updated as bytes are committed.
+#[derive(Clone)]
+pub(crate) enum ContentHasher {
+    Xxh3(Box<Xxh3>),
+    Sha256(Sha256),
+}
+
+impl ContentHasher {
+    pub fn new(algorithm: HashAlgorithm) -> Self {
+        match algorithm {
+            HashAlgorithm::Xxh3 => Self::Xxh3(Box::new(Xxh3::new())),
+            HashAlgorithm::Sha256 => Self::Sha256(Sha256::new()),
+        }
+    }
+
+    pub fn update(&mut self, data: &[u8]) {
+        match self {
+            Self::Xxh3(hasher) => hasher.update(data),
+            Self::Sha256(hasher) => hasher.update(data),
+        }
+    }
+
+    /// The digest of everything hashed so far; hashing can continue.
+    pub fn digest(&self) -> ContentDigest {
+        match self {
+            Self::Xxh3(hasher) => ContentDigest {
+                algorithm: HashAlgorithm::Xxh3,
+                value: hasher.digest().to_be_bytes().to_vec(),
+            },
+            Self::Sha256(hasher) => ContentDigest {
+                algorithm: HashAlgorithm::Sha256,
+                value: hasher.clone().finalize().to_vec(),
+            },
+        }
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn hashes_incrementally_like_one_pass() {
+        let mut sha256 = ContentHasher::new(HashAlgorithm::Sha256);
+        sha256.update(b"ab");
+        sha256.update(b"c");
+        assert_eq!(
+            sha256.digest().to_string(),
+            "sha256:ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+        );
+
+        let mut xxh3 = ContentHasher::new(HashAlgorithm::Xxh3);
+        xxh3.update(b"ab");
+        let partial = xxh3.digest();
+        xxh3.update(b"c");
+        assert_ne!(xxh3.digest(), partial);
+        assert_eq!(
+            xxh3.digest().value,
+            xxhash_rust::xxh3::xxh3_64(b"abc").to_be_bytes()
+        );
+    }
+}
@@ -1,4 +1,10 @@
-use std::{collections::VecDeque, num::NonZeroUsize, sync::Arc};
+use std::{
+    collections::{BTreeMap, VecDeque},
+    future::Future,
+    num::NonZeroUsize,
+    sync::{Arc, Mutex},
+    time::Duration,
+};
 
 use bytes::{Bytes, BytesMut};
 use futures_util::{FutureExt, StreamExt, future::BoxFuture, stream::FuturesUnordered};
@@ -6,9 +12,20 @@ use tokio::{sync::OwnedSemaphorePermit, time::Instant};
 use tokio_util::sync::CancellationToken;
 
 use crate::{
-    ByteRange, CommitSink, DownloadError, DownloadReport, DownloadSnapshot, DownloadSpec,
-    NullProgressSink, ProgressSink, RangeSource, SourceError, SourceErrorKind, WorkerLimit,
-    buffer::OrderedBuffer, sink::SharedSink, source::SharedSource, source_pool::SourcePool,
+    AdaptiveBlockSize, AdaptiveConcurrency, ByteRange, ByteStream, CommitSink, DownloadError,
+    DownloadReport, DownloadSnapshot, DownloadSpec, HedgePolicy, JointSchedule, MemoryBudget,
+    NullProgressSink, OpenedRange, ProgressSink, RangeSource, RateLimit, SinkError, SourceError,
+    SourceErrorKind, SourceHealthMemory, WorkStealing, WorkerLimit,
+    buffer::OrderedBuffer,
+    concurrency::ConcurrencyController,
+    hedge::AttemptLatencies,
+    joint::JointMember,
+    memory_budget::MemoryReservation,
+    rate_limit::ThrottleMonitor,
+    sink::SharedSink,
+    source::SharedSource,
+    source_pool::{AttemptTiming, SourcePool},
+    work_stealing::Region,
 };
 
 #[derive(Clone, Debug)]
@@ -20,10 +37,38 @@ struct WorkItem {
 struct AttemptResult {
     work: WorkItem,
     source: usize,
-    result: Result<Bytes, SourceError>,
+    hedge: bool,
+    elapsed: Duration,
+    result: Result<(Bytes, AttemptTiming), SourceError>,
+    /// Held until the range is committed.
+    memory: Option<MemoryReservation>,
+}
+
+/// The attempts running for one range: the original and at most one hedge.
+struct RangeAttempts {
+    work: WorkItem,
+    source: usize,
+    started: Instant,
+    superseded: CancellationToken,
+    running: usize,
+    hedged: bool,
+    /// One attempt already delivered the range; the other is being cancelled.
+    settled: bool,
+    /// What the original attempt still streams, when work stealing may split it.
+    region: Option<Arc<Region>>,
+}
+
+/// Where an attempt reads its range from.
+enum AttemptInput {
+    /// Opens the range on the source.
+    Open(SharedSource),
+    /// Reads a response the caller already opened, which took the given
+    /// time to start.
+    Opened(ByteStream, Duration),
 }
 
 type PendingWorker = BoxFuture<'static, OwnedSemaphorePermit>;
+type PendingMemory = BoxFuture<'static, MemoryReservation>;
 
 fn release_workers(
     in_flight: &mut FuturesUnordered<BoxFuture<'static, AttemptResult>>,
@@ -42,6 +87,17 @@ pub struct Downloader {
     progress: Arc<dyn ProgressSink>,
     cancellation: CancellationToken,
     worker_limit: WorkerLimit,
+    rate_limit: Option<RateLimit>,
+    memory_budget: Option<MemoryBudget>,
+    throttle: Arc<ThrottleMonitor>,
+    adaptive: Option<AdaptiveConcurrency>,
+    block_sizing: Option<AdaptiveBlockSize>,
+    hedging: Option<HedgePolicy>,
+    work_stealing: Option<WorkStealing>,
+    joint: Option<JointSchedule>,
+    memory: Option<(SourceHealthMemory, Vec<String>)>,
+    /// Behind a lock only so that a running download stays `Sync`.
+    opened: Mutex<Option<OpenedRange>>,
 }
 
 impl Downloader {
@@ -59,6 +115,16 @@ impl Downloader {
             progress: Arc::new(NullProgressSink),
             cancellation: CancellationToken::new(),
             worker_limit,
+            rate_limit: None,
+            memory_budget: None,
+            throttle: Arc::default(),
+            adaptive: None,
+            block_sizing: None,
+            hedging: None,
+            work_stealing: None,
+            joint: None,
+            memory: None,
+            opened: Mutex::new(None),
         })
     }
 
@@ -77,7 +143,73 @@ impl Downloader {
         self
     }
 
+    pub fn with_rate_limit(mut self, rate_limit: RateLimit) -> Self {
+        self.rate_limit = Some(rate_limit);
+        self
+    }
+
+    /// Reserves every range from `memory_budget` before requesting it and
+    /// backs off while the budget is exhausted.
+    pub fn with_memory_budget(mut self, memory_budget: MemoryBudget) -> Self {
+        self.memory_budget = Some(memory_budget);
+        self
+    }
+
+    /// Lets the download tune its own concurrency, with `DownloadSpec::workers` as the ceiling.
+    pub fn with_adaptive_concurrency(mut self, adaptive: AdaptiveConcurrency) -> Self {
+        self.adaptive = Some(adaptive);
+        self
+    }
+
+    /// Sizes each range from the chosen source's measured throughput and latency,
+    /// splitting or coalescing queued ranges to fit.
+    pub fn with_adaptive_block_size(mut self, block_sizing: AdaptiveBlockSize) -> Self {
+        self.block_sizing = Some(block_sizing);
+        self
+    }
+
+    /// Duplicates straggling head-of-window and tail ranges on another source.
+    pub fn with_hedging(mut self, hedging: HedgePolicy) -> Self {
+        self.hedging = Some(hedging);
+        self
+    }
+
+    /// Streams ranges as per-worker regions and lets idle workers split the slowest.
+    pub fn with_work_stealing(mut self, work_stealing: WorkStealing) -> Self {
+        self.work_stealing = Some(work_stealing);
+        self
+    }
+
+    /// Caps the download's concurrency at its share of `joint`, which follows
+    /// the bytes it still has to commit relative to the other members.
+    pub fn with_joint_schedule(mut self, joint: JointSchedule) -> Self {
+        self.joint = Some(joint);
+        self
+    }
+
+    /// Shares source health with other downloads; `keys` name each source in
+    /// `memory`, in source order, and sources with equal keys share one entry.
+    pub fn with_health_memory(mut self, memory: SourceHealthMemory, keys: Vec<String>) -> Self {
+        self.memory = Some((memory, keys));
+        self
+    }
+
+    /// Starts with a range the caller already opened on one of the sources, so
+    /// that response is read instead of requested again.
+    ///
+    /// The range is only read when it starts at the sink's committed offset and
+    /// overlaps no stored range; otherwise it is dropped unread.
+    pub fn with_opened_range(self, opened: OpenedRange) -> Self {
+        *self.opened.lock().expect("opened range lock poisoned") = Some(opened);
+        self
+    }
+
     pub async fn run(self) -> Result<DownloadReport, DownloadError> {
+        let opened = self
+            .opened
+            .lock()
+            .expect("opened range lock poisoned")
+            .take();
         if self.cancellation.is_cancelled() {
             return self.cancelled().await;
         }
@@ -94,53 +226,332 @@ impl Downloader {
                 committed_bytes: committed,
                 received_bytes: 0,
                 attempts: 0,
+                hedges_issued: 0,
+                hedges_won: 0,
+                digest: self.sink.digest().await?,
             });
         }
         if self.sources.is_empty() {
             return self.fail_after_flush(DownloadError::NoUsableSource).await;
         }
+        if let Some(opened) = opened
+            .as_ref()
+            .filter(|opened| opened.source >= self.sources.len())
+        {
+            return Err(DownloadError::InvalidSpec(format!(
+                "opened range source {} is out of range for {} sources",
+                opened.source,
+                self.sources.len()
+            )));
+        }
+
+        if let Some(block_sizing) = &self.block_sizing {
+            block_sizing.validate()?;
+        }
+        if let Some(hedging) = &self.hedging {
+            hedging.validate()?;
+        }
+        if let Some(work_stealing) = &self.work_stealing {
+            work_stealing.validate()?;
+        }
+        let concurrency = match &self.adaptive {
+            Some(adaptive) => ConcurrencyController::adaptive(
+                adaptive,
+                self.spec.workers.min(self.worker_limit.capacity()),
+            )?,
+            None => ConcurrencyController::fixed(self.spec.workers),
+        };
+        let mut pool = SourcePool::new(self.sources.clone(), self.spec.source_cooldown);
+        if let Some((memory, keys)) = &self.memory {
+            pool.remember(memory.clone(), keys.clone())?;
+        }
+        let stored = self.reusable_stored_ranges(committed).await?;
+        self.run_bounded(pool, concurrency, committed, stored, opened)
+            .await
+    }
+
+    /// The sink's stored ranges, trimmed to whole pages of the ordered window
+    /// unless the sink writes at offsets.
+    async fn reusable_stored_ranges(&self, origin: u64) -> Result<Vec<ByteRange>, DownloadError> {
+        let expected = self.spec.expected_size;
+        let page = if self.sink.writes_at_offsets() {
+            1
+        } else {
+            self.spec.page_size as u64
+        };
+        let mut reusable = Vec::new();
+        for range in self.sink.stored_ranges().await? {
+            let start = range.start.max(origin);
+            let start = origin + (start - origin).div_ceil(page) * page;
+            let end = if range.end >= expected {
+                expected
+            } else {
+                origin + range.end.saturating_sub(origin) / page * page
+            };
+            if start < end {
+                reusable.push(ByteRange::new(start, end)?);
+            }
+        }
+        Ok(reusable)
+    }
+
+    /// Moves stored ranges that fit the window from the sink into the ring and
+    /// returns how many bytes it loaded.
+    async fn load_stored(
+        &self,
+        ring: &mut OrderedBuffer,
+        unloaded: &mut VecDeque<ByteRange>,
+    ) -> Result<u64, DownloadError> {
+        let mut loaded = 0;
+        while let Some(range) = unloaded.front_mut() {
+            let window_end = ring.window_end_offset();
+            if range.start >= window_end {
+                break;
+            }
+            let part = ByteRange::new(range.start, range.end.min(window_end))?;
+            let bytes = self.sink.read_stored(part).await?;
+            if bytes.len() as u64 != part.length() {
+                return Err(DownloadError::Sink(SinkError::new(format!(
+                    "stored range {}..{} read back {} bytes",
+                    part.start,
+                    part.end,
+                    bytes.len()
+                ))));
+            }
+            insert_range(ring, self.spec.page_size, part, bytes)?;
+            loaded += part.length();
+            if part.end == range.end {
+                unloaded.pop_front();
+            } else {
+                range.start = part.end;
+            }
+        }
+        Ok(loaded)
+    }
+
+    /// Writes a completed range straight to a sink that writes at offsets.
+    /// Returns `false` when the download was cancelled meanwhile.
+    async fn write_range(
+        &self,
+        range: ByteRange,
+        bytes: Bytes,
+        committed: &mut u64,
+    ) -> Result<bool, DownloadError> {
+        self.sink.write_at(range.start, bytes).await?;
+        *committed = self.sink.committed_offset().await?;
+        Ok(!self.cancellation.is_cancelled())
+    }
 
-        let pool = SourcePool::new(self.sources.clone(), self.spec.source_cooldown);
-        self.run_bounded(pool, committed).await
+    /// Whether an opened range can be read as the first range of a download
+    /// resuming from `origin`.
+    fn accepts_opened(&self, range: ByteRange, origin: u64, stored: &[ByteRange]) -> bool {
+        let expected = self.spec.expected_size;
+        if range.start != origin
+            || range.end > expected
+            || stored
+                .iter()
+                .any(|stored| stored.start < range.end && range.start < stored.end)
+        {
+            return false;
+        }
+        // The ordered window takes whole pages, except at the end of the resource.
+        let page = self.spec.page_size as u64;
+        self.sink.writes_at_offsets()
+            || (range.length() <= page * self.spec.window_pages as u64
+                && (range.end == expected || range.length() % page == 0))
+    }
+
+    /// Where dispatch must stop: the end of the ordered window, or the end of
+    /// the resource for a sink that writes at offsets.
+    fn window_end(&self, ring: &OrderedBuffer) -> u64 {
+        if self.sink.writes_at_offsets() {
+            self.spec.expected_size
+        } else {
+            ring.window_end_offset()
+        }
+    }
+
+    /// A splittable region for a new attempt on `range`, when work stealing is on.
+    fn region(&self, range: ByteRange) -> Option<Arc<Region>> {
+        self.work_stealing.as_ref().map(|_| Region::new(range))
+    }
+
+    /// Appends every contiguous batch the ring holds. Returns `false` when the
+    /// download was cancelled between appends.
+    async fn commit_ready(
+        &self,
+        ring: &mut OrderedBuffer,
+        committed: &mut u64,
+    ) -> Result<bool, DownloadError> {
+        let batch_size = self
+            .sink
+            .append_batch_size_hint()
+            .map(NonZeroUsize::get)
+            .unwrap_or(self.spec.page_size);
+        while let Some(batch) = ring.pop_contiguous_batch(batch_size)? {
+            let end = batch.end_offset();
+            self.sink.append_batch(batch).await?;
+            *committed = end;
+            if self.cancellation.is_cancelled() {
+                return Ok(false);
+            }
+        }
+        Ok(true)
     }
 
     async fn run_bounded(
         &self,
         mut pool: SourcePool,
+        mut concurrency: ConcurrencyController,
         origin: u64,
+        stored: Vec<ByteRange>,
+        opened: Option<OpenedRange>,
     ) -> Result<DownloadReport, DownloadError> {
         let expected = self.spec.expected_size;
         let mut ring = OrderedBuffer::new(origin, self.spec.page_size, self.spec.window_pages)?;
+        let positional = self.sink.writes_at_offsets();
+        // A positional sink already holds its stored ranges where they belong.
+        let mut unloaded: VecDeque<ByteRange> = if positional {
+            VecDeque::new()
+        } else {
+            stored.iter().copied().collect()
+        };
         let mut queue = VecDeque::new();
         let mut in_flight: FuturesUnordered<BoxFuture<'static, AttemptResult>> =
             FuturesUnordered::new();
         let mut pending_worker: Option<PendingWorker> = None;
         let mut ready_worker: Option<OwnedSemaphorePermit> = None;
+        let mut pending_memory: Option<PendingMemory> = None;
+        let mut ready_memory: Option<MemoryReservation> = None;
+        // Reservations of received ranges, by range end, until they are committed.
+        let mut held: Vec<(u64, MemoryReservation)> = Vec::new();
         let mut next_offset = origin;
         let mut committed = origin;
         let mut received = 0_u64;
         let mut attempts = 0_usize;
+        let mut ranges: BTreeMap<u64, RangeAttempts> = BTreeMap::new();
+        let mut latencies = AttemptLatencies::default();
+        let mut hedges_issued = 0_usize;
+        let mut hedges_won = 0_usize;
+        let joint = self
+            .joint
+            .as_ref()
+            .map(|schedule| schedule.join(expected - origin));
+
+        if let Some(opened) =
+            opened.filter(|opened| self.accepts_opened(opened.range, origin, &stored))
+        {
+            let worker = tokio::select! {
+                biased;
+                _ = self.cancellation.cancelled() => return self.stop(&mut ring, DownloadError::Cancelled).await,
+                worker = self.worker_limit.clone().acquire_owned() => worker,
+            };
+            let work = WorkItem {
+                range: opened.range,
+                attempts: 0,
+            };
+            pool.claim(opened.source);
+            let memory = self
+                .memory_budget
+                .as_ref()
+                .map(|budget| budget.force_reserve(work.range.length()));
+            attempts += 1;
+            next_offset = opened.range.end;
+            let superseded = CancellationToken::new();
+            let region = self.region(work.range);
+            ranges.insert(
+                work.range.start,
+                RangeAttempts {
+                    work: work.clone(),
+                    source: opened.source,
+                    started: Instant::now(),
+                    superseded: superseded.clone(),
+                    running: 1,
+                    hedged: false,
+                    settled: false,
+                    region: region.clone(),
+                },
+            );
+            in_flight.push(self.start_attempt(
+                work,
+                opened.source,
+                AttemptInput::Opened(opened.stream, opened.latency),
+                worker,
+                memory,
+                superseded,
+                region,
+                false,
+            ));
+        }
 
         loop {
             if self.cancellation.is_cancelled() {
                 release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
-                return self.cancelled().await;
+                return self.stop(&mut ring, DownloadError::Cancelled).await;
+            }
+            loop {
+                match self.load_stored(&mut ring, &mut unloaded).await {
+                    Ok(0) => break,
+                    Ok(_) => {}
+                    Err(error) => {
+                        release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
+                        return self.stop(&mut ring, error).await;
+                    }
+                }
+                match self.commit_ready(&mut ring, &mut committed).await {
+                    Ok(true) => {}
+                    Ok(false) => {
+                        release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
+                        return self.stop(&mut ring, DownloadError::Cancelled).await;
+                    }
+                    Err(error) => {
+                        release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
+                        return self.stop(&mut ring, error).await;
+                    }
+                }
+            }
+            held.retain(|(end, _)| *end > committed);
+            if let Some(member) = &joint {
+                member.update(expected - committed);
             }
+            let limit = effective_limit(&concurrency, joint.as_ref());
             self.enqueue_new_work(
                 expected,
-                ring.window_end_offset(),
+                self.window_end(&ring),
+                &stored,
                 &mut next_offset,
                 &mut queue,
                 in_flight.len(),
             )?;
+            if let Some(work_stealing) = &self.work_stealing {
+                if queue.is_empty() && in_flight.len() < limit && pool.has_ready(Instant::now()) {
+                    // Only a worker that would otherwise sit idle steals.
+                    if let Some(worker) = ready_worker
+                        .take()
+                        .or_else(|| self.worker_limit.try_acquire_owned())
+                    {
+                        if let Some(stolen) =
+                            steal_region(&mut ranges, &pool, work_stealing, self.spec.page_size)
+                        {
+                            queue.push_back(WorkItem {
+                                range: stolen,
+                                attempts: 0,
+                            });
+                        }
+                        ready_worker = Some(worker);
+                    }
+                }
+            }
 
             let now = Instant::now();
-            if queue.is_empty() || in_flight.len() >= self.spec.workers || !pool.has_ready(now) {
+            if queue.is_empty() || in_flight.len() >= limit || !pool.has_ready(now) {
                 pending_worker = None;
                 ready_worker = None;
+                pending_memory = None;
+                ready_memory = None;
             }
 
-            while in_flight.len() < self.spec.workers {
+            while in_flight.len() < limit {
                 if queue.is_empty() || !pool.has_ready(Instant::now()) {
                     break;
                 }
@@ -155,38 +566,141 @@ impl Downloader {
                     break;
                 };
                 let work = queue.pop_front().expect("the queue was checked above");
-                let Some((source, range_source)) = pool.select(Instant::now()) else {
+                let Some((source, range_source)) = pool.select(Instant::now(), work.range.length())
+                else {
                     queue.push_front(work);
                     ready_worker = Some(worker);
                     break;
                 };
-                attempts += 1;
-                let attempt_timeout = self.spec.attempt_timeout;
-                in_flight.push(
-                    async move {
-                        let _worker = worker;
-                        let result = tokio::time::timeout(
-                            attempt_timeout,
-                            fetch_exact(range_source, work.range),
-                        )
-                        .await
-                        .unwrap_or_else(|_| {
-                            Err(SourceError::new(
-                                SourceErrorKind::Timeout,
-                                format!("range attempt timed out after {attempt_timeout:?}"),
-                            ))
-                        });
-                        AttemptResult {
-                            work,
-                            source,
-                            result,
-                        }
+                let work = match &self.block_sizing {
+                    Some(block_sizing) => {
+                        let target = block_sizing.block_len(
+                            pool.estimate(source),
+                            self.spec.block_size,
+                            self.spec.page_size,
+                            self.spec.window_pages,
+                        );
+                        fit_work(work, &mut queue, target)
+                    }
+                    None => work,
+                };
+                let memory = match &self.memory_budget {
+                    Some(budget) => {
+                        let len = work.range.length();
+                        // The range at the committed offset unblocks this download's
+                        // commits, and with nothing in flight waiting frees nothing here.
+                        let exempt = work.range.start == committed || in_flight.is_empty();
+                        let admitted = ready_memory
+                            .take()
+                            .filter(|memory| memory.bytes() >= len)
+                            .or_else(|| budget.try_reserve(len))
+                            .or_else(|| exempt.then(|| budget.force_reserve(len)));
+                        let Some(memory) = admitted else {
+                            queue.push_front(work);
+                            pool.release(source);
+                            ready_worker = Some(worker);
+                            pending_memory = Some(budget.clone().reserve_owned(len).boxed());
+                            break;
+                        };
+                        Some(memory)
                     }
-                    .boxed(),
+                    None => None,
+                };
+                attempts += 1;
+                let superseded = CancellationToken::new();
+                let region = self.region(work.range);
+                ranges.insert(
+                    work.range.start,
+                    RangeAttempts {
+                        work: work.clone(),
+                        source,
+                        started: Instant::now(),
+                        superseded: superseded.clone(),
+                        running: 1,
+                        hedged: false,
+                        settled: false,
+                        region: region.clone(),
+                    },
                 );
+                in_flight.push(self.start_attempt(
+                    work,
+                    source,
+                    AttemptInput::Open(range_source),
+                    worker,
+                    memory,
+                    superseded,
+                    region,
+                    false,
+                ));
             }
 
-            self.publish_progress(received, committed, &ring, next_offset, in_flight.len());
+            let mut hedge_at: Option<Instant> = None;
+            let straggler_after = self
+                .hedging
+                .as_ref()
+                .and_then(|policy| latencies.straggler_after(policy));
+            if let (Some(policy), Some(after)) = (&self.hedging, straggler_after) {
+                let now = Instant::now();
+                let tail = next_offset >= expected;
+                for start in hedge_candidates(&ranges, committed, tail, policy.tail_ranges) {
+                    if in_flight.len() >= limit {
+                        break;
+                    }
+                    let entry = ranges
+                        .get_mut(&start)
+                        .expect("hedge candidates are running ranges");
+                    let Some(due_at) = entry.started.checked_add(after) else {
+                        continue;
+                    };
+                    if due_at > now {
+                        hedge_at = Some(hedge_at.map_or(due_at, |at| at.min(due_at)));
+                        continue;
+                    }
+                    if !pool.has_ready_other(now, entry.source) {
+                        continue;
+                    }
+                    // Hedges only use spare workers; they never wait for one.
+                    let Some(worker) = self.worker_limit.try_acquire_owned() else {
+                        break;
+                    };
+                    let memory = match &self.memory_budget {
+                        Some(budget) => match budget.try_reserve(entry.work.range.length()) {
+                            Some(memory) => Some(memory),
+                            None => break,
+                        },
+                        None => None,
+                    };
+                    let (source, range_source) = pool
+                        .select_other(now, entry.work.range.length(), entry.source)
+                        .expect("a ready source was checked above");
+                    entry.hedged = true;
+                    entry.running += 1;
+                    attempts += 1;
+                    hedges_issued += 1;
+                    in_flight.push(self.start_attempt(
+                        entry.work.clone(),
+                        source,
+                        AttemptInput::Open(range_source),
+                        worker,
+                        memory,
+                        entry.superseded.clone(),
+                        None,
+                        true,
+                    ));
+                }
+            }
+
+            concurrency.observe(in_flight.len(), self.throttle.is_throttled());
+            self.publish_progress(
+                received,
+                committed,
+                &ring,
+                next_offset,
+                in_flight.len(),
+                effective_limit(&concurrency, joint.as_ref()),
+                (hedges_issued, hedges_won),
+                &pool,
+            );
 
             if committed == expected {
                 release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
@@ -195,53 +709,53 @@ impl Downloader {
                     committed_bytes: committed,
                     received_bytes: received,
                     attempts,
+                    hedges_issued,
+                    hedges_won,
+                    digest: self.sink.digest().await?,
                 });
             }
 
             if in_flight.is_empty() && pending_worker.is_none() && ready_worker.is_none() {
                 if !pool.has_usable() {
-                    return self.fail_after_flush(DownloadError::NoUsableSource).await;
+                    return self.stop(&mut ring, DownloadError::NoUsableSource).await;
                 }
                 if !queue.is_empty() {
                     let ready_at = pool.next_ready_at().ok_or(DownloadError::NoUsableSource)?;
                     tokio::select! {
                         biased;
-                        _ = self.cancellation.cancelled() => return self.cancelled().await,
+                        _ = self.cancellation.cancelled() => return self.stop(&mut ring, DownloadError::Cancelled).await,
                         _ = tokio::time::sleep_until(ready_at) => continue,
                     }
                 }
-                return self.fail_after_flush(DownloadError::Stalled).await;
+                return self.stop(&mut ring, DownloadError::Stalled).await;
             }
 
             let cooldown_ready_at = if !queue.is_empty()
-                && in_flight.len() < self.spec.workers
+                && in_flight.len() < limit
                 && !pool.has_ready(Instant::now())
             {
                 pool.next_ready_at()
             } else {
                 None
             };
+            let wake_at = cooldown_ready_at.into_iter().chain(hedge_at).min();
             enum SchedulerEvent {
                 Completed(AttemptResult),
                 WorkerReady(OwnedSemaphorePermit),
-                CooldownReady,
+                MemoryReady(MemoryReservation),
+                Wake,
+                ThrottleChanged,
                 Cancelled,
             }
-            let event = if let Some(ready_at) = cooldown_ready_at {
-                tokio::select! {
-                    biased;
-                    _ = self.cancellation.cancelled() => SchedulerEvent::Cancelled,
-                    result = in_flight.next(), if !in_flight.is_empty() => SchedulerEvent::Completed(result.ok_or(DownloadError::Stalled)?),
-                    worker = async { pending_worker.as_mut().expect("guarded pending worker").await }, if pending_worker.is_some() => SchedulerEvent::WorkerReady(worker),
-                    _ = tokio::time::sleep_until(ready_at) => SchedulerEvent::CooldownReady,
-                }
-            } else {
-                tokio::select! {
-                    biased;
-                    _ = self.cancellation.cancelled() => SchedulerEvent::Cancelled,
-                    result = in_flight.next(), if !in_flight.is_empty() => SchedulerEvent::Completed(result.ok_or(DownloadError::Stalled)?),
-                    worker = async { pending_worker.as_mut().expect("guarded pending worker").await }, if pending_worker.is_some() => SchedulerEvent::WorkerReady(worker),
-                }
+            let event = tokio::select! {
+                biased;
+                _ = self.cancellation.cancelled() => SchedulerEvent::Cancelled,
+                result = in_flight.next(), if !in_flight.is_empty() => SchedulerEvent::Completed(result.ok_or(DownloadError::Stalled)?),
+                worker = async { pending_worker.as_mut().expect("guarded pending worker").await }, if pending_worker.is_some() => SchedulerEvent::WorkerReady(worker),
+                memory = async { pending_memory.as_mut().expect("guarded pending memory").await }, if pending_memory.is_some() => SchedulerEvent::MemoryReady(memory),
+                _ = tokio::time::sleep_until(wake_at.unwrap_or_else(Instant::now)), if wake_at.is_some() => SchedulerEvent::Wake,
+                _ = self.throttle.changed(), if self.rate_limit.is_some() => SchedulerEvent::ThrottleChanged,
+                _ = async { joint.as_ref().expect("guarded joint member").changed().await }, if joint.is_some() => SchedulerEvent::Wake,
             };
             let completed = match event {
                 SchedulerEvent::Completed(completed) => completed,
@@ -250,50 +764,97 @@ impl Downloader {
                     ready_worker = Some(worker);
                     continue;
                 }
-                SchedulerEvent::CooldownReady => continue,
+                SchedulerEvent::MemoryReady(memory) => {
+                    pending_memory = None;
+                    ready_memory = Some(memory);
+                    continue;
+                }
+                SchedulerEvent::Wake | SchedulerEvent::ThrottleChanged => continue,
                 SchedulerEvent::Cancelled => {
                     release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
-                    return self.cancelled().await;
+                    return self.stop(&mut ring, DownloadError::Cancelled).await;
                 }
             };
 
+            let start = completed.work.range.start;
+            let (settled, twin_running) = match ranges.get_mut(&start) {
+                Some(entry) => {
+                    entry.running -= 1;
+                    (entry.settled, entry.running > 0)
+                }
+                None => (false, false),
+            };
+            if !twin_running {
+                ranges.remove(&start);
+            }
+            if settled {
+                // The other attempt already delivered this range.
+                match &completed.result {
+                    Ok((_, timing)) => pool.record_success(completed.source, timing),
+                    Err(_) => pool.release(completed.source),
+                }
+                continue;
+            }
+
             match completed.result {
-                Ok(bytes) => {
-                    pool.record_success(completed.source);
+                Ok((bytes, timing)) => {
+                    if twin_running {
+                        let entry = ranges.get_mut(&start).expect("the twin is still running");
+                        entry.settled = true;
+                        entry.superseded.cancel();
+                    }
+                    if completed.hedge {
+                        hedges_won += 1;
+                    } else {
+                        latencies.record(completed.elapsed);
+                    }
+                    pool.record_success(completed.source, &timing);
+                    concurrency.record_success(bytes.len() as u64, Instant::now());
                     received = received.saturating_add(bytes.len() as u64);
-                    insert_range(&mut ring, self.spec.page_size, completed.work.range, bytes)?;
-                    let batch_size = self
-                        .sink
-                        .append_batch_size_hint()
-                        .map(NonZeroUsize::get)
-                        .unwrap_or(self.spec.page_size);
-                    while let Some(batch) = ring.pop_contiguous_batch(batch_size)? {
-                        let end = batch.end_offset();
-                        if let Err(error) = self.sink.append_batch(batch).await {
+                    let written = if positional {
+                        self.write_range(completed.work.range, bytes, &mut committed)
+                            .await
+                    } else {
+                        insert_range(&mut ring, self.spec.page_size, completed.work.range, bytes)?;
+                        if let Some(memory) = completed.memory {
+                            held.push((completed.work.range.end, memory));
+                        }
+                        self.commit_ready(&mut ring, &mut committed).await
+                    };
+                    match written {
+                        Ok(true) => {}
+                        Ok(false) => {
                             release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
-                            return self.fail_after_flush(error.into()).await;
+                            return self.stop(&mut ring, DownloadError::Cancelled).await;
                         }
-                        committed = end;
-                        if self.cancellation.is_cancelled() {
+                        Err(error) => {
                             release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
-                            return self.cancelled().await;
+                            return self.stop(&mut ring, error).await;
                         }
                     }
                 }
                 Err(error) => {
                     if let Err(config_error) = pool.record_failure(completed.source, &error) {
                         release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
-                        return self.fail_after_flush(config_error).await;
+                        return self.stop(&mut ring, config_error).await;
+                    }
+                    concurrency.record_failure(error.kind, Instant::now());
+                    if twin_running {
+                        // The other attempt may still deliver the range.
+                        continue;
                     }
                     let attempt = completed.work.attempts + 1;
                     if !pool.has_usable() {
                         release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
                         return self
-                            .fail_after_flush(DownloadError::RetryExhausted {
-                                range: completed.work.range,
-                                attempts: attempt,
-                                last_error: error,
-                            })
+                            .stop(
+                                &mut ring,
+                                DownloadError::RetryExhausted {
+                                    range: completed.work.range,
+                                    attempts: attempt,
+                                    last_error: error,
+                                },
+                            )
                             .await;
                     }
                     if attempt < self.spec.max_attempts {
@@ -315,36 +876,127 @@ impl Downloader {
                     } else {
                         release_workers(&mut in_flight, &mut pending_worker, &mut ready_worker);
                         return self
-                            .fail_after_flush(DownloadError::RetryExhausted {
-                                range: completed.work.range,
-                                attempts: attempt,
-                                last_error: error,
-                            })
+                            .stop(
+                                &mut ring,
+                                DownloadError::RetryExhausted {
+                                    range: completed.work.range,
+                                    attempts: attempt,
+                                    last_error: error,
+                                },
+                            )
                             .await;
                     }
                 }
             }
 
-            self.publish_progress(received, committed, &ring, next_offset, in_flight.len());
+            self.publish_progress(
+                received,
+                committed,
+                &ring,
+                next_offset,
+                in_flight.len(),
+                effective_limit(&concurrency, joint.as_ref()),
+                (hedges_issued, hedges_won),
+                &pool,
+            );
         }
     }
 
+    #[allow(clippy::too_many_arguments)]
+    fn start_attempt(
+        &self,
+        mut work: WorkItem,
+        source: usize,
+        input: AttemptInput,
+        worker: OwnedSemaphorePermit,
+        memory: Option<MemoryReservation>,
+        superseded: CancellationToken,
+        region: Option<Arc<Region>>,
+        hedge: bool,
+    ) -> BoxFuture<'static, AttemptResult> {
+        let deadline = AttemptDeadline::start(self.spec.attempt_timeout);
+        let rate_limit = self.rate_limit.clone();
+        let throttle = self.throttle.clone();
+        async move {
+            let _worker = worker;
+            let started = Instant::now();
+            let limit = rate_limit.as_ref().map(|limit| (limit, throttle.as_ref()));
+            let fetch = async {
+                match input {
+                    AttemptInput::Open(range_source) => {
+                        fetch_exact(range_source, work.range, region.as_deref(), deadline, limit)
+                            .await
+                    }
+                    AttemptInput::Opened(stream, latency) => {
+                        let region = region.as_deref();
+                        read_exact(stream, work.range, region, latency, deadline, limit).await
+                    }
+                }
+            };
+            let result = tokio::select! {
+                biased;
+                _ = superseded.cancelled() => Err(SourceError::new(
+                    SourceErrorKind::Other,
+                    "superseded by a duplicate attempt",
+                )),
+                result = fetch => result,
+            };
+            // The attempt is only answerable for what is left of a split region.
+            if let Some(region) = &region {
+                work.range.end = region.end();
+            }
+            AttemptResult {
+                work,
+                source,
+                hedge,
+                elapsed: started.elapsed(),
+                result,
+                memory,
+            }
+        }
+        .boxed()
+    }
+
     fn enqueue_new_work(
         &self,
         expected: u64,
         window_end: u64,
+        stored: &[ByteRange],
         next_offset: &mut u64,
         queue: &mut VecDeque<WorkItem>,
         in_flight: usize,
     ) -> Result<(), DownloadError> {
-        let queue_limit = self.spec.workers.saturating_mul(2).max(1);
+        // Sized ranges are cut from the queue at dispatch, so keep the whole
+        // window queued for them to coalesce.
+        let queue_limit = if self.block_sizing.is_some() {
+            self.spec.window_pages
+        } else {
+            self.spec.workers.saturating_mul(2).max(1)
+        };
+        let span_end = expected.min(window_end);
+        let range_len = match &self.work_stealing {
+            // One region per idle worker; stealing rebalances them later.
+            Some(_) => {
+                let page = self.spec.page_size as u64;
+                let idle = self.spec.workers.saturating_sub(in_flight).max(1) as u64;
+                let pages = span_end.saturating_sub(*next_offset).div_ceil(page);
+                (pages.div_ceil(idle) * page).max(self.spec.block_size as u64)
+            }
+            None => self.spec.block_size as u64,
+        };
         while *next_offset < expected
             && *next_offset < window_end
             && queue.len().saturating_add(in_flight) < queue_limit
         {
-            let end = expected
-                .min(window_end)
-                .min(next_offset.saturating_add(self.spec.block_size as u64));
+            let mut end = span_end.min(next_offset.saturating_add(range_len));
+            // Stored ranges come from the sink, never from a source.
+            if let Some(range) = stored.iter().find(|range| range.end > *next_offset) {
+                if range.start <= *next_offset {
+                    *next_offset = range.end;
+                    continue;
+                }
+                end = end.min(range.start);
+            }
             queue.push_back(WorkItem {
                 range: ByteRange::new(*next_offset, end)?,
                 attempts: 0,
@@ -354,6 +1006,7 @@ impl Downloader {
         Ok(())
     }
 
+    #[allow(clippy::too_many_arguments)]
     fn publish_progress(
         &self,
         received: u64,
@@ -361,14 +1014,22 @@ impl Downloader {
         ring: &OrderedBuffer,
         next_offset: u64,
         in_flight: usize,
+        concurrency: usize,
+        (hedges_issued, hedges_won): (usize, usize),
+        pool: &SourcePool,
     ) {
         self.progress.update(DownloadSnapshot {
             received_bytes: received,
             committed_bytes: committed,
             buffered_pages: ring.ready_pages(),
             window_saturated: next_offset < self.spec.expected_size
-                && next_offset >= ring.window_end_offset(),
+                && next_offset >= self.window_end(ring),
             in_flight,
+            concurrency,
+            rate_limited: self.throttle.is_throttled(),
+            hedges_issued,
+            hedges_won,
+            sources: pool.snapshot(),
         });
     }
 
@@ -381,15 +1042,107 @@ impl Downloader {
         self.sink.flush().await?;
         Err(error)
     }
+
+    /// Hands the ring's buffered pages to the sink to keep, then fails with
+    /// `error` after flushing.
+    async fn stop<T>(
+        &self,
+        ring: &mut OrderedBuffer,
+        error: DownloadError,
+    ) -> Result<T, DownloadError> {
+        // Keeping the pages is best effort: the original error is the one to report.
+        if let Ok(batches) = ring.take_buffered() {
+            for batch in batches {
+                if self.sink.store_batch(batch).await.is_err() {
+                    break;
+                }
+            }
+        }
+        self.fail_after_flush(error).await
+    }
 }
 
-async fn fetch_exact(source: SharedSource, range: ByteRange) -> Result<Bytes, SourceError> {
+/// The time budget of one range attempt; time spent waiting on the rate limit is not charged.
+struct AttemptDeadline {
+    timeout: Duration,
+    at: Option<Instant>,
+}
+
+impl AttemptDeadline {
+    fn start(timeout: Duration) -> Self {
+        Self {
+            timeout,
+            at: Instant::now().checked_add(timeout),
+        }
+    }
+
+    fn extend(&mut self, by: Duration) {
+        self.at = self.at.and_then(|at| at.checked_add(by));
+    }
+
+    fn expired(&self) -> bool {
+        self.at.is_some_and(|at| Instant::now() >= at)
+    }
+
+    async fn run<F: Future>(&self, future: F) -> Result<F::Output, SourceError> {
+        match self.at {
+            Some(at) => tokio::time::timeout_at(at, future)
+                .await
+                .map_err(|_| self.error()),
+            None => Ok(future.await),
+        }
+    }
+
+    fn error(&self) -> SourceError {
+        SourceError::new(
+            SourceErrorKind::Timeout,
+            format!("range attempt timed out after {:?}", self.timeout),
+        )
+    }
+}
+
+async fn fetch_exact(
+    source: SharedSource,
+    range: ByteRange,
+    region: Option<&Region>,
+    deadline: AttemptDeadline,
+    rate_limit: Option<(&RateLimit, &ThrottleMonitor)>,
+) -> Result<(Bytes, AttemptTiming), SourceError> {
+    let started = Instant::now();
+    let stream = deadline.run(source.open(range)).await??;
+    read_exact(
+        stream,
+        range,
+        region,
+        started.elapsed(),
+        deadline,
+        rate_limit,
+    )
+    .await
+}
+
+/// Reads the body of an opened range, which took `latency` to start.
+///
+/// With a `region`, reading stops at the region's end, which work stealing
+/// may move back while the body streams.
+async fn read_exact(
+    mut stream: ByteStream,
+    range: ByteRange,
+    region: Option<&Region>,
+    latency: Duration,
+    mut deadline: AttemptDeadline,
+    rate_limit: Option<(&RateLimit, &ThrottleMonitor)>,
+) -> Result<(Bytes, AttemptTiming), SourceError> {
     let expected = range.length() as usize;
-    let mut stream = source.open(range).await?;
+    let body_started = Instant::now();
+    let mut throttled = Duration::ZERO;
     let mut body = BytesMut::with_capacity(expected);
-    while let Some(chunk) = stream.next().await {
-        let bytes = chunk?;
+    while let Some(chunk) = deadline.run(stream.next()).await? {
+        let mut bytes = chunk?;
         if bytes.is_empty() {
+            if deadline.expired() {
+                return Err(deadline.error());
+            }
             tokio::task::yield_now().await;
             continue;
         }
@@ -402,12 +1155,37 @@ async fn fetch_exact(source: SharedSource, range: ByteRange) -> Result<Bytes, So
                 ),
             ));
         }
+        if let Some(region) = region {
+            bytes.truncate(region.accept(bytes.len()));
+        }
+        if let Some((rate_limit, throttle)) = rate_limit {
+            let waited = rate_limit.acquire(bytes.len() as u64, throttle).await;
+            deadline.extend(waited);
+            throttled += waited;
+        }
         body.extend_from_slice(&bytes);
+        // The rest of a split region's response belongs to another attempt.
+        if region.is_some_and(|region| region.end() < range.end && region.remaining() == 0) {
+            break;
+        }
     }
+    let expected = region.map_or(expected, |region| (region.end() - range.start) as usize);
     if body.len() != expected {
         return Err(SourceError::truncated(expected as u64, body.len() as u64));
     }
-    Ok(body.freeze())
+    let timing = AttemptTiming {
+        bytes: expected as u64,
+        latency,
+        transfer: body_started.elapsed().saturating_sub(throttled),
+    };
+    Ok((body.freeze(), timing))
+}
+
+/// The concurrency limit, further capped by the download's joint share.
+fn effective_limit(concurrency: &ConcurrencyController, joint: Option<&JointMember>) -> usize {
+    joint.map_or(concurrency.limit(), |member| {
+        concurrency.limit().min(member.limit())
+    })
 }
 
 fn insert_range(
@@ -425,6 +1203,113 @@ fn insert_range(
     Ok(())
 }
 
+/// Running ranges that hold up the download and have not been hedged: the
+/// window head and, once every range has been requested, the last `tail_ranges`.
+fn hedge_candidates(
+    ranges: &BTreeMap<u64, RangeAttempts>,
+    committed: u64,
+    tail: bool,
+    tail_ranges: usize,
+) -> Vec<u64> {
+    let mut candidates = Vec::new();
+    if ranges.get(&committed).is_some_and(|entry| !entry.settled) {
+        candidates.push(committed);
+    }
+    if tail {
+        candidates.extend(
+            ranges
+                .iter()
+                .rev()
+                .filter(|(_, entry)| !entry.settled)
+                .take(tail_ranges)
+                .map(|(start, _)| *start)
+                .filter(|start| *start != committed),
+        );
+    }
+    candidates.retain(|start| !ranges[start].hedged);
+    candidates
+}
+
+/// Splits the region of the running range expected to finish last and
+/// returns the part cut off its back.
+///
+/// A region that has received bytes is judged by the rate it has streamed at
+/// so far, one still waiting for its response by its source's measured
+/// throughput and latency. Hedged ranges are never split.
+fn steal_region(
+    ranges: &mut BTreeMap<u64, RangeAttempts>,
+    pool: &SourcePool,
+    work_stealing: &WorkStealing,
+    page_size: usize,
+) -> Option<ByteRange> {
+    let now = Instant::now();
+    let mut candidates = ranges
+        .iter()
+        .filter(|(_, entry)| entry.running == 1 && !entry.hedged && !entry.settled)
+        .filter_map(|(start, entry)| {
+            let region = entry.region.as_ref()?;
+            let remaining = region.remaining() as f64;
+            let received = region.received();
+            let finish_in = if received > 0 {
+                remaining * now.duration_since(entry.started).as_secs_f64() / received as f64
+            } else {
+                pool.estimate(entry.source)
+                    .map_or(f64::INFINITY, |estimate| {
+                        estimate.latency.as_secs_f64() + remaining / estimate.throughput
+                    })
+            };
+            Some((*start, finish_in, remaining))
+        })
+        .collect::<Vec<_>>();
+    candidates.sort_by(|left, right| right.1.total_cmp(&left.1).then(right.2.total_cmp(&left.2)));
+    candidates.into_iter().find_map(|(start, _, _)| {
+        let entry = ranges
+            .get_mut(&start)
+            .expect("candidates are running ranges");
+        let stolen = entry
+            .region
+            .as_ref()?
+            .split(page_size as u64, work_stealing.min_split)?;
+        entry.work.range.end = stolen.start;
+        Some(stolen)
+    })
+}
+
+/// Fits a fresh range to `target` bytes before dispatch.
+///
+/// A longer range is cut at `target` and its tail returned to the queue front.
+/// A shorter one absorbs the adjacent fresh ranges behind it while they fit.
+/// Retried ranges are only ever cut, so failure splitting keeps working. The
+/// target is whole pages, so every cut stays page aligned.
+fn fit_work(mut work: WorkItem, queue: &mut VecDeque<WorkItem>, target: u64) -> WorkItem {
+    if work.range.length() > target {
+        let middle = work.range.start + target;
+        queue.push_front(WorkItem {
+            range: ByteRange {
+                start: middle,
+                end: work.range.end,
+            },
+            attempts: work.attempts,
+        });
+        work.range.end = middle;
+        return work;
+    }
+    if work.attempts > 0 {
+        return work;
+    }
+    while let Some(next) = queue.front() {
+        if next.attempts > 0
+            || next.range.start != work.range.end
+            || work.range.length() + next.range.length() > target
+        {
+            break;
+        }
+        work.range.end = next.range.end;
+        queue.pop_front();
+    }
+    work
+}
+
 fn split_range(range: ByteRange, page_size: usize) -> Option<(ByteRange, ByteRange)> {
     if range.length() <= page_size as u64 {
         return None;
@@ -465,4 +1350,41 @@ mod tests {
         assert_eq!(batch.chunks()[0].as_ptr(), block_start);
         assert_eq!(batch.chunks()[1].as_ptr(), block_start.wrapping_add(4));
     }
+
+    fn item(start: u64, end: u64, attempts: usize) -> WorkItem {
+        WorkItem {
+            range: ByteRange::new(start, end).expect("valid range"),
+            attempts,
+        }
+    }
+
+    fn ranges(queue: &VecDeque<WorkItem>) -> Vec<(u64, u64)> {
+        queue
+            .iter()
+            .map(|work| (work.range.start, work.range.end))
+            .collect()
+    }
+
+    #[test]
+    fn coalesces_adjacent_fresh_ranges_up_to_the_target() {
+        let mut queue = VecDeque::from([item(4, 8, 0), item(8, 12, 0), item(12, 14, 0)]);
+
+        let work = fit_work(item(0, 4, 0), &mut queue, 10);
+
+        assert_eq!((work.range.start, work.range.end), (0, 8));
+        assert_eq!(ranges(&queue), vec![(8, 12), (12, 14)]);
+    }
+
+    #[test]
+    fn cuts_long_ranges_and_never_merges_retries() {
+        let mut queue = VecDeque::from([item(16, 20, 0)]);
+
+        let work = fit_work(item(0, 16, 1), &mut queue, 8);
+        assert_eq!((work.range.start, work.range.end, work.attempts), (0, 8, 1));
+        assert_eq!(ranges(&queue), vec![(8, 16), (16, 20)]);
+
+        let work = fit_work(queue.pop_front().expect("tail"), &mut queue, 16);
+        assert_eq!((work.range.start, work.range.end), (8, 16));
+        assert_eq!(ranges(&queue), vec![(16, 20)]);
+    }
 }
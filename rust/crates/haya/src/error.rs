@@ -5,6 +5,8 @@ use crate::ByteRange;
 #[derive(Clone, Copy, Debug, Eq, PartialEq)]
 pub enum SourceErrorKind {
     Timeout,
+    /// The server asked the client to back off, for example with HTTP 429.
+    Throttled,
     Transport,
     Truncated,
     Protocol,
@@ -37,6 +39,7 @@ impl SourceError {
         matches!(
             self.kind,
             SourceErrorKind::Timeout
+                | SourceErrorKind::Throttled
                 | SourceErrorKind::Transport
                 | SourceErrorKind::Truncated
                 | SourceErrorKind::Other
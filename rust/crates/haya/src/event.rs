@@ -1,3 +1,7 @@
+use std::time::Duration;
+
+use crate::ContentDigest;
+
 #[derive(Clone, Debug, Eq, PartialEq)]
 pub struct DownloadSnapshot {
     /// Unique resource bytes successfully received and accepted during this session.
@@ -8,6 +12,30 @@ pub struct DownloadSnapshot {
     pub buffered_pages: usize,
     pub window_saturated: bool,
     pub in_flight: usize,
+    /// The number of range attempts this download currently allows in flight.
+    pub concurrency: usize,
+    /// At least one attempt is waiting on the downloader's rate limit.
+    pub rate_limited: bool,
+    /// Duplicate attempts started for straggling ranges.
+    pub hedges_issued: usize,
+    /// Duplicate attempts that delivered their range before the original.
+    pub hedges_won: usize,
+    /// One entry per source, in the order the sources were given.
+    pub sources: Vec<SourceSnapshot>,
+}
+
+#[derive(Clone, Debug, Eq, PartialEq)]
+pub struct SourceSnapshot {
+    pub in_flight: usize,
+    /// Consecutive failures since the source last delivered a range.
+    pub failures: usize,
+    pub disabled: bool,
+    /// Body bytes of every successful attempt, including duplicates that lost a hedge.
+    pub received_bytes: u64,
+    /// Smoothed body throughput in bytes per second, once measured.
+    pub throughput: Option<u64>,
+    /// Smoothed time until the source starts answering, once measured.
+    pub latency: Option<Duration>,
 }
 
 #[derive(Clone, Debug, Eq, PartialEq)]
@@ -18,6 +46,10 @@ pub struct DownloadReport {
     /// Partial bytes from failed attempts and retransmitted physical traffic are excluded.
     pub received_bytes: u64,
     pub attempts: usize,
+    pub hedges_issued: usize,
+    pub hedges_won: usize,
+    /// The sink's hash of the complete resource, when it computes one.
+    pub digest: Option<ContentDigest>,
 }
 
 pub trait ProgressSink: Send + Sync {
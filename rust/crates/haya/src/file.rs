@@ -1,16 +1,36 @@
-use std::{io::IoSlice, num::NonZeroUsize, path::Path};
+use std::{
+    io::{self, IoSlice},
+    num::NonZeroUsize,
+    path::{Path, PathBuf},
+};
 
 use async_trait::async_trait;
 use bytes::{Buf, Bytes};
 use tokio::{
     fs::{File, OpenOptions},
-    io::{AsyncSeekExt, AsyncWriteExt, SeekFrom},
+    io::{AsyncReadExt, AsyncSeekExt, AsyncWriteExt, SeekFrom},
     sync::Mutex,
 };
 
-use crate::{CommitBatch, CommitSink, SinkError};
+use crate::{
+    ByteRange, CommitBatch, CommitSink, ContentDigest, HashAlgorithm, SinkError,
+    digest::ContentHasher,
+    journal::{ResumeJournal, journal_error},
+    writer::WriterThread,
+};
+pub use crate::{
+    journal::{ResourceIdentity, journaled_offset},
+    positional::PositionalFileSink,
+};
 
 const FILE_APPEND_BATCH_SIZE: usize = 1024 * 1024;
+/// Batches handed to the writer thread are written in place, so they can be
+/// larger without costing a copy.
+const WRITER_THREAD_APPEND_BATCH_SIZE: usize = 4 * 1024 * 1024;
+/// Committed bytes after which a journaled sink records its progress again.
+const JOURNAL_SAVE_INTERVAL: u64 = 16 * 1024 * 1024;
+/// Bytes read at a time when hashing the prefix of a resumed file.
+const HASH_READ_SIZE: usize = 4 * 1024 * 1024;
 
 #[derive(Clone, Copy, Debug, Eq, PartialEq)]
 pub enum FileOpenMode {
@@ -23,13 +43,50 @@ pub enum FileOpenMode {
     ResumeFromLength,
 }
 
+/// Where a `FileSink` performs its file I/O.
+#[derive(Clone, Copy, Debug, Default, Eq, PartialEq)]
+pub enum FileBackend {
+    /// `tokio::fs::File`, which copies each write into its own buffer and
+    /// runs it on the shared blocking pool.
+    #[default]
+    Tokio,
+    /// One dedicated thread per sink that writes each batch in place with
+    /// vectored writes, behind a small bounded queue.
+    WriterThread,
+}
+
+/// Whether a `FileSink` forces its data to stable storage when closed.
+#[derive(Clone, Copy, Debug, Default, Eq, PartialEq)]
+pub enum SyncPolicy {
+    /// Leave write-back to the operating system.
+    #[default]
+    Never,
+    /// `fsync` the file before `close` returns.
+    OnClose,
+}
+
+#[derive(Clone, Copy, Debug, Default, Eq, PartialEq)]
+pub struct FileSinkOptions {
+    pub backend: FileBackend,
+    pub sync: SyncPolicy,
+    /// Hashes the committed bytes while they are written, for `digest`.
+    ///
+    /// A resumed file has its existing prefix read and hashed once when it is
+    /// opened; everything after that is hashed from the data being committed.
+    pub hash: Option<HashAlgorithm>,
+}
+
 pub struct FileSink {
     state: Mutex<FileState>,
+    append_batch_size: usize,
 }
 
 struct FileState {
-    file: Option<File>,
+    file: Option<OutputFile>,
     committed: u64,
+    journal: Option<JournalState>,
+    sync: SyncPolicy,
+    hasher: Option<ContentHasher>,
     closed: bool,
     poisoned: bool,
     #[cfg(test)]
@@ -38,6 +95,12 @@ struct FileState {
     fail_flush: bool,
 }
 
+struct JournalState {
+    path: PathBuf,
+    journal: ResumeJournal,
+    saved_committed: u64,
+}
+
 struct ChunkCursor<'a> {
     chunks: &'a [Bytes],
     chunk_index: usize,
@@ -114,18 +177,123 @@ impl Buf for ChunkCursor<'_> {
     }
 }
 
+/// The open output file behind either backend, addressed by offset.
+enum OutputFile {
+    Tokio {
+        file: File,
+        /// The file cursor, when known; writes elsewhere seek first.
+        position: Option<u64>,
+    },
+    Thread(WriterThread),
+}
+
+impl OutputFile {
+    async fn new(file: File, position: u64, backend: FileBackend) -> io::Result<Self> {
+        match backend {
+            FileBackend::Tokio => Ok(Self::Tokio {
+                file,
+                position: Some(position),
+            }),
+            FileBackend::WriterThread => {
+                WriterThread::spawn(file.into_std().await).map(Self::Thread)
+            }
+        }
+    }
+
+    async fn write_at(&mut self, offset: u64, chunks: &[Bytes]) -> io::Result<()> {
+        match self {
+            Self::Tokio { file, position } => {
+                let seek = *position != Some(offset);
+                *position = None;
+                if seek {
+                    file.seek(SeekFrom::Start(offset)).await?;
+                }
+                let mut cursor = ChunkCursor::new(chunks);
+                let end = offset + cursor.remaining() as u64;
+                file.write_all_buf(&mut cursor).await?;
+                // Tokio may report the buffered write's OS error only when the
+                // in-flight blocking operation is polled again.
+                file.flush().await?;
+                *position = Some(end);
+                Ok(())
+            }
+            Self::Thread(writer) => writer.write_at(offset, chunks.to_vec()).await,
+        }
+    }
+
+    async fn read_exact_at(&mut self, offset: u64, len: usize) -> io::Result<Vec<u8>> {
+        match self {
+            Self::Tokio { file, position } => {
+                *position = None;
+                let mut data = vec![0; len];
+                file.seek(SeekFrom::Start(offset)).await?;
+                file.read_exact(&mut data).await?;
+                *position = Some(offset + len as u64);
+                Ok(data)
+            }
+            Self::Thread(writer) => writer.read_exact_at(offset, len).await,
+        }
+    }
+
+    async fn set_len(&mut self, len: u64) -> io::Result<()> {
+        match self {
+            Self::Tokio { file, .. } => file.set_len(len).await,
+            Self::Thread(writer) => writer.set_len(len).await,
+        }
+    }
+
+    async fn sync_data(&mut self) -> io::Result<()> {
+        match self {
+            Self::Tokio { file, .. } => {
+                file.flush().await?;
+                file.sync_data().await
+            }
+            Self::Thread(writer) => writer.sync_data().await,
+        }
+    }
+
+    async fn sync_all(&mut self) -> io::Result<()> {
+        match self {
+            Self::Tokio { file, .. } => {
+                file.flush().await?;
+                file.sync_all().await
+            }
+            Self::Thread(writer) => writer.sync_all().await,
+        }
+    }
+
+    async fn close(self) {
+        if let Self::Thread(writer) = self {
+            writer.close().await;
+        }
+    }
+}
+
 impl FileSink {
     pub async fn open(path: impl AsRef<Path>, mode: FileOpenMode) -> Result<Self, SinkError> {
-        let mut options = OpenOptions::new();
-        options.create(true).write(true);
+        Self::open_with(path, mode, FileSinkOptions::default()).await
+    }
+
+    /// Opens `path` like `open`, with the given backend, sync policy and hash.
+    pub async fn open_with(
+        path: impl AsRef<Path>,
+        mode: FileOpenMode,
+        options: FileSinkOptions,
+    ) -> Result<Self, SinkError> {
+        let mut open_options = OpenOptions::new();
+        open_options.create(true).write(true);
         match mode {
             FileOpenMode::Overwrite => {
-                options.truncate(true);
+                open_options.truncate(true);
+            }
+            // Only a resumed prefix is read back, and only to hash it; a
+            // write-only open keeps FIFOs waiting for their reader.
+            FileOpenMode::ResumeFromLength => {
+                open_options.read(options.hash.is_some());
             }
-            FileOpenMode::ResumeFromLength => {}
         }
 
-        let mut file = options.open(path.as_ref()).await.map_err(|error| {
+        let mut file = open_options.open(path.as_ref()).await.map_err(|error| {
             SinkError::new(format!(
                 "failed to open {}: {error}",
                 path.as_ref().display()
@@ -139,10 +307,108 @@ impl FileSink {
                 .map_err(|error| SinkError::new(format!("failed to seek output file: {error}")))?,
         };
 
+        Self::from_file(file, committed, None, options).await
+    }
+
+    /// Opens `path` with a resume journal kept in a sidecar file next to it.
+    ///
+    /// The journal records `identity` and which ranges of the file are
+    /// written, including ranges past the contiguous prefix that a stopped
+    /// download stored with `store_batch`. With `ResumeFromLength`, a journal
+    /// for the same identity resumes its prefix and offers its stored ranges
+    /// through `stored_ranges`; a journal for another identity, or one that
+    /// cannot be read, restarts the file from empty instead of appending to
+    /// it. A file without a journal resumes from its length as `open` does.
+    /// The journal is removed once the file is complete.
+    pub async fn open_journaled(
+        path: impl AsRef<Path>,
+        mode: FileOpenMode,
+        identity: ResourceIdentity,
+    ) -> Result<Self, SinkError> {
+        Self::open_journaled_with(path, mode, identity, FileSinkOptions::default()).await
+    }
+
+    /// Opens `path` like `open_journaled`, with the given backend and sync
+    /// policy.
+    pub async fn open_journaled_with(
+        path: impl AsRef<Path>,
+        mode: FileOpenMode,
+        identity: ResourceIdentity,
+        options: FileSinkOptions,
+    ) -> Result<Self, SinkError> {
+        let path = path.as_ref();
+        let journal_path = ResumeJournal::path_for(path);
+        let mut file = OpenOptions::new()
+            .create(true)
+            .truncate(false)
+            .read(true)
+            .write(true)
+            .open(path)
+            .await
+            .map_err(|error| {
+                SinkError::new(format!("failed to open {}: {error}", path.display()))
+            })?;
+        let length = file
+            .metadata()
+            .await
+            .map_err(|error| SinkError::new(format!("failed to stat output file: {error}")))?
+            .len();
+        let resume = mode == FileOpenMode::ResumeFromLength;
+        let journal = ResumeJournal::resume(&journal_path, resume, identity, length).await;
+        if journal.is_empty() {
+            file.set_len(0).await.map_err(|error| {
+                SinkError::new(format!("failed to truncate output file: {error}"))
+            })?;
+        }
+        let committed = journal.committed;
+        file.seek(SeekFrom::Start(committed))
+            .await
+            .map_err(|error| SinkError::new(format!("failed to seek output file: {error}")))?;
+        journal.save(&journal_path).await.map_err(journal_error)?;
+
+        Self::from_file(
+            file,
+            committed,
+            Some(JournalState {
+                path: journal_path,
+                journal,
+                saved_committed: committed,
+            }),
+            options,
+        )
+        .await
+    }
+
+    async fn from_file(
+        file: File,
+        committed: u64,
+        journal: Option<JournalState>,
+        options: FileSinkOptions,
+    ) -> Result<Self, SinkError> {
+        let mut file = OutputFile::new(file, committed, options.backend)
+            .await
+            .map_err(|error| SinkError::new(format!("failed to start file writer: {error}")))?;
+        let mut hasher = options.hash.map(ContentHasher::new);
+        if let Some(hasher) = hasher.as_mut() {
+            if let Err(error) = hash_prefix(&mut file, committed, hasher).await {
+                file.close().await;
+                return Err(SinkError::new(format!(
+                    "failed to hash output file: {error}"
+                )));
+            }
+        }
+        let append_batch_size = match options.backend {
+            FileBackend::Tokio => FILE_APPEND_BATCH_SIZE,
+            FileBackend::WriterThread => WRITER_THREAD_APPEND_BATCH_SIZE,
+        };
         Ok(Self {
+            append_batch_size,
             state: Mutex::new(FileState {
                 file: Some(file),
                 committed,
+                journal,
+                sync: options.sync,
+                hasher,
                 closed: false,
                 poisoned: false,
                 #[cfg(test)]
@@ -154,6 +420,35 @@ impl FileSink {
     }
 }
 
+impl FileState {
+    fn ensure_usable(&self) -> Result<(), SinkError> {
+        if self.closed {
+            return Err(SinkError::new("cannot append to a closed file sink"));
+        }
+        if self.poisoned {
+            return Err(cancelled_append_error());
+        }
+        Ok(())
+    }
+
+    /// Makes the written data durable, then records it in the journal.
+    async fn save_journal(&mut self) -> Result<(), SinkError> {
+        let (Some(file), Some(journal)) = (self.file.as_mut(), self.journal.as_mut()) else {
+            return Ok(());
+        };
+        file.sync_data()
+            .await
+            .map_err(|error| SinkError::new(format!("failed to sync output file: {error}")))?;
+        journal
+            .journal
+            .save(&journal.path)
+            .await
+            .map_err(journal_error)?;
+        journal.saved_committed = journal.journal.committed;
+        Ok(())
+    }
+}
+
 #[async_trait]
 impl CommitSink for FileSink {
     async fn committed_offset(&self) -> Result<u64, SinkError> {
@@ -186,17 +481,12 @@ impl CommitSink for FileSink {
     }
 
     fn append_batch_size_hint(&self) -> Option<NonZeroUsize> {
-        NonZeroUsize::new(FILE_APPEND_BATCH_SIZE)
+        NonZeroUsize::new(self.append_batch_size)
     }
 
     async fn append_batch(&self, batch: CommitBatch) -> Result<(), SinkError> {
         let mut state = self.state.lock().await;
-        if state.closed {
-            return Err(SinkError::new("cannot append to a closed file sink"));
-        }
-        if state.poisoned {
-            return Err(cancelled_append_error());
-        }
+        state.ensure_usable()?;
         if batch.offset() != state.committed {
             return Err(SinkError::new(format!(
                 "append at {}, committed offset is {}",
@@ -206,92 +496,222 @@ impl CommitSink for FileSink {
         }
         let committed = state.committed;
         let end_offset = batch.end_offset();
+        // Stored ranges live past the committed offset, so a failed append
+        // must not truncate them away.
+        let keep_tail = state
+            .journal
+            .as_ref()
+            .is_some_and(|journal| !journal.journal.ranges.is_empty());
         #[cfg(test)]
         let fail_write_after_chunks = state.fail_write_after_chunks;
         #[cfg(test)]
         let fail_flush = state.fail_flush;
         state.poisoned = true;
+        // The batch is hashed on the blocking pool while it is written, and
+        // the hash is kept only once the batch is committed, so a rolled-back
+        // batch can be retried.
+        let hash = state.hasher.clone().map(|mut hasher| {
+            let chunks = batch.chunks().to_vec();
+            tokio::task::spawn_blocking(move || {
+                for chunk in &chunks {
+                    hasher.update(chunk);
+                }
+                hasher
+            })
+        });
         let file = state.file.as_mut().expect("an open sink retains its file");
-        let write_result = async {
+        let write = async {
             #[cfg(test)]
             if let Some(chunk_count) = fail_write_after_chunks {
-                let mut cursor =
-                    ChunkCursor::new(&batch.chunks()[..chunk_count.min(batch.chunks().len())]);
-                file.write_all_buf(&mut cursor).await?;
-                return Err(std::io::Error::other("injected batch write failure"));
+                let chunks = &batch.chunks()[..chunk_count.min(batch.chunks().len())];
+                file.write_at(committed, chunks).await?;
+                return Err(io::Error::other("injected batch write failure"));
             }
-            let mut cursor = ChunkCursor::new(batch.chunks());
-            file.write_all_buf(&mut cursor).await?;
-            // Tokio may report the buffered write's OS error only when the
-            // in-flight blocking operation is polled again.
+            file.write_at(committed, batch.chunks()).await?;
             #[cfg(test)]
             if fail_flush {
-                return Err(std::io::Error::other("injected batch flush failure"));
+                return Err(io::Error::other("injected batch flush failure"));
             }
-            file.flush().await
-        }
-        .await;
-        if let Err(write_error) = write_result {
-            let file = state
-                .file
-                .as_mut()
-                .expect("an open sink retains its file until close");
-            let rollback = async {
-                file.set_len(committed).await?;
-                file.seek(SeekFrom::Start(committed)).await?;
-                Ok::<_, std::io::Error>(())
+            Ok::<_, io::Error>(())
+        };
+        let hash = async {
+            match hash {
+                Some(task) => task.await.map(Some).map_err(io::Error::other),
+                None => Ok(None),
             }
-            .await;
-            if let Err(rollback_error) = rollback {
-                state.closed = true;
-                state.file.take();
+        };
+        let (write_result, hash_result) = tokio::join!(write, hash);
+        // A batch that could not be hashed is rolled back like a failed write.
+        let hasher = match write_result.and(hash_result) {
+            Ok(hasher) => hasher,
+            Err(write_error) => {
+                let file = state
+                    .file
+                    .as_mut()
+                    .expect("an open sink retains its file until close");
+                let rollback = if keep_tail {
+                    Ok(())
+                } else {
+                    file.set_len(committed).await
+                };
+                if let Err(rollback_error) = rollback {
+                    state.closed = true;
+                    if let Some(file) = state.file.take() {
+                        file.close().await;
+                    }
+                    return Err(SinkError::new(format!(
+                        "failed to write output file: {write_error}; failed to restore committed offset {committed}, so the sink was closed: {rollback_error}"
+                    )));
+                }
+                state.poisoned = false;
                 return Err(SinkError::new(format!(
-                    "failed to write output file: {write_error}; failed to restore committed offset {committed}, so the sink was closed: {rollback_error}"
+                    "failed to write output file: {write_error}"
                 )));
             }
-            state.poisoned = false;
-            return Err(SinkError::new(format!(
-                "failed to write output file: {write_error}"
-            )));
-        }
+        };
         state.committed = end_offset;
+        state.hasher = hasher;
         state.poisoned = false;
+        let Some(journal) = state.journal.as_mut() else {
+            return Ok(());
+        };
+        journal.journal.advance(end_offset);
+        if end_offset - journal.saved_committed >= JOURNAL_SAVE_INTERVAL {
+            state.save_journal().await?;
+        }
         Ok(())
     }
 
-    async fn flush(&self) -> Result<(), SinkError> {
+    async fn stored_ranges(&self) -> Result<Vec<ByteRange>, SinkError> {
+        let state = self.state.lock().await;
+        Ok(state
+            .journal
+            .as_ref()
+            .map(|journal| journal.journal.ranges.clone())
+            .unwrap_or_default())
+    }
+
+    async fn read_stored(&self, range: ByteRange) -> Result<Bytes, SinkError> {
         let mut state = self.state.lock().await;
-        if state.poisoned {
-            return Err(cancelled_append_error());
+        state.ensure_usable()?;
+        let stored = state.journal.as_ref().is_some_and(|journal| {
+            journal
+                .journal
+                .ranges
+                .iter()
+                .any(|stored| stored.start <= range.start && range.end <= stored.end)
+        });
+        if !stored {
+            return Err(SinkError::new(format!(
+                "range {}..{} is not stored in the output file",
+                range.start, range.end
+            )));
         }
-        let Some(file) = state.file.as_mut() else {
+        let len = usize::try_from(range.length())
+            .map_err(|_| SinkError::new("stored range length exceeds usize"))?;
+        let file = state.file.as_mut().expect("an open sink retains its file");
+        let data = file
+            .read_exact_at(range.start, len)
+            .await
+            .map_err(|error| SinkError::new(format!("failed to read output file: {error}")))?;
+        Ok(Bytes::from(data))
+    }
+
+    async fn store_batch(&self, batch: CommitBatch) -> Result<(), SinkError> {
+        let mut state = self.state.lock().await;
+        state.ensure_usable()?;
+        let Some(journal) = state.journal.as_ref() else {
             return Ok(());
         };
-        file.flush()
+        if batch.offset() < state.committed || batch.end_offset() > journal.journal.identity.size {
+            return Err(SinkError::new(format!(
+                "cannot store {}..{} outside the uncommitted part of the file",
+                batch.offset(),
+                batch.end_offset()
+            )));
+        }
+        let file = state.file.as_mut().expect("an open sink retains its file");
+        file.write_at(batch.offset(), batch.chunks())
             .await
-            .map_err(|error| SinkError::new(format!("failed to flush output file: {error}")))
+            .map_err(|error| SinkError::new(format!("failed to write output file: {error}")))?;
+        let range = ByteRange {
+            start: batch.offset(),
+            end: batch.end_offset(),
+        };
+        state
+            .journal
+            .as_mut()
+            .expect("checked above")
+            .journal
+            .insert(range);
+        state.save_journal().await
+    }
+
+    async fn digest(&self) -> Result<Option<ContentDigest>, SinkError> {
+        let state = self.state.lock().await;
+        Ok(state.hasher.as_ref().map(ContentHasher::digest))
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        let mut state = self.state.lock().await;
+        if state.poisoned {
+            return Err(cancelled_append_error());
+        }
+        // Appends are complete once they return, so only the journal can
+        // lag behind.
+        state.save_journal().await
     }
 
     async fn close(&self) -> Result<(), SinkError> {
         let mut state = self.state.lock().await;
         if state.poisoned {
             state.closed = true;
-            state.file.take();
+            if let Some(file) = state.file.take() {
+                file.close().await;
+            }
             return Err(cancelled_append_error());
         }
+        let sync = state.sync;
         let Some(file) = state.file.as_mut() else {
             state.closed = true;
             return Ok(());
         };
-        file.flush()
-            .await
-            .map_err(|error| SinkError::new(format!("failed to flush output file: {error}")))?;
+        if sync == SyncPolicy::OnClose {
+            file.sync_all()
+                .await
+                .map_err(|error| SinkError::new(format!("failed to sync output file: {error}")))?;
+        }
+        if let Some(journal) = &state.journal {
+            if state.committed == journal.journal.identity.size {
+                ResumeJournal::remove(&journal.path)
+                    .await
+                    .map_err(journal_error)?;
+            } else {
+                state.save_journal().await?;
+            }
+        }
         state.closed = true;
-        state.file.take();
+        if let Some(file) = state.file.take() {
+            file.close().await;
+        }
         Ok(())
     }
 }
 
+async fn hash_prefix(
+    file: &mut OutputFile,
+    len: u64,
+    hasher: &mut ContentHasher,
+) -> io::Result<()> {
+    let mut offset = 0;
+    while offset < len {
+        let read_len = (len - offset).min(HASH_READ_SIZE as u64) as usize;
+        hasher.update(&file.read_exact_at(offset, read_len).await?);
+        offset += read_len as u64;
+    }
+    Ok(())
+}
+
 fn cancelled_append_error() -> SinkError {
     SinkError::new("file sink is unusable because an append was cancelled")
 }
@@ -308,9 +728,16 @@ mod tests {
             .open(temporary.path())
             .expect("open read-only file");
         let sink = FileSink {
+            append_batch_size: FILE_APPEND_BATCH_SIZE,
             state: Mutex::new(FileState {
-                file: Some(File::from_std(read_only)),
+                file: Some(OutputFile::Tokio {
+                    file: File::from_std(read_only),
+                    position: Some(0),
+                }),
                 committed: 0,
+                journal: None,
+                sync: SyncPolicy::Never,
+                hasher: None,
                 closed: false,
                 poisoned: false,
                 fail_write_after_chunks: None,
@@ -369,7 +796,11 @@ mod tests {
     #[tokio::test]
     async fn rolls_back_a_partially_written_batch_and_allows_retry() {
         let temporary = tempfile::NamedTempFile::new().expect("temporary file");
-        let sink = FileSink::open(temporary.path(), FileOpenMode::Overwrite)
+        let options = FileSinkOptions {
+            hash: Some(HashAlgorithm::Xxh3),
+            ..FileSinkOptions::default()
+        };
+        let sink = FileSink::open_with(temporary.path(), FileOpenMode::Overwrite, options)
             .await
             .expect("open file sink");
         sink.state.lock().await.fail_write_after_chunks = Some(1);
@@ -400,6 +831,11 @@ mod tests {
             std::fs::read(temporary.path()).expect("read file"),
             b"retry"
         );
+        let digest = sink.digest().await.expect("digest").expect("hashed sink");
+        assert_eq!(
+            digest.value,
+            xxhash_rust::xxh3::xxh3_64(b"retry").to_be_bytes()
+        );
     }
 
     #[tokio::test]
@@ -0,0 +1,129 @@
+use std::{
+    collections::HashMap,
+    sync::{Arc, Mutex, MutexGuard},
+    time::Duration,
+};
+
+use tokio::time::Instant;
+
+use crate::{DownloadError, source_pool::SourceEstimate};
+
+/// Source health remembered across downloads, keyed by a caller-chosen name
+/// such as the URL host.
+///
+/// A download given the memory starts from what earlier downloads learned
+/// about its sources: recent failures, running cooldowns and throughput.
+/// Failure counts halve every `half_life` and whole entries are forgotten
+/// after `FORGET_AFTER_HALF_LIVES` half-lives without news, so a long batch
+/// neither rediscovers bad hosts nor holds a grudge forever.
+#[derive(Clone, Debug)]
+pub struct SourceHealthMemory {
+    inner: Arc<MemoryInner>,
+}
+
+#[derive(Debug)]
+struct MemoryInner {
+    half_life: Duration,
+    entries: Mutex<HashMap<String, Remembered>>,
+}
+
+#[derive(Debug)]
+struct Remembered {
+    health: RememberedHealth,
+    updated: Instant,
+}
+
+/// What one download learned about a source.
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub(crate) struct RememberedHealth {
+    pub failures: usize,
+    pub ready_at: Instant,
+    pub estimate: Option<SourceEstimate>,
+}
+
+/// Half-lives without news after which an entry is dropped.
+const FORGET_AFTER_HALF_LIVES: u32 = 8;
+
+impl SourceHealthMemory {
+    pub const DEFAULT_HALF_LIFE: Duration = Duration::from_secs(60);
+
+    pub fn new(half_life: Duration) -> Result<Self, DownloadError> {
+        if half_life.is_zero() {
+            return Err(DownloadError::InvalidSpec(
+                "health memory half_life must be positive".into(),
+            ));
+        }
+        Ok(Self {
+            inner: Arc::new(MemoryInner {
+                half_life,
+                entries: Mutex::new(HashMap::new()),
+            }),
+        })
+    }
+
+    /// Returns the decayed health of `key`, if it is still remembered.
+    pub(crate) fn recall(&self, key: &str, now: Instant) -> Option<RememberedHealth> {
+        let mut entries = self.entries();
+        let entry = entries.get(key)?;
+        let half_lives = now.saturating_duration_since(entry.updated).as_secs_f64()
+            / self.inner.half_life.as_secs_f64();
+        if half_lives >= f64::from(FORGET_AFTER_HALF_LIVES) {
+            entries.remove(key);
+            return None;
+        }
+        let mut health = entry.health;
+        health.failures >>= half_lives as u32;
+        Some(health)
+    }
+
+    pub(crate) fn store(&self, key: &str, health: RememberedHealth, now: Instant) {
+        self.entries().insert(
+            key.to_owned(),
+            Remembered {
+                health,
+                updated: now,
+            },
+        );
+    }
+
+    fn entries(&self) -> MutexGuard<'_, HashMap<String, Remembered>> {
+        self.inner
+            .entries
+            .lock()
+            .expect("health memory lock poisoned")
+    }
+}
+
+impl Default for SourceHealthMemory {
+    fn default() -> Self {
+        Self::new(Self::DEFAULT_HALF_LIFE).expect("the default half-life is positive")
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn halves_failures_per_half_life_and_forgets_stale_entries() {
+        let memory = SourceHealthMemory::new(Duration::from_secs(10)).expect("valid half-life");
+        let now = Instant::now();
+        let health = RememberedHealth {
+            failures: 8,
+            ready_at: now,
+            estimate: None,
+        };
+        memory.store("cdn.example", health, now);
+
+        let recalled = |after: u64| {
+            memory
+                .recall("cdn.example", now + Duration::from_secs(after))
+                .map(|health| health.failures)
+        };
+        assert_eq!(recalled(5), Some(8));
+        assert_eq!(recalled(10), Some(4));
+        assert_eq!(recalled(35), Some(1));
+        assert_eq!(recalled(80), None);
+        assert_eq!(recalled(0), None);
+    }
+}
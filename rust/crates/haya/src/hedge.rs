@@ -0,0 +1,136 @@
+use std::{collections::VecDeque, time::Duration};
+
+use crate::DownloadError;
+
+/// Re-issues a straggling range on another source and keeps whichever copy
+/// finishes first.
+///
+/// Only ranges that hold up the download are hedged: the range at the head of
+/// the ordered window, and the last `tail_ranges` ranges once every remaining
+/// range has been requested. A range straggles when its attempt has run
+/// longer than `percentile` of recent successful attempts, and never sooner
+/// than `min_delay`. Each range is hedged at most once.
+#[derive(Clone, Debug, PartialEq)]
+pub struct HedgePolicy {
+    pub percentile: f64,
+    pub min_delay: Duration,
+    pub tail_ranges: usize,
+}
+
+impl HedgePolicy {
+    pub const DEFAULT_PERCENTILE: f64 = 0.9;
+    pub const DEFAULT_MIN_DELAY: Duration = Duration::from_millis(500);
+    pub const DEFAULT_TAIL_RANGES: usize = 4;
+
+    pub fn new() -> Self {
+        Self {
+            percentile: Self::DEFAULT_PERCENTILE,
+            min_delay: Self::DEFAULT_MIN_DELAY,
+            tail_ranges: Self::DEFAULT_TAIL_RANGES,
+        }
+    }
+
+    pub(crate) fn validate(&self) -> Result<(), DownloadError> {
+        if !(self.percentile > 0.0 && self.percentile <= 1.0) {
+            return Err(DownloadError::InvalidSpec(
+                "hedge percentile must be in (0, 1]".into(),
+            ));
+        }
+        Ok(())
+    }
+}
+
+impl Default for HedgePolicy {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+/// Successful attempt durations kept for the straggler percentile.
+const LATENCY_SAMPLES: usize = 64;
+
+/// Recent successful attempt durations of one download.
+#[derive(Debug, Default)]
+pub(crate) struct AttemptLatencies {
+    samples: VecDeque<Duration>,
+}
+
+impl AttemptLatencies {
+    pub fn record(&mut self, elapsed: Duration) {
+        if self.samples.len() == LATENCY_SAMPLES {
+            self.samples.pop_front();
+        }
+        self.samples.push_back(elapsed);
+    }
+
+    /// How long an attempt may run before it counts as a straggler.
+    ///
+    /// Without samples there is nothing to compare against, so nothing straggles.
+    pub fn straggler_after(&self, policy: &HedgePolicy) -> Option<Duration> {
+        if self.samples.is_empty() {
+            return None;
+        }
+        let mut sorted: Vec<_> = self.samples.iter().copied().collect();
+        sorted.sort_unstable();
+        let rank = (policy.percentile * sorted.len() as f64).ceil() as usize;
+        let percentile = sorted[rank.clamp(1, sorted.len()) - 1];
+        Some(percentile.max(policy.min_delay))
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn policy(percentile: f64, min_delay_ms: u64) -> HedgePolicy {
+        HedgePolicy {
+            percentile,
+            min_delay: Duration::from_millis(min_delay_ms),
+            tail_ranges: 1,
+        }
+    }
+
+    #[test]
+    fn uses_the_configured_percentile_of_recent_attempts() {
+        let mut latencies = AttemptLatencies::default();
+        assert_eq!(latencies.straggler_after(&policy(0.9, 0)), None);
+        for millis in 1..=10 {
+            latencies.record(Duration::from_millis(millis * 10));
+        }
+
+        assert_eq!(
+            latencies.straggler_after(&policy(0.9, 0)),
+            Some(Duration::from_millis(90))
+        );
+        assert_eq!(
+            latencies.straggler_after(&policy(0.5, 0)),
+            Some(Duration::from_millis(50))
+        );
+        assert_eq!(
+            latencies.straggler_after(&policy(0.9, 200)),
+            Some(Duration::from_millis(200))
+        );
+    }
+
+    #[test]
+    fn keeps_only_recent_samples() {
+        let mut latencies = AttemptLatencies::default();
+        latencies.record(Duration::from_secs(60));
+        for _ in 0..LATENCY_SAMPLES {
+            latencies.record(Duration::from_millis(10));
+        }
+
+        assert_eq!(
+            latencies.straggler_after(&policy(1.0, 0)),
+            Some(Duration::from_millis(10))
+        );
+    }
+
+    #[test]
+    fn rejects_a_percentile_outside_the_unit_interval() {
+        assert!(policy(0.0, 0).validate().is_err());
+        assert!(policy(1.5, 0).validate().is_err());
+        assert!(policy(f64::NAN, 0).validate().is_err());
+        assert!(policy(1.0, 0).validate().is_ok());
+    }
+}
@@ -0,0 +1,207 @@
+use std::{
+    collections::BTreeMap,
+    sync::{Arc, Mutex, MutexGuard},
+};
+
+use tokio::sync::Notify;
+
+use crate::DownloadError;
+
+/// Splits a number of workers among the downloads that join it, in
+/// proportion to the bytes each still has to commit.
+///
+/// Capacity thus flows to whichever download is behind, so the members of a
+/// joint transfer, such as the video and audio tracks of one media, finish
+/// close together instead of leaving workers idle while the last one drags.
+/// Every running member keeps at least one worker. A member's share only caps
+/// its concurrency; workers themselves still come from its `WorkerLimit`,
+/// which the members usually share.
+#[derive(Clone, Debug)]
+pub struct JointSchedule {
+    inner: Arc<JointInner>,
+}
+
+#[derive(Debug)]
+struct JointInner {
+    workers: usize,
+    state: Mutex<JointState>,
+    changed: Notify,
+}
+
+#[derive(Debug, Default)]
+struct JointState {
+    next_id: u64,
+    /// Remaining bytes and current share of each member, by join order.
+    members: BTreeMap<u64, (u64, usize)>,
+}
+
+impl JointSchedule {
+    pub fn new(workers: usize) -> Result<Self, DownloadError> {
+        if workers == 0 {
+            return Err(DownloadError::InvalidSpec(
+                "a joint schedule needs at least 1 worker".into(),
+            ));
+        }
+        Ok(Self {
+            inner: Arc::new(JointInner {
+                workers,
+                state: Mutex::default(),
+                changed: Notify::new(),
+            }),
+        })
+    }
+
+    pub fn workers(&self) -> usize {
+        self.inner.workers
+    }
+
+    /// Downloads currently running under the schedule.
+    pub fn members(&self) -> usize {
+        self.state().members.len()
+    }
+
+    pub(crate) fn join(&self, remaining: u64) -> JointMember {
+        let id = {
+            let mut state = self.state();
+            let id = state.next_id;
+            state.next_id += 1;
+            state.members.insert(id, (remaining, 0));
+            id
+        };
+        self.rebalance();
+        JointMember {
+            schedule: self.clone(),
+            id,
+        }
+    }
+
+    /// Recomputes every share with the largest-remainder method and wakes the
+    /// members when any share changed.
+    fn rebalance(&self) {
+        let mut state = self.state();
+        let workers = self.inner.workers as u64;
+        let total = state
+            .members
+            .values()
+            .map(|(remaining, _)| *remaining)
+            .sum::<u64>()
+            .max(1);
+        let mut shares = state
+            .members
+            .iter()
+            .map(|(id, (remaining, _))| {
+                let exact = u128::from(workers) * u128::from(*remaining);
+                let share = (exact / u128::from(total)) as u64;
+                (*id, share, exact % u128::from(total))
+            })
+            .collect::<Vec<_>>();
+        let mut spare = workers.saturating_sub(shares.iter().map(|(_, share, _)| share).sum());
+        shares.sort_by(|left, right| right.2.cmp(&left.2).then(left.0.cmp(&right.0)));
+        for (_, share, _) in &mut shares {
+            if spare == 0 {
+                break;
+            }
+            *share += 1;
+            spare -= 1;
+        }
+        let mut changed = false;
+        for (id, share, _) in shares {
+            let share = share.max(1) as usize;
+            let member = state
+                .members
+                .get_mut(&id)
+                .expect("shares come from members");
+            changed |= member.1 != share;
+            member.1 = share;
+        }
+        drop(state);
+        if changed {
+            self.inner.changed.notify_waiters();
+        }
+    }
+
+    fn state(&self) -> MutexGuard<'_, JointState> {
+        self.inner
+            .state
+            .lock()
+            .expect("joint schedule lock poisoned")
+    }
+}
+
+/// One download's place in a `JointSchedule`, given up when dropped.
+#[derive(Debug)]
+pub(crate) struct JointMember {
+    schedule: JointSchedule,
+    id: u64,
+}
+
+impl JointMember {
+    pub fn update(&self, remaining: u64) {
+        let unchanged = {
+            let mut state = self.schedule.state();
+            let member = state
+                .members
+                .get_mut(&self.id)
+                .expect("a member stays until dropped");
+            std::mem::replace(&mut member.0, remaining) == remaining
+        };
+        if !unchanged {
+            self.schedule.rebalance();
+        }
+    }
+
+    /// The most attempts this member may run at once.
+    pub fn limit(&self) -> usize {
+        self.schedule.state().members[&self.id].1
+    }
+
+    pub async fn changed(&self) {
+        self.schedule.inner.changed.notified().await;
+    }
+}
+
+impl Drop for JointMember {
+    fn drop(&mut self) {
+        self.schedule.state().members.remove(&self.id);
+        self.schedule.rebalance();
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn shares_workers_by_remaining_bytes() {
+        let schedule = JointSchedule::new(8).expect("valid schedule");
+        let video = schedule.join(900);
+        let audio = schedule.join(100);
+        assert_eq!((video.limit(), audio.limit()), (7, 1));
+
+        video.update(300);
+        assert_eq!((video.limit(), audio.limit()), (6, 2));
+        audio.update(0);
+        assert_eq!((video.limit(), audio.limit()), (8, 1));
+
+        drop(audio);
+        assert_eq!(video.limit(), 8);
+        assert_eq!(schedule.members(), 1);
+        drop(video);
+        assert_eq!(schedule.members(), 0);
+        assert!(JointSchedule::new(0).is_err());
+    }
+
+    #[tokio::test]
+    async fn wakes_members_when_a_share_changes() {
+        let schedule = JointSchedule::new(4).expect("valid schedule");
+        let video = schedule.join(100);
+        let audio = schedule.join(100);
+
+        let changed = video.changed();
+        tokio::pin!(changed);
+        assert!(futures_util::poll!(changed.as_mut()).is_pending());
+        drop(audio);
+        changed.await;
+        assert_eq!(video.limit(), 4);
+    }
+}
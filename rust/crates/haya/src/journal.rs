@@ -0,0 +1,275 @@
+use std::{
+    io,
+    path::{Path, PathBuf},
+};
+
+use crate::{ByteRange, SinkError};
+
+/// What a resumable file is a copy of.
+///
+/// A journaled file is only continued while the resource keeps the same size
+/// and validator, such as an HTTP ETag, or its Last-Modified date when the
+/// server sends no ETag.
+#[derive(Clone, Debug, Eq, PartialEq)]
+pub struct ResourceIdentity {
+    pub size: u64,
+    pub validator: Option<String>,
+}
+
+impl ResourceIdentity {
+    pub fn new(size: u64, validator: Option<String>) -> Self {
+        Self { size, validator }
+    }
+}
+
+const JOURNAL_HEADER: &str = "haya-journal 1";
+
+/// The committed offset a journaled sink for `target` would resume from if
+/// the resource keeps the identity its journal records, or 0 when there is no
+/// readable journal or it already covers the whole resource.
+///
+/// Lets a caller that only learns the identity from its first range response
+/// request that range where the sink will continue.
+pub async fn journaled_offset(target: impl AsRef<Path>) -> u64 {
+    let target = target.as_ref();
+    let Ok(Some(journal)) = ResumeJournal::load(&ResumeJournal::path_for(target)).await else {
+        return 0;
+    };
+    let length = tokio::fs::metadata(target)
+        .await
+        .map_or(0, |metadata| metadata.len());
+    let committed = journal.committed.min(length);
+    if committed < journal.identity.size {
+        committed
+    } else {
+        0
+    }
+}
+
+/// The sidecar record of a partially written file: which resource it holds,
+/// how long its contiguous prefix is, and which ranges past the prefix are
+/// already written.
+#[derive(Clone, Debug, Eq, PartialEq)]
+pub(crate) struct ResumeJournal {
+    pub identity: ResourceIdentity,
+    pub committed: u64,
+    /// Written ranges past `committed`, ascending and non-adjacent.
+    pub ranges: Vec<ByteRange>,
+}
+
+impl ResumeJournal {
+    pub fn new(identity: ResourceIdentity) -> Self {
+        Self {
+            identity,
+            committed: 0,
+            ranges: Vec::new(),
+        }
+    }
+
+    pub fn path_for(target: &Path) -> PathBuf {
+        let mut name = target.file_name().unwrap_or_default().to_os_string();
+        name.push(".haya");
+        target.with_file_name(name)
+    }
+
+    /// Reads the journal at `path`. A missing file is `Ok(None)`; a journal that
+    /// cannot be parsed is an error, since it no longer vouches for the file.
+    pub async fn load(path: &Path) -> io::Result<Option<Self>> {
+        let text = match tokio::fs::read_to_string(path).await {
+            Ok(text) => text,
+            Err(error) if error.kind() == io::ErrorKind::NotFound => return Ok(None),
+            Err(error) => return Err(error),
+        };
+        Self::parse(&text)
+            .map(Some)
+            .ok_or_else(|| io::Error::new(io::ErrorKind::InvalidData, "malformed resume journal"))
+    }
+
+    /// Decides what an existing file of `length` bytes still holds of
+    /// `identity`, given the journal at `path` when `resume` is set.
+    ///
+    /// A journal for the same identity keeps its prefix and ranges as far as
+    /// the file still reaches. A file without a journal keeps its length as
+    /// prefix. Anything else, including an unreadable journal, starts empty.
+    pub async fn resume(
+        path: &Path,
+        resume: bool,
+        identity: ResourceIdentity,
+        length: u64,
+    ) -> Self {
+        if !resume {
+            return Self::new(identity);
+        }
+        match Self::load(path).await {
+            Ok(Some(mut journal)) if journal.identity == identity => {
+                journal.ranges.retain(|range| range.end <= length);
+                journal.advance(journal.committed.min(length));
+                journal
+            }
+            Ok(None) if length <= identity.size => {
+                let mut journal = Self::new(identity);
+                journal.advance(length);
+                journal
+            }
+            _ => Self::new(identity),
+        }
+    }
+
+    /// Whether the journal holds nothing, so its file must start empty.
+    pub fn is_empty(&self) -> bool {
+        self.committed == 0 && self.ranges.is_empty()
+    }
+
+    /// Replaces the journal at `path` without ever leaving a torn copy behind.
+    pub async fn save(&self, path: &Path) -> io::Result<()> {
+        let mut temporary = path.as_os_str().to_os_string();
+        temporary.push(".tmp");
+        tokio::fs::write(&temporary, self.render()).await?;
+        tokio::fs::rename(&temporary, path).await
+    }
+
+    /// Deletes the journal at `path` once its file is complete.
+    pub async fn remove(path: &Path) -> io::Result<()> {
+        match tokio::fs::remove_file(path).await {
+            Err(error) if error.kind() == io::ErrorKind::NotFound => Ok(()),
+            result => result,
+        }
+    }
+
+    /// Records that the contiguous prefix now ends at `committed`.
+    pub fn advance(&mut self, committed: u64) {
+        self.committed = committed;
+        self.ranges.retain_mut(|range| {
+            range.start = range.start.max(committed);
+            range.start < range.end
+        });
+    }
+
+    /// Records a written range past the contiguous prefix.
+    pub fn insert(&mut self, range: ByteRange) {
+        let mut merged = range;
+        self.ranges.retain(|existing| {
+            if existing.end < merged.start || existing.start > merged.end {
+                return true;
+            }
+            merged.start = merged.start.min(existing.start);
+            merged.end = merged.end.max(existing.end);
+            false
+        });
+        let index = self
+            .ranges
+            .partition_point(|existing| existing.end < merged.start);
+        self.ranges.insert(index, merged);
+        self.advance(self.committed);
+    }
+
+    /// Records a written range and extends the contiguous prefix over it when
+    /// they meet.
+    pub fn record_written(&mut self, range: ByteRange) {
+        self.insert(range);
+        if let Some(first) = self.ranges.first().copied() {
+            if first.start <= self.committed {
+                self.advance(first.end.max(self.committed));
+            }
+        }
+    }
+
+    fn render(&self) -> String {
+        let mut text = format!("{JOURNAL_HEADER}\nsize {}\n", self.identity.size);
+        if let Some(validator) = &self.identity.validator {
+            text.push_str(&format!("validator {validator}\n"));
+        }
+        text.push_str(&format!("committed {}\n", self.committed));
+        for range in &self.ranges {
+            text.push_str(&format!("range {} {}\n", range.start, range.end));
+        }
+        text
+    }
+
+    fn parse(text: &str) -> Option<Self> {
+        let mut lines = text.lines();
+        if lines.next()? != JOURNAL_HEADER {
+            return None;
+        }
+        let mut size = None;
+        let mut validator = None;
+        let mut committed = None;
+        let mut ranges = Vec::new();
+        for line in lines {
+            let (key, value) = line.split_once(' ')?;
+            match key {
+                "size" => size = Some(value.parse().ok()?),
+                "validator" => validator = Some(value.to_owned()),
+                "committed" => committed = Some(value.parse().ok()?),
+                "range" => {
+                    let (start, end) = value.split_once(' ')?;
+                    ranges.push(ByteRange::new(start.parse().ok()?, end.parse().ok()?).ok()?);
+                }
+                _ => return None,
+            }
+        }
+        let identity = ResourceIdentity::new(size?, validator);
+        let committed: u64 = committed?;
+        let ordered = ranges.windows(2).all(|pair| pair[0].end < pair[1].start);
+        let bounded = ranges
+            .iter()
+            .all(|range| range.start >= committed && range.end <= identity.size);
+        if committed > identity.size || !ordered || !bounded {
+            return None;
+        }
+        Some(Self {
+            identity,
+            committed,
+            ranges,
+        })
+    }
+}
+
+pub(crate) fn journal_error(error: io::Error) -> SinkError {
+    SinkError::new(format!("failed to write resume journal: {error}"))
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn range(start: u64, end: u64) -> ByteRange {
+        ByteRange::new(start, end).expect("valid range")
+    }
+
+    #[test]
+    fn merges_written_ranges_and_drops_them_once_committed() {
+        let mut journal = ResumeJournal::new(ResourceIdentity::new(100, None));
+        journal.insert(range(40, 50));
+        journal.insert(range(10, 20));
+        journal.insert(range(20, 30));
+        journal.insert(range(60, 70));
+        assert_eq!(
+            journal.ranges,
+            [range(10, 30), range(40, 50), range(60, 70)]
+        );
+
+        journal.advance(45);
+        assert_eq!(journal.ranges, [range(45, 50), range(60, 70)]);
+
+        journal.record_written(range(50, 60));
+        assert_eq!(journal.committed, 70);
+        assert!(journal.ranges.is_empty());
+    }
+
+    #[test]
+    fn round_trips_and_rejects_inconsistent_journals() {
+        let mut journal =
+            ResumeJournal::new(ResourceIdentity::new(100, Some("Wed, 21 Oct 2015".into())));
+        journal.advance(10);
+        journal.insert(range(20, 30));
+        assert_eq!(ResumeJournal::parse(&journal.render()), Some(journal));
+
+        assert_eq!(ResumeJournal::parse("haya-journal 1\nsize 10\n"), None);
+        assert_eq!(
+            ResumeJournal::parse("haya-journal 1\nsize 10\ncommitted 4\nrange 2 6\n"),
+            None
+        );
+        assert_eq!(ResumeJournal::parse("other\nsize 10\ncommitted 4\n"), None);
+    }
+}
@@ -1,18 +1,39 @@
+mod block_size;
 mod buffer;
+mod concurrency;
+mod digest;
 mod downloader;
 mod error;
 mod event;
 pub mod file;
+mod health;
+mod hedge;
+mod joint;
+mod journal;
+mod memory_budget;
 mod model;
+mod positional;
+mod rate_limit;
 mod sink;
 mod source;
 mod source_pool;
+mod work_stealing;
 mod worker_limit;
+mod writer;
 
+pub use block_size::AdaptiveBlockSize;
+pub use concurrency::AdaptiveConcurrency;
+pub use digest::{ContentDigest, HashAlgorithm};
 pub use downloader::Downloader;
 pub use error::{DownloadError, SinkError, SourceError, SourceErrorKind};
-pub use event::{DownloadReport, DownloadSnapshot, NullProgressSink, ProgressSink};
+pub use event::{DownloadReport, DownloadSnapshot, NullProgressSink, ProgressSink, SourceSnapshot};
+pub use health::SourceHealthMemory;
+pub use hedge::HedgePolicy;
+pub use joint::JointSchedule;
+pub use memory_budget::MemoryBudget;
 pub use model::{ByteRange, DownloadSpec};
+pub use rate_limit::RateLimit;
 pub use sink::{CommitBatch, CommitSink};
-pub use source::{ByteStream, RangeSource};
+pub use source::{ByteStream, OpenedRange, RangeSource};
+pub use work_stealing::WorkStealing;
 pub use worker_limit::WorkerLimit;
@@ -0,0 +1,157 @@
+use std::sync::{Arc, Mutex, MutexGuard};
+
+use tokio::sync::Notify;
+
+use crate::DownloadError;
+
+/// A byte budget for range buffers and reordering pages, shared by every
+/// downloader that holds a clone.
+///
+/// A range reserves its length before it is requested and keeps it until its
+/// bytes are committed. The range a download is blocked on, the one at its
+/// committed offset, is always admitted, even over budget, so downloads never
+/// deadlock on memory held by each other's out-of-order pages; usage can thus
+/// exceed the capacity by at most one range per download.
+#[derive(Clone, Debug)]
+pub struct MemoryBudget {
+    inner: Arc<MemoryBudgetInner>,
+}
+
+#[derive(Debug)]
+struct MemoryBudgetInner {
+    capacity: u64,
+    used: Mutex<u64>,
+    released: Notify,
+}
+
+impl MemoryBudget {
+    pub fn new(capacity: u64) -> Result<Self, DownloadError> {
+        if capacity == 0 {
+            return Err(DownloadError::InvalidSpec(
+                "memory budget must be at least 1 byte".into(),
+            ));
+        }
+        Ok(Self {
+            inner: Arc::new(MemoryBudgetInner {
+                capacity,
+                used: Mutex::new(0),
+                released: Notify::new(),
+            }),
+        })
+    }
+
+    pub fn capacity(&self) -> u64 {
+        self.inner.capacity
+    }
+
+    /// Bytes currently reserved by all holders.
+    pub fn used(&self) -> u64 {
+        *self.used_bytes()
+    }
+
+    /// Reserves `bytes` if they fit. A reservation larger than the whole
+    /// budget fits once nothing else is reserved.
+    pub(crate) fn try_reserve(&self, bytes: u64) -> Option<MemoryReservation> {
+        let mut used = self.used_bytes();
+        if *used != 0 && used.saturating_add(bytes) > self.inner.capacity {
+            return None;
+        }
+        *used = used.saturating_add(bytes);
+        Some(self.reservation(bytes))
+    }
+
+    /// Reserves `bytes` whether or not they fit.
+    pub(crate) fn force_reserve(&self, bytes: u64) -> MemoryReservation {
+        let mut used = self.used_bytes();
+        *used = used.saturating_add(bytes);
+        self.reservation(bytes)
+    }
+
+    /// Waits until `bytes` fit and reserves them.
+    pub(crate) async fn reserve_owned(self, bytes: u64) -> MemoryReservation {
+        loop {
+            let released = self.inner.released.notified();
+            if let Some(reservation) = self.try_reserve(bytes) {
+                return reservation;
+            }
+            released.await;
+        }
+    }
+
+    fn reservation(&self, bytes: u64) -> MemoryReservation {
+        MemoryReservation {
+            budget: self.clone(),
+            bytes,
+        }
+    }
+
+    fn used_bytes(&self) -> MutexGuard<'_, u64> {
+        self.inner.used.lock().expect("memory budget lock poisoned")
+    }
+}
+
+/// Bytes held against a `MemoryBudget` until dropped.
+#[derive(Debug)]
+pub(crate) struct MemoryReservation {
+    budget: MemoryBudget,
+    bytes: u64,
+}
+
+impl MemoryReservation {
+    pub(crate) fn bytes(&self) -> u64 {
+        self.bytes
+    }
+}
+
+impl Drop for MemoryReservation {
+    fn drop(&mut self) {
+        {
+            let mut used = self.budget.used_bytes();
+            *used = used.saturating_sub(self.bytes);
+        }
+        self.budget.inner.released.notify_waiters();
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use std::time::Duration;
+
+    use super::*;
+
+    #[test]
+    fn reservations_fit_the_capacity_until_released() {
+        let budget = MemoryBudget::new(100).expect("valid budget");
+
+        let first = budget.try_reserve(60).expect("fits");
+        assert!(budget.try_reserve(50).is_none());
+        let forced = budget.force_reserve(50);
+        assert_eq!(budget.used(), 110);
+
+        drop(first);
+        drop(forced);
+        assert_eq!(budget.used(), 0);
+        let oversized = budget.try_reserve(150).expect("fits an idle budget");
+        assert!(budget.try_reserve(1).is_none());
+        drop(oversized);
+        assert!(MemoryBudget::new(0).is_err());
+    }
+
+    #[tokio::test]
+    async fn a_waiting_reservation_is_admitted_once_bytes_are_released() {
+        let budget = MemoryBudget::new(100).expect("valid budget");
+        let held = budget.try_reserve(80).expect("fits");
+
+        let waiting = tokio::spawn(budget.clone().reserve_owned(40));
+        tokio::time::sleep(Duration::from_millis(20)).await;
+        assert!(!waiting.is_finished());
+
+        drop(held);
+        let reservation = tokio::time::timeout(Duration::from_millis(500), waiting)
+            .await
+            .expect("admitted after the release")
+            .expect("waiter joins");
+        assert_eq!(reservation.bytes(), 40);
+        assert_eq!(budget.used(), 40);
+    }
+}
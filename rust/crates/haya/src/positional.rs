@@ -0,0 +1,262 @@
+use std::{
+    fs::OpenOptions,
+    io,
+    path::{Path, PathBuf},
+    sync::Arc,
+};
+
+use async_trait::async_trait;
+use bytes::Bytes;
+use tokio::sync::Mutex;
+
+use crate::{
+    ByteRange, CommitSink, SinkError,
+    file::{FileOpenMode, ResourceIdentity},
+    journal::{ResumeJournal, journal_error},
+};
+
+/// Written bytes after which the journal is brought up to date again.
+const JOURNAL_SAVE_INTERVAL: u64 = 16 * 1024 * 1024;
+
+/// A file sink that writes each range at its own offset as soon as it arrives.
+///
+/// The file is preallocated to the resource size (with `fallocate` on Linux)
+/// and ranges are written with positional writes, so the downloader needs no
+/// reordering window and never holds completed ranges back behind a slow one.
+/// Written ranges are tracked in the same sidecar journal as
+/// `FileSink::open_journaled`; `committed_offset` is the contiguous prefix
+/// and the other written ranges are offered through `stored_ranges`.
+pub struct PositionalFileSink {
+    file: Arc<std::fs::File>,
+    state: Mutex<PositionalState>,
+}
+
+struct PositionalState {
+    journal: ResumeJournal,
+    journal_path: PathBuf,
+    unsaved_bytes: u64,
+    closed: bool,
+}
+
+impl PositionalFileSink {
+    /// Opens `path` for `identity`, resuming it under the rules of
+    /// `FileSink::open_journaled`.
+    pub async fn open(
+        path: impl AsRef<Path>,
+        mode: FileOpenMode,
+        identity: ResourceIdentity,
+    ) -> Result<Self, SinkError> {
+        let path = path.as_ref().to_owned();
+        let journal_path = ResumeJournal::path_for(&path);
+        let opened_path = path.clone();
+        let file = blocking(move || {
+            OpenOptions::new()
+                .create(true)
+                .truncate(false)
+                .read(true)
+                .write(true)
+                .open(&opened_path)
+        })
+        .await
+        .map_err(|error| SinkError::new(format!("failed to open {}: {error}", path.display())))?;
+        let file = Arc::new(file);
+        let length = file
+            .metadata()
+            .map_err(|error| SinkError::new(format!("failed to stat output file: {error}")))?
+            .len();
+        let resume = mode == FileOpenMode::ResumeFromLength;
+        let journal = ResumeJournal::resume(&journal_path, resume, identity, length).await;
+        if journal.is_empty() {
+            let file = file.clone();
+            blocking(move || file.set_len(0)).await.map_err(|error| {
+                SinkError::new(format!("failed to truncate output file: {error}"))
+            })?;
+        }
+        // The journal must vouch for the file before preallocation makes its
+        // length meaningless.
+        journal.save(&journal_path).await.map_err(journal_error)?;
+        let size = journal.identity.size;
+        let preallocated = file.clone();
+        blocking(move || preallocate(&preallocated, size))
+            .await
+            .map_err(|error| {
+                SinkError::new(format!("failed to preallocate output file: {error}"))
+            })?;
+
+        Ok(Self {
+            file,
+            state: Mutex::new(PositionalState {
+                journal,
+                journal_path,
+                unsaved_bytes: 0,
+                closed: false,
+            }),
+        })
+    }
+}
+
+impl PositionalState {
+    fn ensure_open(&self) -> Result<(), SinkError> {
+        if self.closed {
+            return Err(SinkError::new("cannot write to a closed file sink"));
+        }
+        Ok(())
+    }
+
+    /// Makes the written data durable, then records it in the journal.
+    async fn save_journal(&mut self, file: &Arc<std::fs::File>) -> Result<(), SinkError> {
+        let file = file.clone();
+        blocking(move || file.sync_data())
+            .await
+            .map_err(|error| SinkError::new(format!("failed to sync output file: {error}")))?;
+        self.journal
+            .save(&self.journal_path)
+            .await
+            .map_err(journal_error)?;
+        self.unsaved_bytes = 0;
+        Ok(())
+    }
+}
+
+#[async_trait]
+impl CommitSink for PositionalFileSink {
+    async fn committed_offset(&self) -> Result<u64, SinkError> {
+        Ok(self.state.lock().await.journal.committed)
+    }
+
+    async fn append(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        let committed = self.committed_offset().await?;
+        if offset != committed {
+            return Err(SinkError::new(format!(
+                "append at {offset}, committed offset is {committed}"
+            )));
+        }
+        self.write_at(offset, data).await
+    }
+
+    fn writes_at_offsets(&self) -> bool {
+        true
+    }
+
+    async fn write_at(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        if data.is_empty() {
+            return self.state.lock().await.ensure_open();
+        }
+        let end = offset
+            .checked_add(data.len() as u64)
+            .ok_or_else(|| SinkError::new("write end offset overflow"))?;
+        {
+            let state = self.state.lock().await;
+            state.ensure_open()?;
+            if end > state.journal.identity.size {
+                return Err(SinkError::new(format!(
+                    "write at {offset}..{end} is past the resource size {}",
+                    state.journal.identity.size
+                )));
+            }
+        }
+        // Writes to disjoint ranges need no ordering, so the lock is not held
+        // across the write itself.
+        let file = self.file.clone();
+        blocking(move || write_all_at(&file, &data, offset))
+            .await
+            .map_err(|error| SinkError::new(format!("failed to write output file: {error}")))?;
+
+        let mut state = self.state.lock().await;
+        state.ensure_open()?;
+        state
+            .journal
+            .record_written(ByteRange { start: offset, end });
+        state.unsaved_bytes += end - offset;
+        if state.unsaved_bytes >= JOURNAL_SAVE_INTERVAL {
+            state.save_journal(&self.file).await?;
+        }
+        Ok(())
+    }
+
+    async fn stored_ranges(&self) -> Result<Vec<ByteRange>, SinkError> {
+        Ok(self.state.lock().await.journal.ranges.clone())
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        let mut state = self.state.lock().await;
+        if state.closed {
+            return Ok(());
+        }
+        state.save_journal(&self.file).await
+    }
+
+    async fn close(&self) -> Result<(), SinkError> {
+        let mut state = self.state.lock().await;
+        if state.closed {
+            return Ok(());
+        }
+        if state.journal.committed == state.journal.identity.size {
+            ResumeJournal::remove(&state.journal_path)
+                .await
+                .map_err(journal_error)?;
+        } else {
+            state.save_journal(&self.file).await?;
+        }
+        state.closed = true;
+        Ok(())
+    }
+}
+
+async fn blocking<T: Send + 'static>(
+    operation: impl FnOnce() -> io::Result<T> + Send + 'static,
+) -> io::Result<T> {
+    tokio::task::spawn_blocking(operation)
+        .await
+        .map_err(io::Error::other)?
+}
+
+#[cfg(unix)]
+fn write_all_at(file: &std::fs::File, data: &[u8], offset: u64) -> io::Result<()> {
+    std::os::unix::fs::FileExt::write_all_at(file, data, offset)
+}
+
+#[cfg(windows)]
+fn write_all_at(file: &std::fs::File, mut data: &[u8], mut offset: u64) -> io::Result<()> {
+    use std::os::windows::fs::FileExt;
+
+    while !data.is_empty() {
+        let written = file.seek_write(data, offset)?;
+        if written == 0 {
+            return Err(io::ErrorKind::WriteZero.into());
+        }
+        data = &data[written..];
+        offset += written as u64;
+    }
+    Ok(())
+}
+
+#[cfg(target_os = "linux")]
+fn preallocate(file: &std::fs::File, size: u64) -> io::Result<()> {
+    use std::os::fd::AsRawFd;
+
+    let Ok(length) = libc::off_t::try_from(size) else {
+        return Err(io::Error::other("file size exceeds off_t"));
+    };
+    if length == 0 {
+        return Ok(());
+    }
+    // SAFETY: `file` owns an open descriptor for the duration of the call.
+    if unsafe { libc::fallocate(file.as_raw_fd(), 0, 0, length) } == 0 {
+        return Ok(());
+    }
+    let error = io::Error::last_os_error();
+    // Filesystems without fallocate still get a sparse file of the right size.
+    if error.raw_os_error() == Some(libc::EOPNOTSUPP) {
+        return file.set_len(size);
+    }
+    Err(error)
+}
+
+#[cfg(not(target_os = "linux"))]
+fn preallocate(file: &std::fs::File, size: u64) -> io::Result<()> {
+    if file.metadata()?.len() < size {
+        file.set_len(size)?;
+    }
+    Ok(())
+}
@@ -0,0 +1,168 @@
+use std::{
+    sync::{
+        Arc, Mutex, MutexGuard,
+        atomic::{AtomicUsize, Ordering},
+    },
+    time::Duration,
+};
+
+use tokio::{sync::Notify, time::Instant};
+
+use crate::DownloadError;
+
+/// A token bucket shared by every downloader that holds a clone.
+///
+/// The bucket holds at most one second of traffic. A chunk larger than that
+/// waits for a full bucket and then leaves it in debt, so the long-run rate
+/// stays bounded without splitting chunks.
+#[derive(Clone, Debug)]
+pub struct RateLimit {
+    inner: Arc<RateLimitInner>,
+}
+
+#[derive(Debug)]
+struct RateLimitInner {
+    bucket: Mutex<Bucket>,
+    changed: Notify,
+}
+
+#[derive(Debug)]
+struct Bucket {
+    bytes_per_second: u64,
+    tokens: f64,
+    updated: Instant,
+}
+
+impl Bucket {
+    fn refill(&mut self, now: Instant) {
+        let elapsed = now.saturating_duration_since(self.updated).as_secs_f64();
+        let capacity = self.bytes_per_second as f64;
+        self.tokens = (self.tokens + elapsed * capacity).min(capacity);
+        self.updated = now;
+    }
+
+    fn take(&mut self, amount: u64, now: Instant) -> Option<Duration> {
+        self.refill(now);
+        let rate = self.bytes_per_second as f64;
+        let needed = (amount as f64).min(rate);
+        if self.tokens >= needed {
+            self.tokens -= amount as f64;
+            return None;
+        }
+        Some(Duration::from_secs_f64((needed - self.tokens) / rate))
+    }
+}
+
+impl RateLimit {
+    pub fn new(bytes_per_second: u64) -> Result<Self, DownloadError> {
+        validate_rate(bytes_per_second)?;
+        Ok(Self {
+            inner: Arc::new(RateLimitInner {
+                bucket: Mutex::new(Bucket {
+                    bytes_per_second,
+                    tokens: bytes_per_second as f64,
+                    updated: Instant::now(),
+                }),
+                changed: Notify::new(),
+            }),
+        })
+    }
+
+    pub fn bytes_per_second(&self) -> u64 {
+        self.bucket().bytes_per_second
+    }
+
+    /// Changes the rate for every holder, including chunks already waiting.
+    pub fn set_bytes_per_second(&self, bytes_per_second: u64) -> Result<(), DownloadError> {
+        validate_rate(bytes_per_second)?;
+        {
+            let mut bucket = self.bucket();
+            bucket.refill(Instant::now());
+            bucket.bytes_per_second = bytes_per_second;
+            bucket.tokens = bucket.tokens.min(bytes_per_second as f64);
+        }
+        self.inner.changed.notify_waiters();
+        Ok(())
+    }
+
+    /// Waits until `amount` bytes may pass and returns the time spent waiting.
+    pub(crate) async fn acquire(&self, amount: u64, throttle: &ThrottleMonitor) -> Duration {
+        let started = Instant::now();
+        let mut waiting = None;
+        loop {
+            let changed = self.inner.changed.notified();
+            let Some(delay) = self.bucket().take(amount, Instant::now()) else {
+                return started.elapsed();
+            };
+            waiting.get_or_insert_with(|| throttle.enter());
+            tokio::select! {
+                _ = tokio::time::sleep(delay) => {}
+                _ = changed => {}
+            }
+        }
+    }
+
+    fn bucket(&self) -> MutexGuard<'_, Bucket> {
+        self.inner.bucket.lock().expect("rate limit lock poisoned")
+    }
+}
+
+fn validate_rate(bytes_per_second: u64) -> Result<(), DownloadError> {
+    if bytes_per_second == 0 {
+        return Err(DownloadError::InvalidSpec(
+            "rate limit must be at least 1 byte per second".into(),
+        ));
+    }
+    Ok(())
+}
+
+/// Counts the attempts of one downloader that are waiting on its rate limit.
+#[derive(Debug, Default)]
+pub(crate) struct ThrottleMonitor {
+    waiting: AtomicUsize,
+    changed: Notify,
+}
+
+impl ThrottleMonitor {
+    fn enter(&self) -> ThrottleGuard<'_> {
+        self.waiting.fetch_add(1, Ordering::AcqRel);
+        self.changed.notify_one();
+        ThrottleGuard(self)
+    }
+
+    pub(crate) fn is_throttled(&self) -> bool {
+        self.waiting.load(Ordering::Acquire) > 0
+    }
+
+    pub(crate) async fn changed(&self) {
+        self.changed.notified().await;
+    }
+}
+
+struct ThrottleGuard<'a>(&'a ThrottleMonitor);
+
+impl Drop for ThrottleGuard<'_> {
+    fn drop(&mut self) {
+        self.0.waiting.fetch_sub(1, Ordering::AcqRel);
+        self.0.changed.notify_one();
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn a_large_chunk_waits_for_a_full_bucket_and_leaves_debt() {
+        let now = Instant::now();
+        let mut bucket = Bucket {
+            bytes_per_second: 100,
+            tokens: 100.0,
+            updated: now,
+        };
+
+        assert_eq!(bucket.take(250, now), None);
+        assert_eq!(bucket.tokens, -150.0);
+        assert_eq!(bucket.take(10, now), Some(Duration::from_millis(1600)));
+    }
+}
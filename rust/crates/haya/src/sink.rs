@@ -3,7 +3,7 @@ use std::{num::NonZeroUsize, sync::Arc};
 use async_trait::async_trait;
 use bytes::Bytes;
 
-use crate::SinkError;
+use crate::{ByteRange, ContentDigest, SinkError};
 
 #[derive(Debug)]
 pub struct CommitBatch {
@@ -90,6 +90,51 @@ pub trait CommitSink: Send + Sync {
         Ok(())
     }
 
+    /// Whether the sink takes completed ranges at any offset through
+    /// `write_at`. The downloader then writes every range as soon as it
+    /// arrives instead of reordering ranges in a bounded window.
+    fn writes_at_offsets(&self) -> bool {
+        false
+    }
+
+    /// Writes a completed range at its offset. Only called when
+    /// `writes_at_offsets` is true; `committed_offset` then reports the
+    /// contiguous prefix written so far.
+    async fn write_at(&self, offset: u64, _data: Bytes) -> Result<(), SinkError> {
+        Err(SinkError::new(format!(
+            "this sink cannot write at offset {offset}"
+        )))
+    }
+
+    /// Ranges past the committed offset that the sink already holds from an
+    /// earlier download, ascending. The downloader commits them with
+    /// `read_stored` instead of requesting them again.
+    async fn stored_ranges(&self) -> Result<Vec<ByteRange>, SinkError> {
+        Ok(Vec::new())
+    }
+
+    /// Reads back part of a range listed by `stored_ranges`.
+    async fn read_stored(&self, range: ByteRange) -> Result<Bytes, SinkError> {
+        Err(SinkError::new(format!(
+            "range {}..{} is not stored by this sink",
+            range.start, range.end
+        )))
+    }
+
+    /// Keeps a batch past the committed offset for a later download to reuse.
+    ///
+    /// A download that stops early hands its buffered out-of-order pages to
+    /// this method before flushing. The default discards them.
+    async fn store_batch(&self, _batch: CommitBatch) -> Result<(), SinkError> {
+        Ok(())
+    }
+
+    /// The hash of the committed bytes, for sinks that compute one while
+    /// committing. The downloader reports it once the sink is closed.
+    async fn digest(&self) -> Result<Option<ContentDigest>, SinkError> {
+        Ok(None)
+    }
+
     async fn flush(&self) -> Result<(), SinkError>;
 
     async fn close(&self) -> Result<(), SinkError> {
@@ -1,4 +1,4 @@
-use std::{pin::Pin, sync::Arc};
+use std::{pin::Pin, sync::Arc, time::Duration};
 
 use async_trait::async_trait;
 use bytes::Bytes;
@@ -13,4 +13,15 @@ pub trait RangeSource: Send + Sync {
     async fn open(&self, range: ByteRange) -> Result<ByteStream, SourceError>;
 }
 
+/// A range a caller already opened on one of a download's sources, typically
+/// to learn the resource size from the response.
+pub struct OpenedRange {
+    /// The index of the source in the download's source list.
+    pub source: usize,
+    pub range: ByteRange,
+    pub stream: ByteStream,
+    /// How long the source took to start answering.
+    pub latency: Duration,
+}
+
 pub(crate) type SharedSource = Arc<dyn RangeSource>;
@@ -2,7 +2,48 @@ use std::time::Duration;
 
 use tokio::time::Instant;
 
-use crate::{DownloadError, SourceError, source::SharedSource};
+use crate::{
+    DownloadError, SourceError, SourceHealthMemory, SourceSnapshot, health::RememberedHealth,
+    source::SharedSource,
+};
+
+/// Weight of the newest sample in the per-source moving averages.
+const ESTIMATE_WEIGHT: f64 = 0.3;
+/// Shortest body transfer time used for a throughput sample.
+const MIN_TRANSFER_TIME: Duration = Duration::from_millis(1);
+
+/// Smoothed body throughput and time to first byte of one source.
+#[derive(Clone, Copy, Debug, PartialEq)]
+pub(crate) struct SourceEstimate {
+    pub throughput: f64,
+    pub latency: Duration,
+}
+
+/// Timing of one successful range attempt.
+#[derive(Clone, Copy, Debug)]
+pub(crate) struct AttemptTiming {
+    pub bytes: u64,
+    /// Time until the source returned a body stream.
+    pub latency: Duration,
+    /// Time spent receiving the body, excluding rate limit waits.
+    pub transfer: Duration,
+}
+
+impl SourceEstimate {
+    fn from_timing(timing: &AttemptTiming) -> Self {
+        Self {
+            throughput: timing.bytes as f64 / timing.transfer.max(MIN_TRANSFER_TIME).as_secs_f64(),
+            latency: timing.latency,
+        }
+    }
+
+    fn update(&mut self, timing: &AttemptTiming) {
+        let sample = Self::from_timing(timing);
+        self.throughput += ESTIMATE_WEIGHT * (sample.throughput - self.throughput);
+        self.latency =
+            self.latency.mul_f64(1.0 - ESTIMATE_WEIGHT) + sample.latency.mul_f64(ESTIMATE_WEIGHT);
+    }
+}
 
 #[derive(Debug)]
 struct Health {
@@ -10,53 +51,176 @@ struct Health {
     in_flight: usize,
     disabled: bool,
     ready_at: Instant,
+    estimate: Option<SourceEstimate>,
+    received_bytes: u64,
+}
+
+impl Health {
+    fn new(now: Instant) -> Self {
+        Self {
+            failures: 0,
+            in_flight: 0,
+            disabled: false,
+            ready_at: now,
+            estimate: None,
+            received_bytes: 0,
+        }
+    }
+
+    /// Seconds until a new range of `len` bytes would finish here, assuming the
+    /// attempts already running on this source share its throughput.
+    ///
+    /// An unmeasured source borrows `fallback`, the best measured estimate, so it
+    /// is probed optimistically; with nothing measured, load alone decides.
+    fn expected_completion(&self, len: u64, fallback: Option<SourceEstimate>) -> f64 {
+        match self.estimate.or(fallback) {
+            Some(estimate) => {
+                let queued = (self.in_flight as u64 + 1).saturating_mul(len) as f64;
+                estimate.latency.as_secs_f64() + queued / estimate.throughput.max(1.0)
+            }
+            None => self.in_flight as f64,
+        }
+    }
 }
 
 pub(crate) struct SourcePool {
     sources: Vec<SharedSource>,
     health: Vec<Health>,
     cooldown: Duration,
+    memory: Option<(SourceHealthMemory, Vec<String>)>,
 }
 
 impl SourcePool {
     pub fn new(sources: Vec<SharedSource>, cooldown: Duration) -> Self {
         let now = Instant::now();
-        let health = sources
-            .iter()
-            .map(|_| Health {
-                failures: 0,
-                in_flight: 0,
-                disabled: false,
-                ready_at: now,
-            })
-            .collect();
+        let health = sources.iter().map(|_| Health::new(now)).collect();
         Self {
             sources,
             health,
             cooldown,
+            memory: None,
         }
     }
 
-    pub fn select(&mut self, now: Instant) -> Option<(usize, SharedSource)> {
+    /// Starts each source from what `memory` recalls under its key and keeps
+    /// the memory up to date with every outcome from now on.
+    pub fn remember(
+        &mut self,
+        memory: SourceHealthMemory,
+        keys: Vec<String>,
+    ) -> Result<(), DownloadError> {
+        if keys.len() != self.sources.len() {
+            return Err(DownloadError::InvalidSpec(format!(
+                "health memory needs one key per source, got {} keys for {} sources",
+                keys.len(),
+                self.sources.len()
+            )));
+        }
+        let now = Instant::now();
+        for (health, key) in self.health.iter_mut().zip(&keys) {
+            if let Some(remembered) = memory.recall(key, now) {
+                health.failures = remembered.failures;
+                health.ready_at = remembered.ready_at.max(now);
+                health.estimate = remembered.estimate;
+            }
+        }
+        self.memory = Some((memory, keys));
+        Ok(())
+    }
+
+    fn remember_outcome(&self, id: usize) {
+        if let Some((memory, keys)) = &self.memory {
+            let health = &self.health[id];
+            memory.store(
+                &keys[id],
+                RememberedHealth {
+                    failures: health.failures,
+                    ready_at: health.ready_at,
+                    estimate: health.estimate,
+                },
+                Instant::now(),
+            );
+        }
+    }
+
+    /// Selects the ready source expected to finish a `len`-byte range first.
+    ///
+    /// Recent failures still outrank speed, so a flaky fast mirror yields to a
+    /// healthy slow one.
+    pub fn select(&mut self, now: Instant, len: u64) -> Option<(usize, SharedSource)> {
+        self.select_where(now, len, |_| true)
+    }
+
+    /// Selects a ready source other than `exclude`, for a duplicate attempt.
+    pub fn select_other(
+        &mut self,
+        now: Instant,
+        len: u64,
+        exclude: usize,
+    ) -> Option<(usize, SharedSource)> {
+        self.select_where(now, len, |id| id != exclude)
+    }
+
+    fn select_where(
+        &mut self,
+        now: Instant,
+        len: u64,
+        eligible: impl Fn(usize) -> bool,
+    ) -> Option<(usize, SharedSource)> {
+        let fallback = self
+            .health
+            .iter()
+            .filter_map(|health| health.estimate)
+            .max_by(|left, right| left.throughput.total_cmp(&right.throughput));
         let id = self
             .health
             .iter()
             .enumerate()
-            .filter(|(_, health)| !health.disabled && health.ready_at <= now)
-            .min_by_key(|(id, health)| (health.failures, health.in_flight, *id))
-            .map(|(id, _)| id)?;
+            .filter(|(id, health)| eligible(*id) && !health.disabled && health.ready_at <= now)
+            .map(|(id, health)| {
+                (
+                    id,
+                    health.failures,
+                    health.expected_completion(len, fallback),
+                )
+            })
+            .min_by(|left, right| {
+                left.1
+                    .cmp(&right.1)
+                    .then(left.2.total_cmp(&right.2))
+                    .then(left.0.cmp(&right.0))
+            })
+            .map(|(id, ..)| id)?;
         self.health[id].in_flight += 1;
         Some((id, self.sources[id].clone()))
     }
 
-    pub fn record_success(&mut self, id: usize) {
+    /// Counts an attempt on `id` that started without being selected, such as
+    /// a range the caller already opened.
+    pub fn claim(&mut self, id: usize) {
+        self.health[id].in_flight += 1;
+    }
+
+    /// Returns a source slot whose attempt was abandoned without an outcome.
+    pub fn release(&mut self, id: usize) {
+        let health = &mut self.health[id];
+        health.in_flight = health.in_flight.saturating_sub(1);
+    }
+
+    pub fn record_success(&mut self, id: usize, timing: &AttemptTiming) {
         let health = &mut self.health[id];
         health.in_flight = health.in_flight.saturating_sub(1);
+        health.received_bytes = health.received_bytes.saturating_add(timing.bytes);
+        match &mut health.estimate {
+            Some(estimate) => estimate.update(timing),
+            None => health.estimate = Some(SourceEstimate::from_timing(timing)),
+        }
         let now = Instant::now();
         if health.ready_at <= now {
             health.failures = 0;
             health.ready_at = now;
         }
+        self.remember_outcome(id);
     }
 
     pub fn record_failure(&mut self, id: usize, error: &SourceError) -> Result<(), DownloadError> {
@@ -71,9 +235,30 @@ impl SourcePool {
         } else {
             health.disabled = true;
         }
+        self.remember_outcome(id);
         Ok(())
     }
 
+    pub fn estimate(&self, id: usize) -> Option<SourceEstimate> {
+        self.health[id].estimate
+    }
+
+    pub fn snapshot(&self) -> Vec<SourceSnapshot> {
+        self.health
+            .iter()
+            .map(|health| SourceSnapshot {
+                in_flight: health.in_flight,
+                failures: health.failures,
+                disabled: health.disabled,
+                received_bytes: health.received_bytes,
+                throughput: health
+                    .estimate
+                    .map(|estimate| estimate.throughput.round() as u64),
+                latency: health.estimate.map(|estimate| estimate.latency),
+            })
+            .collect()
+    }
+
     pub fn has_usable(&self) -> bool {
         self.health.iter().any(|health| !health.disabled)
     }
@@ -84,6 +269,13 @@ impl SourcePool {
             .any(|health| !health.disabled && health.ready_at <= now)
     }
 
+    pub fn has_ready_other(&self, now: Instant, exclude: usize) -> bool {
+        self.health
+            .iter()
+            .enumerate()
+            .any(|(id, health)| id != exclude && !health.disabled && health.ready_at <= now)
+    }
+
     pub fn next_ready_at(&self) -> Option<Instant> {
         self.health
             .iter()
@@ -95,20 +287,54 @@ impl SourcePool {
 
 #[cfg(test)]
 mod tests {
+    use std::sync::Arc;
+
+    use async_trait::async_trait;
+
     use super::*;
-    use crate::SourceErrorKind;
+    use crate::{ByteRange, ByteStream, RangeSource, SourceErrorKind};
+
+    struct UnusedSource;
+
+    #[async_trait]
+    impl RangeSource for UnusedSource {
+        async fn open(&self, _range: ByteRange) -> Result<ByteStream, SourceError> {
+            Err(SourceError::new(SourceErrorKind::Other, "not opened"))
+        }
+    }
+
+    fn measured_pool(throughputs: &[Option<f64>]) -> SourcePool {
+        let sources = throughputs
+            .iter()
+            .map(|_| Arc::new(UnusedSource) as SharedSource)
+            .collect();
+        let mut pool = SourcePool::new(sources, Duration::ZERO);
+        for (health, throughput) in pool.health.iter_mut().zip(throughputs) {
+            health.estimate = throughput.map(|throughput| SourceEstimate {
+                throughput,
+                latency: Duration::ZERO,
+            });
+        }
+        pool
+    }
+
+    fn picks(pool: &mut SourcePool, count: usize) -> Vec<usize> {
+        let now = Instant::now();
+        (0..count)
+            .map(|_| pool.select(now, 1000).expect("a ready source").0)
+            .collect()
+    }
 
     #[test]
     fn sibling_success_does_not_cancel_an_active_cooldown() {
         let mut pool = SourcePool {
             sources: Vec::new(),
             health: vec![Health {
-                failures: 0,
                 in_flight: 2,
-                disabled: false,
-                ready_at: Instant::now(),
+                ..Health::new(Instant::now())
             }],
             cooldown: Duration::from_secs(1),
+            memory: None,
         };
 
         pool.record_failure(
@@ -117,10 +343,56 @@ mod tests {
         )
         .expect("cooldown fits in an instant");
         let ready_at = pool.health[0].ready_at;
-        pool.record_success(0);
+        pool.record_success(0, &timing(1024, 0));
 
         assert_eq!(pool.health[0].failures, 1);
         assert_eq!(pool.health[0].ready_at, ready_at);
         assert_eq!(pool.health[0].in_flight, 0);
     }
+
+    fn timing(bytes: u64, latency_ms: u64) -> AttemptTiming {
+        AttemptTiming {
+            bytes,
+            latency: Duration::from_millis(latency_ms),
+            transfer: Duration::from_secs(1),
+        }
+    }
+
+    #[test]
+    fn smooths_throughput_and_latency_per_source() {
+        let mut pool = SourcePool::new(Vec::new(), Duration::ZERO);
+        pool.health.push(Health {
+            in_flight: 2,
+            ..Health::new(Instant::now())
+        });
+
+        pool.record_success(0, &timing(1000, 100));
+        assert_eq!(
+            pool.estimate(0),
+            Some(SourceEstimate {
+                throughput: 1000.0,
+                latency: Duration::from_millis(100),
+            })
+        );
+        pool.record_success(0, &timing(2000, 200));
+        let estimate = pool.estimate(0).expect("measured source");
+        assert!((estimate.throughput - 1300.0).abs() < 1e-6);
+        assert!((estimate.latency.as_secs_f64() - 0.13).abs() < 1e-6);
+    }
+
+    #[test]
+    fn weights_sources_by_expected_completion_time() {
+        let mut pool = measured_pool(&[Some(1000.0), Some(10_000.0)]);
+
+        // The fast mirror takes ranges until nine running ones make it no
+        // quicker than a single range on the slow mirror.
+        assert_eq!(picks(&mut pool, 10), [vec![1; 9], vec![0]].concat());
+    }
+
+    #[test]
+    fn probes_unmeasured_sources_as_if_they_were_the_fastest() {
+        let mut pool = measured_pool(&[Some(1000.0), None]);
+
+        assert_eq!(picks(&mut pool, 3), vec![0, 1, 0]);
+    }
 }
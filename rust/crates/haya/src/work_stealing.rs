@@ -0,0 +1,148 @@
+use std::sync::{Arc, Mutex, MutexGuard};
+
+use crate::{ByteRange, DownloadError};
+
+/// Streams each range as one region and lets idle workers split the slowest.
+///
+/// New work is cut into one region per idle worker instead of fixed blocks,
+/// so a good connection streams a long region with a single request. Once
+/// nothing is left to request, a worker that would otherwise sit idle takes
+/// the back half of the unreceived part of the region expected to finish
+/// last, and the worker streaming it stops at the split. A slow source thus
+/// loses its remaining bytes to faster ones as soon as a worker frees up,
+/// instead of only after it times out. Each half of a split keeps at least
+/// `min_split` bytes. A configured `AdaptiveBlockSize` still caps each range.
+#[derive(Clone, Debug, PartialEq)]
+pub struct WorkStealing {
+    pub min_split: u64,
+}
+
+impl WorkStealing {
+    pub const DEFAULT_MIN_SPLIT: u64 = 256 * 1024;
+
+    pub fn new() -> Self {
+        Self {
+            min_split: Self::DEFAULT_MIN_SPLIT,
+        }
+    }
+
+    pub(crate) fn validate(&self) -> Result<(), DownloadError> {
+        if self.min_split == 0 {
+            return Err(DownloadError::InvalidSpec(
+                "work stealing min_split must be positive".into(),
+            ));
+        }
+        Ok(())
+    }
+}
+
+impl Default for WorkStealing {
+    fn default() -> Self {
+        Self::new()
+    }
+}
+
+/// The part of a range one attempt still streams, shared with the scheduler
+/// so that it can move the end forward.
+#[derive(Debug)]
+pub(crate) struct Region {
+    start: u64,
+    state: Mutex<RegionState>,
+}
+
+#[derive(Debug)]
+struct RegionState {
+    end: u64,
+    received: u64,
+}
+
+impl Region {
+    pub fn new(range: ByteRange) -> Arc<Self> {
+        Arc::new(Self {
+            start: range.start,
+            state: Mutex::new(RegionState {
+                end: range.end,
+                received: 0,
+            }),
+        })
+    }
+
+    pub fn end(&self) -> u64 {
+        self.state().end
+    }
+
+    pub fn received(&self) -> u64 {
+        self.state().received
+    }
+
+    /// Bytes the region still expects.
+    pub fn remaining(&self) -> u64 {
+        let state = self.state();
+        state.end - self.start - state.received
+    }
+
+    /// Accepts up to `len` more bytes and returns how many still belong to the region.
+    pub fn accept(&self, len: usize) -> usize {
+        let mut state = self.state();
+        let room = state.end - self.start - state.received;
+        let accepted = room.min(len as u64);
+        state.received += accepted;
+        accepted as usize
+    }
+
+    /// Moves the end back to the page-aligned middle of the unreceived part
+    /// and returns the range cut off, unless either half would be shorter
+    /// than `min_split`.
+    pub fn split(&self, page_size: u64, min_split: u64) -> Option<ByteRange> {
+        let mut state = self.state();
+        let received_end = self.start + state.received;
+        let remaining = state.end - received_end;
+        let middle = received_end + remaining / 2;
+        let middle = self.start + (middle - self.start).div_ceil(page_size) * page_size;
+        if middle - received_end < min_split || state.end.saturating_sub(middle) < min_split {
+            return None;
+        }
+        let stolen = ByteRange {
+            start: middle,
+            end: state.end,
+        };
+        state.end = middle;
+        Some(stolen)
+    }
+
+    fn state(&self) -> MutexGuard<'_, RegionState> {
+        self.state.lock().expect("region lock poisoned")
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn splits_the_unreceived_part_at_a_page_boundary() {
+        let region = Region::new(ByteRange::new(100, 1100).expect("valid range"));
+        assert_eq!(region.accept(300), 300);
+
+        let stolen = region.split(64, 64).expect("both halves are large enough");
+
+        // The unreceived part 400..1100 splits at 750, rounded up to 100 + 11 pages.
+        assert_eq!(stolen, ByteRange::new(804, 1100).expect("valid range"));
+        assert_eq!(region.end(), 804);
+        assert_eq!(region.remaining(), 404);
+        assert_eq!(region.accept(500), 404);
+        assert_eq!(region.accept(1), 0);
+        assert_eq!(region.received(), 704);
+    }
+
+    #[test]
+    fn keeps_halves_shorter_than_the_minimum_whole() {
+        let region = Region::new(ByteRange::new(0, 1000).expect("valid range"));
+        assert_eq!(region.accept(700), 700);
+
+        assert_eq!(region.split(64, 200), None);
+        assert_eq!(region.end(), 1000);
+        assert!(region.split(8, 100).is_some());
+        assert!(WorkStealing { min_split: 0 }.validate().is_err());
+    }
+}
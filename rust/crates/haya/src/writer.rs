@@ -0,0 +1,143 @@
+use std::{
+    fs::File,
+    io::{self, IoSlice, Read, Seek, SeekFrom, Write},
+    thread,
+};
+
+use bytes::Bytes;
+use tokio::sync::{mpsc, oneshot};
+
+/// Operations that may wait for the writer thread before callers block.
+const WRITER_QUEUE_DEPTH: usize = 4;
+/// Most slices handed to one vectored write; Linux rejects more than 1024.
+const MAX_WRITE_SLICES: usize = 1024;
+
+type Job = Box<dyn FnOnce(&mut File) + Send>;
+
+/// A file owned by one dedicated thread that performs its I/O in order.
+///
+/// Unlike `tokio::fs::File`, writes neither copy the data into an
+/// intermediate buffer nor occupy the shared blocking pool, so many sinks
+/// committing at once do not queue behind each other's disk I/O.
+pub(crate) struct WriterThread {
+    jobs: mpsc::Sender<Job>,
+    finished: oneshot::Receiver<()>,
+}
+
+impl WriterThread {
+    pub fn spawn(mut file: File) -> io::Result<Self> {
+        let (jobs, mut receiver) = mpsc::channel::<Job>(WRITER_QUEUE_DEPTH);
+        let (finished_sender, finished) = oneshot::channel();
+        thread::Builder::new()
+            .name("haya-writer".into())
+            .spawn(move || {
+                while let Some(job) = receiver.blocking_recv() {
+                    job(&mut file);
+                }
+                drop(file);
+                let _ = finished_sender.send(());
+            })?;
+        Ok(Self { jobs, finished })
+    }
+
+    /// Writes `chunks` contiguously from `offset` with vectored writes.
+    pub async fn write_at(&self, offset: u64, chunks: Vec<Bytes>) -> io::Result<()> {
+        self.run(move |file| write_chunks_at(file, offset, &chunks))
+            .await
+    }
+
+    pub async fn read_exact_at(&self, offset: u64, len: usize) -> io::Result<Vec<u8>> {
+        self.run(move |file| {
+            let mut data = vec![0; len];
+            file.seek(SeekFrom::Start(offset))?;
+            file.read_exact(&mut data)?;
+            Ok(data)
+        })
+        .await
+    }
+
+    pub async fn set_len(&self, len: u64) -> io::Result<()> {
+        self.run(move |file| file.set_len(len)).await
+    }
+
+    pub async fn sync_data(&self) -> io::Result<()> {
+        self.run(|file| file.sync_data()).await
+    }
+
+    pub async fn sync_all(&self) -> io::Result<()> {
+        self.run(|file| file.sync_all()).await
+    }
+
+    /// Stops the thread once queued work is done and waits for it to close
+    /// the file.
+    pub async fn close(self) {
+        drop(self.jobs);
+        let _ = self.finished.await;
+    }
+
+    async fn run<T: Send + 'static>(
+        &self,
+        operation: impl FnOnce(&mut File) -> io::Result<T> + Send + 'static,
+    ) -> io::Result<T> {
+        let (reply, result) = oneshot::channel();
+        let job: Job = Box::new(move |file| {
+            let _ = reply.send(operation(file));
+        });
+        self.jobs
+            .send(job)
+            .await
+            .map_err(|_| io::Error::other("file writer thread has stopped"))?;
+        result
+            .await
+            .map_err(|_| io::Error::other("file writer thread has stopped"))?
+    }
+}
+
+fn write_chunks_at(file: &mut File, offset: u64, chunks: &[Bytes]) -> io::Result<()> {
+    file.seek(SeekFrom::Start(offset))?;
+    let mut slices = chunks
+        .iter()
+        .filter(|chunk| !chunk.is_empty())
+        .map(|chunk| IoSlice::new(chunk))
+        .collect::<Vec<_>>();
+    let mut remaining = &mut slices[..];
+    while !remaining.is_empty() {
+        let count = remaining.len().min(MAX_WRITE_SLICES);
+        match file.write_vectored(&remaining[..count]) {
+            Ok(0) => return Err(io::ErrorKind::WriteZero.into()),
+            Ok(written) => IoSlice::advance_slices(&mut remaining, written),
+            Err(error) if error.kind() == io::ErrorKind::Interrupted => {}
+            Err(error) => return Err(error),
+        }
+    }
+    Ok(())
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[tokio::test]
+    async fn writes_more_slices_than_one_vectored_write_accepts() {
+        let temporary = tempfile::NamedTempFile::new().expect("temporary file");
+        let writer =
+            WriterThread::spawn(temporary.reopen().expect("reopen file")).expect("spawn writer");
+        let chunks = (0..MAX_WRITE_SLICES + 7)
+            .map(|index| Bytes::from(vec![(index % 251) as u8; 3]))
+            .collect::<Vec<_>>();
+        let expected = chunks.concat();
+
+        writer.write_at(5, chunks).await.expect("write chunks");
+        let written = writer
+            .read_exact_at(5, expected.len())
+            .await
+            .expect("read back");
+        writer.close().await;
+
+        assert_eq!(written, expected);
+        assert_eq!(
+            std::fs::metadata(temporary.path()).expect("stat").len(),
+            5 + expected.len() as u64
+        );
+    }
+}
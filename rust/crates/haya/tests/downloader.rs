@@ -11,9 +11,13 @@ use async_trait::async_trait;
 use bytes::Bytes;
 use futures_util::stream;
 use haya::{
-    ByteRange, ByteStream, CommitSink, DownloadError, DownloadSnapshot, DownloadSpec, Downloader,
-    ProgressSink, RangeSource, SinkError, SourceError, SourceErrorKind,
+    AdaptiveBlockSize, AdaptiveConcurrency, ByteRange, ByteStream, CommitSink, ContentDigest,
+    DownloadError, DownloadSnapshot, DownloadSpec, Downloader, HashAlgorithm, HedgePolicy,
+    OpenedRange, ProgressSink, RangeSource, SinkError, SourceError, SourceErrorKind,
+    SourceHealthMemory,
+    file::{FileOpenMode, FileSink, FileSinkOptions, PositionalFileSink, ResourceIdentity},
 };
+use sha2::{Digest, Sha256};
 use tokio_util::sync::CancellationToken;
 
 #[derive(Default)]
@@ -455,6 +459,218 @@ async fn waits_for_a_failed_source_cooldown() {
     );
 }
 
+#[tokio::test]
+async fn adaptive_concurrency_starts_small_and_halves_when_throttled() {
+    let expected = payload(8 * 1024);
+    let mut source = MemorySource::new(expected.clone());
+    source.failures.get_mut().expect("failure map").insert(0, 1);
+    source.failure_kinds.insert(0, SourceErrorKind::Throttled);
+    let sink = Arc::new(MemorySink::default());
+    let progress = Arc::new(RecordedProgress::default());
+    let mut download_spec = spec(expected.len() as u64, 1024);
+    download_spec.block_size = 1024;
+    download_spec.workers = 4;
+
+    Downloader::new(download_spec, vec![Arc::new(source)], sink.clone())
+        .expect("valid downloader")
+        .with_progress_sink(progress.clone())
+        .with_adaptive_concurrency(AdaptiveConcurrency {
+            initial_workers: 2,
+            min_workers: 1,
+            sample_interval: Duration::from_secs(60),
+        })
+        .run()
+        .await
+        .expect("throttled range is retried");
+
+    assert_eq!(sink.bytes(), expected);
+    let snapshots = progress.snapshots.lock().expect("progress lock poisoned");
+    assert_eq!(snapshots[0].concurrency, 2);
+    assert!(snapshots.iter().all(|snapshot| snapshot.in_flight <= 2));
+    assert_eq!(snapshots.last().expect("final snapshot").concurrency, 1);
+}
+
+#[tokio::test]
+async fn adaptive_block_size_coalesces_queued_ranges_for_a_fast_source() {
+    let expected = payload(16 * 1024);
+    let source = Arc::new(MemorySource::new(expected.clone()));
+    let sink = Arc::new(MemorySink::default());
+    let mut download_spec = spec(expected.len() as u64, 1024);
+    download_spec.block_size = 1024;
+    download_spec.window_pages = 16;
+    download_spec.workers = 1;
+
+    Downloader::new(download_spec, vec![source.clone()], sink.clone())
+        .expect("valid downloader")
+        .with_adaptive_block_size(AdaptiveBlockSize::new())
+        .run()
+        .await
+        .expect("download succeeds");
+
+    assert_eq!(sink.bytes(), expected);
+    assert_eq!(
+        source.requests(),
+        vec![
+            ByteRange::new(0, 1024).expect("valid range"),
+            ByteRange::new(1024, 16 * 1024).expect("valid range"),
+        ]
+    );
+}
+
+#[tokio::test]
+async fn rejects_an_adaptive_block_size_without_a_valid_range() {
+    let expected = payload(1024);
+    let result = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![Arc::new(MemorySource::new(expected))],
+        Arc::new(MemorySink::default()),
+    )
+    .expect("valid downloader")
+    .with_adaptive_block_size(AdaptiveBlockSize {
+        min_block_size: 4096,
+        max_block_size: 1024,
+        ..AdaptiveBlockSize::new()
+    })
+    .run()
+    .await;
+
+    assert!(matches!(result, Err(DownloadError::InvalidSpec(_))));
+}
+
+#[tokio::test]
+async fn hedges_a_stalled_window_head_on_another_source() {
+    let expected = payload(8 * 1024);
+    let mut stalled = MemorySource::new(expected.clone());
+    stalled.pending_starts.insert(0);
+    let healthy = Arc::new(MemorySource::new(expected.clone()));
+    let sink = Arc::new(MemorySink::default());
+    let progress = Arc::new(RecordedProgress::default());
+    let mut download_spec = spec(expected.len() as u64, 1024);
+    download_spec.block_size = 1024;
+    download_spec.workers = 2;
+    download_spec.attempt_timeout = Duration::from_secs(30);
+
+    let report = tokio::time::timeout(
+        Duration::from_secs(5),
+        Downloader::new(
+            download_spec,
+            vec![Arc::new(stalled), healthy.clone()],
+            sink.clone(),
+        )
+        .expect("valid downloader")
+        .with_progress_sink(progress.clone())
+        .with_hedging(HedgePolicy {
+            percentile: 0.9,
+            min_delay: Duration::from_millis(10),
+            tail_ranges: 2,
+        })
+        .run(),
+    )
+    .await
+    .expect("the hedge finishes long before the attempt timeout")
+    .expect("download succeeds");
+
+    assert_eq!(sink.bytes(), expected);
+    assert_eq!(report.hedges_issued, 1);
+    assert_eq!(report.hedges_won, 1);
+    assert!(
+        healthy
+            .requests()
+            .contains(&ByteRange::new(0, 1024).expect("valid range"))
+    );
+    let snapshots = progress.snapshots.lock().expect("progress lock poisoned");
+    let last = snapshots.last().expect("final snapshot");
+    assert_eq!((last.hedges_issued, last.hedges_won), (1, 1));
+    assert_eq!(last.sources.len(), 2);
+    let carried: u64 = last
+        .sources
+        .iter()
+        .map(|source| source.received_bytes)
+        .sum();
+    assert_eq!(carried, expected.len() as u64);
+    assert!(last.sources[1].throughput.is_some());
+}
+
+#[tokio::test]
+async fn a_shared_health_memory_carries_cooldowns_into_later_downloads() {
+    let expected = payload(4 * 1024);
+    let memory = SourceHealthMemory::default();
+    let keys = || vec!["flaky.example".to_owned(), "steady.example".to_owned()];
+    let mut download_spec = spec(expected.len() as u64, 1024);
+    download_spec.source_cooldown = Duration::from_secs(30);
+
+    let mut flaky = MemorySource::new(expected.clone());
+    flaky.failures.get_mut().expect("failure map").insert(0, 1);
+    Downloader::new(
+        download_spec.clone(),
+        vec![
+            Arc::new(flaky),
+            Arc::new(MemorySource::new(expected.clone())),
+        ],
+        Arc::new(MemorySink::default()),
+    )
+    .expect("valid downloader")
+    .with_health_memory(memory.clone(), keys())
+    .run()
+    .await
+    .expect("the steady source finishes the first download");
+
+    let recovered = Arc::new(MemorySource::new(expected.clone()));
+    let sink = Arc::new(MemorySink::default());
+    Downloader::new(
+        download_spec,
+        vec![
+            recovered.clone(),
+            Arc::new(MemorySource::new(expected.clone())),
+        ],
+        sink.clone(),
+    )
+    .expect("valid downloader")
+    .with_health_memory(memory, keys())
+    .run()
+    .await
+    .expect("second download succeeds");
+
+    assert_eq!(sink.bytes(), expected);
+    assert!(recovered.requests().is_empty());
+}
+
+#[tokio::test]
+async fn rejects_a_health_memory_without_one_key_per_source() {
+    let expected = payload(1024);
+    let result = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![Arc::new(MemorySource::new(expected))],
+        Arc::new(MemorySink::default()),
+    )
+    .expect("valid downloader")
+    .with_health_memory(SourceHealthMemory::default(), Vec::new())
+    .run()
+    .await;
+
+    assert!(matches!(result, Err(DownloadError::InvalidSpec(_))));
+}
+
+#[tokio::test]
+async fn rejects_an_adaptive_floor_above_the_initial_concurrency() {
+    let expected = payload(1024);
+    let result = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![Arc::new(MemorySource::new(expected))],
+        Arc::new(MemorySink::default()),
+    )
+    .expect("valid downloader")
+    .with_adaptive_concurrency(AdaptiveConcurrency {
+        initial_workers: 1,
+        min_workers: 2,
+        sample_interval: Duration::from_secs(1),
+    })
+    .run()
+    .await;
+
+    assert!(matches!(result, Err(DownloadError::InvalidSpec(_))));
+}
+
 #[tokio::test]
 async fn rejects_a_cooldown_that_cannot_fit_in_an_instant() {
     let expected = payload(1024);
@@ -682,6 +898,65 @@ async fn resumes_from_the_committed_prefix() {
     assert_eq!(report.received_bytes, (expected.len() - prefix) as u64);
 }
 
+#[tokio::test]
+async fn reads_an_opened_first_range_instead_of_requesting_it() {
+    let expected = payload(8 * 1024 + 7);
+    let first = Arc::new(MemorySource::new(expected.clone()));
+    let second = Arc::new(MemorySource::new(expected.clone()));
+    let sink = Arc::new(MemorySink::default());
+    let opened = OpenedRange {
+        source: 1,
+        range: ByteRange::new(0, 2048).expect("valid range"),
+        stream: Box::pin(stream::iter([Ok(expected.slice(..2048))])),
+        latency: Duration::from_millis(5),
+    };
+
+    let report = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![first.clone(), second.clone()],
+        sink.clone(),
+    )
+    .expect("valid downloader")
+    .with_opened_range(opened)
+    .run()
+    .await
+    .expect("download succeeds");
+
+    assert_eq!(sink.bytes(), expected);
+    assert_eq!(report.received_bytes, expected.len() as u64);
+    let requests = [first.requests(), second.requests()].concat();
+    assert!(requests.iter().all(|range| range.start >= 2048));
+    assert_eq!(report.attempts, requests.len() + 1);
+}
+
+#[tokio::test]
+async fn drops_an_opened_range_that_precedes_the_committed_prefix() {
+    let expected = payload(8 * 1024 + 7);
+    let prefix = 1237;
+    let source = Arc::new(MemorySource::new(expected.clone()));
+    let sink = Arc::new(MemorySink::with_bytes(&expected[..prefix]));
+    let opened = OpenedRange {
+        source: 0,
+        range: ByteRange::new(0, 2048).expect("valid range"),
+        stream: Box::pin(stream::pending()),
+        latency: Duration::ZERO,
+    };
+
+    Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![source.clone()],
+        sink.clone(),
+    )
+    .expect("valid downloader")
+    .with_opened_range(opened)
+    .run()
+    .await
+    .expect("resume succeeds");
+
+    assert_eq!(sink.bytes(), expected);
+    assert_eq!(source.requests()[0].start, prefix as u64);
+}
+
 #[tokio::test]
 async fn completes_an_already_finished_download_without_sources() {
     let expected = payload(3);
@@ -869,3 +1144,121 @@ async fn cancellation_wins_over_an_immediately_ready_final_block() {
     assert_eq!(sink.flushes.load(Ordering::Relaxed), 1);
     assert_eq!(sink.closes.load(Ordering::Relaxed), 0);
 }
+
+#[tokio::test]
+async fn a_resumed_download_reuses_pages_stored_by_a_cancelled_one() {
+    let expected = payload(8 * 1024);
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    let identity = ResourceIdentity::new(expected.len() as u64, Some("\"etag\"".into()));
+    let mut stalled = MemorySource::new(expected.clone());
+    stalled.pending_starts.insert(0);
+    let stalled = Arc::new(stalled);
+    let sink = FileSink::open_journaled(&path, FileOpenMode::Overwrite, identity.clone())
+        .await
+        .expect("open sink");
+    let progress = Arc::new(RecordedProgress::default());
+    let cancellation = CancellationToken::new();
+    let downloader = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![stalled],
+        Arc::new(sink),
+    )
+    .expect("valid downloader")
+    .with_progress_sink(progress.clone())
+    .with_cancellation_token(cancellation.clone());
+
+    let task = tokio::spawn(downloader.run());
+    tokio::time::timeout(Duration::from_secs(1), async {
+        while !progress
+            .snapshots
+            .lock()
+            .expect("progress lock poisoned")
+            .iter()
+            .any(|snapshot| snapshot.buffered_pages == 2)
+        {
+            tokio::time::sleep(Duration::from_millis(1)).await;
+        }
+    })
+    .await
+    .expect("the second range is buffered");
+    cancellation.cancel();
+    assert!(matches!(
+        task.await.expect("task joins"),
+        Err(DownloadError::Cancelled)
+    ));
+
+    let source = Arc::new(MemorySource::new(expected.clone()));
+    let options = FileSinkOptions {
+        hash: Some(HashAlgorithm::Sha256),
+        ..FileSinkOptions::default()
+    };
+    let sink =
+        FileSink::open_journaled_with(&path, FileOpenMode::ResumeFromLength, identity, options)
+            .await
+            .expect("reopen sink");
+    let report = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![source.clone()],
+        Arc::new(sink),
+    )
+    .expect("valid downloader")
+    .run()
+    .await
+    .expect("resumed download succeeds");
+
+    assert_eq!(report.committed_bytes, expected.len() as u64);
+    assert_eq!(report.received_bytes, 6 * 1024);
+    // The resumed prefix, the stored pages and the new ranges all count.
+    assert_eq!(
+        report.digest,
+        Some(ContentDigest {
+            algorithm: HashAlgorithm::Sha256,
+            value: Sha256::digest(&expected).to_vec(),
+        })
+    );
+    assert!(
+        source
+            .requests()
+            .iter()
+            .all(|range| range.end <= 2048 || range.start >= 4096)
+    );
+    assert_eq!(tokio::fs::read(&path).await.expect("read output"), expected);
+}
+
+#[tokio::test]
+async fn a_positional_sink_keeps_ranges_flowing_past_a_slow_head() {
+    let expected = payload(16 * 1024);
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    let mut source = MemorySource::new(expected.clone());
+    source.delays.insert(0, Duration::from_millis(200));
+    let source = Arc::new(source);
+    let sink = PositionalFileSink::open(
+        &path,
+        FileOpenMode::Overwrite,
+        ResourceIdentity::new(expected.len() as u64, None),
+    )
+    .await
+    .expect("open sink");
+    let downloader = Downloader::new(
+        spec(expected.len() as u64, 1024),
+        vec![source.clone()],
+        Arc::new(sink),
+    )
+    .expect("valid downloader");
+
+    let task = tokio::spawn(downloader.run());
+    tokio::time::timeout(Duration::from_millis(150), async {
+        // The ordered window ends at 4 KiB while the head is still pending.
+        while !source.requests().iter().any(|range| range.start >= 4096) {
+            tokio::time::sleep(Duration::from_millis(1)).await;
+        }
+    })
+    .await
+    .expect("dispatch passes the ordered window");
+    let report = task.await.expect("task joins").expect("download succeeds");
+
+    assert_eq!(report.committed_bytes, expected.len() as u64);
+    assert_eq!(tokio::fs::read(&path).await.expect("read output"), expected);
+}
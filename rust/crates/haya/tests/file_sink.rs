@@ -1,7 +1,10 @@
 use bytes::Bytes;
 use haya::{
-    CommitBatch, CommitSink,
-    file::{FileOpenMode, FileSink},
+    ByteRange, CommitBatch, CommitSink, HashAlgorithm,
+    file::{
+        FileBackend, FileOpenMode, FileSink, FileSinkOptions, PositionalFileSink, ResourceIdentity,
+        SyncPolicy, journaled_offset,
+    },
 };
 
 #[tokio::test]
@@ -128,3 +131,157 @@ async fn preserves_empty_append_behavior() {
     assert_eq!(sink.committed_offset().await.expect("offset"), 0);
     assert!(sink.append(1, Bytes::new()).await.is_err());
 }
+
+fn identity(validator: &str) -> ResourceIdentity {
+    ResourceIdentity::new(12, Some(validator.to_owned()))
+}
+
+#[tokio::test]
+async fn a_journal_resumes_the_prefix_and_stored_ranges_of_the_same_resource() {
+    resumes_the_prefix_and_stored_ranges(FileSinkOptions::default()).await;
+}
+
+#[tokio::test]
+async fn the_writer_thread_backend_appends_stores_and_resumes() {
+    resumes_the_prefix_and_stored_ranges(FileSinkOptions {
+        backend: FileBackend::WriterThread,
+        sync: SyncPolicy::OnClose,
+        hash: Some(HashAlgorithm::Sha256),
+    })
+    .await;
+}
+
+async fn resumes_the_prefix_and_stored_ranges(options: FileSinkOptions) {
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    let journal = directory.path().join("output.bin.haya");
+    let sink =
+        FileSink::open_journaled_with(&path, FileOpenMode::Overwrite, identity("\"v1\""), options)
+            .await
+            .expect("open sink");
+    sink.append_batch(
+        CommitBatch::new(0, vec![Bytes::from_static(b"a"), Bytes::from_static(b"bc")])
+            .expect("valid batch"),
+    )
+    .await
+    .expect("append prefix");
+    sink.store_batch(CommitBatch::new(6, vec![Bytes::from_static(b"ghi")]).expect("valid batch"))
+        .await
+        .expect("store range");
+    sink.close().await.expect("close sink");
+    assert!(journal.exists());
+    assert_eq!(journaled_offset(&path).await, 3);
+
+    let sink = FileSink::open_journaled_with(
+        &path,
+        FileOpenMode::ResumeFromLength,
+        identity("\"v1\""),
+        options,
+    )
+    .await
+    .expect("reopen sink");
+    let stored = ByteRange::new(6, 9).expect("valid range");
+    assert_eq!(sink.committed_offset().await.expect("offset"), 3);
+    assert_eq!(sink.stored_ranges().await.expect("stored ranges"), [stored]);
+    assert_eq!(
+        sink.read_stored(stored).await.expect("read stored"),
+        Bytes::from_static(b"ghi")
+    );
+    sink.append(3, Bytes::from_static(b"def"))
+        .await
+        .expect("append before the stored range");
+    sink.append(6, Bytes::from_static(b"ghijkl"))
+        .await
+        .expect("append over the stored range");
+    sink.close().await.expect("close sink");
+
+    assert_eq!(
+        tokio::fs::read(&path).await.expect("read output"),
+        b"abcdefghijkl"
+    );
+    assert!(!journal.exists());
+    assert_eq!(journaled_offset(&path).await, 0);
+    if options.hash.is_some() {
+        assert_eq!(
+            sink.digest()
+                .await
+                .expect("digest")
+                .map(|digest| digest.to_string()),
+            Some("sha256:d682ed4ca4d989c134ec94f1551e1ec580dd6d5a6ecde9f3d35e6e4a717fbde4".into())
+        );
+    }
+}
+
+#[tokio::test]
+async fn a_journal_for_another_resource_restarts_the_file() {
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    let sink = FileSink::open_journaled(&path, FileOpenMode::Overwrite, identity("\"v1\""))
+        .await
+        .expect("open sink");
+    sink.append(0, Bytes::from_static(b"old"))
+        .await
+        .expect("append prefix");
+    sink.close().await.expect("close sink");
+
+    let sink = FileSink::open_journaled(&path, FileOpenMode::ResumeFromLength, identity("\"v2\""))
+        .await
+        .expect("reopen sink");
+
+    assert_eq!(sink.committed_offset().await.expect("offset"), 0);
+    assert!(
+        sink.stored_ranges()
+            .await
+            .expect("stored ranges")
+            .is_empty()
+    );
+    assert!(
+        tokio::fs::read(&path)
+            .await
+            .expect("read output")
+            .is_empty()
+    );
+}
+
+#[tokio::test]
+async fn a_positional_sink_writes_ranges_out_of_order_and_resumes_them() {
+    let directory = tempfile::tempdir().expect("temporary directory");
+    let path = directory.path().join("output.bin");
+    let journal = directory.path().join("output.bin.haya");
+    let sink = PositionalFileSink::open(&path, FileOpenMode::Overwrite, identity("\"v1\""))
+        .await
+        .expect("open sink");
+    assert_eq!(tokio::fs::metadata(&path).await.expect("stat").len(), 12);
+    sink.write_at(6, Bytes::from_static(b"ghi"))
+        .await
+        .expect("write a later range");
+    sink.write_at(0, Bytes::from_static(b"abc"))
+        .await
+        .expect("write the head");
+    assert_eq!(sink.committed_offset().await.expect("offset"), 3);
+    sink.close().await.expect("close sink");
+
+    let sink = PositionalFileSink::open(&path, FileOpenMode::ResumeFromLength, identity("\"v1\""))
+        .await
+        .expect("reopen sink");
+    assert_eq!(sink.committed_offset().await.expect("offset"), 3);
+    assert_eq!(
+        sink.stored_ranges().await.expect("stored ranges"),
+        [ByteRange::new(6, 9).expect("valid range")]
+    );
+    sink.write_at(9, Bytes::from_static(b"jkl"))
+        .await
+        .expect("write the tail");
+    sink.write_at(3, Bytes::from_static(b"def"))
+        .await
+        .expect("fill the gap");
+    assert_eq!(sink.committed_offset().await.expect("offset"), 12);
+    assert!(sink.write_at(10, Bytes::from_static(b"xyz")).await.is_err());
+    sink.close().await.expect("close sink");
+
+    assert_eq!(
+        tokio::fs::read(&path).await.expect("read output"),
+        b"abcdefghijkl"
+    );
+    assert!(!journal.exists());
+}
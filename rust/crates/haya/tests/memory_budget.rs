@@ -0,0 +1,190 @@
+use std::{
+    sync::{
+        Arc, Mutex,
+        atomic::{AtomicUsize, Ordering},
+    },
+    time::Duration,
+};
+
+use async_trait::async_trait;
+use bytes::Bytes;
+use futures_util::stream;
+use haya::{
+    ByteRange, ByteStream, CommitSink, DownloadSpec, Downloader, MemoryBudget, RangeSource,
+    SinkError, SourceError,
+};
+use tokio::sync::Notify;
+
+#[derive(Default)]
+struct MemorySink(Mutex<Vec<u8>>);
+
+#[async_trait]
+impl CommitSink for MemorySink {
+    async fn committed_offset(&self) -> Result<u64, SinkError> {
+        Ok(self.0.lock().expect("sink lock poisoned").len() as u64)
+    }
+
+    async fn append(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        let mut bytes = self.0.lock().expect("sink lock poisoned");
+        if bytes.len() as u64 != offset {
+            return Err(SinkError::new("non-contiguous append"));
+        }
+        bytes.extend_from_slice(&data);
+        Ok(())
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        Ok(())
+    }
+}
+
+#[derive(Default)]
+struct Activity {
+    active: AtomicUsize,
+    peak: AtomicUsize,
+    total: AtomicUsize,
+    changed: Notify,
+}
+
+impl Activity {
+    fn enter(self: &Arc<Self>) -> ActivityGuard {
+        let active = self.active.fetch_add(1, Ordering::SeqCst) + 1;
+        self.total.fetch_add(1, Ordering::SeqCst);
+        self.peak.fetch_max(active, Ordering::SeqCst);
+        self.changed.notify_waiters();
+        ActivityGuard(self.clone())
+    }
+
+    async fn wait_for_total(&self, expected: usize) {
+        loop {
+            let notified = self.changed.notified();
+            if self.total.load(Ordering::SeqCst) >= expected {
+                return;
+            }
+            notified.await;
+        }
+    }
+}
+
+struct ActivityGuard(Arc<Activity>);
+
+impl Drop for ActivityGuard {
+    fn drop(&mut self) {
+        self.0.active.fetch_sub(1, Ordering::SeqCst);
+        self.0.changed.notify_waiters();
+    }
+}
+
+struct TrackedSource {
+    payload: Bytes,
+    activity: Arc<Activity>,
+    release: Arc<Notify>,
+}
+
+#[async_trait]
+impl RangeSource for TrackedSource {
+    async fn open(&self, range: ByteRange) -> Result<ByteStream, SourceError> {
+        let guard = self.activity.enter();
+        self.release.notified().await;
+        let bytes = self.payload.slice(range.start as usize..range.end as usize);
+        Ok(Box::pin(stream::once(async move {
+            drop(guard);
+            Ok(bytes)
+        })))
+    }
+}
+
+fn spec(size: usize, workers: usize) -> DownloadSpec {
+    let mut spec = DownloadSpec::new(size as u64);
+    spec.page_size = 1024;
+    spec.block_size = 1024;
+    spec.window_pages = 16;
+    spec.workers = workers;
+    spec.attempt_timeout = Duration::from_secs(2);
+    spec
+}
+
+#[test]
+fn rejects_an_empty_budget() {
+    assert!(MemoryBudget::new(0).is_err());
+}
+
+#[tokio::test]
+async fn bounds_the_ranges_of_two_downloaders_and_admits_each_head_range() {
+    let activity = Arc::new(Activity::default());
+    let release = Arc::new(Notify::new());
+    let budget = MemoryBudget::new(3 * 1024).expect("valid budget");
+    let payload = Bytes::from(vec![7; 8 * 1024]);
+    let source = Arc::new(TrackedSource {
+        payload: payload.clone(),
+        activity: activity.clone(),
+        release: release.clone(),
+    });
+    let start = |sink: Arc<MemorySink>| {
+        tokio::spawn(
+            Downloader::new(spec(payload.len(), 8), vec![source.clone()], sink)
+                .expect("valid downloader")
+                .with_memory_budget(budget.clone())
+                .run(),
+        )
+    };
+    let first_sink = Arc::new(MemorySink::default());
+    let second_sink = Arc::new(MemorySink::default());
+    let first = start(first_sink.clone());
+    let second = start(second_sink.clone());
+
+    // Three ranges fill the budget; the other download's head range is admitted over it.
+    activity.wait_for_total(4).await;
+    tokio::time::sleep(Duration::from_millis(50)).await;
+    assert_eq!(activity.active.load(Ordering::SeqCst), 4);
+    assert_eq!(budget.used(), 4 * 1024);
+
+    while !first.is_finished() || !second.is_finished() {
+        release.notify_waiters();
+        tokio::task::yield_now().await;
+    }
+    first.await.expect("first joins").expect("first succeeds");
+    second
+        .await
+        .expect("second joins")
+        .expect("second succeeds");
+    assert_eq!(*first_sink.0.lock().expect("sink lock poisoned"), payload);
+    assert_eq!(*second_sink.0.lock().expect("sink lock poisoned"), payload);
+    assert!(activity.peak.load(Ordering::SeqCst) <= 3 + 2);
+    assert_eq!(budget.used(), 0);
+}
+
+#[tokio::test]
+async fn a_budget_smaller_than_a_range_still_downloads_one_range_at_a_time() {
+    let activity = Arc::new(Activity::default());
+    let release = Arc::new(Notify::new());
+    let budget = MemoryBudget::new(100).expect("valid budget");
+    let payload = Bytes::from(vec![9; 4 * 1024]);
+    let sink = Arc::new(MemorySink::default());
+    let download = tokio::spawn(
+        Downloader::new(
+            spec(payload.len(), 4),
+            vec![Arc::new(TrackedSource {
+                payload: payload.clone(),
+                activity: activity.clone(),
+                release: release.clone(),
+            })],
+            sink.clone(),
+        )
+        .expect("valid downloader")
+        .with_memory_budget(budget.clone())
+        .run(),
+    );
+
+    while !download.is_finished() {
+        release.notify_waiters();
+        tokio::task::yield_now().await;
+    }
+    download
+        .await
+        .expect("download joins")
+        .expect("download succeeds");
+    assert_eq!(*sink.0.lock().expect("sink lock poisoned"), payload);
+    assert_eq!(activity.peak.load(Ordering::SeqCst), 1);
+    assert_eq!(budget.used(), 0);
+}
@@ -0,0 +1,173 @@
+use std::{
+    sync::{Arc, Mutex},
+    time::{Duration, Instant},
+};
+
+use async_trait::async_trait;
+use bytes::Bytes;
+use futures_util::stream;
+use haya::{
+    ByteRange, ByteStream, CommitSink, DownloadSnapshot, DownloadSpec, Downloader, ProgressSink,
+    RangeSource, RateLimit, SinkError, SourceError,
+};
+use tokio::sync::Notify;
+
+#[derive(Default)]
+struct MemorySink(Mutex<Vec<u8>>);
+
+#[async_trait]
+impl CommitSink for MemorySink {
+    async fn committed_offset(&self) -> Result<u64, SinkError> {
+        Ok(self.0.lock().expect("sink lock poisoned").len() as u64)
+    }
+
+    async fn append(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        let mut bytes = self.0.lock().expect("sink lock poisoned");
+        if bytes.len() as u64 != offset {
+            return Err(SinkError::new("non-contiguous append"));
+        }
+        bytes.extend_from_slice(&data);
+        Ok(())
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        Ok(())
+    }
+}
+
+struct MemorySource(Bytes);
+
+#[async_trait]
+impl RangeSource for MemorySource {
+    async fn open(&self, range: ByteRange) -> Result<ByteStream, SourceError> {
+        let bytes = self.0.slice(range.start as usize..range.end as usize);
+        Ok(Box::pin(stream::once(async move { Ok(bytes) })))
+    }
+}
+
+#[derive(Default)]
+struct RecordedProgress {
+    rate_limited: Mutex<Vec<bool>>,
+    changed: Notify,
+}
+
+impl RecordedProgress {
+    async fn wait_until_rate_limited(&self) {
+        loop {
+            let notified = self.changed.notified();
+            if self
+                .rate_limited
+                .lock()
+                .expect("progress lock poisoned")
+                .contains(&true)
+            {
+                return;
+            }
+            notified.await;
+        }
+    }
+}
+
+impl ProgressSink for RecordedProgress {
+    fn update(&self, snapshot: DownloadSnapshot) {
+        self.rate_limited
+            .lock()
+            .expect("progress lock poisoned")
+            .push(snapshot.rate_limited);
+        self.changed.notify_waiters();
+    }
+}
+
+fn spec(size: usize, workers: usize) -> DownloadSpec {
+    let mut spec = DownloadSpec::new(size as u64);
+    spec.page_size = 1024;
+    spec.block_size = 1024;
+    spec.window_pages = 16;
+    spec.workers = workers;
+    spec.attempt_timeout = Duration::from_secs(2);
+    spec
+}
+
+fn downloader(payload: &Bytes, spec: DownloadSpec, rate_limit: RateLimit) -> Downloader {
+    Downloader::new(
+        spec,
+        vec![Arc::new(MemorySource(payload.clone()))],
+        Arc::new(MemorySink::default()),
+    )
+    .expect("valid downloader")
+    .with_rate_limit(rate_limit)
+}
+
+#[test]
+fn rejects_a_zero_rate() {
+    assert!(RateLimit::new(0).is_err());
+    let limit = RateLimit::new(1024).expect("valid limit");
+    assert!(limit.set_bytes_per_second(0).is_err());
+    assert_eq!(limit.bytes_per_second(), 1024);
+}
+
+#[tokio::test]
+async fn bounds_the_combined_rate_of_two_downloaders() {
+    let limit = RateLimit::new(32 * 1024).expect("valid limit");
+    let payload = Bytes::from(vec![9; 24 * 1024]);
+    let started = Instant::now();
+
+    let first = tokio::spawn(downloader(&payload, spec(payload.len(), 4), limit.clone()).run());
+    let second = tokio::spawn(downloader(&payload, spec(payload.len(), 4), limit).run());
+    first.await.expect("first joins").expect("first succeeds");
+    second
+        .await
+        .expect("second joins")
+        .expect("second succeeds");
+
+    // 48 KiB against a 32 KiB burst needs at least another half second.
+    assert!(started.elapsed() >= Duration::from_millis(450));
+}
+
+#[tokio::test]
+async fn raising_the_rate_wakes_waiting_attempts() {
+    let limit = RateLimit::new(1024).expect("valid limit");
+    let payload = Bytes::from(vec![4; 16 * 1024]);
+    let progress = Arc::new(RecordedProgress::default());
+    let transfer = tokio::spawn(
+        downloader(&payload, spec(payload.len(), 2), limit.clone())
+            .with_progress_sink(progress.clone())
+            .run(),
+    );
+
+    tokio::time::timeout(Duration::from_secs(1), progress.wait_until_rate_limited())
+        .await
+        .expect("the snapshot reports the throttled attempt");
+    limit
+        .set_bytes_per_second(64 * 1024 * 1024)
+        .expect("valid rate");
+    tokio::time::timeout(Duration::from_secs(1), transfer)
+        .await
+        .expect("the raised rate applies to waiting attempts")
+        .expect("transfer joins")
+        .expect("transfer succeeds");
+    assert_eq!(
+        progress
+            .rate_limited
+            .lock()
+            .expect("progress lock poisoned")
+            .last(),
+        Some(&false)
+    );
+}
+
+#[tokio::test]
+async fn waiting_on_the_rate_limit_does_not_consume_attempt_timeout() {
+    let limit = RateLimit::new(4 * 1024).expect("valid limit");
+    let payload = Bytes::from(vec![6; 6 * 1024]);
+    let mut download_spec = spec(payload.len(), 1);
+    download_spec.max_attempts = 1;
+    download_spec.attempt_timeout = Duration::from_millis(100);
+
+    let report = downloader(&payload, download_spec, limit)
+        .run()
+        .await
+        .expect("throttled attempts succeed");
+
+    assert_eq!(report.attempts, 6);
+}
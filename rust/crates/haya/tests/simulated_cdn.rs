@@ -0,0 +1,680 @@
+//! Downloads from a simulated CDN whose mirrors follow a fault script, on
+//! tokio's paused clock.
+//!
+//! Each mirror serves an in-memory payload with its own latency and a link
+//! bandwidth shared by its open requests. Episodes of the script make the
+//! mirror slow down, reset bodies halfway, end bodies early or answer with an
+//! HTTP status for a span of virtual time, after which it recovers. Faults are
+//! decided when a request opens. Statuses map to error kinds the way
+//! `haya-http` maps them. Since no real time passes, a sweep over a thousand
+//! seeded scenarios runs in seconds and reports their tail latency and wasted
+//! bytes.
+
+use std::{
+    collections::VecDeque,
+    sync::{
+        Arc, Mutex,
+        atomic::{AtomicU64, AtomicUsize, Ordering},
+    },
+    time::Duration,
+};
+
+use async_trait::async_trait;
+use bytes::Bytes;
+use futures_util::stream;
+use haya::{
+    ByteRange, ByteStream, CommitSink, DownloadError, DownloadSpec, Downloader, JointSchedule,
+    RangeSource, SinkError, SourceError, SourceErrorKind, WorkStealing, WorkerLimit,
+};
+use tokio::time::Instant;
+
+const PAGE_SIZE: usize = 16 * 1024;
+const CHUNK_SIZE: usize = 8 * 1024;
+
+#[derive(Clone, Copy, Debug)]
+enum Fault {
+    /// Delays the first byte and divides the link bandwidth.
+    Slowdown {
+        extra_latency: Duration,
+        bandwidth_divisor: u64,
+    },
+    /// Sends half of the body, then fails like a reset connection.
+    ResetMidBody,
+    /// Sends half of the body, then ends it cleanly.
+    ShortRead,
+    /// Answers with an HTTP status instead of 206.
+    Status(u16),
+}
+
+#[derive(Clone, Debug)]
+struct Episode {
+    from: Duration,
+    until: Duration,
+    fault: Fault,
+}
+
+#[derive(Clone, Debug)]
+struct Mirror {
+    latency: Duration,
+    /// Bytes per second shared by every request open on the mirror.
+    bandwidth: u64,
+    episodes: Vec<Episode>,
+}
+
+impl Mirror {
+    fn new(latency_ms: u64, bandwidth: u64) -> Self {
+        Self {
+            latency: Duration::from_millis(latency_ms),
+            bandwidth,
+            episodes: Vec::new(),
+        }
+    }
+
+    /// Applies `fault` from `from_ms` until the mirror recovers at `until_ms`.
+    fn with(mut self, from_ms: u64, until_ms: u64, fault: Fault) -> Self {
+        self.episodes.push(Episode {
+            from: Duration::from_millis(from_ms),
+            until: Duration::from_millis(until_ms),
+            fault,
+        });
+        self
+    }
+
+    fn fault_at(&self, elapsed: Duration) -> Option<Fault> {
+        self.episodes
+            .iter()
+            .find(|episode| episode.from <= elapsed && elapsed < episode.until)
+            .map(|episode| episode.fault)
+    }
+}
+
+fn status_error(status: u16) -> SourceError {
+    let kind = match status {
+        429 | 503 => SourceErrorKind::Throttled,
+        408 | 500..=599 => SourceErrorKind::Other,
+        _ => SourceErrorKind::Protocol,
+    };
+    SourceError::new(kind, format!("expected HTTP 206, got {status}"))
+}
+
+struct Link {
+    bandwidth: u64,
+    /// When the link finishes sending what it already accepted.
+    free_at: Mutex<Instant>,
+}
+
+impl Link {
+    /// Queues `bytes`, slowed by `divisor`, and returns when they finish arriving.
+    fn transmit(&self, bytes: usize, divisor: u64) -> Instant {
+        let nanos = bytes as u64 * divisor * 1_000_000_000 / self.bandwidth;
+        let mut free_at = self.free_at.lock().expect("link lock poisoned");
+        let finish = (*free_at).max(Instant::now()) + Duration::from_nanos(nanos);
+        *free_at = finish;
+        finish
+    }
+}
+
+struct SimulatedMirror {
+    payload: Bytes,
+    mirror: Mirror,
+    started: Instant,
+    link: Arc<Link>,
+    requests: AtomicUsize,
+    sent_bytes: Arc<AtomicU64>,
+}
+
+impl SimulatedMirror {
+    fn new(payload: Bytes, mirror: Mirror, started: Instant) -> Self {
+        Self {
+            payload,
+            link: Arc::new(Link {
+                bandwidth: mirror.bandwidth,
+                free_at: Mutex::new(started),
+            }),
+            mirror,
+            started,
+            requests: AtomicUsize::new(0),
+            sent_bytes: Arc::new(AtomicU64::new(0)),
+        }
+    }
+}
+
+struct Body {
+    chunks: VecDeque<Bytes>,
+    ending: Option<SourceError>,
+    link: Arc<Link>,
+    divisor: u64,
+    sent_bytes: Arc<AtomicU64>,
+}
+
+#[async_trait]
+impl RangeSource for SimulatedMirror {
+    async fn open(&self, range: ByteRange) -> Result<ByteStream, SourceError> {
+        self.requests.fetch_add(1, Ordering::Relaxed);
+        let fault = self.mirror.fault_at(self.started.elapsed());
+        let (extra_latency, divisor) = match fault {
+            Some(Fault::Slowdown {
+                extra_latency,
+                bandwidth_divisor,
+            }) => (extra_latency, bandwidth_divisor),
+            _ => (Duration::ZERO, 1),
+        };
+        tokio::time::sleep(self.mirror.latency + extra_latency).await;
+        if let Some(Fault::Status(status)) = fault {
+            return Err(status_error(status));
+        }
+
+        let mut body = self.payload.slice(range.start as usize..range.end as usize);
+        let mut ending = None;
+        if let Some(Fault::ResetMidBody | Fault::ShortRead) = fault {
+            body = body.slice(..body.len() / 2);
+            if let Some(Fault::ResetMidBody) = fault {
+                ending = Some(SourceError::new(
+                    SourceErrorKind::Transport,
+                    "connection reset by peer",
+                ));
+            }
+        }
+        let chunks = (0..body.len())
+            .step_by(CHUNK_SIZE)
+            .map(|start| body.slice(start..(start + CHUNK_SIZE).min(body.len())))
+            .collect();
+        let body = Body {
+            chunks,
+            ending,
+            link: self.link.clone(),
+            divisor,
+            sent_bytes: self.sent_bytes.clone(),
+        };
+        Ok(Box::pin(stream::unfold(body, |mut body| async move {
+            match body.chunks.pop_front() {
+                Some(chunk) => {
+                    let arrives = body.link.transmit(chunk.len(), body.divisor);
+                    tokio::time::sleep_until(arrives).await;
+                    body.sent_bytes
+                        .fetch_add(chunk.len() as u64, Ordering::Relaxed);
+                    Some((Ok(chunk), body))
+                }
+                None => body.ending.take().map(|error| (Err(error), body)),
+            }
+        })))
+    }
+}
+
+#[derive(Default)]
+struct MemorySink {
+    bytes: Mutex<Vec<u8>>,
+}
+
+#[async_trait]
+impl CommitSink for MemorySink {
+    async fn committed_offset(&self) -> Result<u64, SinkError> {
+        Ok(self.bytes.lock().expect("sink lock poisoned").len() as u64)
+    }
+
+    async fn append(&self, offset: u64, data: Bytes) -> Result<(), SinkError> {
+        let mut bytes = self.bytes.lock().expect("sink lock poisoned");
+        if bytes.len() as u64 != offset {
+            return Err(SinkError::new(format!(
+                "append at {offset}, committed offset is {}",
+                bytes.len()
+            )));
+        }
+        bytes.extend_from_slice(&data);
+        Ok(())
+    }
+
+    async fn flush(&self) -> Result<(), SinkError> {
+        Ok(())
+    }
+}
+
+#[derive(Debug, PartialEq)]
+struct Outcome {
+    /// `None` when the download completed with the expected bytes.
+    error: Option<String>,
+    /// Virtual time from the start of the download until it returned.
+    elapsed: Duration,
+    /// Per mirror, in the order given.
+    requests: Vec<usize>,
+    /// Body bytes every mirror sent, including those the download discarded.
+    sent_bytes: u64,
+    payload_size: u64,
+}
+
+impl Outcome {
+    fn completed(&self) -> bool {
+        self.error.is_none()
+    }
+
+    fn wasted_bytes(&self) -> u64 {
+        self.sent_bytes.saturating_sub(self.payload_size)
+    }
+}
+
+fn payload(size: usize) -> Bytes {
+    Bytes::from(
+        (0..size)
+            .map(|index| (index % 251) as u8)
+            .collect::<Vec<_>>(),
+    )
+}
+
+fn spec(expected_size: u64) -> DownloadSpec {
+    DownloadSpec {
+        expected_size,
+        page_size: PAGE_SIZE,
+        block_size: 4 * PAGE_SIZE,
+        window_pages: 16,
+        workers: 4,
+        max_attempts: 3,
+        source_cooldown: Duration::from_millis(100),
+        attempt_timeout: Duration::from_secs(5),
+    }
+}
+
+async fn simulate(mirrors: Vec<Mirror>, payload: Bytes, spec: DownloadSpec) -> Outcome {
+    simulate_with(mirrors, payload, spec, None).await
+}
+
+async fn simulate_with(
+    mirrors: Vec<Mirror>,
+    payload: Bytes,
+    spec: DownloadSpec,
+    work_stealing: Option<WorkStealing>,
+) -> Outcome {
+    let started = Instant::now();
+    let mirrors = mirrors
+        .into_iter()
+        .map(|mirror| Arc::new(SimulatedMirror::new(payload.clone(), mirror, started)))
+        .collect::<Vec<_>>();
+    let sink = Arc::new(MemorySink::default());
+    let mut downloader = Downloader::new(
+        spec,
+        mirrors
+            .iter()
+            .map(|mirror| mirror.clone() as Arc<dyn RangeSource>)
+            .collect(),
+        sink.clone(),
+    )
+    .expect("valid downloader");
+    if let Some(work_stealing) = work_stealing {
+        downloader = downloader.with_work_stealing(work_stealing);
+    }
+    let result = downloader.run().await;
+    let elapsed = started.elapsed();
+    let error = match result {
+        Ok(_) => {
+            assert_eq!(*sink.bytes.lock().expect("sink lock poisoned"), payload);
+            None
+        }
+        Err(error) => {
+            assert!(
+                matches!(
+                    error,
+                    DownloadError::RetryExhausted { .. } | DownloadError::NoUsableSource
+                ),
+                "unexpected download error: {error}"
+            );
+            Some(error.to_string())
+        }
+    };
+    Outcome {
+        error,
+        elapsed,
+        requests: mirrors
+            .iter()
+            .map(|mirror| mirror.requests.load(Ordering::Relaxed))
+            .collect(),
+        sent_bytes: mirrors
+            .iter()
+            .map(|mirror| mirror.sent_bytes.load(Ordering::Relaxed))
+            .sum(),
+        payload_size: payload.len() as u64,
+    }
+}
+
+#[tokio::test(start_paused = true)]
+async fn retries_ranges_after_resets_and_short_reads() {
+    let expected = payload(32 * PAGE_SIZE);
+    let outcome = simulate(
+        vec![
+            Mirror::new(20, 4 * 1024 * 1024).with(0, 150, Fault::ResetMidBody),
+            Mirror::new(30, 2 * 1024 * 1024).with(0, 150, Fault::ShortRead),
+        ],
+        expected.clone(),
+        spec(expected.len() as u64),
+    )
+    .await;
+
+    assert!(outcome.completed(), "{outcome:?}");
+    assert!(outcome.wasted_bytes() > 0);
+    assert!(outcome.requests.iter().sum::<usize>() > 8);
+}
+
+#[tokio::test(start_paused = true)]
+async fn fails_over_from_a_forbidden_mirror() {
+    let expected = payload(32 * PAGE_SIZE);
+    let outcome = simulate(
+        vec![
+            Mirror::new(10, 8 * 1024 * 1024).with(0, u64::MAX, Fault::Status(403)),
+            Mirror::new(40, 2 * 1024 * 1024),
+        ],
+        expected.clone(),
+        spec(expected.len() as u64),
+    )
+    .await;
+
+    assert!(outcome.completed(), "{outcome:?}");
+    // The first 403 disables the mirror; only requests already open reach it.
+    assert!(outcome.requests[0] <= 4, "{outcome:?}");
+    assert_eq!(outcome.wasted_bytes(), 0);
+}
+
+#[tokio::test(start_paused = true)]
+async fn backs_off_a_throttled_mirror_until_it_recovers() {
+    let expected = payload(32 * PAGE_SIZE);
+    let outcome = simulate(
+        vec![Mirror::new(20, 4 * 1024 * 1024).with(0, 500, Fault::Status(429))],
+        expected.clone(),
+        spec(expected.len() as u64),
+    )
+    .await;
+
+    assert!(outcome.completed(), "{outcome:?}");
+    assert!(outcome.elapsed >= Duration::from_millis(500));
+    // Cooldowns space the retries out instead of hammering the mirror.
+    assert!(outcome.requests[0] < 24, "{outcome:?}");
+}
+
+#[tokio::test(start_paused = true)]
+async fn a_server_error_burst_on_every_mirror_exhausts_the_retries() {
+    let expected = payload(32 * PAGE_SIZE);
+    let outcome = simulate(
+        vec![
+            Mirror::new(20, 4 * 1024 * 1024).with(0, 60_000, Fault::Status(500)),
+            Mirror::new(20, 4 * 1024 * 1024).with(0, 60_000, Fault::Status(502)),
+        ],
+        expected.clone(),
+        spec(expected.len() as u64),
+    )
+    .await;
+
+    assert!(
+        outcome
+            .error
+            .as_deref()
+            .is_some_and(|error| error.contains("expected HTTP 206")),
+        "{outcome:?}"
+    );
+    assert_eq!(outcome.sent_bytes, 0);
+}
+
+#[tokio::test(start_paused = true)]
+async fn a_slowed_mirror_cedes_ranges_to_a_faster_one() {
+    let expected = payload(64 * PAGE_SIZE);
+    let slowdown = Fault::Slowdown {
+        extra_latency: Duration::from_millis(200),
+        bandwidth_divisor: 10,
+    };
+    let outcome = simulate(
+        vec![
+            Mirror::new(20, 4 * 1024 * 1024).with(0, u64::MAX, slowdown),
+            Mirror::new(20, 4 * 1024 * 1024),
+        ],
+        expected.clone(),
+        spec(expected.len() as u64),
+    )
+    .await;
+
+    assert!(outcome.completed(), "{outcome:?}");
+    assert!(outcome.requests[1] > 2 * outcome.requests[0], "{outcome:?}");
+}
+
+#[tokio::test(start_paused = true)]
+async fn times_out_a_stalled_mirror_in_virtual_time() {
+    let expected = payload(16 * PAGE_SIZE);
+    let stall = Fault::Slowdown {
+        extra_latency: Duration::from_secs(3600),
+        bandwidth_divisor: 1,
+    };
+    let outcome = simulate(
+        vec![
+            Mirror::new(10, 4 * 1024 * 1024).with(0, 1_000, stall),
+            Mirror::new(50, 1024 * 1024).with(0, 1_000, stall),
+        ],
+        expected.clone(),
+        spec(expected.len() as u64),
+    )
+    .await;
+
+    assert!(outcome.completed(), "{outcome:?}");
+    // The stalled attempts time out after the spec's five seconds, not an hour.
+    assert!(outcome.elapsed >= Duration::from_secs(5));
+    assert!(outcome.elapsed < Duration::from_secs(60));
+}
+
+/// SplitMix64, so that every seed always yields the same scenario.
+struct Scenarios(u64);
+
+impl Scenarios {
+    fn next(&mut self) -> u64 {
+        self.0 = self.0.wrapping_add(0x9e37_79b9_7f4a_7c15);
+        let mut value = self.0;
+        value = (value ^ (value >> 30)).wrapping_mul(0xbf58_476d_1ce4_e5b9);
+        value = (value ^ (value >> 27)).wrapping_mul(0x94d0_49bb_1331_11eb);
+        value ^ (value >> 31)
+    }
+
+    fn below(&mut self, bound: u64) -> u64 {
+        self.next() % bound
+    }
+
+    fn fault(&mut self, allow_forbidden: bool) -> Fault {
+        match self.below(if allow_forbidden { 7 } else { 6 }) {
+            0 => Fault::Slowdown {
+                extra_latency: Duration::from_millis(self.below(500)),
+                bandwidth_divisor: 1 + self.below(20),
+            },
+            1 => Fault::ResetMidBody,
+            2 => Fault::ShortRead,
+            3 => Fault::Status(429),
+            4 => Fault::Status(503),
+            5 => Fault::Status([500, 502, 504][self.below(3) as usize]),
+            _ => Fault::Status(403),
+        }
+    }
+
+    /// Two to four mirrors with up to three episodes each. Only later mirrors
+    /// may turn forbidden, so the first one always remains usable.
+    fn scenario(seed: u64) -> Vec<Mirror> {
+        let mut random = Self(seed);
+        let mirror_count = 2 + random.below(3);
+        (0..mirror_count)
+            .map(|index| {
+                let mut mirror =
+                    Mirror::new(5 + random.below(150), (256 + random.below(4 * 1024)) * 1024);
+                for _ in 0..random.below(4) {
+                    let from = random.below(2_000);
+                    let until = from + 50 + random.below(1_500);
+                    mirror = mirror.with(from, until, random.fault(index > 0));
+                }
+                mirror
+            })
+            .collect()
+    }
+}
+
+fn percentile(sorted: &[Duration], fraction: f64) -> Duration {
+    sorted[((sorted.len() as f64 * fraction) as usize).min(sorted.len() - 1)]
+}
+
+/// Runs every seeded scenario, checks that a sample replays exactly and
+/// returns the outcomes in seed order.
+async fn sweep(
+    scenarios: u64,
+    payload: &Bytes,
+    work_stealing: Option<WorkStealing>,
+) -> Vec<Outcome> {
+    let download_spec = spec(payload.len() as u64);
+    let mut outcomes = Vec::new();
+    for seed in 0..scenarios {
+        outcomes.push(
+            simulate_with(
+                Scenarios::scenario(seed),
+                payload.clone(),
+                download_spec.clone(),
+                work_stealing.clone(),
+            )
+            .await,
+        );
+    }
+    // Virtual time makes a scenario replay exactly.
+    for seed in (0..scenarios).step_by(97) {
+        let replayed = simulate_with(
+            Scenarios::scenario(seed),
+            payload.clone(),
+            download_spec.clone(),
+            work_stealing.clone(),
+        )
+        .await;
+        assert_eq!(replayed, outcomes[seed as usize], "seed {seed}");
+    }
+
+    let completed = outcomes
+        .iter()
+        .filter(|outcome| outcome.completed())
+        .count();
+    let mut elapsed = outcomes
+        .iter()
+        .filter(|outcome| outcome.completed())
+        .map(|outcome| outcome.elapsed)
+        .collect::<Vec<_>>();
+    elapsed.sort();
+    let wasted = outcomes.iter().map(Outcome::wasted_bytes).sum::<u64>();
+    println!(
+        "{completed}/{scenarios} completed; p50 {:?}, p99 {:?}, max {:?}; {:.2} wasted bytes per payload byte",
+        percentile(&elapsed, 0.5),
+        percentile(&elapsed, 0.99),
+        elapsed.last().expect("some scenario completed"),
+        wasted as f64 / (scenarios * payload.len() as u64) as f64,
+    );
+    assert!(
+        completed as u64 * 10 >= scenarios * 9,
+        "{completed}/{scenarios} completed"
+    );
+    outcomes
+}
+
+#[tokio::test(start_paused = true)]
+async fn sweeps_seeded_fault_scenarios() {
+    sweep(1_000, &payload(32 * PAGE_SIZE), None).await;
+}
+
+#[tokio::test(start_paused = true)]
+async fn sweeps_seeded_fault_scenarios_with_work_stealing() {
+    let work_stealing = WorkStealing {
+        min_split: 2 * PAGE_SIZE as u64,
+    };
+    sweep(1_000, &payload(32 * PAGE_SIZE), Some(work_stealing)).await;
+}
+
+#[tokio::test(start_paused = true)]
+async fn work_stealing_streams_one_region_per_worker() {
+    let expected = payload(64 * PAGE_SIZE);
+    let mut download_spec = spec(expected.len() as u64);
+    download_spec.window_pages = 64;
+
+    let outcome = simulate_with(
+        vec![Mirror::new(20, 4 * 1024 * 1024)],
+        expected.clone(),
+        download_spec,
+        Some(WorkStealing::new()),
+    )
+    .await;
+
+    assert!(outcome.completed(), "{outcome:?}");
+    // Four workers stream a quarter each instead of sixteen four-page blocks.
+    assert_eq!(outcome.requests, [4]);
+    assert_eq!(outcome.wasted_bytes(), 0);
+}
+
+#[tokio::test(start_paused = true)]
+async fn idle_workers_take_over_the_rest_of_a_slow_mirrors_regions() {
+    let expected = payload(64 * PAGE_SIZE);
+    let mut download_spec = spec(expected.len() as u64);
+    download_spec.window_pages = 64;
+    let mirrors = vec![
+        Mirror::new(20, 4 * 1024 * 1024),
+        Mirror::new(20, 128 * 1024),
+    ];
+
+    let blocks = simulate(mirrors.clone(), expected.clone(), download_spec.clone()).await;
+    let regions = simulate_with(
+        mirrors,
+        expected.clone(),
+        download_spec,
+        Some(WorkStealing {
+            min_split: PAGE_SIZE as u64,
+        }),
+    )
+    .await;
+
+    assert!(blocks.completed(), "{blocks:?}");
+    assert!(regions.completed(), "{regions:?}");
+    assert!(
+        regions.elapsed * 3 < blocks.elapsed * 2,
+        "{regions:?} vs {blocks:?}"
+    );
+    // The slow mirror stops at each split instead of sending bytes nobody reads.
+    assert_eq!(regions.wasted_bytes(), 0);
+}
+
+/// Downloads a small and a large payload at once, each capped at three of four
+/// shared workers, and returns when each finished.
+async fn simulate_pair(joint: Option<JointSchedule>) -> (Duration, Duration) {
+    let started = Instant::now();
+    let worker_limit = WorkerLimit::new(4).expect("valid worker limit");
+    let download = |pages: usize| {
+        let expected = payload(pages * PAGE_SIZE);
+        let mirror = Arc::new(SimulatedMirror::new(
+            expected.clone(),
+            Mirror::new(200, 64 * 1024 * 1024),
+            started,
+        ));
+        let sink = Arc::new(MemorySink::default());
+        let mut download_spec = spec(expected.len() as u64);
+        download_spec.workers = 3;
+        let mut downloader = Downloader::new(
+            download_spec,
+            vec![mirror as Arc<dyn RangeSource>],
+            sink.clone(),
+        )
+        .expect("valid downloader")
+        .with_worker_limit(worker_limit.clone());
+        if let Some(joint) = &joint {
+            downloader = downloader.with_joint_schedule(joint.clone());
+        }
+        async move {
+            downloader.run().await.expect("download completes");
+            assert_eq!(*sink.bytes.lock().expect("sink lock poisoned"), expected);
+            started.elapsed()
+        }
+    };
+    tokio::join!(download(32), download(96))
+}
+
+#[tokio::test(start_paused = true)]
+async fn a_joint_schedule_moves_workers_to_the_download_behind() {
+    // The small download asks first, takes three workers and finishes early,
+    // after which the large one can only use three of the four.
+    let (small, large) = simulate_pair(None).await;
+    let (joint_small, joint_large) =
+        simulate_pair(Some(JointSchedule::new(4).expect("valid schedule"))).await;
+
+    assert!(joint_large < large, "{joint_large:?} vs {large:?}");
+    assert!(
+        joint_large - joint_small < large - small,
+        "{joint_small:?}..{joint_large:?} vs {small:?}..{large:?}"
+    );
+}
@@ -0,0 +1,156 @@
+use std::{
+    collections::HashMap,
+    io,
+    net::SocketAddr,
+    sync::{Arc, LazyLock, Mutex},
+    time::{Duration, Instant},
+};
+
+use reqwest::dns::{Addrs, Name, Resolve, Resolving};
+
+/// How long a successful lookup is reused. The system resolver does not
+/// report record TTLs, so this stays short enough to follow CDN rotations.
+const POSITIVE_TTL: Duration = Duration::from_secs(60);
+/// How long a failed lookup is answered from the cache, so a dead mirror host
+/// does not cost every range worker its own resolver timeout.
+const NEGATIVE_TTL: Duration = Duration::from_secs(5);
+
+static SHARED: LazyLock<DnsCache> = LazyLock::new(|| DnsCache::new(POSITIVE_TTL, NEGATIVE_TTL));
+
+type Lookup = Result<Arc<[SocketAddr]>, String>;
+
+/// A process-wide cache in front of the system resolver, plugged into every
+/// session's client so new sessions and mirror hosts skip repeated lookups.
+#[derive(Clone)]
+pub struct DnsCache {
+    inner: Arc<DnsCacheInner>,
+}
+
+struct DnsCacheInner {
+    entries: Mutex<HashMap<String, CachedLookup>>,
+    positive_ttl: Duration,
+    negative_ttl: Duration,
+}
+
+struct CachedLookup {
+    lookup: Lookup,
+    expires_at: Instant,
+}
+
+impl DnsCache {
+    pub fn new(positive_ttl: Duration, negative_ttl: Duration) -> Self {
+        Self {
+            inner: Arc::new(DnsCacheInner {
+                entries: Mutex::new(HashMap::new()),
+                positive_ttl,
+                negative_ttl,
+            }),
+        }
+    }
+
+    /// The cache shared by all sessions of this process.
+    pub fn shared() -> Self {
+        SHARED.clone()
+    }
+
+    /// Resolves `host`, answering from the cache while its entry is fresh.
+    pub async fn lookup(&self, host: &str) -> Lookup {
+        if let Some(lookup) = self.cached(host) {
+            return lookup;
+        }
+        let lookup = match tokio::net::lookup_host((host, 0)).await {
+            Ok(addresses) => {
+                let addresses: Arc<[SocketAddr]> = addresses.collect();
+                if addresses.is_empty() {
+                    Err(format!("no addresses found for {host}"))
+                } else {
+                    Ok(addresses)
+                }
+            }
+            Err(error) => Err(error.to_string()),
+        };
+        self.store(host, lookup.clone());
+        lookup
+    }
+
+    fn cached(&self, host: &str) -> Option<Lookup> {
+        let mut entries = self.inner.entries.lock().expect("DNS cache lock");
+        match entries.get(host) {
+            Some(entry) if entry.expires_at > Instant::now() => Some(entry.lookup.clone()),
+            Some(_) => {
+                entries.remove(host);
+                None
+            }
+            None => None,
+        }
+    }
+
+    fn store(&self, host: &str, lookup: Lookup) {
+        let ttl = if lookup.is_ok() {
+            self.inner.positive_ttl
+        } else {
+            self.inner.negative_ttl
+        };
+        let now = Instant::now();
+        let mut entries = self.inner.entries.lock().expect("DNS cache lock");
+        entries.retain(|_, entry| entry.expires_at > now);
+        entries.insert(
+            host.to_owned(),
+            CachedLookup {
+                lookup,
+                expires_at: now + ttl,
+            },
+        );
+    }
+}
+
+impl Resolve for DnsCache {
+    fn resolve(&self, name: Name) -> Resolving {
+        let cache = self.clone();
+        Box::pin(async move {
+            let addresses = cache
+                .lookup(name.as_str())
+                .await
+                .map_err(io::Error::other)?;
+            Ok(Box::new(addresses.to_vec().into_iter()) as Addrs)
+        })
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use std::{net::SocketAddr, time::Duration};
+
+    use super::DnsCache;
+
+    #[test]
+    fn answers_from_the_cache_until_the_entry_expires() {
+        let cache = DnsCache::new(Duration::from_millis(300), Duration::from_millis(30));
+        let address: SocketAddr = "192.0.2.1:0".parse().expect("address");
+        cache.store("cdn.example", Ok(vec![address].into()));
+        cache.store("dead.example", Err("lookup failed".into()));
+
+        assert_eq!(
+            cache.cached("cdn.example").expect("fresh entry").as_deref(),
+            Ok([address].as_slice())
+        );
+        assert!(cache.cached("dead.example").expect("fresh entry").is_err());
+
+        std::thread::sleep(Duration::from_millis(60));
+        assert!(cache.cached("cdn.example").is_some());
+        assert!(cache.cached("dead.example").is_none());
+
+        std::thread::sleep(Duration::from_millis(300));
+        assert!(cache.cached("cdn.example").is_none());
+    }
+
+    #[tokio::test]
+    async fn caches_a_system_lookup() {
+        let cache = DnsCache::new(Duration::from_secs(60), Duration::from_secs(5));
+
+        let addresses = cache.lookup("localhost").await.expect("localhost resolves");
+
+        assert!(addresses.iter().all(|address| address.ip().is_loopback()));
+        assert_eq!(cache.cached("localhost"), Some(Ok(addresses)));
+    }
+}
@@ -0,0 +1,285 @@
+use std::{
+    collections::VecDeque,
+    sync::{Arc, Mutex},
+    time::{Duration, Instant},
+};
+
+use haya::JointSchedule;
+use pyo3::{exceptions::PyValueError, prelude::*};
+use tokio_util::sync::CancellationToken;
+
+use crate::{TransferSnapshot, TransferState, duration_from_seconds};
+
+/// Number of recent samples the group's speed is smoothed over.
+const SPEED_WINDOW: usize = 10;
+
+/// Progress of every transfer in a group, aggregated natively so Python awaits
+/// one update per tick instead of polling each handle.
+#[pyclass(frozen, get_all, module = "yutto._core", skip_from_py_object)]
+#[derive(Clone, Debug)]
+pub(crate) struct TransferGroupProgress {
+    expected_bytes: u64,
+    received_bytes: u64,
+    committed_bytes: u64,
+    /// Received bytes not yet committed to their sinks.
+    buffered_bytes: u64,
+    /// Bytes per second received during this run, smoothed over recent updates.
+    speed: f64,
+    window_saturated: bool,
+    /// Whether every transfer in the group had finished when this was taken.
+    done: bool,
+    transfers: Vec<TransferSnapshot>,
+}
+
+/// Transfers started with `group=` report here; `next_progress` resolves at
+/// the group's cadence, or as soon as every transfer has finished.
+///
+/// With `workers`, the group also splits that many workers among its running
+/// transfers in proportion to the bytes each has left, so the one behind gets
+/// more of them.
+#[pyclass(frozen, module = "yutto._core")]
+pub(crate) struct TransferGroup {
+    pub(crate) shared: Arc<GroupShared>,
+}
+
+#[pymethods]
+impl TransferGroup {
+    #[new]
+    #[pyo3(signature = (*, interval=0.25, workers=None))]
+    fn new(interval: f64, workers: Option<i64>) -> PyResult<Self> {
+        let joint = workers
+            .map(|workers| {
+                let workers = usize::try_from(workers)
+                    .map_err(|_| PyValueError::new_err("group workers must be positive"))?;
+                JointSchedule::new(workers)
+                    .map_err(|error| PyValueError::new_err(error.to_string()))
+            })
+            .transpose()?;
+        Ok(Self {
+            shared: Arc::new(GroupShared {
+                interval: duration_from_seconds(interval, "interval")?,
+                members: Mutex::new(Vec::new()),
+                joint,
+                cursor: tokio::sync::Mutex::new(GroupCursor::default()),
+            }),
+        })
+    }
+
+    /// Resolves to the next aggregated update, or `None` once an update that
+    /// reported every transfer done has been delivered.
+    fn next_progress<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyAny>> {
+        let shared = self.shared.clone();
+        crate::runtime::future_into_py(py, async move { Ok(shared.next_progress().await) })
+    }
+
+    /// Workers the group splits among its transfers, if it splits any.
+    #[getter]
+    fn workers(&self) -> Option<usize> {
+        self.shared.joint.as_ref().map(JointSchedule::workers)
+    }
+
+    fn __len__(&self) -> usize {
+        self.shared
+            .members
+            .lock()
+            .expect("transfer group lock poisoned")
+            .len()
+    }
+}
+
+struct GroupMember {
+    state: Arc<Mutex<TransferState>>,
+    completion: CancellationToken,
+}
+
+pub(crate) struct GroupShared {
+    interval: Duration,
+    members: Mutex<Vec<GroupMember>>,
+    /// Shared by the members' downloads when the group splits workers.
+    pub(crate) joint: Option<JointSchedule>,
+    /// Held across a wait, so concurrent consumers take turns.
+    cursor: tokio::sync::Mutex<GroupCursor>,
+}
+
+impl GroupShared {
+    pub(crate) fn join(&self, state: Arc<Mutex<TransferState>>, completion: CancellationToken) {
+        self.members
+            .lock()
+            .expect("transfer group lock poisoned")
+            .push(GroupMember { state, completion });
+    }
+
+    async fn next_progress(&self) -> Option<TransferGroupProgress> {
+        let mut cursor = self.cursor.lock().await;
+        let (states, completions): (Vec<_>, Vec<_>) = self
+            .members
+            .lock()
+            .expect("transfer group lock poisoned")
+            .iter()
+            .map(|member| (member.state.clone(), member.completion.clone()))
+            .unzip();
+        match cursor.finished_members {
+            Some(members) if members == states.len() => return None,
+            // Transfers joined after the group had finished, e.g. a later serial batch.
+            Some(_) => *cursor = GroupCursor::default(),
+            None => {}
+        }
+        if let Some(last_update) = cursor.last_update {
+            let all_done = async {
+                for completion in &completions {
+                    completion.cancelled().await;
+                }
+            };
+            tokio::select! {
+                _ = tokio::time::sleep_until((last_update + self.interval).into()) => {}
+                _ = all_done => {}
+            }
+        }
+        // Checked before the snapshots, so a done update carries final counts.
+        let done = completions.iter().all(CancellationToken::is_cancelled);
+        let transfers = states
+            .iter()
+            .map(|state| {
+                state
+                    .lock()
+                    .expect("transfer state lock poisoned")
+                    .snapshot()
+            })
+            .collect();
+        let progress = cursor.record(transfers, Instant::now(), done);
+        if done {
+            cursor.finished_members = Some(states.len());
+        }
+        Some(progress)
+    }
+}
+
+#[derive(Default)]
+struct GroupCursor {
+    /// `(time, bytes received during this run)` of recent updates.
+    samples: VecDeque<(Instant, u64)>,
+    last_update: Option<Instant>,
+    /// Member count covered by the last update, once it reported all done.
+    finished_members: Option<usize>,
+}
+
+impl GroupCursor {
+    fn record(
+        &mut self,
+        transfers: Vec<TransferSnapshot>,
+        now: Instant,
+        done: bool,
+    ) -> TransferGroupProgress {
+        // Bytes a resumed transfer found on disk are not part of the speed.
+        let transferred = transfers
+            .iter()
+            .map(|transfer| {
+                transfer
+                    .received_bytes
+                    .saturating_sub(transfer.origin_bytes)
+            })
+            .sum();
+        if self.samples.len() == SPEED_WINDOW {
+            self.samples.pop_front();
+        }
+        self.samples.push_back((now, transferred));
+        self.last_update = Some(now);
+        let (since, transferred_since) = self.samples[0];
+        let elapsed = now.duration_since(since).as_secs_f64();
+        let speed = if elapsed > 0.0 {
+            transferred.saturating_sub(transferred_since) as f64 / elapsed
+        } else {
+            0.0
+        };
+        TransferGroupProgress {
+            expected_bytes: transfers
+                .iter()
+                .map(|transfer| transfer.expected_bytes)
+                .sum(),
+            received_bytes: transfers
+                .iter()
+                .map(|transfer| transfer.received_bytes)
+                .sum(),
+            committed_bytes: transfers
+                .iter()
+                .map(|transfer| transfer.committed_bytes)
+                .sum(),
+            buffered_bytes: transfers
+                .iter()
+                .map(|transfer| {
+                    transfer
+                        .received_bytes
+                        .saturating_sub(transfer.committed_bytes)
+                })
+                .sum(),
+            speed,
+            window_saturated: transfers.iter().any(|transfer| transfer.window_saturated),
+            done,
+            transfers,
+        }
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use std::time::{Duration, Instant};
+
+    use super::{GroupCursor, SPEED_WINDOW};
+    use crate::TransferSnapshot;
+
+    fn snapshot(origin_bytes: u64, received_bytes: u64, committed_bytes: u64) -> TransferSnapshot {
+        TransferSnapshot {
+            expected_bytes: 4096,
+            origin_bytes,
+            received_bytes,
+            committed_bytes,
+            buffered_pages: 0,
+            window_saturated: false,
+            in_flight: 0,
+            concurrency: 0,
+            rate_limited: false,
+            hedges_issued: 0,
+            hedges_won: 0,
+            sources: Vec::new(),
+            digest: None,
+        }
+    }
+
+    #[test]
+    fn resumed_bytes_do_not_count_as_speed() {
+        let mut cursor = GroupCursor::default();
+        let start = Instant::now();
+
+        let first = cursor.record(vec![snapshot(1024, 1024, 1024)], start, false);
+        let second = cursor.record(
+            vec![snapshot(1024, 3072, 2048)],
+            start + Duration::from_secs(2),
+            true,
+        );
+
+        assert_eq!(first.speed, 0.0);
+        assert_eq!(second.speed, 1024.0);
+        assert_eq!(second.expected_bytes, 4096);
+        assert_eq!(second.received_bytes, 3072);
+        assert_eq!(second.buffered_bytes, 1024);
+        assert!(second.done);
+    }
+
+    #[test]
+    fn speed_is_smoothed_over_the_recent_window() {
+        let mut cursor = GroupCursor::default();
+        let start = Instant::now();
+
+        let mut progress = None;
+        for second in 0..=SPEED_WINDOW as u64 {
+            progress = Some(cursor.record(
+                vec![snapshot(0, second * 100, second * 100)],
+                start + Duration::from_secs(second),
+                false,
+            ));
+        }
+
+        assert_eq!(cursor.samples.len(), SPEED_WINDOW);
+        assert_eq!(progress.expect("progress").speed, 100.0);
+    }
+}
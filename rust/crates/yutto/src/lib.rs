@@ -6,21 +6,36 @@ use std::{
 };
 
 use haya::{
-    CommitSink, DownloadSnapshot, DownloadSpec, Downloader, ProgressSink, WorkerLimit,
-    file::{FileOpenMode, FileSink},
+    AdaptiveBlockSize, AdaptiveConcurrency, ByteRange, CommitSink, DownloadReport,
+    DownloadSnapshot, DownloadSpec, Downloader, HashAlgorithm, HedgePolicy, JointSchedule,
+    MemoryBudget, OpenedRange, ProgressSink, RateLimit, SourceHealthMemory, WorkStealing,
+    WorkerLimit,
+    file::{
+        FileBackend, FileOpenMode, FileSink, FileSinkOptions, PositionalFileSink, ResourceIdentity,
+        journaled_offset,
+    },
 };
-use haya_http::HttpRangeSource;
+use haya_http::{HttpRangeSource, open_first_range};
 use pyo3::{
     create_exception,
     exceptions::{PyException, PyRuntimeError, PyValueError},
     prelude::*,
     types::{PyAny, PyBytes},
 };
-use reqwest::{Client, Url};
+use reqwest::{Client, Url, header::HeaderMap};
 use tokio_util::sync::CancellationToken;
 
-use crate::session::{Response, Session, SessionConfig, SessionError};
+use crate::{
+    group::{GroupShared, TransferGroup, TransferGroupProgress},
+    remux::{Chapter, RemuxOptions},
+    runtime::{RuntimeStats, configure_runtime, runtime_stats},
+    session::{Response, Session, SessionConfig, SessionError},
+};
 
+pub mod dns;
+mod group;
+pub mod remux;
+mod runtime;
 pub mod session;
 
 create_exception!(yutto._core, HttpError, PyException);
@@ -30,6 +45,7 @@ create_exception!(yutto._core, HttpTimeoutError, HttpError);
 create_exception!(yutto._core, HttpTransportError, HttpError);
 create_exception!(yutto._core, HttpStatusError, HttpError);
 create_exception!(yutto._core, SessionClosedError, HttpError);
+create_exception!(yutto._core, RemuxError, PyException);
 
 #[derive(Clone, Debug)]
 enum TransferOutcome {
@@ -48,9 +64,36 @@ struct TransferState {
     buffered_pages: usize,
     window_saturated: bool,
     in_flight: usize,
+    concurrency: usize,
+    rate_limited: bool,
+    hedges_issued: usize,
+    hedges_won: usize,
+    sources: Vec<TransferSourceStats>,
+    /// `algorithm:hex` of the committed file, once a hashed transfer completes.
+    digest: Option<String>,
     outcome: TransferOutcome,
 }
 
+impl TransferState {
+    fn snapshot(&self) -> TransferSnapshot {
+        TransferSnapshot {
+            expected_bytes: self.expected_bytes,
+            origin_bytes: self.origin_bytes,
+            received_bytes: self.received_bytes,
+            committed_bytes: self.committed_bytes,
+            buffered_pages: self.buffered_pages,
+            window_saturated: self.window_saturated,
+            in_flight: self.in_flight,
+            concurrency: self.concurrency,
+            rate_limited: self.rate_limited,
+            hedges_issued: self.hedges_issued,
+            hedges_won: self.hedges_won,
+            sources: self.sources.clone(),
+            digest: self.digest.clone(),
+        }
+    }
+}
+
 #[pyclass(frozen, get_all, module = "yutto._core", skip_from_py_object)]
 #[derive(Clone, Debug)]
 struct TransferSnapshot {
@@ -61,6 +104,40 @@ struct TransferSnapshot {
     buffered_pages: usize,
     window_saturated: bool,
     in_flight: usize,
+    concurrency: usize,
+    rate_limited: bool,
+    hedges_issued: usize,
+    hedges_won: usize,
+    sources: Vec<TransferSourceStats>,
+    digest: Option<String>,
+}
+
+#[pyclass(frozen, get_all, module = "yutto._core", skip_from_py_object)]
+#[derive(Clone, Debug)]
+struct TransferSourceStats {
+    url: String,
+    in_flight: usize,
+    failures: usize,
+    disabled: bool,
+    received_bytes: u64,
+    /// Smoothed body throughput in bytes per second, once measured.
+    throughput: Option<u64>,
+    /// Smoothed time to first byte in seconds, once measured.
+    latency: Option<f64>,
+}
+
+impl TransferSourceStats {
+    fn new(url: String) -> Self {
+        Self {
+            url,
+            in_flight: 0,
+            failures: 0,
+            disabled: false,
+            received_bytes: 0,
+            throughput: None,
+            latency: None,
+        }
+    }
 }
 
 #[pyclass(frozen, module = "yutto._core", skip_from_py_object)]
@@ -104,12 +181,14 @@ impl NativeResponse {
 #[pyclass(frozen, module = "yutto._core")]
 struct YuttoSession {
     session: Session,
+    /// Mirror health learned by earlier transfers, keyed by URL host.
+    health: SourceHealthMemory,
 }
 
 #[pymethods]
 impl YuttoSession {
     #[new]
-    #[pyo3(signature = (*, headers=None, cookies=None, proxy=None, use_system_proxy=true, accept_invalid_certs=false, ca_cert_file=None, ca_cert_dir=None, read_timeout=5.0, connect_timeout=5.0))]
+    #[pyo3(signature = (*, headers=None, cookies=None, proxy=None, use_system_proxy=true, accept_invalid_certs=false, ca_cert_file=None, ca_cert_dir=None, read_timeout=5.0, connect_timeout=5.0, http2=true, http2_adaptive_window=true, pool_idle_timeout=Some(90.0), pool_max_idle_per_host=32, tcp_nodelay=true, tcp_keepalive=Some(30.0)))]
     #[allow(clippy::too_many_arguments)]
     fn new(
         headers: Option<HashMap<String, String>>,
@@ -121,6 +200,12 @@ impl YuttoSession {
         ca_cert_dir: Option<PathBuf>,
         read_timeout: f64,
         connect_timeout: f64,
+        http2: bool,
+        http2_adaptive_window: bool,
+        pool_idle_timeout: Option<f64>,
+        pool_max_idle_per_host: usize,
+        tcp_nodelay: bool,
+        tcp_keepalive: Option<f64>,
     ) -> PyResult<Self> {
         let session = Session::new(SessionConfig {
             headers: headers.unwrap_or_default(),
@@ -132,9 +217,22 @@ impl YuttoSession {
             ca_cert_dir,
             read_timeout: duration_from_seconds(read_timeout, "read_timeout")?,
             connect_timeout: duration_from_seconds(connect_timeout, "connect_timeout")?,
+            http2,
+            http2_adaptive_window,
+            pool_idle_timeout: pool_idle_timeout
+                .map(|value| duration_from_seconds(value, "pool_idle_timeout"))
+                .transpose()?,
+            pool_max_idle_per_host,
+            tcp_nodelay,
+            tcp_keepalive: tcp_keepalive
+                .map(|value| duration_from_seconds(value, "tcp_keepalive"))
+                .transpose()?,
         })
         .map_err(session_error_to_py)?;
-        Ok(Self { session })
+        Ok(Self {
+            session,
+            health: SourceHealthMemory::default(),
+        })
     }
 
     #[pyo3(signature = (url, *, params=None, headers=None))]
@@ -146,7 +244,7 @@ impl YuttoSession {
         headers: Option<HashMap<String, String>>,
     ) -> PyResult<Bound<'py, PyAny>> {
         let session = self.session.clone();
-        pyo3_async_runtimes::tokio::future_into_py(py, async move {
+        runtime::future_into_py(py, async move {
             session
                 .get(url, params.unwrap_or_default(), headers.unwrap_or_default())
                 .await
@@ -155,10 +253,27 @@ impl YuttoSession {
         })
     }
 
-    fn probe_size<'py>(&self, py: Python<'py>, url: String) -> PyResult<Bound<'py, PyAny>> {
+    /// Starts connecting to the hosts of `urls` in the background and returns
+    /// immediately, so the connections are warm by the time a transfer starts.
+    fn prewarm(&self, urls: Vec<String>) -> PyResult<()> {
+        if self.session.is_closed() {
+            return Err(session_error_to_py(SessionError::Closed));
+        }
+        let session = self.session.clone();
+        runtime::get_runtime().spawn(async move {
+            let _ = session.prewarm(&urls).await;
+        });
+        Ok(())
+    }
+
+    fn probe_resource<'py>(&self, py: Python<'py>, url: String) -> PyResult<Bound<'py, PyAny>> {
         let session = self.session.clone();
-        pyo3_async_runtimes::tokio::future_into_py(py, async move {
-            session.probe_size(url).await.map_err(session_error_to_py)
+        runtime::future_into_py(py, async move {
+            session
+                .probe_resource(url)
+                .await
+                .map(|identity| identity.map(|identity| (identity.size, identity.validator)))
+                .map_err(session_error_to_py)
         })
     }
 
@@ -176,27 +291,57 @@ impl YuttoSession {
         self.session.is_closed()
     }
 
-    #[pyo3(signature = (sources, target, expected_size, *, overwrite=false, workers=8, block_size=524288, worker_limit=None))]
+    #[pyo3(signature = (sources, target, expected_size=None, *, validator=None, overwrite=false, workers=8, block_size=524288, worker_limit=None, rate_limit=None, memory_budget=None, adaptive_workers=false, adaptive_block_size=false, hedged_requests=false, work_stealing=false, positional_writes=false, streaming=false, hash=None, group=None, max_attempts=3, attempt_timeout=30.0, source_cooldown=0.5))]
     #[allow(clippy::too_many_arguments)]
     fn start_transfer(
         &self,
         sources: Vec<String>,
         target: PathBuf,
-        expected_size: u64,
+        expected_size: Option<u64>,
+        validator: Option<String>,
         overwrite: bool,
         workers: usize,
         block_size: usize,
         worker_limit: Option<PyRef<'_, TransferWorkerLimit>>,
+        rate_limit: Option<PyRef<'_, TransferRateLimit>>,
+        memory_budget: Option<PyRef<'_, TransferMemoryBudget>>,
+        adaptive_workers: bool,
+        adaptive_block_size: bool,
+        hedged_requests: bool,
+        work_stealing: bool,
+        positional_writes: bool,
+        streaming: bool,
+        hash: Option<&str>,
+        group: Option<PyRef<'_, TransferGroup>>,
+        max_attempts: usize,
+        attempt_timeout: f64,
+        source_cooldown: f64,
     ) -> PyResult<TransferHandle> {
         start_transfer_with_session(
             &self.session,
+            self.health.clone(),
             sources,
             target,
-            expected_size,
+            expected_size.map(|size| ResourceIdentity::new(size, validator)),
             overwrite,
-            workers,
-            block_size,
+            TransferTuning {
+                workers,
+                block_size,
+                adaptive_workers,
+                adaptive_block_size,
+                hedged_requests,
+                work_stealing,
+                positional_writes,
+                streaming,
+                hash: hash.map(hash_algorithm_from_py).transpose()?,
+                max_attempts,
+                attempt_timeout: duration_from_seconds(attempt_timeout, "attempt_timeout")?,
+                source_cooldown: duration_from_seconds(source_cooldown, "source_cooldown")?,
+            },
             worker_limit.map(|limit| limit.inner.clone()),
+            rate_limit.map(|limit| limit.inner.clone()),
+            memory_budget.map(|budget| budget.inner.clone()),
+            group.map(|group| group.shared.clone()),
         )
     }
 }
@@ -223,6 +368,76 @@ impl TransferWorkerLimit {
     }
 }
 
+#[pyclass(frozen, module = "yutto._core")]
+struct TransferRateLimit {
+    inner: RateLimit,
+}
+
+#[pymethods]
+impl TransferRateLimit {
+    #[new]
+    fn new(bytes_per_second: i64) -> PyResult<Self> {
+        let inner = RateLimit::new(rate_from_py(bytes_per_second)?)
+            .map_err(|error| PyValueError::new_err(error.to_string()))?;
+        Ok(Self { inner })
+    }
+
+    #[getter]
+    fn bytes_per_second(&self) -> u64 {
+        self.inner.bytes_per_second()
+    }
+
+    fn set_bytes_per_second(&self, bytes_per_second: i64) -> PyResult<()> {
+        self.inner
+            .set_bytes_per_second(rate_from_py(bytes_per_second)?)
+            .map_err(|error| PyValueError::new_err(error.to_string()))
+    }
+}
+
+/// Bytes of range and reordering buffers that every transfer holding it may
+/// reserve together.
+#[pyclass(frozen, module = "yutto._core")]
+struct TransferMemoryBudget {
+    inner: MemoryBudget,
+}
+
+#[pymethods]
+impl TransferMemoryBudget {
+    #[new]
+    fn new(capacity: i64) -> PyResult<Self> {
+        let capacity = u64::try_from(capacity)
+            .map_err(|_| PyValueError::new_err("memory budget must be positive"))?;
+        let inner = MemoryBudget::new(capacity)
+            .map_err(|error| PyValueError::new_err(error.to_string()))?;
+        Ok(Self { inner })
+    }
+
+    #[getter]
+    fn capacity(&self) -> u64 {
+        self.inner.capacity()
+    }
+
+    #[getter]
+    fn used(&self) -> u64 {
+        self.inner.used()
+    }
+}
+
+fn rate_from_py(bytes_per_second: i64) -> PyResult<u64> {
+    u64::try_from(bytes_per_second)
+        .map_err(|_| PyValueError::new_err("rate limit must be positive"))
+}
+
+fn hash_algorithm_from_py(name: &str) -> PyResult<HashAlgorithm> {
+    match name {
+        "xxh3" => Ok(HashAlgorithm::Xxh3),
+        "sha256" => Ok(HashAlgorithm::Sha256),
+        _ => Err(PyValueError::new_err(format!(
+            "unsupported hash algorithm: {name}"
+        ))),
+    }
+}
+
 #[pyclass(module = "yutto._core")]
 struct TransferHandle {
     state: Arc<Mutex<TransferState>>,
@@ -234,7 +449,7 @@ struct TransferHandle {
 impl TransferHandle {
     fn wait<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, PyAny>> {
         let completion = self.completion.clone();
-        pyo3_async_runtimes::tokio::future_into_py(py, async move {
+        runtime::future_into_py(py, async move {
             completion.cancelled_owned().await;
             Ok(())
         })
@@ -255,16 +470,10 @@ impl TransferHandle {
     }
 
     fn snapshot(&self) -> TransferSnapshot {
-        let state = self.state.lock().expect("transfer state lock poisoned");
-        TransferSnapshot {
-            expected_bytes: state.expected_bytes,
-            origin_bytes: state.origin_bytes,
-            received_bytes: state.received_bytes,
-            committed_bytes: state.committed_bytes,
-            buffered_pages: state.buffered_pages,
-            window_saturated: state.window_saturated,
-            in_flight: state.in_flight,
-        }
+        self.state
+            .lock()
+            .expect("transfer state lock poisoned")
+            .snapshot()
     }
 
     fn result(&self) -> PyResult<u64> {
@@ -294,30 +503,84 @@ impl ProgressSink for StateProgress {
         state.buffered_pages = snapshot.buffered_pages;
         state.window_saturated = snapshot.window_saturated;
         state.in_flight = snapshot.in_flight;
+        state.concurrency = snapshot.concurrency;
+        state.rate_limited = snapshot.rate_limited;
+        state.hedges_issued = snapshot.hedges_issued;
+        state.hedges_won = snapshot.hedges_won;
+        for (stats, source) in state.sources.iter_mut().zip(snapshot.sources) {
+            stats.in_flight = source.in_flight;
+            stats.failures = source.failures;
+            stats.disabled = source.disabled;
+            stats.received_bytes = source.received_bytes;
+            stats.throughput = source.throughput;
+            stats.latency = source.latency.map(|latency| latency.as_secs_f64());
+        }
     }
 }
 
+/// Scheduling knobs of one transfer, validated at the Python boundary.
+struct TransferTuning {
+    workers: usize,
+    block_size: usize,
+    adaptive_workers: bool,
+    adaptive_block_size: bool,
+    hedged_requests: bool,
+    /// Streams per-worker regions that idle workers split, instead of fixed blocks.
+    work_stealing: bool,
+    /// Writes each range at its offset instead of through the ordered window.
+    positional_writes: bool,
+    /// Writes the ordered stream into a pipe, without a journal or resume.
+    streaming: bool,
+    /// Hashes the committed bytes as they are written.
+    hash: Option<HashAlgorithm>,
+    max_attempts: usize,
+    attempt_timeout: Duration,
+    source_cooldown: Duration,
+}
+
 #[allow(clippy::too_many_arguments)]
 fn start_transfer_with_session(
     session: &Session,
+    health: SourceHealthMemory,
     sources: Vec<String>,
     target: PathBuf,
-    expected_size: u64,
+    identity: Option<ResourceIdentity>,
     overwrite: bool,
-    workers: usize,
-    block_size: usize,
+    tuning: TransferTuning,
     worker_limit: Option<WorkerLimit>,
+    rate_limit: Option<RateLimit>,
+    memory_budget: Option<MemoryBudget>,
+    group: Option<Arc<GroupShared>>,
 ) -> PyResult<TransferHandle> {
     if sources.is_empty() {
         return Err(PyValueError::new_err("at least one source is required"));
     }
-    if workers == 0 {
+    if tuning.workers == 0 {
         return Err(PyValueError::new_err("workers must be at least 1"));
     }
-    if block_size == 0 {
+    if tuning.block_size == 0 {
         return Err(PyValueError::new_err("block_size must be at least 1"));
     }
-    let spec = transfer_spec(expected_size, workers, block_size);
+    if tuning.max_attempts == 0 {
+        return Err(PyValueError::new_err("max_attempts must be at least 1"));
+    }
+    if tuning.streaming && tuning.positional_writes {
+        return Err(PyValueError::new_err(
+            "streaming transfers must write in order, not at offsets",
+        ));
+    }
+    if tuning.hash.is_some() && tuning.positional_writes {
+        return Err(PyValueError::new_err(
+            "hashed transfers must write in order, not at offsets",
+        ));
+    }
+    // An unknown size is learned from the first range response.
+    let expected_size = identity.as_ref().map_or(0, |identity| identity.size);
+    let spec = transfer_spec(expected_size, &tuning);
+    let adaptive = tuning.adaptive_workers.then(AdaptiveConcurrency::new);
+    let block_sizing = tuning.adaptive_block_size.then(AdaptiveBlockSize::new);
+    let hedging = tuning.hedged_requests.then(HedgePolicy::new);
+    let work_stealing = tuning.work_stealing.then(WorkStealing::new);
     let client = session.client().map_err(session_error_to_py)?;
 
     let cancellation = CancellationToken::new();
@@ -332,10 +595,24 @@ fn start_transfer_with_session(
         buffered_pages: 0,
         window_saturated: false,
         in_flight: 0,
+        concurrency: 0,
+        rate_limited: false,
+        hedges_issued: 0,
+        hedges_won: 0,
+        sources: sources
+            .iter()
+            .cloned()
+            .map(TransferSourceStats::new)
+            .collect(),
+        digest: None,
         outcome: TransferOutcome::Running,
     }));
+    let joint = group.as_ref().and_then(|group| group.joint.clone());
+    if let Some(group) = group {
+        group.join(state.clone(), completion.clone());
+    }
     let task_state = state.clone();
-    pyo3_async_runtimes::tokio::get_runtime().spawn(async move {
+    runtime::get_runtime().spawn(async move {
         let result = run_transfer(TransferArgs {
             client,
             sources,
@@ -343,19 +620,32 @@ fn start_transfer_with_session(
             overwrite,
             spec,
             worker_limit,
+            rate_limit,
+            memory_budget,
+            adaptive,
+            block_sizing,
+            hedging,
+            work_stealing,
+            joint,
+            positional_writes: tuning.positional_writes,
+            streaming: tuning.streaming,
+            hash: tuning.hash,
+            health,
+            identity,
             cancellation: task_cancellation.clone(),
             state: task_state.clone(),
         })
         .await;
-        let outcome = match result {
-            Ok(committed) => TransferOutcome::Completed(committed),
+        let mut state = task_state.lock().expect("transfer state lock poisoned");
+        state.outcome = match result {
+            Ok(report) => {
+                state.digest = report.digest.map(|digest| digest.to_string());
+                TransferOutcome::Completed(report.committed_bytes)
+            }
             Err(_error) if task_cancellation.is_cancelled() => TransferOutcome::Cancelled,
             Err(error) => TransferOutcome::Failed(error),
         };
-        task_state
-            .lock()
-            .expect("transfer state lock poisoned")
-            .outcome = outcome;
+        drop(state);
         task_completion.cancel();
     });
 
@@ -373,35 +663,92 @@ struct TransferArgs {
     overwrite: bool,
     spec: DownloadSpec,
     worker_limit: Option<WorkerLimit>,
+    rate_limit: Option<RateLimit>,
+    memory_budget: Option<MemoryBudget>,
+    adaptive: Option<AdaptiveConcurrency>,
+    block_sizing: Option<AdaptiveBlockSize>,
+    hedging: Option<HedgePolicy>,
+    work_stealing: Option<WorkStealing>,
+    joint: Option<JointSchedule>,
+    positional_writes: bool,
+    streaming: bool,
+    hash: Option<HashAlgorithm>,
+    health: SourceHealthMemory,
     cancellation: CancellationToken,
+    identity: Option<ResourceIdentity>,
     state: Arc<Mutex<TransferState>>,
 }
 
-async fn run_transfer(args: TransferArgs) -> Result<u64, String> {
-    let sources = args
+async fn run_transfer(mut args: TransferArgs) -> Result<DownloadReport, String> {
+    let urls = args
         .sources
+        .iter()
+        .map(|source| Url::parse(source).map_err(|error| format!("invalid source URL: {error}")))
+        .collect::<Result<Vec<_>, String>>()?;
+    let hosts = urls
+        .iter()
+        .map(|url| url.host_str().unwrap_or_default().to_owned())
+        .collect();
+    let (identity, opened) = match args.identity.take() {
+        Some(identity) => (identity, None),
+        None => {
+            let (identity, opened) = open_first_range_with_retries(&args, &urls).await?;
+            (identity, Some(opened))
+        }
+    };
+    args.spec.expected_size = identity.size;
+    args.state
+        .lock()
+        .expect("transfer state lock poisoned")
+        .expected_bytes = identity.size;
+    let sources = urls
         .into_iter()
-        .map(|source| {
-            let url =
-                Url::parse(&source).map_err(|error| format!("invalid source URL: {error}"))?;
-            Ok(Arc::new(HttpRangeSource::new(
+        .map(|url| {
+            Arc::new(HttpRangeSource::new(
                 args.client.clone(),
                 url,
                 Default::default(),
-                args.spec.expected_size,
-            )) as Arc<dyn haya::RangeSource>)
+                identity.size,
+            )) as Arc<dyn haya::RangeSource>
         })
-        .collect::<Result<Vec<_>, String>>()?;
+        .collect();
     let mode = if args.overwrite {
         FileOpenMode::Overwrite
     } else {
         FileOpenMode::ResumeFromLength
     };
-    let sink = Arc::new(
-        FileSink::open(args.target, mode)
-            .await
-            .map_err(|error| error.to_string())?,
-    );
+    let sink: Arc<dyn CommitSink> = if args.streaming {
+        // A pipe can neither seek nor be resumed. The plain sink without a
+        // journal appends in order and never seeks while appends succeed.
+        let options = FileSinkOptions {
+            hash: args.hash,
+            ..FileSinkOptions::default()
+        };
+        Arc::new(
+            FileSink::open_with(args.target, FileOpenMode::Overwrite, options)
+                .await
+                .map_err(|error| error.to_string())?,
+        )
+    } else if args.positional_writes {
+        Arc::new(
+            PositionalFileSink::open(args.target, mode, identity)
+                .await
+                .map_err(|error| error.to_string())?,
+        )
+    } else {
+        // Concurrent transfers would otherwise share the blocking pool for
+        // every committed batch.
+        let options = FileSinkOptions {
+            backend: FileBackend::WriterThread,
+            hash: args.hash,
+            ..FileSinkOptions::default()
+        };
+        Arc::new(
+            FileSink::open_journaled_with(args.target, mode, identity, options)
+                .await
+                .map_err(|error| error.to_string())?,
+        )
+    };
     let committed = sink
         .committed_offset()
         .await
@@ -417,24 +764,102 @@ async fn run_transfer(args: TransferArgs) -> Result<u64, String> {
     let mut downloader = Downloader::new(args.spec, sources, sink.clone())
         .map_err(|error| error.to_string())?
         .with_progress_sink(progress)
-        .with_cancellation_token(args.cancellation);
+        .with_cancellation_token(args.cancellation)
+        .with_health_memory(args.health, hosts);
     if let Some(worker_limit) = args.worker_limit {
         downloader = downloader.with_worker_limit(worker_limit);
     }
+    if let Some(rate_limit) = args.rate_limit {
+        downloader = downloader.with_rate_limit(rate_limit);
+    }
+    if let Some(memory_budget) = args.memory_budget {
+        downloader = downloader.with_memory_budget(memory_budget);
+    }
+    if let Some(adaptive) = args.adaptive {
+        downloader = downloader.with_adaptive_concurrency(adaptive);
+    }
+    if let Some(block_sizing) = args.block_sizing {
+        downloader = downloader.with_adaptive_block_size(block_sizing);
+    }
+    if let Some(hedging) = args.hedging {
+        downloader = downloader.with_hedging(hedging);
+    }
+    if let Some(work_stealing) = args.work_stealing {
+        downloader = downloader.with_work_stealing(work_stealing);
+    }
+    if let Some(joint) = args.joint {
+        downloader = downloader.with_joint_schedule(joint);
+    }
+    // A resumed sink usually starts past the opened range, which the
+    // downloader then drops unread.
+    if let Some(opened) = opened {
+        downloader = downloader.with_opened_range(opened);
+    }
     let result = downloader.run().await;
     let close_result = sink.close().await;
     match (result, close_result) {
-        (Ok(report), Ok(())) => Ok(report.committed_bytes),
+        (Ok(report), Ok(())) => Ok(report),
         (Err(error), _) => Err(error.to_string()),
         (Ok(_), Err(error)) => Err(error.to_string()),
     }
 }
 
-fn transfer_spec(expected_size: u64, workers: usize, requested_block_size: usize) -> DownloadSpec {
+/// How long the first range waits for one mirror before also asking the next.
+const FIRST_RANGE_STAGGER: Duration = Duration::from_millis(300);
+
+/// Opens the first block on whichever source answers first, retrying the
+/// whole race after the source cooldown when every source fails.
+///
+/// A file with a resumable journal is continued at its committed offset, so
+/// the first block starts there instead of fetching bytes already written.
+async fn open_first_range_with_retries(
+    args: &TransferArgs,
+    urls: &[Url],
+) -> Result<(ResourceIdentity, OpenedRange), String> {
+    // The first block must be whole pages of the ordered window to be read.
+    let page = args.spec.page_size as u64;
+    let len = (args.spec.block_size as u64)
+        .div_ceil(page)
+        .min(args.spec.window_pages as u64)
+        * page;
+    let mut start = if args.overwrite || args.streaming {
+        0
+    } else {
+        journaled_offset(&args.target).await
+    };
+    let mut attempt = 1;
+    loop {
+        let requested = ByteRange::new(start, start + len).expect("the first block is not empty");
+        let result = tokio::select! {
+            biased;
+            _ = args.cancellation.cancelled() => return Err("transfer was cancelled".into()),
+            result = open_first_range(&args.client, urls, &HeaderMap::new(), requested, FIRST_RANGE_STAGGER) => result,
+        };
+        match result {
+            Ok(opened) => return Ok(opened),
+            Err(error) if attempt >= args.spec.max_attempts => {
+                return Err(format!("failed to open the first range: {error}"));
+            }
+            Err(_) => {}
+        }
+        // The resource may have shrunk below the journal, so retries start over.
+        start = 0;
+        attempt += 1;
+        tokio::select! {
+            biased;
+            _ = args.cancellation.cancelled() => return Err("transfer was cancelled".into()),
+            _ = tokio::time::sleep(args.spec.source_cooldown) => {}
+        }
+    }
+}
+
+fn transfer_spec(expected_size: u64, tuning: &TransferTuning) -> DownloadSpec {
     let mut spec = DownloadSpec::new(expected_size);
-    spec.block_size = requested_block_size;
-    spec.workers = workers;
-    spec.source_cooldown = Duration::from_millis(500);
+    spec.block_size = tuning.block_size;
+    spec.workers = tuning.workers;
+    spec.max_attempts = tuning.max_attempts;
+    spec.attempt_timeout = tuning.attempt_timeout;
+    spec.source_cooldown = tuning.source_cooldown;
     spec
 }
 
@@ -461,14 +886,81 @@ fn session_error_to_py(error: SessionError) -> PyErr {
     }
 }
 
+/// Merges fragmented MP4 tracks into `output` on a blocking thread, so
+/// neither the event loop nor the GIL waits for the copy.
+///
+/// Inputs the native remuxer does not support raise `RemuxError`, and the
+/// caller is expected to fall back to FFmpeg.
+#[pyfunction]
+#[pyo3(signature = (output, *, video=None, audio=None, title=None, chapters=None, cover=None, hvc1_tag=false))]
+#[allow(clippy::too_many_arguments)]
+fn remux_mp4<'py>(
+    py: Python<'py>,
+    output: PathBuf,
+    video: Option<PathBuf>,
+    audio: Option<PathBuf>,
+    title: Option<String>,
+    chapters: Option<Vec<(f64, String)>>,
+    cover: Option<PathBuf>,
+    hvc1_tag: bool,
+) -> PyResult<Bound<'py, PyAny>> {
+    let chapters = chapters
+        .unwrap_or_default()
+        .into_iter()
+        .map(|(start, title)| {
+            let start = Duration::try_from_secs_f64(start).map_err(|error| {
+                PyValueError::new_err(format!("invalid chapter start: {error}"))
+            })?;
+            Ok(Chapter { start, title })
+        })
+        .collect::<PyResult<Vec<_>>>()?;
+    runtime::future_into_py(py, async move {
+        let cover = match cover {
+            Some(path) => Some(
+                tokio::fs::read(&path)
+                    .await
+                    .map_err(|error| RemuxError::new_err(error.to_string()))?,
+            ),
+            None => None,
+        };
+        let options = RemuxOptions {
+            video,
+            audio,
+            title,
+            chapters,
+            cover,
+            hvc1_tag,
+        };
+        // Dropping this future, as cancelling the Python awaitable does,
+        // stops the copy at the next chunk.
+        let cancellation = CancellationToken::new();
+        let _cancel_on_drop = cancellation.clone().drop_guard();
+        tokio::task::spawn_blocking(move || {
+            remux::remux(&output, &options, || cancellation.is_cancelled())
+        })
+        .await
+        .map_err(|error| PyRuntimeError::new_err(error.to_string()))?
+        .map(|_| ())
+        .map_err(|error| RemuxError::new_err(error.to_string()))
+    })
+}
+
 #[pymodule(gil_used = false)]
 #[pyo3(name = "_core")]
 fn yutto(module: &Bound<'_, PyModule>) -> PyResult<()> {
+    // Only used if `configure_runtime` is not called before the first native call.
+    pyo3_async_runtimes::tokio::init(runtime::runtime_builder());
     module.add_class::<YuttoSession>()?;
     module.add_class::<NativeResponse>()?;
     module.add_class::<TransferHandle>()?;
+    module.add_class::<TransferGroup>()?;
+    module.add_class::<TransferGroupProgress>()?;
     module.add_class::<TransferWorkerLimit>()?;
+    module.add_class::<TransferRateLimit>()?;
+    module.add_class::<TransferMemoryBudget>()?;
     module.add_class::<TransferSnapshot>()?;
+    module.add_class::<TransferSourceStats>()?;
+    module.add_class::<RuntimeStats>()?;
     module.add("HttpError", module.py().get_type::<HttpError>())?;
     module.add("InvalidUrlError", module.py().get_type::<InvalidUrlError>())?;
     module.add(
@@ -488,21 +980,46 @@ fn yutto(module: &Bound<'_, PyModule>) -> PyResult<()> {
         "SessionClosedError",
         module.py().get_type::<SessionClosedError>(),
     )?;
+    module.add("RemuxError", module.py().get_type::<RemuxError>())?;
+    module.add_function(wrap_pyfunction!(remux_mp4, module)?)?;
+    module.add_function(wrap_pyfunction!(configure_runtime, module)?)?;
+    module.add_function(wrap_pyfunction!(runtime_stats, module)?)?;
     Ok(())
 }
 
 #[cfg(test)]
 mod tests {
+    use std::time::Duration;
+
     use haya::DownloadSpec;
 
-    use super::transfer_spec;
+    use super::{TransferTuning, transfer_spec};
 
     #[test]
     fn transfer_configuration_keeps_the_fixed_ordered_window() {
-        let spec = transfer_spec(1024, 100, 64 * 1024 * 1024);
+        let spec = transfer_spec(
+            1024,
+            &TransferTuning {
+                workers: 100,
+                block_size: 64 * 1024 * 1024,
+                adaptive_workers: false,
+                adaptive_block_size: false,
+                hedged_requests: false,
+                work_stealing: false,
+                positional_writes: false,
+                streaming: false,
+                hash: None,
+                max_attempts: 5,
+                attempt_timeout: Duration::from_secs(10),
+                source_cooldown: Duration::from_millis(200),
+            },
+        );
 
         assert_eq!(spec.block_size, 64 * 1024 * 1024);
         assert_eq!(spec.window_pages, DownloadSpec::DEFAULT_WINDOW_PAGES);
         assert_eq!(spec.workers, 100);
+        assert_eq!(spec.max_attempts, 5);
+        assert_eq!(spec.attempt_timeout, Duration::from_secs(10));
+        assert_eq!(spec.source_cooldown, Duration::from_millis(200));
     }
 }
@@ -0,0 +1,221 @@
+//! Reading and writing ISO base media file format boxes.
+
+use std::io::{self, Read, Seek, SeekFrom};
+
+pub(super) type FourCc = [u8; 4];
+
+pub(super) fn malformed(what: &str) -> io::Error {
+    io::Error::new(io::ErrorKind::InvalidData, format!("malformed {what}"))
+}
+
+/// The header of a box in a file and where its payload lies.
+pub(super) struct BoxHeader {
+    pub kind: FourCc,
+    pub start: u64,
+    pub payload_start: u64,
+    pub end: u64,
+}
+
+/// Reads the header of the box at the file position, or `None` at the end of
+/// the file.
+pub(super) fn read_header(
+    file: &mut (impl Read + Seek),
+    file_len: u64,
+) -> io::Result<Option<BoxHeader>> {
+    let start = file.stream_position()?;
+    if start >= file_len {
+        return Ok(None);
+    }
+    let mut header = [0; 8];
+    file.read_exact(&mut header)?;
+    let size = u32::from_be_bytes(header[..4].try_into().expect("four bytes"));
+    let kind = header[4..].try_into().expect("four bytes");
+    let (size, header_len) = match size {
+        0 => (file_len - start, 8),
+        1 => {
+            let mut large = [0; 8];
+            file.read_exact(&mut large)?;
+            (u64::from_be_bytes(large), 16)
+        }
+        size => (u64::from(size), 8),
+    };
+    let end = start
+        .checked_add(size)
+        .filter(|end| size >= header_len && *end <= file_len)
+        .ok_or_else(|| malformed("box size"))?;
+    Ok(Some(BoxHeader {
+        kind,
+        start,
+        payload_start: start + header_len,
+        end,
+    }))
+}
+
+/// Reads the payload of `header` into memory and leaves the file after it.
+pub(super) fn read_payload(
+    file: &mut (impl Read + Seek),
+    header: &BoxHeader,
+) -> io::Result<Vec<u8>> {
+    let len =
+        usize::try_from(header.end - header.payload_start).map_err(|_| malformed("box size"))?;
+    let mut payload = vec![0; len];
+    file.seek(SeekFrom::Start(header.payload_start))?;
+    file.read_exact(&mut payload)?;
+    Ok(payload)
+}
+
+/// A box held in memory, as a child of another one.
+pub(super) struct Child<'a> {
+    pub kind: FourCc,
+    /// The whole box, header included.
+    pub raw: &'a [u8],
+    pub payload: &'a [u8],
+}
+
+/// Splits the payload of a container box into its children.
+pub(super) fn children(mut data: &[u8]) -> io::Result<Vec<Child<'_>>> {
+    let mut children = Vec::new();
+    while !data.is_empty() {
+        let mut reader = Reader::new(data);
+        let size = reader.u32()?;
+        let kind = reader.four_cc()?;
+        let (size, header_len) = match size {
+            0 => (data.len() as u64, 8),
+            1 => (reader.u64()?, 16),
+            size => (u64::from(size), 8),
+        };
+        let size = usize::try_from(size)
+            .ok()
+            .filter(|size| *size >= header_len && *size <= data.len())
+            .ok_or_else(|| malformed("box size"))?;
+        children.push(Child {
+            kind,
+            raw: &data[..size],
+            payload: &data[header_len..size],
+        });
+        data = &data[size..];
+    }
+    Ok(children)
+}
+
+pub(super) fn find<'a, 'b>(children: &'b [Child<'a>], kind: &FourCc) -> Option<&'b Child<'a>> {
+    children.iter().find(|child| &child.kind == kind)
+}
+
+pub(super) fn require<'a, 'b>(
+    children: &'b [Child<'a>],
+    kind: &FourCc,
+) -> io::Result<&'b Child<'a>> {
+    find(children, kind).ok_or_else(|| {
+        io::Error::new(
+            io::ErrorKind::InvalidData,
+            format!("missing {} box", String::from_utf8_lossy(kind)),
+        )
+    })
+}
+
+/// A big-endian cursor over an in-memory payload.
+pub(super) struct Reader<'a> {
+    data: &'a [u8],
+}
+
+impl<'a> Reader<'a> {
+    pub fn new(data: &'a [u8]) -> Self {
+        Self { data }
+    }
+
+    pub fn bytes(&mut self, len: usize) -> io::Result<&'a [u8]> {
+        if len > self.data.len() {
+            return Err(malformed("box payload"));
+        }
+        let (bytes, rest) = self.data.split_at(len);
+        self.data = rest;
+        Ok(bytes)
+    }
+
+    pub fn skip(&mut self, len: usize) -> io::Result<()> {
+        self.bytes(len).map(|_| ())
+    }
+
+    pub fn u32(&mut self) -> io::Result<u32> {
+        Ok(u32::from_be_bytes(self.array()?))
+    }
+
+    pub fn u64(&mut self) -> io::Result<u64> {
+        Ok(u64::from_be_bytes(self.array()?))
+    }
+
+    pub fn i32(&mut self) -> io::Result<i32> {
+        Ok(i32::from_be_bytes(self.array()?))
+    }
+
+    pub fn four_cc(&mut self) -> io::Result<FourCc> {
+        self.array()
+    }
+
+    /// Reads the version and flags of a full box.
+    pub fn version_and_flags(&mut self) -> io::Result<(u8, u32)> {
+        let word = self.u32()?;
+        Ok(((word >> 24) as u8, word & 0x00ff_ffff))
+    }
+
+    fn array<const N: usize>(&mut self) -> io::Result<[u8; N]> {
+        Ok(self.bytes(N)?.try_into().expect("exact length"))
+    }
+}
+
+/// Builds boxes in memory, filling in each size once its contents are known.
+#[derive(Default)]
+pub(super) struct BoxWriter {
+    data: Vec<u8>,
+}
+
+impl BoxWriter {
+    pub fn into_inner(self) -> Vec<u8> {
+        self.data
+    }
+
+    pub fn container(&mut self, kind: &FourCc, body: impl FnOnce(&mut Self)) {
+        let start = self.data.len();
+        self.u32(0);
+        self.bytes(kind);
+        body(self);
+        let size = u32::try_from(self.data.len() - start).expect("box fits in 4 GiB");
+        self.data[start..start + 4].copy_from_slice(&size.to_be_bytes());
+    }
+
+    pub fn full(&mut self, kind: &FourCc, version: u8, flags: u32, body: impl FnOnce(&mut Self)) {
+        self.container(kind, |writer| {
+            writer.u32(u32::from(version) << 24 | flags);
+            body(writer);
+        });
+    }
+
+    pub fn bytes(&mut self, bytes: &[u8]) {
+        self.data.extend_from_slice(bytes);
+    }
+
+    pub fn u8(&mut self, value: u8) {
+        self.data.push(value);
+    }
+
+    pub fn u16(&mut self, value: u16) {
+        self.bytes(&value.to_be_bytes());
+    }
+
+    pub fn u32(&mut self, value: u32) {
+        self.bytes(&value.to_be_bytes());
+    }
+
+    pub fn u64(&mut self, value: u64) {
+        self.bytes(&value.to_be_bytes());
+    }
+
+    pub fn i32(&mut self, value: i32) {
+        self.bytes(&value.to_be_bytes());
+    }
+
+    pub fn i64(&mut self, value: i64) {
+        self.bytes(&value.to_be_bytes());
+    }
+}
@@ -0,0 +1,402 @@
+//! Indexing the samples of a fragmented MP4 track without reading its media.
+
+use std::{
+    fs::File,
+    io::{self, Seek, SeekFrom},
+    path::Path,
+};
+
+use super::{
+    RemuxError,
+    boxes::{Child, Reader, children, find, malformed, read_header, read_payload, require},
+};
+
+const TFHD_BASE_DATA_OFFSET: u32 = 0x1;
+const TFHD_SAMPLE_DESCRIPTION_INDEX: u32 = 0x2;
+const TFHD_DEFAULT_SAMPLE_DURATION: u32 = 0x8;
+const TFHD_DEFAULT_SAMPLE_SIZE: u32 = 0x10;
+const TFHD_DEFAULT_SAMPLE_FLAGS: u32 = 0x20;
+
+const TRUN_DATA_OFFSET: u32 = 0x1;
+const TRUN_FIRST_SAMPLE_FLAGS: u32 = 0x4;
+const TRUN_SAMPLE_DURATION: u32 = 0x100;
+const TRUN_SAMPLE_SIZE: u32 = 0x200;
+const TRUN_SAMPLE_FLAGS: u32 = 0x400;
+const TRUN_COMPOSITION_OFFSET: u32 = 0x800;
+
+const SAMPLE_IS_NON_SYNC: u32 = 0x1_0000;
+
+#[derive(Clone, Copy, Debug, Eq, PartialEq)]
+pub(super) struct Sample {
+    pub size: u32,
+    pub duration: u32,
+    pub composition_offset: i32,
+    pub sync: bool,
+}
+
+/// The samples of one track run, which lie back to back in the input.
+#[derive(Clone, Copy, Debug, Eq, PartialEq)]
+pub(super) struct Chunk {
+    pub offset: u64,
+    pub size: u64,
+    pub first_sample: usize,
+    pub sample_count: usize,
+    pub decode_time: u64,
+}
+
+/// An entry of the track's edit list, in the timescales of the input.
+#[derive(Clone, Copy, Debug, Eq, PartialEq)]
+pub(super) struct Edit {
+    /// Zero in fragmented files means the rest of the media.
+    pub duration: u64,
+    /// `-1` for an empty edit.
+    pub media_time: i64,
+}
+
+/// The single track of a fragmented MP4 file, with its samples flattened.
+pub(super) struct FragmentedTrack {
+    pub movie_timescale: u32,
+    pub timescale: u32,
+    /// Payloads of the boxes copied into the output.
+    pub tkhd: Vec<u8>,
+    pub mdhd: Vec<u8>,
+    pub hdlr: Vec<u8>,
+    /// The whole `vmhd`, `smhd` or other media header box.
+    pub media_header: Vec<u8>,
+    /// The whole `dinf` box.
+    pub dinf: Option<Vec<u8>>,
+    pub stsd: Vec<u8>,
+    pub edits: Vec<Edit>,
+    pub samples: Vec<Sample>,
+    pub chunks: Vec<Chunk>,
+}
+
+impl FragmentedTrack {
+    pub fn media_duration(&self) -> u64 {
+        self.samples
+            .iter()
+            .map(|sample| u64::from(sample.duration))
+            .sum()
+    }
+}
+
+struct TrackDefaults {
+    track_id: u32,
+    sample_duration: u32,
+    sample_size: u32,
+    sample_flags: u32,
+}
+
+/// Indexes the track stored in the fragmented MP4 file at `path`.
+pub(super) fn read_track(path: &Path) -> Result<FragmentedTrack, RemuxError> {
+    let mut file = File::open(path)?;
+    let file_len = file.metadata()?.len();
+    let mut track = None;
+    while let Some(header) = read_header(&mut file, file_len)? {
+        match &header.kind {
+            b"moov" if track.is_none() => {
+                track = Some(read_movie(&read_payload(&mut file, &header)?)?);
+            }
+            b"moov" => return Err(unsupported("more than one moov box")),
+            b"moof" => {
+                let Some((track, defaults)) = &mut track else {
+                    return Err(unsupported("fragments before the moov box"));
+                };
+                let payload = read_payload(&mut file, &header)?;
+                read_fragment(track, defaults, &payload, header.start, file_len)?;
+            }
+            _ => {}
+        }
+        file.seek(SeekFrom::Start(header.end))?;
+    }
+    let (track, _) = track.ok_or_else(|| unsupported("no moov box"))?;
+    if track.samples.is_empty() {
+        return Err(unsupported("track without samples"));
+    }
+    Ok(track)
+}
+
+fn unsupported(what: &str) -> RemuxError {
+    RemuxError::Unsupported(what.to_owned())
+}
+
+fn read_movie(payload: &[u8]) -> Result<(FragmentedTrack, TrackDefaults), RemuxError> {
+    let boxes = children(payload)?;
+    let movie_timescale = {
+        let mut mvhd = Reader::new(require(&boxes, b"mvhd")?.payload);
+        let (version, _) = mvhd.version_and_flags()?;
+        mvhd.skip(if version == 1 { 16 } else { 8 })?;
+        mvhd.u32()?
+    };
+    let mut traks = boxes.iter().filter(|child| &child.kind == b"trak");
+    let (Some(trak), None) = (traks.next(), traks.next()) else {
+        return Err(unsupported("not exactly one track"));
+    };
+    let mvex = find(&boxes, b"mvex").ok_or_else(|| unsupported("unfragmented file"))?;
+
+    let trak = children(trak.payload)?;
+    let tkhd = require(&trak, b"tkhd")?.payload;
+    check_full_box_len(tkhd, 84, 96, "tkhd box")?;
+    let track_id = {
+        let mut reader = Reader::new(tkhd);
+        let (version, _) = reader.version_and_flags()?;
+        reader.skip(if version == 1 { 16 } else { 8 })?;
+        reader.u32()?
+    };
+    let edits = match find(&trak, b"edts") {
+        Some(edts) => read_edits(require(&children(edts.payload)?, b"elst")?)?,
+        None => Vec::new(),
+    };
+    let mdia = children(require(&trak, b"mdia")?.payload)?;
+    let mdhd = require(&mdia, b"mdhd")?.payload;
+    check_full_box_len(mdhd, 24, 36, "mdhd box")?;
+    let timescale = {
+        let mut reader = Reader::new(mdhd);
+        let (version, _) = reader.version_and_flags()?;
+        reader.skip(if version == 1 { 16 } else { 8 })?;
+        reader.u32()?
+    };
+    if timescale == 0 || movie_timescale == 0 {
+        return Err(malformed("timescale").into());
+    }
+    let hdlr = require(&mdia, b"hdlr")?;
+    if hdlr.payload.len() < 12 {
+        return Err(malformed("hdlr box").into());
+    }
+    let minf = children(require(&mdia, b"minf")?.payload)?;
+    let media_header = minf
+        .iter()
+        .find(|child| child.kind.ends_with(b"mhd"))
+        .ok_or_else(|| malformed("minf box"))?;
+    let stbl = children(require(&minf, b"stbl")?.payload)?;
+    let stsd = require(&stbl, b"stsd")?;
+    check_sample_description(stsd.payload)?;
+    for table in [b"stsz", b"stz2"] {
+        if let Some(table) = find(&stbl, table) {
+            let mut reader = Reader::new(table.payload);
+            reader.skip(8)?;
+            if reader.u32()? != 0 {
+                return Err(unsupported("samples outside of fragments"));
+            }
+        }
+    }
+
+    let mut defaults = None;
+    for trex in children(mvex.payload)?
+        .iter()
+        .filter(|child| &child.kind == b"trex")
+    {
+        let trex = read_trex(trex.payload)?;
+        if trex.track_id == track_id {
+            defaults = Some(trex);
+            break;
+        }
+    }
+    let defaults = defaults.ok_or_else(|| malformed("mvex box"))?;
+
+    let track = FragmentedTrack {
+        movie_timescale,
+        timescale,
+        tkhd: tkhd.to_vec(),
+        mdhd: mdhd.to_vec(),
+        hdlr: hdlr.payload.to_vec(),
+        media_header: media_header.raw.to_vec(),
+        dinf: find(&minf, b"dinf").map(|dinf| dinf.raw.to_vec()),
+        stsd: stsd.payload.to_vec(),
+        edits,
+        samples: Vec::new(),
+        chunks: Vec::new(),
+    };
+    Ok((track, defaults))
+}
+
+/// Checks that a box which is copied field by field has the size its version
+/// implies.
+fn check_full_box_len(payload: &[u8], v0: usize, v1: usize, what: &str) -> io::Result<()> {
+    let expected = match payload.first() {
+        Some(0) => v0,
+        Some(1) => v1,
+        _ => return Err(malformed(what)),
+    };
+    if payload.len() != expected {
+        return Err(malformed(what));
+    }
+    Ok(())
+}
+
+fn check_sample_description(payload: &[u8]) -> Result<(), RemuxError> {
+    let mut reader = Reader::new(payload);
+    reader.skip(4)?;
+    if reader.u32()? != 1 {
+        return Err(unsupported("not exactly one sample description"));
+    }
+    reader.skip(4)?;
+    let format = reader.four_cc()?;
+    if format.starts_with(b"enc") {
+        return Err(unsupported("encrypted track"));
+    }
+    Ok(())
+}
+
+fn read_edits(elst: &Child<'_>) -> Result<Vec<Edit>, RemuxError> {
+    let mut reader = Reader::new(elst.payload);
+    let (version, _) = reader.version_and_flags()?;
+    let count = reader.u32()?;
+    let mut edits = Vec::new();
+    for _ in 0..count {
+        let (duration, media_time) = if version == 1 {
+            (reader.u64()?, reader.u64()? as i64)
+        } else {
+            (u64::from(reader.u32()?), i64::from(reader.i32()?))
+        };
+        let rate = reader.u32()?;
+        if media_time != -1 && rate != 0x0001_0000 {
+            return Err(unsupported("edit with a playback rate"));
+        }
+        edits.push(Edit {
+            duration,
+            media_time,
+        });
+    }
+    Ok(edits)
+}
+
+fn read_trex(payload: &[u8]) -> io::Result<TrackDefaults> {
+    let mut reader = Reader::new(payload);
+    reader.version_and_flags()?;
+    let track_id = reader.u32()?;
+    let _description_index = reader.u32()?;
+    Ok(TrackDefaults {
+        track_id,
+        sample_duration: reader.u32()?,
+        sample_size: reader.u32()?,
+        sample_flags: reader.u32()?,
+    })
+}
+
+fn read_fragment(
+    track: &mut FragmentedTrack,
+    defaults: &TrackDefaults,
+    payload: &[u8],
+    moof_start: u64,
+    file_len: u64,
+) -> Result<(), RemuxError> {
+    let boxes = children(payload)?;
+    let mut trafs = boxes.iter().filter(|child| &child.kind == b"traf");
+    let (Some(traf), None) = (trafs.next(), trafs.next()) else {
+        return Err(unsupported("not exactly one track fragment"));
+    };
+    let traf = children(traf.payload)?;
+
+    let mut tfhd = Reader::new(require(&traf, b"tfhd")?.payload);
+    let (_, flags) = tfhd.version_and_flags()?;
+    if tfhd.u32()? != defaults.track_id {
+        return Err(malformed("tfhd box").into());
+    }
+    let base_offset = if flags & TFHD_BASE_DATA_OFFSET != 0 {
+        tfhd.u64()?
+    } else {
+        moof_start
+    };
+    if flags & TFHD_SAMPLE_DESCRIPTION_INDEX != 0 && tfhd.u32()? != 1 {
+        return Err(unsupported("several sample descriptions"));
+    }
+    let mut read_default = |flag: u32, fallback: u32| {
+        if flags & flag != 0 {
+            tfhd.u32()
+        } else {
+            Ok(fallback)
+        }
+    };
+    let default_duration = read_default(TFHD_DEFAULT_SAMPLE_DURATION, defaults.sample_duration)?;
+    let default_size = read_default(TFHD_DEFAULT_SAMPLE_SIZE, defaults.sample_size)?;
+    let default_flags = read_default(TFHD_DEFAULT_SAMPLE_FLAGS, defaults.sample_flags)?;
+
+    let mut decode_time = track.media_duration();
+    if let Some(tfdt) = find(&traf, b"tfdt") {
+        let mut reader = Reader::new(tfdt.payload);
+        let (version, _) = reader.version_and_flags()?;
+        let base = if version == 1 {
+            reader.u64()?
+        } else {
+            u64::from(reader.u32()?)
+        };
+        if base != decode_time {
+            return Err(unsupported(
+                "fragments that do not start at zero or leave gaps",
+            ));
+        }
+    }
+
+    let mut data_offset = base_offset;
+    for trun in traf.iter().filter(|child| &child.kind == b"trun") {
+        let mut reader = Reader::new(trun.payload);
+        let (version, flags) = reader.version_and_flags()?;
+        let count = reader.u32()? as usize;
+        if flags & TRUN_DATA_OFFSET != 0 {
+            data_offset = base_offset
+                .checked_add_signed(i64::from(reader.i32()?))
+                .ok_or_else(|| malformed("trun data offset"))?;
+        }
+        let first_flags = if flags & TRUN_FIRST_SAMPLE_FLAGS != 0 {
+            Some(reader.u32()?)
+        } else {
+            None
+        };
+        let first_sample = track.samples.len();
+        let mut size = 0_u64;
+        for index in 0..count {
+            let duration = if flags & TRUN_SAMPLE_DURATION != 0 {
+                reader.u32()?
+            } else {
+                default_duration
+            };
+            let sample_size = if flags & TRUN_SAMPLE_SIZE != 0 {
+                reader.u32()?
+            } else {
+                default_size
+            };
+            let sample_flags = if flags & TRUN_SAMPLE_FLAGS != 0 {
+                reader.u32()?
+            } else if index == 0 {
+                first_flags.unwrap_or(default_flags)
+            } else {
+                default_flags
+            };
+            let composition_offset = if flags & TRUN_COMPOSITION_OFFSET == 0 {
+                0
+            } else if version == 0 {
+                i32::try_from(reader.u32()?)
+                    .map_err(|_| unsupported("composition offset out of range"))?
+            } else {
+                reader.i32()?
+            };
+            track.samples.push(Sample {
+                size: sample_size,
+                duration,
+                composition_offset,
+                sync: sample_flags & SAMPLE_IS_NON_SYNC == 0,
+            });
+            size += u64::from(sample_size);
+        }
+        if count == 0 {
+            continue;
+        }
+        if data_offset
+            .checked_add(size)
+            .is_none_or(|end| end > file_len)
+        {
+            return Err(malformed("trun data offset").into());
+        }
+        track.chunks.push(Chunk {
+            offset: data_offset,
+            size,
+            first_sample,
+            sample_count: count,
+            decode_time,
+        });
+        data_offset += size;
+        decode_time = track.media_duration();
+    }
+    Ok(())
+}
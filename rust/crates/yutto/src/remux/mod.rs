@@ -0,0 +1,907 @@
+//! Merges fragmented MP4 tracks, as served over DASH, into one progressive
+//! MP4 file without re-encoding them.
+//!
+//! Each input is indexed from its `moov` and `moof` boxes alone. The media is
+//! then copied run by run into a single `mdat`, interleaved by decode time,
+//! and followed by a `moov` with ordinary sample tables, so the output is
+//! written once from front to back. Inputs this module does not understand
+//! are rejected with `RemuxError::Unsupported` before any output is created.
+
+use std::{
+    fs::{self, File},
+    io::{self, BufWriter, Read, Seek, SeekFrom, Write},
+    path::{Path, PathBuf},
+    time::Duration,
+};
+
+use boxes::{BoxWriter, FourCc};
+use fragments::{FragmentedTrack, read_track};
+
+mod boxes;
+mod fragments;
+
+/// Timescale of the output movie header and edit lists.
+const MOVIE_TIMESCALE: u32 = 1000;
+/// Buffer between the inputs and the output file.
+const COPY_BUFFER_SIZE: usize = 1024 * 1024;
+/// `tkhd` flags of a track that is enabled and part of the presentation.
+const TRACK_ENABLED_IN_MOVIE: u32 = 0x3;
+/// Nero chapter lists hold at most this many chapters.
+const MAX_CHAPTERS: usize = 255;
+
+#[derive(Clone, Debug, Eq, PartialEq)]
+pub struct Chapter {
+    pub start: Duration,
+    pub title: String,
+}
+
+/// What to merge into the output besides the media itself.
+#[derive(Clone, Debug, Default)]
+pub struct RemuxOptions {
+    pub video: Option<PathBuf>,
+    pub audio: Option<PathBuf>,
+    pub title: Option<String>,
+    pub chapters: Vec<Chapter>,
+    /// A JPEG or PNG image stored as the cover art.
+    pub cover: Option<Vec<u8>>,
+    /// Tags HEVC video as `hvc1` instead of `hev1`, as Apple players require.
+    pub hvc1_tag: bool,
+}
+
+#[derive(Debug, thiserror::Error)]
+pub enum RemuxError {
+    #[error("unsupported input: {0}")]
+    Unsupported(String),
+    #[error("remux was cancelled")]
+    Cancelled,
+    #[error(transparent)]
+    Io(#[from] io::Error),
+}
+
+struct Input {
+    path: PathBuf,
+    track: FragmentedTrack,
+    /// Where each chunk of the track starts in the output.
+    chunk_offsets: Vec<u64>,
+}
+
+/// Merges the tracks of `options` into `output` and returns its size.
+///
+/// `cancelled` is polled between chunks. A remux that fails or is cancelled
+/// after creating `output` removes it again.
+pub fn remux(
+    output: &Path,
+    options: &RemuxOptions,
+    cancelled: impl Fn() -> bool,
+) -> Result<u64, RemuxError> {
+    let mut inputs = Vec::new();
+    for path in [&options.video, &options.audio].into_iter().flatten() {
+        inputs.push(Input {
+            path: path.clone(),
+            track: read_track(path)?,
+            chunk_offsets: Vec::new(),
+        });
+    }
+    if inputs.is_empty() {
+        return Err(RemuxError::Unsupported("no tracks to merge".into()));
+    }
+    if options.hvc1_tag && options.video.is_some() {
+        let format = &mut inputs[0].track.stsd[12..16];
+        if format == b"hev1" {
+            format.copy_from_slice(b"hvc1");
+        }
+    }
+    let cover_format = options.cover.as_deref().map(cover_format).transpose()?;
+
+    let file_type = file_type(output, &inputs);
+    let media_size = inputs
+        .iter()
+        .flat_map(|input| &input.track.chunks)
+        .map(|chunk| chunk.size)
+        .sum::<u64>();
+    let mdat_header = media_header(media_size);
+    let order = interleave(&inputs);
+    let mut offset = (file_type.len() + mdat_header.len()) as u64;
+    for input in &mut inputs {
+        input.chunk_offsets = vec![0; input.track.chunks.len()];
+    }
+    for &(track, chunk) in &order {
+        inputs[track].chunk_offsets[chunk] = offset;
+        offset += inputs[track].track.chunks[chunk].size;
+    }
+    let movie = movie(&inputs, options, cover_format);
+
+    if cancelled() {
+        return Err(RemuxError::Cancelled);
+    }
+    let result = (|| {
+        let mut writer = BufWriter::with_capacity(COPY_BUFFER_SIZE, File::create(output)?);
+        writer.write_all(&file_type)?;
+        writer.write_all(&mdat_header)?;
+        let mut files = inputs
+            .iter()
+            .map(|input| File::open(&input.path))
+            .collect::<io::Result<Vec<_>>>()?;
+        for (track, chunk) in order {
+            if cancelled() {
+                return Err(RemuxError::Cancelled);
+            }
+            let chunk = inputs[track].track.chunks[chunk];
+            let file = &mut files[track];
+            file.seek(SeekFrom::Start(chunk.offset))?;
+            if io::copy(&mut file.take(chunk.size), &mut writer)? != chunk.size {
+                return Err(io::Error::from(io::ErrorKind::UnexpectedEof).into());
+            }
+        }
+        writer.write_all(&movie)?;
+        writer
+            .into_inner()
+            .map_err(io::IntoInnerError::into_error)?;
+        Ok(offset + movie.len() as u64)
+    })();
+    if result.is_err() {
+        let _ = fs::remove_file(output);
+    }
+    result
+}
+
+/// Orders the chunks of all tracks by decode time, keeping each track in order.
+fn interleave(inputs: &[Input]) -> Vec<(usize, usize)> {
+    let mut order = inputs
+        .iter()
+        .enumerate()
+        .flat_map(|(track, input)| (0..input.track.chunks.len()).map(move |chunk| (track, chunk)))
+        .collect::<Vec<_>>();
+    order.sort_by(|&(a, a_chunk), &(b, b_chunk)| {
+        let (a, b) = (&inputs[a].track, &inputs[b].track);
+        let a_time = u128::from(a.chunks[a_chunk].decode_time) * u128::from(b.timescale);
+        let b_time = u128::from(b.chunks[b_chunk].decode_time) * u128::from(a.timescale);
+        a_time.cmp(&b_time)
+    });
+    order
+}
+
+fn cover_format(image: &[u8]) -> Result<u32, RemuxError> {
+    // Well-known types of iTunes metadata values.
+    if image.starts_with(&[0xff, 0xd8, 0xff]) {
+        Ok(13)
+    } else if image.starts_with(b"\x89PNG\r\n\x1a\n") {
+        Ok(14)
+    } else {
+        Err(RemuxError::Unsupported(
+            "cover art is neither JPEG nor PNG".into(),
+        ))
+    }
+}
+
+fn rescale(value: u64, from: u32, to: u32) -> u64 {
+    let scaled = (u128::from(value) * u128::from(to) + u128::from(from) / 2) / u128::from(from);
+    u64::try_from(scaled).unwrap_or(u64::MAX)
+}
+
+fn file_type(output: &Path, inputs: &[Input]) -> Vec<u8> {
+    let audio_file = output
+        .extension()
+        .is_some_and(|extension| extension.eq_ignore_ascii_case("m4a"));
+    let major: &FourCc = if audio_file { b"M4A " } else { b"isom" };
+    let mut writer = BoxWriter::default();
+    writer.container(b"ftyp", |writer| {
+        writer.bytes(major);
+        writer.u32(0x200);
+        writer.bytes(major);
+        writer.bytes(b"isom");
+        writer.bytes(b"iso2");
+        if inputs
+            .iter()
+            .any(|input| &input.track.stsd[12..16] == b"avc1")
+        {
+            writer.bytes(b"avc1");
+        }
+        writer.bytes(b"mp41");
+    });
+    writer.into_inner()
+}
+
+fn media_header(size: u64) -> Vec<u8> {
+    match u32::try_from(size + 8) {
+        Ok(size) => [&size.to_be_bytes()[..], b"mdat"].concat(),
+        Err(_) => [
+            &1_u32.to_be_bytes()[..],
+            b"mdat",
+            &(size + 16).to_be_bytes(),
+        ]
+        .concat(),
+    }
+}
+
+/// The edit list of a track in the movie timescale, with the durations that
+/// fragmented files leave open filled in.
+fn edits(track: &FragmentedTrack) -> Vec<(u64, i64)> {
+    track
+        .edits
+        .iter()
+        .map(|edit| {
+            let duration = if edit.duration != 0 {
+                rescale(edit.duration, track.movie_timescale, MOVIE_TIMESCALE)
+            } else if edit.media_time >= 0 {
+                let remaining = track
+                    .media_duration()
+                    .saturating_sub(edit.media_time.unsigned_abs());
+                rescale(remaining, track.timescale, MOVIE_TIMESCALE)
+            } else {
+                0
+            };
+            (duration, edit.media_time)
+        })
+        .filter(|&(duration, media_time)| duration != 0 || media_time >= 0)
+        .collect()
+}
+
+fn presentation_duration(track: &FragmentedTrack) -> u64 {
+    let edits = edits(track);
+    if edits.is_empty() {
+        rescale(track.media_duration(), track.timescale, MOVIE_TIMESCALE)
+    } else {
+        edits.iter().map(|&(duration, _)| duration).sum()
+    }
+}
+
+fn movie(inputs: &[Input], options: &RemuxOptions, cover_format: Option<u32>) -> Vec<u8> {
+    let duration = inputs
+        .iter()
+        .map(|input| presentation_duration(&input.track))
+        .max()
+        .unwrap_or_default();
+    let mut writer = BoxWriter::default();
+    writer.container(b"moov", |writer| {
+        let version = u8::from(duration > u64::from(u32::MAX));
+        writer.full(b"mvhd", version, 0, |writer| {
+            write_times(writer, version, MOVIE_TIMESCALE, duration);
+            writer.u32(0x0001_0000);
+            writer.u16(0x0100);
+            writer.bytes(&[0; 10]);
+            write_unity_matrix(writer);
+            writer.bytes(&[0; 24]);
+            writer.u32(inputs.len() as u32 + 1);
+        });
+        for (index, input) in inputs.iter().enumerate() {
+            write_track(writer, index as u32 + 1, input);
+        }
+        if options.title.is_some() || cover_format.is_some() || !options.chapters.is_empty() {
+            writer.container(b"udta", |writer| {
+                write_user_data(writer, options, cover_format);
+            });
+        }
+    });
+    writer.into_inner()
+}
+
+/// Writes the creation and modification times, a timescale and a duration,
+/// as `mvhd` and `mdhd` lay them out.
+fn write_times(writer: &mut BoxWriter, version: u8, timescale: u32, duration: u64) {
+    if version == 1 {
+        writer.u64(0);
+        writer.u64(0);
+        writer.u32(timescale);
+        writer.u64(duration);
+    } else {
+        writer.u32(0);
+        writer.u32(0);
+        writer.u32(timescale);
+        writer.u32(duration as u32);
+    }
+}
+
+fn write_unity_matrix(writer: &mut BoxWriter) {
+    for value in [0x0001_0000, 0, 0, 0, 0x0001_0000, 0, 0, 0, 0x4000_0000_u32] {
+        writer.u32(value);
+    }
+}
+
+fn write_track(writer: &mut BoxWriter, track_id: u32, input: &Input) {
+    let track = &input.track;
+    let edits = edits(track);
+    let duration = presentation_duration(track);
+    writer.container(b"trak", |writer| {
+        let (input_version, flags) = (track.tkhd[0], read_flags(&track.tkhd));
+        let version = u8::from(duration > u64::from(u32::MAX));
+        writer.full(b"tkhd", version, flags | TRACK_ENABLED_IN_MOVIE, |writer| {
+            if version == 1 {
+                writer.u64(0);
+                writer.u64(0);
+                writer.u32(track_id);
+                writer.u32(0);
+                writer.u64(duration);
+            } else {
+                writer.u32(0);
+                writer.u32(0);
+                writer.u32(track_id);
+                writer.u32(0);
+                writer.u32(duration as u32);
+            }
+            writer.bytes(&track.tkhd[if input_version == 1 { 36 } else { 24 }..]);
+        });
+        if !edits.is_empty() {
+            writer.container(b"edts", |writer| write_edit_list(writer, &edits));
+        }
+        writer.container(b"mdia", |writer| {
+            let media_duration = track.media_duration();
+            let version = u8::from(media_duration > u64::from(u32::MAX));
+            writer.full(b"mdhd", version, 0, |writer| {
+                write_times(writer, version, track.timescale, media_duration);
+                writer.bytes(&track.mdhd[if track.mdhd[0] == 1 { 32 } else { 20 }..]);
+            });
+            writer.container(b"hdlr", |writer| writer.bytes(&track.hdlr));
+            writer.container(b"minf", |writer| {
+                writer.bytes(&track.media_header);
+                match &track.dinf {
+                    Some(dinf) => writer.bytes(dinf),
+                    None => writer.container(b"dinf", |writer| {
+                        writer.full(b"dref", 0, 0, |writer| {
+                            writer.u32(1);
+                            // The media is in the same file.
+                            writer.full(b"url ", 0, 1, |_| {});
+                        });
+                    }),
+                }
+                writer.container(b"stbl", |writer| write_sample_tables(writer, input));
+            });
+        });
+    });
+}
+
+fn read_flags(payload: &[u8]) -> u32 {
+    u32::from_be_bytes([0, payload[1], payload[2], payload[3]])
+}
+
+fn write_edit_list(writer: &mut BoxWriter, edits: &[(u64, i64)]) {
+    let version = u8::from(edits.iter().any(|&(duration, media_time)| {
+        duration > u64::from(u32::MAX) || i32::try_from(media_time).is_err()
+    }));
+    writer.full(b"elst", version, 0, |writer| {
+        writer.u32(edits.len() as u32);
+        for &(duration, media_time) in edits {
+            if version == 1 {
+                writer.u64(duration);
+                writer.i64(media_time);
+            } else {
+                writer.u32(duration as u32);
+                writer.i32(media_time as i32);
+            }
+            writer.u32(0x0001_0000);
+        }
+    });
+}
+
+/// Collapses equal neighbours into `(count, value)` runs.
+fn runs<T: PartialEq>(values: impl IntoIterator<Item = T>) -> Vec<(u32, T)> {
+    let mut runs: Vec<(u32, T)> = Vec::new();
+    for value in values {
+        match runs.last_mut() {
+            Some((count, last)) if *last == value => *count += 1,
+            _ => runs.push((1, value)),
+        }
+    }
+    runs
+}
+
+fn write_sample_tables(writer: &mut BoxWriter, input: &Input) {
+    let samples = &input.track.samples;
+    writer.container(b"stsd", |writer| writer.bytes(&input.track.stsd));
+
+    let durations = runs(samples.iter().map(|sample| sample.duration));
+    writer.full(b"stts", 0, 0, |writer| {
+        writer.u32(durations.len() as u32);
+        for (count, duration) in durations {
+            writer.u32(count);
+            writer.u32(duration);
+        }
+    });
+
+    if samples.iter().any(|sample| sample.composition_offset != 0) {
+        let offsets = runs(samples.iter().map(|sample| sample.composition_offset));
+        let version = u8::from(offsets.iter().any(|&(_, offset)| offset < 0));
+        writer.full(b"ctts", version, 0, |writer| {
+            writer.u32(offsets.len() as u32);
+            for (count, offset) in offsets {
+                writer.u32(count);
+                writer.i32(offset);
+            }
+        });
+    }
+
+    if !samples.iter().all(|sample| sample.sync) {
+        let sync_samples = (1..)
+            .zip(samples)
+            .filter(|(_, sample)| sample.sync)
+            .map(|(number, _)| number)
+            .collect::<Vec<u32>>();
+        writer.full(b"stss", 0, 0, |writer| {
+            writer.u32(sync_samples.len() as u32);
+            for number in sync_samples {
+                writer.u32(number);
+            }
+        });
+    }
+
+    let chunk_sizes = runs(input.track.chunks.iter().map(|chunk| chunk.sample_count));
+    writer.full(b"stsc", 0, 0, |writer| {
+        writer.u32(chunk_sizes.len() as u32);
+        let mut first_chunk = 1;
+        for (count, sample_count) in chunk_sizes {
+            writer.u32(first_chunk);
+            writer.u32(sample_count as u32);
+            writer.u32(1);
+            first_chunk += count;
+        }
+    });
+
+    writer.full(b"stsz", 0, 0, |writer| {
+        match runs(samples.iter().map(|sample| sample.size)).as_slice() {
+            [(count, size)] => {
+                writer.u32(*size);
+                writer.u32(*count);
+            }
+            _ => {
+                writer.u32(0);
+                writer.u32(samples.len() as u32);
+                for sample in samples {
+                    writer.u32(sample.size);
+                }
+            }
+        }
+    });
+
+    let offsets = &input.chunk_offsets;
+    if offsets.iter().all(|&offset| offset <= u64::from(u32::MAX)) {
+        writer.full(b"stco", 0, 0, |writer| {
+            writer.u32(offsets.len() as u32);
+            for &offset in offsets {
+                writer.u32(offset as u32);
+            }
+        });
+    } else {
+        writer.full(b"co64", 0, 0, |writer| {
+            writer.u32(offsets.len() as u32);
+            for &offset in offsets {
+                writer.u64(offset);
+            }
+        });
+    }
+}
+
+/// Writes the chapters as a Nero `chpl` list and the title and cover art as
+/// iTunes metadata, which is where FFmpeg puts them in MP4 files.
+fn write_user_data(writer: &mut BoxWriter, options: &RemuxOptions, cover_format: Option<u32>) {
+    if !options.chapters.is_empty() {
+        writer.full(b"chpl", 1, 0, |writer| {
+            let chapters = &options.chapters[..options.chapters.len().min(MAX_CHAPTERS)];
+            writer.u32(0);
+            writer.u8(chapters.len() as u8);
+            for chapter in chapters {
+                let title = truncate(&chapter.title, usize::from(u8::MAX));
+                writer.u64((chapter.start.as_nanos() / 100) as u64);
+                writer.u8(title.len() as u8);
+                writer.bytes(title.as_bytes());
+            }
+        });
+    }
+    if options.title.is_none() && cover_format.is_none() {
+        return;
+    }
+    writer.full(b"meta", 0, 0, |writer| {
+        writer.full(b"hdlr", 0, 0, |writer| {
+            writer.u32(0);
+            writer.bytes(b"mdir");
+            writer.bytes(b"appl");
+            writer.bytes(&[0; 9]);
+        });
+        writer.container(b"ilst", |writer| {
+            if let Some(title) = &options.title {
+                write_metadata_item(writer, b"\xa9nam", 1, title.as_bytes());
+            }
+            if let (Some(cover), Some(format)) = (&options.cover, cover_format) {
+                write_metadata_item(writer, b"covr", format, cover);
+            }
+        });
+    });
+}
+
+fn write_metadata_item(writer: &mut BoxWriter, kind: &FourCc, format: u32, value: &[u8]) {
+    writer.container(kind, |writer| {
+        writer.container(b"data", |writer| {
+            writer.u32(format);
+            writer.u32(0);
+            writer.bytes(value);
+        });
+    });
+}
+
+fn truncate(text: &str, max_len: usize) -> &str {
+    let mut end = text.len().min(max_len);
+    while !text.is_char_boundary(end) {
+        end -= 1;
+    }
+    &text[..end]
+}
+
+#[cfg(test)]
+mod tests {
+    use std::cell::Cell;
+
+    use super::{
+        boxes::{Child, Reader, children, find},
+        *,
+    };
+
+    #[derive(Clone)]
+    struct TestSample {
+        duration: u32,
+        data: Vec<u8>,
+        composition_offset: i32,
+        sync: bool,
+    }
+
+    struct TestTrack {
+        handler: FourCc,
+        format: FourCc,
+        timescale: u32,
+        fragments: Vec<Vec<TestSample>>,
+    }
+
+    impl TestTrack {
+        fn samples(&self) -> impl Iterator<Item = &TestSample> {
+            self.fragments.iter().flatten()
+        }
+
+        fn media(&self) -> Vec<u8> {
+            self.samples()
+                .flat_map(|sample| sample.data.clone())
+                .collect()
+        }
+    }
+
+    fn video_track() -> TestTrack {
+        let sample = |index: u8| TestSample {
+            duration: 3000,
+            data: vec![index; 100 + usize::from(index) * 10],
+            composition_offset: [3000, 9000, 0][usize::from(index) % 3],
+            sync: matches!(index, 0 | 3),
+        };
+        TestTrack {
+            handler: *b"vide",
+            format: *b"hev1",
+            timescale: 90000,
+            fragments: vec![(0..3).map(sample).collect(), (3..6).map(sample).collect()],
+        }
+    }
+
+    fn audio_track() -> TestTrack {
+        let sample = |index: u8| TestSample {
+            duration: 1024,
+            data: vec![0x80 + index; 20],
+            composition_offset: 0,
+            sync: true,
+        };
+        TestTrack {
+            handler: *b"soun",
+            format: *b"mp4a",
+            timescale: 48000,
+            fragments: (0..3)
+                .map(|fragment| (fragment * 4..fragment * 4 + 4).map(sample).collect())
+                .collect(),
+        }
+    }
+
+    /// Lays `track` out as a DASH segment: an init section and one
+    /// `moof`/`mdat` pair per fragment.
+    fn fragmented_mp4(track: &TestTrack) -> Vec<u8> {
+        let mut writer = BoxWriter::default();
+        writer.container(b"ftyp", |writer| writer.bytes(b"iso5\0\0\0\x01iso6mp41"));
+        writer.container(b"moov", |writer| {
+            writer.full(b"mvhd", 0, 0, |writer| {
+                write_times(writer, 0, 1000, 0);
+                writer.bytes(&[0; 80]);
+            });
+            writer.container(b"trak", |writer| {
+                writer.full(b"tkhd", 0, 0x3, |writer| {
+                    writer.bytes(&[0; 8]);
+                    writer.u32(7);
+                    writer.bytes(&[0; 8]);
+                    writer.bytes(&[0; 16]);
+                    write_unity_matrix(writer);
+                    writer.bytes(&[0; 8]);
+                });
+                writer.container(b"mdia", |writer| {
+                    writer.full(b"mdhd", 0, 0, |writer| {
+                        write_times(writer, 0, track.timescale, 0);
+                        writer.u32(0x55c4_0000);
+                    });
+                    writer.full(b"hdlr", 0, 0, |writer| {
+                        writer.u32(0);
+                        writer.bytes(&track.handler);
+                        writer.bytes(&[0; 13]);
+                    });
+                    writer.container(b"minf", |writer| {
+                        writer.full(b"vmhd", 0, 1, |writer| writer.bytes(&[0; 8]));
+                        writer.container(b"stbl", |writer| {
+                            writer.full(b"stsd", 0, 0, |writer| {
+                                writer.u32(1);
+                                writer.container(&track.format, |writer| {
+                                    writer.bytes(&[0, 0, 0, 0, 0, 0, 0, 1]);
+                                });
+                            });
+                            for table in [b"stts", b"stsc", b"stco"] {
+                                writer.full(table, 0, 0, |writer| writer.u32(0));
+                            }
+                            writer.full(b"stsz", 0, 0, |writer| writer.u64(0));
+                        });
+                    });
+                });
+            });
+            writer.container(b"mvex", |writer| {
+                writer.full(b"trex", 0, 0, |writer| {
+                    writer.u32(7);
+                    writer.u32(1);
+                    writer.u64(0);
+                    writer.u32(SAMPLE_IS_NON_SYNC);
+                });
+            });
+        });
+        let mut decode_time = 0;
+        for samples in &track.fragments {
+            let moof = |data_offset: i32| {
+                let mut writer = BoxWriter::default();
+                writer.container(b"moof", |writer| {
+                    writer.full(b"mfhd", 0, 0, |writer| writer.u32(1));
+                    writer.container(b"traf", |writer| {
+                        write_fragment(writer, samples, decode_time, data_offset);
+                    });
+                });
+                writer.into_inner()
+            };
+            let data_offset = moof(0).len() as i32 + 8;
+            writer.bytes(&moof(data_offset));
+            writer.container(b"mdat", |writer| {
+                for sample in samples {
+                    writer.bytes(&sample.data);
+                }
+            });
+            decode_time += samples
+                .iter()
+                .map(|sample| u64::from(sample.duration))
+                .sum::<u64>();
+        }
+        writer.into_inner()
+    }
+
+    const SAMPLE_IS_NON_SYNC: u32 = 0x1_0000;
+
+    /// Writes a track fragment, with the sample fields in the `tfhd` when
+    /// every sample shares them, as encoders do for audio.
+    fn write_fragment(
+        writer: &mut BoxWriter,
+        samples: &[TestSample],
+        decode_time: u64,
+        data_offset: i32,
+    ) {
+        let first = &samples[0];
+        let uniform = samples.iter().all(|sample| {
+            sample.duration == first.duration
+                && sample.data.len() == first.data.len()
+                && sample.composition_offset == 0
+                && sample.sync
+        });
+        let flags = |sample: &TestSample| if sample.sync { 0 } else { SAMPLE_IS_NON_SYNC };
+        if uniform {
+            writer.full(b"tfhd", 0, 0x2_0038, |writer| {
+                writer.u32(7);
+                writer.u32(first.duration);
+                writer.u32(first.data.len() as u32);
+                writer.u32(0);
+            });
+        } else {
+            writer.full(b"tfhd", 0, 0x2_0000, |writer| writer.u32(7));
+        }
+        writer.full(b"tfdt", 1, 0, |writer| writer.u64(decode_time));
+        let trun_flags = if uniform { 0x1 } else { 0xf01 };
+        writer.full(b"trun", 1, trun_flags, |writer| {
+            writer.u32(samples.len() as u32);
+            writer.i32(data_offset);
+            for sample in samples.iter().filter(|_| !uniform) {
+                writer.u32(sample.duration);
+                writer.u32(sample.data.len() as u32);
+                writer.u32(flags(sample));
+                writer.i32(sample.composition_offset);
+            }
+        });
+    }
+
+    fn write_input(directory: &Path, name: &str, track: &TestTrack) -> PathBuf {
+        let path = directory.join(name);
+        fs::write(&path, fragmented_mp4(track)).expect("write input");
+        path
+    }
+
+    fn entries(table: &Child<'_>, width: usize) -> Vec<Vec<u32>> {
+        let mut reader = Reader::new(table.payload);
+        reader.version_and_flags().expect("full box");
+        let count = reader.u32().expect("entry count");
+        (0..count)
+            .map(|_| (0..width).map(|_| reader.u32().expect("entry")).collect())
+            .collect()
+    }
+
+    /// Reads a track's media back through its sample tables.
+    fn track_media(file: &[u8], stbl: &[Child<'_>]) -> Vec<u8> {
+        let mut stsz = Reader::new(find(stbl, b"stsz").expect("stsz").payload);
+        stsz.version_and_flags().expect("full box");
+        let (sample_size, count) = (stsz.u32().expect("size"), stsz.u32().expect("count"));
+        let sizes = (0..count)
+            .map(|_| match sample_size {
+                0 => stsz.u32().expect("size") as usize,
+                size => size as usize,
+            })
+            .collect::<Vec<_>>();
+        let offsets = entries(find(stbl, b"stco").expect("stco"), 1);
+        let stsc = entries(find(stbl, b"stsc").expect("stsc"), 3);
+        let mut media = Vec::new();
+        let mut sizes = sizes.into_iter();
+        for (index, offset) in offsets.iter().enumerate() {
+            let chunk = index as u32 + 1;
+            let run = stsc
+                .iter()
+                .rev()
+                .find(|entry| entry[0] <= chunk)
+                .expect("stsc run");
+            let mut offset = offset[0] as usize;
+            for size in sizes.by_ref().take(run[1] as usize) {
+                media.extend_from_slice(&file[offset..offset + size]);
+                offset += size;
+            }
+        }
+        media
+    }
+
+    #[test]
+    fn merges_fragmented_tracks_into_one_progressive_file() {
+        let directory = tempfile::tempdir().expect("temporary directory");
+        let (video, audio) = (video_track(), audio_track());
+        let output = directory.path().join("output.mp4");
+        let options = RemuxOptions {
+            video: Some(write_input(directory.path(), "video.m4s", &video)),
+            audio: Some(write_input(directory.path(), "audio.m4s", &audio)),
+            title: Some("标题".into()),
+            chapters: vec![
+                Chapter {
+                    start: Duration::ZERO,
+                    title: "开头".into(),
+                },
+                Chapter {
+                    start: Duration::from_millis(100),
+                    title: "正片".into(),
+                },
+            ],
+            cover: Some(vec![0xff, 0xd8, 0xff, 0xe0, 1, 2, 3]),
+            hvc1_tag: true,
+        };
+
+        let size = remux(&output, &options, || false).expect("remux succeeds");
+
+        let file = fs::read(&output).expect("read output");
+        assert_eq!(size, file.len() as u64);
+        let top = children(&file).expect("top-level boxes");
+        let kinds = top.iter().map(|child| &child.kind).collect::<Vec<_>>();
+        assert_eq!(kinds, [b"ftyp", b"mdat", b"moov"]);
+        let moov = children(top[2].payload).expect("moov children");
+        let traks = moov
+            .iter()
+            .filter(|child| &child.kind == b"trak")
+            .map(|trak| children(trak.payload).expect("trak children"))
+            .collect::<Vec<_>>();
+        assert_eq!(traks.len(), 2);
+
+        let mut chunk_offsets = Vec::new();
+        for (trak, (track, duration)) in traks.iter().zip([(&video, 18000_u32), (&audio, 12288)]) {
+            let mdia = children(find(trak, b"mdia").expect("mdia").payload).expect("mdia");
+            let mdhd = find(&mdia, b"mdhd").expect("mdhd").payload;
+            assert_eq!(
+                &mdhd[12..20],
+                [&track.timescale.to_be_bytes()[..], &duration.to_be_bytes()].concat()
+            );
+            let minf = children(find(&mdia, b"minf").expect("minf").payload).expect("minf");
+            let stbl = children(find(&minf, b"stbl").expect("stbl").payload).expect("stbl");
+            assert_eq!(track_media(&file, &stbl), track.media());
+            chunk_offsets.push(entries(find(&stbl, b"stco").expect("stco"), 1));
+
+            let stsd = find(&stbl, b"stsd").expect("stsd").payload;
+            let stts = entries(find(&stbl, b"stts").expect("stts"), 2);
+            if track.handler == *b"vide" {
+                assert_eq!(&stsd[12..16], b"hvc1");
+                assert_eq!(stts, [vec![6, 3000]]);
+                assert_eq!(
+                    entries(find(&stbl, b"stss").expect("stss"), 1),
+                    [vec![1], vec![4]]
+                );
+                let ctts = entries(find(&stbl, b"ctts").expect("ctts"), 2);
+                assert_eq!(ctts.len(), 6);
+                assert_eq!(ctts[1], [1, 9000]);
+            } else {
+                assert_eq!(&stsd[12..16], b"mp4a");
+                assert_eq!(stts, [vec![12, 1024]]);
+                assert!(find(&stbl, b"stss").is_none());
+                assert!(find(&stbl, b"ctts").is_none());
+            }
+        }
+        // Chunks alternate by decode time: V0, A0, A1, V1, A2.
+        let (video_chunks, audio_chunks) = (&chunk_offsets[0], &chunk_offsets[1]);
+        assert!(video_chunks[0][0] < audio_chunks[0][0]);
+        assert!(audio_chunks[1][0] < video_chunks[1][0]);
+        assert!(video_chunks[1][0] < audio_chunks[2][0]);
+
+        let udta = children(find(&moov, b"udta").expect("udta").payload).expect("udta");
+        let chpl = find(&udta, b"chpl").expect("chpl").payload;
+        assert_eq!(chpl[8], 2);
+        assert!(chpl.windows(6).any(|window| window == "正片".as_bytes()));
+        let meta = find(&udta, b"meta").expect("meta").payload;
+        let ilst = children(&meta[4..]).expect("meta children");
+        let items = children(find(&ilst, b"ilst").expect("ilst").payload).expect("ilst");
+        let value = |kind: &FourCc| find(&items, kind).expect("item").payload[16..].to_vec();
+        assert_eq!(value(b"\xa9nam"), "标题".as_bytes());
+        assert_eq!(value(b"covr"), options.cover.clone().expect("cover"));
+    }
+
+    #[test]
+    fn rejects_unsupported_input_before_creating_the_output() {
+        let directory = tempfile::tempdir().expect("temporary directory");
+        let mut encrypted = audio_track();
+        encrypted.format = *b"enca";
+        let output = directory.path().join("output.m4a");
+
+        let error = remux(
+            &output,
+            &RemuxOptions {
+                audio: Some(write_input(directory.path(), "audio.m4s", &encrypted)),
+                ..RemuxOptions::default()
+            },
+            || false,
+        )
+        .expect_err("encrypted audio is unsupported");
+        assert!(matches!(error, RemuxError::Unsupported(_)), "{error}");
+
+        let missing = directory.path().join("missing.m4s");
+        let error = remux(
+            &output,
+            &RemuxOptions {
+                video: Some(missing),
+                ..RemuxOptions::default()
+            },
+            || false,
+        )
+        .expect_err("missing video fails");
+        assert!(matches!(error, RemuxError::Io(_)), "{error}");
+        assert!(!output.exists());
+    }
+
+    #[test]
+    fn cancellation_removes_the_partial_output() {
+        let directory = tempfile::tempdir().expect("temporary directory");
+        let output = directory.path().join("output.mp4");
+        let options = RemuxOptions {
+            video: Some(write_input(directory.path(), "video.m4s", &video_track())),
+            audio: Some(write_input(directory.path(), "audio.m4s", &audio_track())),
+            ..RemuxOptions::default()
+        };
+        let polls = Cell::new(0);
+
+        let error = remux(&output, &options, || {
+            polls.set(polls.get() + 1);
+            polls.get() > 3
+        })
+        .expect_err("remux is cancelled");
+
+        assert!(matches!(error, RemuxError::Cancelled), "{error}");
+        assert_eq!(polls.get(), 4);
+        assert!(!output.exists());
+    }
+}
@@ -0,0 +1,166 @@
+use std::{
+    future::Future,
+    sync::{
+        OnceLock,
+        atomic::{AtomicBool, Ordering},
+    },
+};
+
+use pyo3::{
+    exceptions::{PyRuntimeError, PyValueError},
+    prelude::*,
+};
+use tokio::runtime::{Builder, Runtime};
+
+/// Threads of the runtime are named after the extension so that they can be
+/// told apart from the host's own threads in profilers and `top -H`.
+const THREAD_NAME: &str = "yutto-runtime";
+
+/// The runtime `configure_runtime` built; unset while the default one is used.
+static CONFIGURED: OnceLock<Runtime> = OnceLock::new();
+
+/// Set by the first `get_runtime`, after which the runtime can no longer be
+/// replaced.
+static STARTED: AtomicBool = AtomicBool::new(false);
+
+/// A snapshot of the runtime's scheduler, taken by `runtime_stats`.
+///
+/// Blocking-pool and poll-time metrics are only tracked by tokio builds with
+/// `--cfg tokio_unstable`; otherwise those fields are `None`.
+#[pyclass(frozen, get_all, module = "yutto._core", skip_from_py_object)]
+#[derive(Clone, Debug)]
+pub(crate) struct RuntimeStats {
+    workers: usize,
+    /// Tasks spawned and not yet finished, including idle transfer tasks.
+    alive_tasks: usize,
+    /// Tasks scheduled from outside the runtime and not yet picked up.
+    global_queue_depth: usize,
+    /// Seconds each worker spent running tasks since the runtime started.
+    worker_busy_seconds: Vec<f64>,
+    /// Times each worker ran out of tasks and parked.
+    worker_park_counts: Vec<u64>,
+    blocking_threads: Option<usize>,
+    idle_blocking_threads: Option<usize>,
+    /// Blocking calls, such as file writes and remuxing, waiting for a thread.
+    blocking_queue_depth: Option<usize>,
+    /// Per worker, a moving average of the time one task poll took.
+    worker_mean_poll_seconds: Option<Vec<f64>>,
+}
+
+/// Replaces the default runtime every native call runs on.
+///
+/// Must be called before the first session or transfer starts the runtime;
+/// afterwards the running runtime is kept and this raises `RuntimeError`.
+/// Options left `None` keep tokio's defaults: one worker per core, 512
+/// blocking threads and an event interval of 61 ticks.
+#[pyfunction]
+#[pyo3(signature = (*, worker_threads=None, max_blocking_threads=None, event_interval=None))]
+pub(crate) fn configure_runtime(
+    worker_threads: Option<usize>,
+    max_blocking_threads: Option<usize>,
+    event_interval: Option<u32>,
+) -> PyResult<()> {
+    let mut builder = runtime_builder();
+    if let Some(worker_threads) = worker_threads {
+        if worker_threads == 0 {
+            return Err(PyValueError::new_err("worker_threads must be at least 1"));
+        }
+        builder.worker_threads(worker_threads);
+    }
+    if let Some(max_blocking_threads) = max_blocking_threads {
+        if max_blocking_threads == 0 {
+            return Err(PyValueError::new_err(
+                "max_blocking_threads must be at least 1",
+            ));
+        }
+        builder.max_blocking_threads(max_blocking_threads);
+    }
+    if let Some(event_interval) = event_interval {
+        if event_interval == 0 {
+            return Err(PyValueError::new_err("event_interval must be at least 1"));
+        }
+        builder.event_interval(event_interval);
+    }
+    // Checked before building, so a late call does not leave a second
+    // runtime's threads running unused.
+    if STARTED.load(Ordering::Acquire) || CONFIGURED.get().is_some() {
+        return Err(already_running());
+    }
+    let runtime = builder
+        .build()
+        .map_err(|error| PyRuntimeError::new_err(error.to_string()))?;
+    let runtime = match CONFIGURED.set(runtime) {
+        Ok(()) => CONFIGURED.get().expect("the runtime was just configured"),
+        Err(runtime) => {
+            runtime.shutdown_background();
+            return Err(already_running());
+        }
+    };
+    pyo3_async_runtimes::tokio::init_with_runtime(runtime).map_err(|()| already_running())
+}
+
+#[pyfunction]
+pub(crate) fn runtime_stats() -> RuntimeStats {
+    let metrics = get_runtime().metrics();
+    let workers = metrics.num_workers();
+    #[cfg(tokio_unstable)]
+    let (blocking_threads, idle_blocking_threads, blocking_queue_depth, worker_mean_poll_seconds) = (
+        Some(metrics.num_blocking_threads()),
+        Some(metrics.num_idle_blocking_threads()),
+        Some(metrics.blocking_queue_depth()),
+        Some(
+            (0..workers)
+                .map(|worker| metrics.worker_mean_poll_time(worker).as_secs_f64())
+                .collect(),
+        ),
+    );
+    #[cfg(not(tokio_unstable))]
+    let (blocking_threads, idle_blocking_threads, blocking_queue_depth, worker_mean_poll_seconds) =
+        (None, None, None, None);
+    RuntimeStats {
+        workers,
+        alive_tasks: metrics.num_alive_tasks(),
+        global_queue_depth: metrics.global_queue_depth(),
+        worker_busy_seconds: (0..workers)
+            .map(|worker| metrics.worker_total_busy_duration(worker).as_secs_f64())
+            .collect(),
+        worker_park_counts: (0..workers)
+            .map(|worker| metrics.worker_park_count(worker))
+            .collect(),
+        blocking_threads,
+        idle_blocking_threads,
+        blocking_queue_depth,
+        worker_mean_poll_seconds,
+    }
+}
+
+/// The runtime every native call runs on, starting the default one on first
+/// use. All native code goes through this instead of `pyo3_async_runtimes`, so
+/// `configure_runtime` knows whether it is too late.
+pub(crate) fn get_runtime() -> &'static Runtime {
+    STARTED.store(true, Ordering::Release);
+    pyo3_async_runtimes::tokio::get_runtime()
+}
+
+/// `pyo3_async_runtimes::tokio::future_into_py`, marking the runtime started.
+pub(crate) fn future_into_py<'py, F, T>(py: Python<'py>, future: F) -> PyResult<Bound<'py, PyAny>>
+where
+    F: Future<Output = PyResult<T>> + Send + 'static,
+    T: for<'a> IntoPyObject<'a> + Send + 'static,
+{
+    STARTED.store(true, Ordering::Release);
+    pyo3_async_runtimes::tokio::future_into_py(py, future)
+}
+
+/// Named threads with every driver enabled, as the default runtime has.
+pub(crate) fn runtime_builder() -> Builder {
+    let mut builder = Builder::new_multi_thread();
+    builder.enable_all().thread_name(THREAD_NAME);
+    builder
+}
+
+fn already_running() -> PyErr {
+    PyRuntimeError::new_err(
+        "the native runtime is already running; configure it before the first session or transfer",
+    )
+}
@@ -1,5 +1,5 @@
 use std::{
-    collections::{BTreeMap, HashMap},
+    collections::{BTreeMap, HashMap, HashSet},
     fs,
     io::Read,
     path::{Path, PathBuf},
@@ -9,17 +9,23 @@ use std::{
 
 use bytes::Bytes;
 use flate2::read::{DeflateDecoder, GzDecoder, ZlibDecoder};
-use haya::{SourceError, SourceErrorKind};
-use haya_http::probe_size as probe_media_size;
+use haya::{SourceError, SourceErrorKind, file::ResourceIdentity};
+use haya_http::probe_resource as probe_media_resource;
 use reqwest::{
     Certificate, Client, ClientBuilder, Proxy, StatusCode, Url,
     cookie::{CookieStore, Jar},
-    header::{ACCEPT_ENCODING, CONTENT_ENCODING, HeaderMap, HeaderName, HeaderValue},
+    header::{ACCEPT_ENCODING, CONTENT_ENCODING, HeaderMap, HeaderName, HeaderValue, RANGE},
 };
 use thiserror::Error;
+use tokio::task::JoinSet;
+
+use crate::dns::DnsCache;
 
 const DEFAULT_READ_TIMEOUT: Duration = Duration::from_secs(5);
 const DEFAULT_CONNECT_TIMEOUT: Duration = Duration::from_secs(5);
+const DEFAULT_POOL_IDLE_TIMEOUT: Duration = Duration::from_secs(90);
+const DEFAULT_POOL_MAX_IDLE_PER_HOST: usize = 32;
+const DEFAULT_TCP_KEEPALIVE: Duration = Duration::from_secs(30);
 
 #[derive(Debug, Error)]
 pub enum SessionError {
@@ -49,6 +55,20 @@ pub struct SessionConfig {
     pub ca_cert_dir: Option<PathBuf>,
     pub read_timeout: Duration,
     pub connect_timeout: Duration,
+    /// Offer HTTP/2 during the TLS handshake, so concurrent range requests to
+    /// one host share a multiplexed connection; `false` pins HTTP/1.1.
+    pub http2: bool,
+    /// Grow HTTP/2 stream and connection windows with the measured
+    /// bandwidth-delay product instead of keeping the 64 KiB defaults.
+    pub http2_adaptive_window: bool,
+    /// How long an idle connection stays pooled; `None` keeps it until the
+    /// server closes it.
+    pub pool_idle_timeout: Option<Duration>,
+    /// Idle connections kept per host. HTTP/1.1 range workers each hold one,
+    /// so this should cover the worker count to avoid fresh handshakes.
+    pub pool_max_idle_per_host: usize,
+    pub tcp_nodelay: bool,
+    pub tcp_keepalive: Option<Duration>,
 }
 
 impl Default for SessionConfig {
@@ -63,6 +83,12 @@ impl Default for SessionConfig {
             ca_cert_dir: None,
             read_timeout: DEFAULT_READ_TIMEOUT,
             connect_timeout: DEFAULT_CONNECT_TIMEOUT,
+            http2: true,
+            http2_adaptive_window: true,
+            pool_idle_timeout: Some(DEFAULT_POOL_IDLE_TIMEOUT),
+            pool_max_idle_per_host: DEFAULT_POOL_MAX_IDLE_PER_HOST,
+            tcp_nodelay: true,
+            tcp_keepalive: Some(DEFAULT_TCP_KEEPALIVE),
         }
     }
 }
@@ -139,9 +165,19 @@ impl Session {
             .referer(false)
             .default_headers(default_headers)
             .cookie_provider(cookies.clone())
+            .dns_resolver(Arc::new(DnsCache::shared()))
             .danger_accept_invalid_certs(config.accept_invalid_certs)
             .read_timeout(config.read_timeout)
-            .connect_timeout(config.connect_timeout);
+            .connect_timeout(config.connect_timeout)
+            .pool_idle_timeout(config.pool_idle_timeout)
+            .pool_max_idle_per_host(config.pool_max_idle_per_host)
+            .tcp_nodelay(config.tcp_nodelay)
+            .tcp_keepalive(config.tcp_keepalive);
+        builder = if config.http2 {
+            builder.http2_adaptive_window(config.http2_adaptive_window)
+        } else {
+            builder.http1_only()
+        };
         if let Some(path) = config.ca_cert_file {
             builder = add_root_certificates(builder, &path, true)?;
         } else if let Some(path) = config.ca_cert_dir {
@@ -204,10 +240,35 @@ impl Session {
         })
     }
 
-    pub async fn probe_size(&self, url: String) -> Result<Option<u64>, SessionError> {
+    /// Opens a pooled connection to each distinct origin of `urls` with a
+    /// one-byte range request, so a transfer started later skips the DNS, TCP
+    /// and TLS round trips. Failures are ignored; the transfer reports them.
+    pub async fn prewarm(&self, urls: &[String]) -> Result<(), SessionError> {
+        let client = self.client()?;
+        let mut origins = HashSet::new();
+        let mut warmups = JoinSet::new();
+        for url in urls.iter().filter_map(|url| parse_url(url).ok()) {
+            if !origins.insert(url.origin()) {
+                continue;
+            }
+            let request = client.get(url).header(RANGE, "bytes=0-0");
+            warmups.spawn(async move {
+                if let Ok(response) = request.send().await {
+                    let _ = response.bytes().await;
+                }
+            });
+        }
+        while warmups.join_next().await.is_some() {}
+        Ok(())
+    }
+
+    pub async fn probe_resource(
+        &self,
+        url: String,
+    ) -> Result<Option<ResourceIdentity>, SessionError> {
         let url = parse_url(&url)?;
         let client = self.client()?;
-        probe_media_size(&client, url)
+        probe_media_resource(&client, url)
             .await
             .map_err(classify_source_error)
     }
@@ -442,7 +503,10 @@ mod tests {
         sync::oneshot,
     };
 
-    use super::{Session, SessionConfig, SessionCookieStore, SessionError, decode_response_body};
+    use super::{
+        DEFAULT_POOL_MAX_IDLE_PER_HOST, Session, SessionConfig, SessionCookieStore, SessionError,
+        decode_response_body,
+    };
 
     async fn serve_once(
         response: impl AsRef<[u8]>,
@@ -482,6 +546,39 @@ mod tests {
         format!("http://{address}/resource")
     }
 
+    /// Serves keep-alive responses until `requests` have been answered and
+    /// reports how many connections carried them.
+    async fn serve_keep_alive(requests: usize) -> (String, oneshot::Receiver<usize>) {
+        let listener = TcpListener::bind("127.0.0.1:0").await.expect("listener");
+        let address = listener.local_addr().expect("address");
+        let (connections_sender, connections_receiver) = oneshot::channel();
+        tokio::spawn(async move {
+            let mut connections = 0;
+            let mut answered = 0;
+            while answered < requests {
+                let (mut stream, _) = listener.accept().await.expect("connection");
+                connections += 1;
+                let mut request = vec![0; 8192];
+                while answered < requests {
+                    match stream.read(&mut request).await {
+                        Ok(0) | Err(_) => break,
+                        Ok(_) => {}
+                    }
+                    answered += 1;
+                    if stream
+                        .write_all(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                        .await
+                        .is_err()
+                    {
+                        break;
+                    }
+                }
+            }
+            let _ = connections_sender.send(connections);
+        });
+        (format!("http://{address}/resource"), connections_receiver)
+    }
+
     async fn serve_redirect_once() -> (String, oneshot::Receiver<String>) {
         let listener = TcpListener::bind("127.0.0.1:0").await.expect("listener");
         let address = listener.local_addr().expect("address");
@@ -765,4 +862,87 @@ mod tests {
 
         assert_eq!(response.body, "abc");
     }
+
+    #[tokio::test]
+    async fn pooled_connections_are_reused_across_requests() {
+        for (max_idle, expected_connections) in [(DEFAULT_POOL_MAX_IDLE_PER_HOST, 1), (0, 3)] {
+            let (url, connections) = serve_keep_alive(3).await;
+            let session = Session::new(SessionConfig {
+                use_system_proxy: false,
+                pool_max_idle_per_host: max_idle,
+                ..SessionConfig::default()
+            })
+            .expect("session");
+
+            for _ in 0..3 {
+                let response = session
+                    .get(url.clone(), vec![], HashMap::new())
+                    .await
+                    .expect("response");
+                assert_eq!(response.body, "ok");
+            }
+
+            assert_eq!(
+                connections.await.expect("connection count"),
+                expected_connections
+            );
+        }
+    }
+
+    #[tokio::test]
+    async fn http1_only_sessions_still_reach_http1_servers() {
+        let (url, request) = serve_once(
+            "HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nok",
+            Duration::ZERO,
+        )
+        .await;
+        let session = Session::new(SessionConfig {
+            use_system_proxy: false,
+            http2: false,
+            pool_idle_timeout: None,
+            tcp_keepalive: None,
+            ..SessionConfig::default()
+        })
+        .expect("session");
+
+        let response = session
+            .get(url, vec![], HashMap::new())
+            .await
+            .expect("response");
+
+        assert_eq!(response.body, "ok");
+        assert!(
+            request
+                .await
+                .expect("captured request")
+                .starts_with("GET /resource HTTP/1.1\r\n")
+        );
+    }
+
+    #[tokio::test]
+    async fn prewarming_leaves_a_pooled_connection_for_the_next_request() {
+        let (url, connections) = serve_keep_alive(2).await;
+        let session = Session::new(SessionConfig {
+            use_system_proxy: false,
+            ..SessionConfig::default()
+        })
+        .expect("session");
+
+        session
+            .prewarm(&[url.clone(), format!("{url}?mirror"), "not a URL".into()])
+            .await
+            .expect("prewarm");
+        let response = session
+            .get(url, vec![], HashMap::new())
+            .await
+            .expect("response");
+
+        assert_eq!(response.body, "ok");
+        assert_eq!(connections.await.expect("connection count"), 1);
+        session.close();
+        assert!(matches!(
+            session.prewarm(&[]).await,
+            Err(SessionError::Closed)
+        ));
+    }
 }
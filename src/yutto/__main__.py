@@ -8,10 +8,11 @@ import shlex
 import sys
 from typing import TYPE_CHECKING
 
+from yutto._native import configure_runtime_from_environment
 from yutto.api.user_info import validate_user_info
 from yutto.cli.cli import cli, handle_default_subcommand
 from yutto.cli.event_renderer import CliApplicationEventRenderer
-from yutto.cli.request_adapter import download_request_from_namespace
+from yutto.cli.request_adapter import download_request_from_namespace, rate_limit_from_mebibytes
 from yutto.core.application import YuttoApplication
 from yutto.core.execution import ExecutionScopeFactory, RequestExecutionScopeFactory
 from yutto.core.operation import bind_download_report_sink
@@ -20,6 +21,7 @@ from yutto.exceptions import ErrorCode, YuttoBaseException
 from yutto.input_parser import file_scheme_parser
 from yutto.login import run_auth
 from yutto.utils.console.logger import Badge, Logger
+from yutto.utils.fetcher import SessionPool
 from yutto.utils.ffmpeg import FFmpeg
 from yutto.utils.functional import as_sync
 from yutto.validator import (
@@ -58,6 +60,12 @@ def main():
     renderer = CliApplicationEventRenderer()
     with bind_download_report_sink(renderer.report):
         args = parser.parse_args(handle_default_subcommand(sys.argv[1:]))
+    # 在任何原生调用启动运行时之前按 YUTTO_RUNTIME_* 配置运行时
+    try:
+        configure_runtime_from_environment()
+    except ValueError as e:
+        Logger.error(str(e))
+        sys.exit(ErrorCode.WRONG_ARGUMENT_ERROR.value)
     match args.command:
         case "download":
             renderer.progress_enabled = not args.no_progress and sys.stdout.isatty()
@@ -75,11 +83,23 @@ def main():
                     def resolve_credentials(request: DownloadRequest) -> AuthInfo | None:
                         return credentials_by_request[id(request)]
 
+                    # 批量下载中同一凭据的请求复用已建立连接的 session，避免每个请求重新握手
+                    session_pool = SessionPool()
                     scope_factory = RequestExecutionScopeFactory(
                         resolve_credentials,
                         on_open=_CliAuthAnnouncer(),
+                        transfer_workers=max(
+                            (request.network.download_workers for request in requests),
+                            default=None,
+                        ),
+                        download_rate_limit=rate_limit_from_mebibytes(args.download_rate_limit),
+                        session_pool=session_pool,
+                        reserve_disk_space=args.reserve_disk_space,
                     )
-                    run_download(scope_factory, requests, renderer, jobs=args.jobs)
+                    try:
+                        run_download(scope_factory, requests, renderer, jobs=args.jobs)
+                    finally:
+                        session_pool.close()
                 except YuttoBaseException as e:
                     Logger.error(e.message)
                     sys.exit(e.code.value)
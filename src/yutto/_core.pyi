@@ -1,5 +1,6 @@
 from collections.abc import Awaitable
 from pathlib import Path
+from typing import Literal
 
 class HttpError(Exception): ...
 class InvalidUrlError(HttpError): ...
@@ -8,6 +9,7 @@ class HttpTimeoutError(HttpError): ...
 class HttpTransportError(HttpError): ...
 class HttpStatusError(HttpError): ...
 class SessionClosedError(HttpError): ...
+class RemuxError(Exception): ...
 
 class NativeResponse:
     @property
@@ -36,6 +38,34 @@ class TransferSnapshot:
     def window_saturated(self) -> bool: ...
     @property
     def in_flight(self) -> int: ...
+    @property
+    def concurrency(self) -> int: ...
+    @property
+    def rate_limited(self) -> bool: ...
+    @property
+    def hedges_issued(self) -> int: ...
+    @property
+    def hedges_won(self) -> int: ...
+    @property
+    def sources(self) -> list[TransferSourceStats]: ...
+    @property
+    def digest(self) -> str | None: ...
+
+class TransferSourceStats:
+    @property
+    def url(self) -> str: ...
+    @property
+    def in_flight(self) -> int: ...
+    @property
+    def failures(self) -> int: ...
+    @property
+    def disabled(self) -> bool: ...
+    @property
+    def received_bytes(self) -> int: ...
+    @property
+    def throughput(self) -> int | None: ...
+    @property
+    def latency(self) -> float | None: ...
 
 class TransferHandle:
     def wait(self) -> Awaitable[None]: ...
@@ -44,11 +74,69 @@ class TransferHandle:
     def snapshot(self) -> TransferSnapshot: ...
     def result(self) -> int: ...
 
+class TransferGroupProgress:
+    @property
+    def expected_bytes(self) -> int: ...
+    @property
+    def received_bytes(self) -> int: ...
+    @property
+    def committed_bytes(self) -> int: ...
+    @property
+    def buffered_bytes(self) -> int: ...
+    @property
+    def speed(self) -> float: ...
+    @property
+    def window_saturated(self) -> bool: ...
+    @property
+    def done(self) -> bool: ...
+    @property
+    def transfers(self) -> list[TransferSnapshot]: ...
+
+class TransferGroup:
+    def __init__(self, *, interval: float = ..., workers: int | None = ...) -> None: ...
+    @property
+    def workers(self) -> int | None: ...
+    def next_progress(self) -> Awaitable[TransferGroupProgress | None]: ...
+    def __len__(self) -> int: ...
+
 class TransferWorkerLimit:
     def __init__(self, capacity: int) -> None: ...
     @property
     def capacity(self) -> int: ...
 
+class TransferRateLimit:
+    def __init__(self, bytes_per_second: int) -> None: ...
+    @property
+    def bytes_per_second(self) -> int: ...
+    def set_bytes_per_second(self, bytes_per_second: int) -> None: ...
+
+class TransferMemoryBudget:
+    def __init__(self, capacity: int) -> None: ...
+    @property
+    def capacity(self) -> int: ...
+    @property
+    def used(self) -> int: ...
+
+class RuntimeStats:
+    @property
+    def workers(self) -> int: ...
+    @property
+    def alive_tasks(self) -> int: ...
+    @property
+    def global_queue_depth(self) -> int: ...
+    @property
+    def worker_busy_seconds(self) -> list[float]: ...
+    @property
+    def worker_park_counts(self) -> list[int]: ...
+    @property
+    def blocking_threads(self) -> int | None: ...
+    @property
+    def idle_blocking_threads(self) -> int | None: ...
+    @property
+    def blocking_queue_depth(self) -> int | None: ...
+    @property
+    def worker_mean_poll_seconds(self) -> list[float] | None: ...
+
 class YuttoSession:
     def __init__(
         self,
@@ -62,6 +150,12 @@ class YuttoSession:
         ca_cert_dir: str | Path | None = ...,
         read_timeout: float = ...,
         connect_timeout: float = ...,
+        http2: bool = ...,
+        http2_adaptive_window: bool = ...,
+        pool_idle_timeout: float | None = ...,
+        pool_max_idle_per_host: int = ...,
+        tcp_nodelay: bool = ...,
+        tcp_keepalive: float | None = ...,
     ) -> None: ...
     def get(
         self,
@@ -70,7 +164,8 @@ class YuttoSession:
         params: list[tuple[str, str]] | None = ...,
         headers: dict[str, str] | None = ...,
     ) -> Awaitable[NativeResponse]: ...
-    def probe_size(self, url: str) -> Awaitable[int | None]: ...
+    def prewarm(self, urls: list[str]) -> None: ...
+    def probe_resource(self, url: str) -> Awaitable[tuple[int, str | None] | None]: ...
     def cookie(self, name: str, *, url: str = ...) -> str | None: ...
     def close(self) -> None: ...
     @property
@@ -79,10 +174,42 @@ class YuttoSession:
         self,
         sources: list[str],
         target: str | Path,
-        expected_size: int,
+        expected_size: int | None = ...,
         *,
+        validator: str | None = ...,
         overwrite: bool = ...,
         workers: int = ...,
         block_size: int = ...,
         worker_limit: TransferWorkerLimit | None = ...,
+        rate_limit: TransferRateLimit | None = ...,
+        memory_budget: TransferMemoryBudget | None = ...,
+        adaptive_workers: bool = ...,
+        adaptive_block_size: bool = ...,
+        hedged_requests: bool = ...,
+        work_stealing: bool = ...,
+        positional_writes: bool = ...,
+        streaming: bool = ...,
+        hash: Literal["xxh3", "sha256"] | None = ...,
+        group: TransferGroup | None = ...,
+        max_attempts: int = ...,
+        attempt_timeout: float = ...,
+        source_cooldown: float = ...,
     ) -> TransferHandle: ...
+
+def remux_mp4(
+    output: str | Path,
+    *,
+    video: str | Path | None = ...,
+    audio: str | Path | None = ...,
+    title: str | None = ...,
+    chapters: list[tuple[float, str]] | None = ...,
+    cover: str | Path | None = ...,
+    hvc1_tag: bool = ...,
+) -> Awaitable[None]: ...
+def configure_runtime(
+    *,
+    worker_threads: int | None = ...,
+    max_blocking_threads: int | None = ...,
+    event_interval: int | None = ...,
+) -> None: ...
+def runtime_stats() -> RuntimeStats: ...
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import asyncio
+import os
+from typing import TYPE_CHECKING
 
 from yutto._core import (
     HttpError,
@@ -9,14 +11,27 @@ from yutto._core import (
     HttpTransportError,
     InvalidUrlError,
     NativeResponse,
+    RemuxError,
+    RuntimeStats,
     SessionClosedError,
+    TransferGroup,
+    TransferGroupProgress,
     TransferHandle,
+    TransferMemoryBudget,
+    TransferRateLimit,
     TransferSnapshot,
+    TransferSourceStats,
     TransferWorkerLimit,
     UnsupportedProtocolError,
     YuttoSession,
+    configure_runtime,
+    remux_mp4,
+    runtime_stats,
 )
 
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
 __all__ = [
     "HttpError",
     "HttpStatusError",
@@ -24,15 +39,32 @@ __all__ = [
     "HttpTransportError",
     "InvalidUrlError",
     "NativeResponse",
+    "RemuxError",
+    "RuntimeStats",
     "SessionClosedError",
+    "TransferGroup",
+    "TransferGroupProgress",
     "TransferHandle",
+    "TransferMemoryBudget",
+    "TransferRateLimit",
     "TransferSnapshot",
+    "TransferSourceStats",
     "TransferWorkerLimit",
     "UnsupportedProtocolError",
     "YuttoSession",
+    "configure_runtime",
+    "configure_runtime_from_environment",
+    "remux_mp4",
+    "runtime_stats",
     "wait_for_transfer",
 ]
 
+RUNTIME_ENVIRONMENT = {
+    "YUTTO_RUNTIME_WORKER_THREADS": "worker_threads",
+    "YUTTO_RUNTIME_MAX_BLOCKING_THREADS": "max_blocking_threads",
+    "YUTTO_RUNTIME_EVENT_INTERVAL": "event_interval",
+}
+
 
 async def wait_for_transfer(
     handle: TransferHandle,
@@ -45,3 +77,26 @@ async def wait_for_transfer(
         handle.cancel()
         await handle.wait()
         raise
+
+
+def configure_runtime_from_environment(environ: Mapping[str, str] | None = None) -> bool:
+    """Configure the native runtime from ``YUTTO_RUNTIME_*`` variables, if any is set.
+
+    Returns whether the runtime was configured. The CLI and server call this at
+    startup, before any session can start the runtime, so a malformed value is
+    reported there instead of breaking every import of yutto.
+    """
+    environment = os.environ if environ is None else environ
+    options: dict[str, int] = {}
+    for variable, option in RUNTIME_ENVIRONMENT.items():
+        value = environment.get(variable, "").strip()
+        if not value:
+            continue
+        try:
+            options[option] = int(value)
+        except ValueError:
+            raise ValueError(f"{variable} must be an integer, got {value!r}") from None
+    if not options:
+        return False
+    configure_runtime(**options)
+    return True
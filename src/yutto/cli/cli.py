@@ -147,6 +147,30 @@ def add_serve_arguments(parser: argparse.ArgumentParser, settings: YuttoSettings
         default=max(16, settings.basic.num_workers),
         help="单任务允许的最大下载并发数",
     )
+    parser.add_argument(
+        "--max-transfer-workers",
+        type=int,
+        default=None,
+        help="所有下载任务共享的最大下载并发总数，默认与 --max-download-workers 相同",
+    )
+    parser.add_argument(
+        "--download-rate-limit",
+        type=float,
+        default=settings.basic.download_rate_limit,
+        help="所有下载任务共享的总带宽上限，单位为 MiB/s，默认不限速",
+    )
+    parser.add_argument(
+        "--transfer-memory-limit",
+        type=float,
+        default=None,
+        help="所有下载任务共享的分块缓冲内存上限，单位为 MiB，默认不限制",
+    )
+    parser.add_argument(
+        "--reserve-disk-space",
+        default=settings.basic.reserve_disk_space,
+        action="store_true",
+        help="下载前探测音视频大小并预留磁盘空间，空间不足时任务排队等待",
+    )
     parser.add_argument(
         "--task-limit",
         type=int,
@@ -168,6 +192,12 @@ def add_download_arguments(parser: argparse.ArgumentParser, settings: YuttoSetti
     group_basic.add_argument(
         "-n", "--num-workers", type=int, default=settings.basic.num_workers, help="同时用于下载的最大 Worker 数"
     )
+    group_basic.add_argument(
+        "--adaptive-workers",
+        default=settings.basic.adaptive_workers,
+        action="store_true",
+        help="根据实测吞吐自动调整各音视频的下载并发数，以 --num-workers 为上限",
+    )
     group_basic.add_argument(
         "-j",
         "--jobs",
@@ -232,6 +262,12 @@ def add_download_arguments(parser: argparse.ArgumentParser, settings: YuttoSetti
         default="ffmpeg",
         help="FFmpeg 可执行文件路径，默认从 PATH 解析（`ffmpeg`）",
     )
+    group_basic.add_argument(
+        "--streaming-mux",
+        default=settings.basic.streaming_mux,
+        action="store_true",
+        help="边下载边通过命名管道送入 FFmpeg 合并，不再写入临时音视频文件（需断点续传时自动回退）",
+    )
     group_basic.add_argument(
         "--ai-translation-language",
         default=settings.basic.ai_translation_language,
@@ -251,6 +287,42 @@ def add_download_arguments(parser: argparse.ArgumentParser, settings: YuttoSetti
         type=float,
         help="分块下载时各块大小，单位为 MiB，默认为 0.5MiB",
     )
+    group_basic.add_argument(
+        "--adaptive-block-size",
+        default=settings.basic.adaptive_block_size,
+        action="store_true",
+        help="根据各镜像的实测吞吐与延迟自动调整分块大小，相邻分块会合并为一次请求",
+    )
+    group_basic.add_argument(
+        "--hedged-requests",
+        default=settings.basic.hedged_requests,
+        action="store_true",
+        help="阻塞下载进度的慢分块会在另一个镜像上重复请求，取先完成者",
+    )
+    group_basic.add_argument(
+        "--work-stealing",
+        default=settings.basic.work_stealing,
+        action="store_true",
+        help="每个 worker 连续下载一整段区间，空闲的 worker 会接手最慢区间的后半段",
+    )
+    group_basic.add_argument(
+        "--content-hash",
+        default=settings.basic.content_hash,
+        choices=["xxh3", "sha256"],
+        help="在写入时计算下载内容的校验值，默认不计算",
+    )
+    group_basic.add_argument(
+        "--download-rate-limit",
+        default=settings.basic.download_rate_limit,
+        type=float,
+        help="所有下载共享的总带宽上限，单位为 MiB/s，默认不限速",
+    )
+    group_basic.add_argument(
+        "--reserve-disk-space",
+        default=settings.basic.reserve_disk_space,
+        action="store_true",
+        help="下载前探测音视频大小并预留磁盘空间，空间不足时排队等待其他下载完成",
+    )
     group_basic.add_argument(
         "-w", "--overwrite", default=settings.basic.overwrite, action="store_true", help="强制覆盖已下载内容"
     )
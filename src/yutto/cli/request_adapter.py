@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import math
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, cast
 
@@ -65,6 +66,7 @@ def download_request_from_namespace(args: argparse.Namespace) -> DownloadRequest
             "format": args.output_format,
             "audio_only_format": args.output_format_audio_only,
             "overwrite": args.overwrite,
+            "streaming_mux": args.streaming_mux,
             "subpath_template": args.subpath_template,
             "metadata_format_premiered": args.metadata_format_premiered,
         },
@@ -72,7 +74,12 @@ def download_request_from_namespace(args: argparse.Namespace) -> DownloadRequest
             "proxy": args.proxy,
             "fetch_workers": args.fetch_workers,
             "download_workers": args.num_workers,
+            "adaptive_workers": args.adaptive_workers,
             "block_size_bytes": int(args.block_size * MEBIBYTE),
+            "adaptive_block_size": args.adaptive_block_size,
+            "hedged_requests": args.hedged_requests,
+            "work_stealing": args.work_stealing,
+            "content_hash": args.content_hash,
             "download_interval": args.download_interval,
             "banned_mirrors_pattern": args.banned_mirrors_pattern,
         },
@@ -95,6 +102,22 @@ def download_request_from_namespace(args: argparse.Namespace) -> DownloadRequest
     return DownloadRequest.model_validate(request)
 
 
+def rate_limit_from_mebibytes(value: float | None) -> int | None:
+    """Translate a MiB/s bandwidth option into whole bytes per second."""
+
+    if value is None:
+        return None
+    return math.ceil(value * MEBIBYTE)
+
+
+def memory_limit_from_mebibytes(value: float | None) -> int | None:
+    """Translate a MiB memory option into whole bytes."""
+
+    if value is None:
+        return None
+    return math.ceil(value * MEBIBYTE)
+
+
 def download_request_from_mapping(payload: object, settings: YuttoSettings) -> DownloadRequest:
     """Apply trusted local settings as defaults for an RPC request payload."""
     return download_request_parser_from_settings(settings)(payload)
@@ -158,6 +181,7 @@ def _download_request_defaults_from_settings(settings: YuttoSettings) -> dict[st
             "format": settings.basic.output_format,
             "audio_only_format": settings.basic.output_format_audio_only,
             "overwrite": settings.basic.overwrite,
+            "streaming_mux": settings.basic.streaming_mux,
             "subpath_template": settings.basic.subpath_template,
             "metadata_format_premiered": settings.basic.metadata_format_premiered,
         },
@@ -165,7 +189,12 @@ def _download_request_defaults_from_settings(settings: YuttoSettings) -> dict[st
             "proxy": settings.basic.proxy,
             "fetch_workers": settings.basic.fetch_workers,
             "download_workers": settings.basic.num_workers,
+            "adaptive_workers": settings.basic.adaptive_workers,
             "block_size_bytes": int(settings.basic.block_size * MEBIBYTE),
+            "adaptive_block_size": settings.basic.adaptive_block_size,
+            "hedged_requests": settings.basic.hedged_requests,
+            "work_stealing": settings.basic.work_stealing,
+            "content_hash": settings.basic.content_hash,
             "download_interval": settings.basic.download_interval,
             "banned_mirrors_pattern": settings.basic.banned_mirrors_pattern,
         },
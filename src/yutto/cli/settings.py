@@ -17,6 +17,7 @@ from yutto.utils.time import TIME_DATE_FMT
 
 class YuttoBasicSettings(BaseModel):
     num_workers: Annotated[int, Field(8, gt=0)]
+    adaptive_workers: Annotated[bool, Field(False)]
     jobs: Annotated[int, Field(1, gt=0)]
     fetch_workers: Annotated[int, Field(8, gt=0)]
     video_quality: Annotated[VideoQuality, Field(127)]
@@ -28,9 +29,16 @@ class YuttoBasicSettings(BaseModel):
     output_format_audio_only: Annotated[
         Literal["infer", "m4a", "aac", "mp3", "flac", "mp4", "mkv", "mov"], Field("infer")
     ]
+    streaming_mux: Annotated[bool, Field(False)]
     ai_translation_language: Annotated[str | None, Field(None)]
     danmaku_format: Annotated[Literal["xml", "ass", "protobuf"], Field("ass")]
     block_size: Annotated[float, Field(0.5)]
+    adaptive_block_size: Annotated[bool, Field(False)]
+    hedged_requests: Annotated[bool, Field(False)]
+    work_stealing: Annotated[bool, Field(False)]
+    content_hash: Annotated[Literal["xxh3", "sha256"] | None, Field(None)]
+    download_rate_limit: Annotated[float | None, Field(None, gt=0)]
+    reserve_disk_space: Annotated[bool, Field(False)]
     overwrite: Annotated[bool, Field(False)]
     proxy: Annotated[str, Field("auto")]
     dir: Annotated[str, Field("./")]
@@ -4,6 +4,8 @@ import asyncio
 from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING, Protocol
 
+from yutto._native import TransferMemoryBudget, TransferRateLimit, TransferWorkerLimit
+from yutto.downloader.disk_space import DiskSpaceReservations
 from yutto.utils.fetcher import (
     DEFAULT_FETCH_WORKERS,
     cookies_from_auth,
@@ -19,6 +21,7 @@ if TYPE_CHECKING:
     from yutto.auth import AuthInfo
     from yutto.core.request import DownloadRequest
     from yutto.types import UserInfo
+    from yutto.utils.fetcher import SessionPool
 
 
 class ExecutionScope:
@@ -27,6 +30,10 @@ class ExecutionScope:
     session: YuttoSession
     fetch_limiter: asyncio.Semaphore
     download_workers: int
+    transfer_limit: TransferWorkerLimit
+    transfer_rate_limit: TransferRateLimit | None
+    transfer_memory_budget: TransferMemoryBudget | None
+    disk_space: DiskSpaceReservations | None
     user_info_cache: UserInfo | None
     user_info_lock: asyncio.Lock
     wbi_img_cache: Mapping[str, str] | None
@@ -39,6 +46,10 @@ class ExecutionScope:
         *,
         fetch_workers: int = DEFAULT_FETCH_WORKERS,
         download_workers: int = DEFAULT_FETCH_WORKERS,
+        transfer_limit: TransferWorkerLimit | None = None,
+        transfer_rate_limit: TransferRateLimit | None = None,
+        transfer_memory_budget: TransferMemoryBudget | None = None,
+        disk_space: DiskSpaceReservations | None = None,
     ):
         if fetch_workers < 1:
             raise ValueError("fetch_workers must be at least 1")
@@ -47,6 +58,12 @@ class ExecutionScope:
         self.session = session
         self.fetch_limiter = asyncio.Semaphore(fetch_workers)
         self.download_workers = download_workers
+        # 所有传输共享的 range worker 预算；空闲 permit 由仍在下载的传输按需取用
+        self.transfer_limit = transfer_limit if transfer_limit is not None else TransferWorkerLimit(download_workers)
+        self.transfer_rate_limit = transfer_rate_limit
+        self.transfer_memory_budget = transfer_memory_budget
+        # 未提供时不做磁盘空间准入，下载直接开始
+        self.disk_space = disk_space
         self.user_info_cache = None
         self.user_info_lock = asyncio.Lock()
         self.wbi_img_cache = None
@@ -66,24 +83,47 @@ class ExecutionScopeFactory(Protocol):
 
 
 class RequestExecutionScopeFactory:
-    """Build request-scoped clients, concurrency guards, credentials, and caches."""
+    """Build request-scoped clients, concurrency guards, credentials, and caches.
+
+    With a `session_pool`, clients are borrowed from the pool instead of being
+    opened and closed per request, so later requests with the same credentials
+    and proxy reuse warm connections; the caller owns and closes the pool.
+    """
 
     def __init__(
         self,
         credential_resolver: Callable[[DownloadRequest], AuthInfo | None] | None = None,
         *,
         on_open: Callable[[ExecutionScope, DownloadRequest], Awaitable[None]] | None = None,
+        transfer_workers: int | None = None,
+        download_rate_limit: int | None = None,
+        transfer_memory_limit: int | None = None,
+        session_pool: SessionPool | None = None,
+        reserve_disk_space: bool = False,
     ):
         self._credential_resolver = credential_resolver or (lambda request: None)
         self._on_open = on_open
+        self._session_pool = session_pool
+        # 由工厂持有的全局传输预算，跨请求、跨条目共享；未指定时退化为请求级预算
+        self._transfer_limit = TransferWorkerLimit(transfer_workers) if transfer_workers is not None else None
+        # 带宽限制同样由所有 scope 共享；调用方可经 transfer_rate_limit 在运行时调整速率
+        self.transfer_rate_limit = TransferRateLimit(download_rate_limit) if download_rate_limit is not None else None
+        # 分块与重排缓冲的内存总预算，预算耗尽时各传输暂缓发起新的分块请求
+        self.transfer_memory_budget = (
+            TransferMemoryBudget(transfer_memory_limit) if transfer_memory_limit is not None else None
+        )
+        # 启用时磁盘空间预留同样跨 scope 共享，并发条目按各自卷的剩余空间排队；
+        # 预留需要在下载前探测各轨大小，因此默认关闭
+        self.disk_space = DiskSpaceReservations() if reserve_disk_space else None
 
     @asynccontextmanager
     async def open(self, request: DownloadRequest) -> AsyncIterator[ExecutionScope]:
         proxy, trust_env = resolve_proxy(request.network.proxy)
         auth = self._credential_resolver(request)
         cookies = cookies_from_auth(auth)
+        open_client = create_client if self._session_pool is None else self._session_pool.lend
 
-        async with create_client(
+        async with open_client(
             cookies=cookies,
             trust_env=trust_env,
             proxy=proxy,
@@ -92,6 +132,10 @@ class RequestExecutionScopeFactory:
                 session,
                 fetch_workers=request.network.fetch_workers,
                 download_workers=request.network.download_workers,
+                transfer_limit=self._transfer_limit,
+                transfer_rate_limit=self.transfer_rate_limit,
+                transfer_memory_budget=self.transfer_memory_budget,
+                disk_space=self.disk_space,
             )
             if self._on_open is not None:
                 await self._on_open(scope, request)
@@ -104,6 +104,7 @@ class OutputRequestOptions(_RequestModel):
     format: Literal["infer", "mp4", "mkv", "mov"] = "infer"
     audio_only_format: Literal["infer", "m4a", "aac", "mp3", "flac", "mp4", "mkv", "mov"] = "infer"
     overwrite: bool = False
+    streaming_mux: bool = False
     subpath_template: str = "{auto}"
     metadata_format_premiered: str = TIME_DATE_FMT
     enforce_directory_boundary: bool = Field(default=False, exclude=True)
@@ -115,7 +116,12 @@ class NetworkRequestOptions(_RequestModel):
     proxy: str = "auto"
     fetch_workers: int = 8
     download_workers: int = 8
+    adaptive_workers: bool = False
     block_size_bytes: int = 512 * 1024
+    adaptive_block_size: bool = False
+    hedged_requests: bool = False
+    work_stealing: bool = False
+    content_hash: Literal["xxh3", "sha256"] | None = None
     download_interval: int = 0
     banned_mirrors_pattern: str | None = None
 
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import shutil
+from contextlib import asynccontextmanager, suppress
+from typing import TYPE_CHECKING
+
+from yutto.exceptions import InsufficientDiskSpaceError
+from yutto.utils.console.formatter import size_format
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Mapping
+    from pathlib import Path
+
+DEFAULT_RECHECK_INTERVAL = 5.0
+
+
+class DiskSpaceReservations:
+    """Admit downloads only while their expected bytes fit the free space of their volumes.
+
+    Reservations are keyed by device, so the temporary and output directories
+    share one budget when they live on the same volume. A reservation is held
+    until the download finishes, even though the bytes it already wrote have
+    also left the free space; admission errs on the side of waiting.
+    """
+
+    def __init__(self, *, recheck_interval: float = DEFAULT_RECHECK_INTERVAL):
+        if recheck_interval <= 0:
+            raise ValueError("recheck_interval must be positive")
+        self.recheck_interval = recheck_interval
+        self._condition = asyncio.Condition()
+        self._reserved: dict[int, int] = {}
+
+    @asynccontextmanager
+    async def reserve(self, needs: Mapping[Path, int]) -> AsyncIterator[None]:
+        """Wait until `needs` (directory -> bytes) fits, then hold it until the block exits.
+
+        Raises `InsufficientDiskSpaceError` at once when a volume cannot fit the
+        request even with no other reservation on it, since waiting cannot help.
+        """
+        demand: dict[int, tuple[Path, int]] = {}
+        for directory, size in needs.items():
+            if size <= 0:
+                continue
+            device = (await asyncio.to_thread(directory.stat)).st_dev
+            representative, reserved = demand.get(device, (directory, 0))
+            demand[device] = (representative, reserved + size)
+
+        async with self._condition:
+            while (shortage := await self._shortage(demand)) is not None:
+                device, directory, missing = shortage
+                if not self._reserved.get(device):
+                    raise InsufficientDiskSpaceError(
+                        f"{directory} 所在磁盘剩余空间不足，还需要 {size_format(missing)}，请清理磁盘后重试"
+                    )
+                # 其余下载完成时会唤醒等待者；定期重查以感知外部释放的空间
+                with suppress(TimeoutError):
+                    async with asyncio.timeout(self.recheck_interval):
+                        await self._condition.wait()
+            for device, (_, size) in demand.items():
+                self._reserved[device] = self._reserved.get(device, 0) + size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                for device, (_, size) in demand.items():
+                    remaining = self._reserved[device] - size
+                    if remaining > 0:
+                        self._reserved[device] = remaining
+                    else:
+                        del self._reserved[device]
+                self._condition.notify_all()
+
+    async def _shortage(self, demand: Mapping[int, tuple[Path, int]]) -> tuple[int, Path, int] | None:
+        for device, (directory, size) in demand.items():
+            free = (await asyncio.to_thread(shutil.disk_usage, directory)).free
+            available = free - self._reserved.get(device, 0)
+            if size > available:
+                return device, directory, size - max(available, 0)
+        return None
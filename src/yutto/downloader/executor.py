@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from contextlib import nullcontext
 from typing import TYPE_CHECKING
 
 from yutto.core.events import (
@@ -12,7 +13,13 @@ from yutto.core.operation import ReportColor, ReportLevel, emit_download_event,
 from yutto.core.result import Artifact, ArtifactKind, ItemResult, ItemSkipReason, ItemState
 from yutto.downloader.artifact_writer import ArtifactWriter
 from yutto.downloader.media_muxer import MediaMuxer
-from yutto.downloader.transfer import cleanup_temporary_media, download_video_and_audio
+from yutto.downloader.streaming import can_stream_media, stream_video_and_audio
+from yutto.downloader.transfer import (
+    cleanup_temporary_media,
+    download_video_and_audio,
+    estimate_media_disk_usage,
+    prewarm_media_sources,
+)
 from yutto.media.quality import audio_quality_map, video_quality_map
 
 if TYPE_CHECKING:
@@ -33,6 +40,9 @@ class DownloadExecutor:
         plan.paths.output_dir.mkdir(parents=True, exist_ok=True)
         plan.paths.temporary_dir.mkdir(parents=True, exist_ok=True)
         emit_streams_selected(episode_data, plan)
+        if plan.has_media and (plan.overwrite or not plan.paths.output.exists()):
+            # 连接在写字幕、弹幕等附属资源期间预先建立，下载开始时即可直接复用
+            prewarm_media_sources(scope, plan)
 
         artifacts: list[Artifact] = []
         artifact_writer = ArtifactWriter()
@@ -89,16 +99,22 @@ class DownloadExecutor:
             emit_download_report("文件已存在，因启用 overwrite 选项强制删除……")
             plan.paths.output.unlink()
 
-        await download_video_and_audio(scope, plan)
-
-        emit_download_event(DownloadStageChanged(name=DownloadStage.POSTPROCESSING, item=plan.item))
-        if plan.requires_audio_transcode_notice:
-            assert plan.audio is not None
-            emit_download_report(
-                f"输出容器 {plan.paths.output.suffix} 无法直接封装 {plan.audio.codec} 音频，"
-                f"将自动转码为 {plan.audio_save_codec}",
-            )
-        await MediaMuxer().mux(plan)
+        streaming = can_stream_media(plan)
+        # 预留临时文件与输出文件所需的空间，空间不足时排队等待其他下载完成，而不是写到一半失败
+        reservation = (
+            scope.disk_space.reserve(await estimate_media_disk_usage(scope, plan, streaming=streaming))
+            if scope.disk_space is not None
+            else nullcontext()
+        )
+        async with reservation:
+            if streaming:
+                emit_audio_transcode_notice(plan)
+                await stream_video_and_audio(scope, plan, MediaMuxer())
+            else:
+                await download_video_and_audio(scope, plan)
+                emit_download_event(DownloadStageChanged(name=DownloadStage.POSTPROCESSING, item=plan.item))
+                emit_audio_transcode_notice(plan)
+                await MediaMuxer().mux(plan)
 
         cleanup_temporary_media(plan)
         artifact_writer.cleanup_temporary(plan)
@@ -111,6 +127,15 @@ class DownloadExecutor:
         )
 
 
+def emit_audio_transcode_notice(plan: DownloadPlan) -> None:
+    if plan.requires_audio_transcode_notice:
+        assert plan.audio is not None
+        emit_download_report(
+            f"输出容器 {plan.paths.output.suffix} 无法直接封装 {plan.audio.codec} 音频，"
+            f"将自动转码为 {plan.audio_save_codec}",
+        )
+
+
 def emit_streams_selected(episode_data: EpisodeData, plan: DownloadPlan) -> None:
     videos = episode_data["videos"]
     selected_video_index = plan.video.index if plan.video is not None else -1
@@ -4,9 +4,11 @@ import asyncio
 import os
 from typing import TYPE_CHECKING
 
+from yutto._native import RemuxError, remux_mp4
 from yutto.core.operation import ReportLevel, emit_download_report
 from yutto.exceptions import PostprocessingError
 from yutto.utils.ffmpeg import FFmpeg, FFmpegCommandBuilder
+from yutto.utils.metadata import read_chapter_info
 
 if TYPE_CHECKING:
     import subprocess
@@ -18,26 +20,45 @@ if TYPE_CHECKING:
         async def exec_async(self, args: list[str]) -> subprocess.CompletedProcess[bytes]: ...
 
 
+NATIVE_REMUX_SUFFIXES = frozenset({".mp4", ".m4a"})
+
+
+def can_remux_natively(plan: DownloadPlan) -> bool:
+    """Whether the tracks only need copying into an MP4 container, which needs no FFmpeg."""
+    return (
+        plan.paths.output.suffix.lower() in NATIVE_REMUX_SUFFIXES
+        and (plan.video is None or plan.video_save_codec == "copy")
+        and (plan.audio is None or plan.audio_save_codec == "copy")
+    )
+
+
 class MediaMuxer:
-    """Own one FFmpeg invocation and any partial output it creates."""
+    """Own one merge, in-process or through FFmpeg, and any partial output it creates."""
 
     def __init__(self, ffmpeg: FFmpegRunner | None = None):
         self._ffmpeg = ffmpeg
 
-    async def mux(self, plan: DownloadPlan) -> None:
+    async def mux(self, plan: DownloadPlan, *, streaming: bool = False) -> None:
+        """Mux the downloaded tracks, or with ``streaming`` read them from their FIFOs as they arrive."""
+        emit_download_report("开始合并……")
+        if not streaming and can_remux_natively(plan) and await self._remux_natively(plan):
+            emit_download_report("合并完成！")
+            return
+
+        video_path = plan.paths.video_pipe if streaming else plan.paths.video
+        audio_path = plan.paths.audio_pipe if streaming else plan.paths.audio
         command_builder = FFmpegCommandBuilder()
         output = command_builder.add_output(plan.paths.output)
-        emit_download_report("开始合并……")
 
         if plan.video is not None:
-            video_input = command_builder.add_video_input(plan.paths.video)
+            video_input = command_builder.add_video_input(video_path)
             output.use(video_input)
             output.set_vcodec(plan.video_save_codec)
             if plan.attach_hvc1_tag:
                 output.with_extra_options([f"-tag:v:{video_input.stream_id}", "hvc1"])
 
         if plan.audio is not None:
-            audio_input = command_builder.add_audio_input(plan.paths.audio)
+            audio_input = command_builder.add_audio_input(audio_path)
             output.use(audio_input)
             output.set_acodec(plan.audio_save_codec)
 
@@ -73,3 +94,30 @@ class MediaMuxer:
         if not plan.paths.output.exists():
             raise PostprocessingError("合并失败：FFmpeg 未生成目标文件！")
         emit_download_report("合并完成！")
+
+    async def _remux_natively(self, plan: DownloadPlan) -> bool:
+        """Copy the tracks into the output in-process, or return ``False`` if FFmpeg has to do it."""
+        has_video = plan.video is not None
+        title: str | None = None
+        chapters: list[tuple[float, str]] = []
+        if has_video and plan.resources.has_chapter_info:
+            title, chapter_info = read_chapter_info(plan.paths.chapter_info)
+            chapters = [(float(chapter["start"]), chapter["content"]) for chapter in chapter_info]
+        try:
+            await remux_mp4(
+                plan.paths.output,
+                video=plan.paths.video if has_video else None,
+                audio=plan.paths.audio if plan.audio is not None else None,
+                title=title,
+                chapters=chapters,
+                cover=plan.paths.cover if has_video and plan.resources.has_cover else None,
+                hvc1_tag=plan.attach_hvc1_tag,
+            )
+        except RemuxError as error:
+            plan.paths.output.unlink(missing_ok=True)
+            emit_download_report(f"无法直接合并，改用 FFmpeg：{error}", level=ReportLevel.DEBUG)
+            return False
+        except asyncio.CancelledError:
+            plan.paths.output.unlink(missing_ok=True)
+            raise
+        return True
@@ -8,6 +8,7 @@ from yutto.utils.time import TIME_FULL_FMT
 
 if TYPE_CHECKING:
     from pathlib import Path
+    from typing import Literal
 
     from yutto.core.request import DownloadRequest
     from yutto.media.codec import AudioCodec, VideoCodec
@@ -23,6 +24,8 @@ class DownloadPaths:
     output: Path
     video: Path
     audio: Path
+    video_pipe: Path
+    audio_pipe: Path
     cover: Path
     saved_cover: Path
     chapter_info: Path
@@ -101,7 +104,13 @@ class DownloadPlan:
     attach_hvc1_tag: bool
     requires_audio_transcode_notice: bool
     overwrite: bool
+    streaming_mux: bool
     block_size: int
+    adaptive_block_size: bool
+    hedged_requests: bool
+    work_stealing: bool
+    content_hash: Literal["xxh3", "sha256"] | None
+    adaptive_workers: bool
     banned_mirrors_pattern: str | None
     resources: DownloadResources
 
@@ -199,7 +208,13 @@ class DownloadPlanner:
                 audio_meta is not None and audio_save_codec not in {requested_audio_save_codec, "copy"}
             ),
             overwrite=request.output.overwrite,
+            streaming_mux=request.output.streaming_mux,
             block_size=request.network.block_size_bytes,
+            adaptive_block_size=request.network.adaptive_block_size,
+            hedged_requests=request.network.hedged_requests,
+            work_stealing=request.network.work_stealing,
+            content_hash=request.network.content_hash,
+            adaptive_workers=request.network.adaptive_workers,
             banned_mirrors_pattern=request.network.banned_mirrors_pattern,
             resources=resources,
         )
@@ -224,6 +239,8 @@ def resolve_paths(
         output=output_dir / f"{filename}{output_suffix}",
         video=temporary_dir / f"{filename}_video.m4s",
         audio=temporary_dir / f"{filename}_audio.m4s",
+        video_pipe=temporary_dir / f"{filename}_video.fifo",
+        audio_pipe=temporary_dir / f"{filename}_audio.fifo",
         cover=temporary_dir / f"{filename}_cover.jpg",
         saved_cover=output_dir / f"{filename}-poster.jpg",
         chapter_info=temporary_dir / f"{filename}_chapter_info.ini",
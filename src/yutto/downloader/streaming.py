@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+from typing import TYPE_CHECKING
+
+from yutto.core.events import DownloadStage, DownloadStageChanged
+from yutto.core.operation import emit_download_event
+from yutto.downloader.transfer import download_video_and_audio
+from yutto.exceptions import PostprocessingError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from yutto.core.execution import ExecutionScope
+    from yutto.downloader.media_muxer import MediaMuxer
+    from yutto.downloader.planner import DownloadPlan
+
+_RELEASE_INTERVAL_SECONDS = 0.05
+
+
+def can_stream_media(plan: DownloadPlan) -> bool:
+    """Whether the media can be muxed while it downloads instead of from temporary files."""
+    if not plan.streaming_mux or not hasattr(os, "mkfifo"):
+        return False
+    # Partial temporary files can only be resumed through the temporary-file path.
+    return plan.overwrite or not any(path.exists() for path in _temporary_media(plan))
+
+
+async def stream_video_and_audio(scope: ExecutionScope, plan: DownloadPlan, muxer: MediaMuxer) -> None:
+    """Download the media into FIFOs that FFmpeg muxes while the bytes arrive."""
+    pipes = _media_pipes(plan)
+    for pipe in pipes:
+        pipe.unlink(missing_ok=True)
+        os.mkfifo(pipe)
+    mux_task = asyncio.create_task(muxer.mux(plan, streaming=True))
+    download_task = asyncio.create_task(download_video_and_audio(scope, plan, streaming=True))
+    tasks = (mux_task, download_task)
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if not download_task.done():
+            # FFmpeg stopped reading, so the transfers cannot finish.
+            await _stop(tasks, pipes)
+            mux_task.result()
+            plan.paths.output.unlink(missing_ok=True)
+            raise PostprocessingError("合并失败：FFmpeg 在音视频下载完成前退出！")
+        if download_task.exception() is not None:
+            await _stop(tasks, pipes)
+            download_task.result()
+        emit_download_event(DownloadStageChanged(name=DownloadStage.POSTPROCESSING, item=plan.item))
+        await mux_task
+    finally:
+        if not all(task.done() for task in tasks):
+            cleanup_task = asyncio.create_task(_stop(tasks, pipes))
+            try:
+                await asyncio.shield(cleanup_task)
+            except asyncio.CancelledError:
+                await cleanup_task
+                raise
+        for pipe in pipes:
+            pipe.unlink(missing_ok=True)
+
+
+async def _stop(tasks: Iterable[asyncio.Task[None]], pipes: Iterable[Path]) -> None:
+    """Cancel both sides and keep releasing the FIFOs until every task has finished."""
+    tasks = tuple(tasks)
+    for task in tasks:
+        task.cancel()
+    while not all(task.done() for task in tasks):
+        _release_pipes(pipes)
+        await asyncio.wait(tasks, timeout=_RELEASE_INTERVAL_SECONDS)
+
+
+def _release_pipes(pipes: Iterable[Path]) -> None:
+    """Let native writers blocked on opening a FIFO proceed; without a reader their writes then fail."""
+    for pipe in pipes:
+        with contextlib.suppress(OSError):
+            os.close(os.open(pipe, os.O_RDONLY | os.O_NONBLOCK))
+
+
+def _media_pipes(plan: DownloadPlan) -> list[Path]:
+    pipes: list[Path] = []
+    if plan.video is not None:
+        pipes.append(plan.paths.video_pipe)
+    if plan.audio is not None:
+        pipes.append(plan.paths.audio_pipe)
+    return pipes
+
+
+def _temporary_media(plan: DownloadPlan) -> list[Path]:
+    paths: list[Path] = []
+    if plan.video is not None:
+        paths.append(plan.paths.video)
+    if plan.audio is not None:
+        paths.append(plan.paths.audio)
+    return paths
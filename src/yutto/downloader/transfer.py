@@ -4,16 +4,18 @@ import asyncio
 import re
 from typing import TYPE_CHECKING
 
-from yutto._native import TransferWorkerLimit, wait_for_transfer
+from returns.result import Failure, Success
+
+from yutto._native import TransferGroup, wait_for_transfer
 from yutto.core.events import DownloadStage, DownloadStageChanged
 from yutto.core.operation import emit_download_event, emit_download_report
 from yutto.downloader.progressbar import show_progress
 from yutto.exceptions import MaxRetryError
-from yutto.utils.asynclib import NoSuccessfulResultError, make_coroutine_factory, race_for_first_success
-from yutto.utils.fetcher import Fetcher, unwrap_fetch_result
+from yutto.utils.fetcher import Fetcher
 
 if TYPE_CHECKING:
     from collections.abc import Callable, Iterable
+    from pathlib import Path
     from typing import Any
 
     from yutto.core.execution import ExecutionScope
@@ -34,29 +36,78 @@ def create_mirrors_filter(banned_mirrors_pattern: str | None) -> Callable[[list[
     return mirrors_filter
 
 
-async def _probe_media_size(scope: ExecutionScope, url: str, mirrors: Iterable[str]) -> int:
-    async def probe(candidate: str) -> int:
-        size = unwrap_fetch_result(await Fetcher.get_size(scope, candidate))
-        if size is None:
-            raise MaxRetryError("媒体大小探测未返回长度")
-        return size
-
-    create_probe = make_coroutine_factory(probe)
-    try:
-        return await race_for_first_success(create_probe(candidate) for candidate in (url, *mirrors))
-    except NoSuccessfulResultError as error:
-        if len(error.exceptions) == 1 and isinstance(error.exceptions[0], MaxRetryError):
-            raise error.exceptions[0] from None
-        if not error.exceptions:
-            raise MaxRetryError("媒体大小探测失败：所有地址均已取消") from error
-        raise MaxRetryError(f"媒体大小探测失败：{len(error.exceptions)} 个地址均不可用") from ExceptionGroup(
-            "all media size probes failed", error.exceptions
-        )
-
-
-async def download_video_and_audio(scope: ExecutionScope, plan: DownloadPlan) -> None:
-    """Download all media through the native Haya transfer core."""
+def prewarm_media_sources(scope: ExecutionScope, plan: DownloadPlan) -> None:
+    """Start connecting to every media host in the background while sidecar resources are written."""
+    mirrors_filter = create_mirrors_filter(plan.banned_mirrors_pattern)
+    scope.session.prewarm(
+        [
+            url
+            for stream in (plan.video, plan.audio)
+            if stream is not None
+            for url in (stream.url, *mirrors_filter(list(stream.mirrors)))
+        ]
+    )
+
+
+async def estimate_media_disk_usage(scope: ExecutionScope, plan: DownloadPlan, *, streaming: bool) -> dict[Path, int]:
+    """Estimate the bytes the media still needs in the temporary and output directories.
+
+    Each track is probed through its sources in order until one reports the
+    size; a source that fails after its retries hands over to the next, and
+    the last failure is raised. A track no source reports a size for counts
+    as zero.
+    """
+    mirrors_filter = create_mirrors_filter(plan.banned_mirrors_pattern)
+    candidates = [(plan.video, plan.paths.video), (plan.audio, plan.paths.audio)]
+    tracks = [(stream, path) for stream, path in candidates if stream is not None]
+    sizes = await asyncio.gather(
+        *(_probe_track_size(scope, [stream.url, *mirrors_filter(list(stream.mirrors))]) for stream, _ in tracks)
+    )
+    temporary_bytes = 0
+    if not streaming:
+        for (_, path), size in zip(tracks, sizes, strict=True):
+            # 续传时临时文件中已有的部分不再占用新的空间
+            existing = 0 if plan.overwrite else await asyncio.to_thread(_file_size, path)
+            temporary_bytes += max(0, size - existing)
+    needs = {plan.paths.temporary_dir: temporary_bytes}
+    # 封装只复制音视频流，输出大小按各轨之和估算；两个目录可能是同一个
+    needs[plan.paths.output_dir] = needs.get(plan.paths.output_dir, 0) + sum(sizes)
+    return needs
+
+
+async def _probe_track_size(scope: ExecutionScope, sources: list[str]) -> int:
+    failure: MaxRetryError | None = None
+    for url in sources:
+        match await Fetcher.probe_resource(scope, url):
+            case Success(resource) if resource is not None:
+                return resource[0]
+            case Failure(error):
+                failure = error
+            case _:
+                pass
+    if failure is not None:
+        raise failure
+    return 0
+
+
+def _file_size(path: Path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+async def download_video_and_audio(scope: ExecutionScope, plan: DownloadPlan, *, streaming: bool = False) -> None:
+    """Download all media through the native Haya transfer core.
+
+    Each transfer learns the media size from its first range response, so no
+    separate size probe delays the first bytes unless disk-space admission
+    asked for the sizes up front. With
+    ``streaming``, each track is written in order into its FIFO instead of its
+    temporary file, and all tracks start together because the muxer reading the
+    FIFOs needs every one of them to make progress. The group splits the
+    download workers among the running tracks by the bytes each has left, so
+    the track behind gets most of them and the tracks finish close together.
+    """
     handles = []
+    group = TransferGroup(workers=scope.download_workers)
     wait_tasks: list[asyncio.Task[int]] = []
     progress_task: asyncio.Task[None] | None = None
     mirrors_filter = create_mirrors_filter(plan.banned_mirrors_pattern)
@@ -65,40 +116,50 @@ async def download_video_and_audio(scope: ExecutionScope, plan: DownloadPlan) ->
     emit_download_report("开始下载……")
     try:
         prepared_transfers = []
-        for stream, target in (
-            (plan.video, plan.paths.video),
-            (plan.audio, plan.paths.audio),
+        for label, stream, target in (
+            ("视频", plan.video, plan.paths.video_pipe if streaming else plan.paths.video),
+            ("音频", plan.audio, plan.paths.audio_pipe if streaming else plan.paths.audio),
         ):
             if stream is None:
                 continue
-            mirrors = mirrors_filter(list(stream.mirrors))
-            size = await _probe_media_size(scope, stream.url, mirrors)
-            prepared_transfers.append(([stream.url, *mirrors], target, size))
+            prepared_transfers.append((label, [stream.url, *mirrors_filter(list(stream.mirrors))], target))
 
-        total_size = sum(size for _, _, size in prepared_transfers)
-        worker_limit = TransferWorkerLimit(scope.download_workers)
-        batch_size = 1 if scope.download_workers == 1 else len(prepared_transfers)
+        serial = scope.download_workers == 1 and not streaming
+        batch_size = 1 if serial else len(prepared_transfers)
         for batch_start in range(0, len(prepared_transfers), batch_size):
             batch_tasks = []
-            for sources, target, size in prepared_transfers[batch_start : batch_start + batch_size]:
+            batch_handles = []
+            for label, sources, target in prepared_transfers[batch_start : batch_start + batch_size]:
                 handle = scope.session.start_transfer(
                     sources,
                     target,
-                    size,
                     overwrite=plan.overwrite,
                     workers=scope.download_workers,
                     block_size=plan.block_size,
-                    worker_limit=worker_limit,
+                    adaptive_block_size=plan.adaptive_block_size,
+                    hedged_requests=plan.hedged_requests,
+                    work_stealing=plan.work_stealing,
+                    streaming=streaming,
+                    hash=plan.content_hash,
+                    adaptive_workers=plan.adaptive_workers,
+                    worker_limit=scope.transfer_limit,
+                    rate_limit=scope.transfer_rate_limit,
+                    memory_budget=scope.transfer_memory_budget,
+                    group=group,
                 )
                 handles.append(handle)
+                batch_handles.append((label, handle))
                 wait_task = asyncio.create_task(wait_for_transfer(handle))
                 wait_tasks.append(wait_task)
                 batch_tasks.append(wait_task)
 
-            progress_task = asyncio.create_task(show_progress(handles, total_size, item=plan.item))
+            progress_task = asyncio.create_task(show_progress(group, item=plan.item))
             await _wait_for_native_transfers(batch_tasks)
             await progress_task
             progress_task = None
+            if plan.content_hash is not None:
+                for label, handle in batch_handles:
+                    emit_download_report(f"校验值 {handle.snapshot().digest}", badge=label)
         emit_download_report("下载完成！")
     finally:
         if progress_task is not None:
@@ -7,7 +7,11 @@ from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 from yutto.auth import default_auth_file
-from yutto.cli.request_adapter import download_request_parser_from_settings
+from yutto.cli.request_adapter import (
+    download_request_parser_from_settings,
+    memory_limit_from_mebibytes,
+    rate_limit_from_mebibytes,
+)
 from yutto.core.application import YuttoApplication
 from yutto.core.task_service import DownloadTaskService, ResolveTaskService
 from yutto.download_manager import DownloadManager
@@ -101,6 +105,10 @@ def build_server(args: argparse.Namespace, token: str, *, ffmpeg: FFmpeg | None
             auth_file=args.auth_file or default_auth_file(),
             max_fetch_workers=args.max_fetch_workers,
             max_download_workers=args.max_download_workers,
+            max_transfer_workers=args.max_transfer_workers,
+            download_rate_limit=rate_limit_from_mebibytes(args.download_rate_limit),
+            transfer_memory_limit=memory_limit_from_mebibytes(args.transfer_memory_limit),
+            reserve_disk_space=args.reserve_disk_space,
             allowed_video_save_codecs=frozenset([*ffmpeg.video_encodecs, "copy"]),
             allowed_audio_save_codecs=frozenset([*ffmpeg.audio_encodecs, "copy"]),
         )
@@ -148,6 +156,7 @@ def build_server(args: argparse.Namespace, token: str, *, ffmpeg: FFmpeg | None
         prepare_request=policy.prepare_request,
         parse_request=parse_request,
         resolve_service=resolve_service,
+        on_close=policy.close,
     )
 
 
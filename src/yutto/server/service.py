@@ -15,7 +15,7 @@ from yutto.auth import load_auth, validate_profile
 from yutto.core.execution import RequestExecutionScopeFactory
 from yutto.core.result import ResolvedItem, ResolveResult
 from yutto.core.serialization import listing_item_to_wire
-from yutto.utils.fetcher import resolve_proxy
+from yutto.utils.fetcher import SessionPool, resolve_proxy
 
 if TYPE_CHECKING:
     from yutto.auth import AuthInfo
@@ -57,6 +57,10 @@ class ServerPolicyOptions:
     auth_file: Path
     max_fetch_workers: int = 8
     max_download_workers: int = 8
+    max_transfer_workers: int | None = None
+    download_rate_limit: int | None = None
+    transfer_memory_limit: int | None = None
+    reserve_disk_space: bool = False
     min_block_size_bytes: int = 64 * 1024
     max_block_size_bytes: int = 64 * 1024 * 1024
     allowed_video_save_codecs: frozenset[str] | None = None
@@ -67,6 +71,12 @@ class ServerPolicyOptions:
             raise ValueError("max_fetch_workers must be at least 1")
         if self.max_download_workers < 1:
             raise ValueError("max_download_workers must be at least 1")
+        if self.max_transfer_workers is not None and self.max_transfer_workers < 1:
+            raise ValueError("max_transfer_workers must be at least 1")
+        if self.download_rate_limit is not None and self.download_rate_limit < 1:
+            raise ValueError("download_rate_limit must be at least 1 byte per second")
+        if self.transfer_memory_limit is not None and self.transfer_memory_limit < 1:
+            raise ValueError("transfer_memory_limit must be at least 1 byte")
         if self.min_block_size_bytes < 1:
             raise ValueError("min_block_size_bytes must be at least 1")
         if self.max_block_size_bytes < self.min_block_size_bytes:
@@ -82,6 +92,7 @@ class ServerPolicy:
 
     def __init__(self, options: ServerPolicyOptions):
         self.options = options
+        self.session_pool = SessionPool()
 
     def prepare_request(self, request: DownloadRequest) -> DownloadRequest:
         """Return an immutable copy with server-owned absolute output paths."""
@@ -115,8 +126,25 @@ class ServerPolicy:
         return request.model_copy(update={"output": output})
 
     def build_scope_factory(self) -> RequestExecutionScopeFactory:
-        """Build the shared request-to-scope boundary used by server tasks."""
-        return RequestExecutionScopeFactory(self.resolve_credentials)
+        """Build the shared request-to-scope boundary used by server tasks.
+
+        All tasks draw range workers, bandwidth and buffer memory from one server-wide transfer budget,
+        and tasks with the same credentials and proxy borrow warm sessions from the policy's pool,
+        which `close` shuts down with the server.
+        """
+        transfer_workers = self.options.max_transfer_workers or self.options.max_download_workers
+        return RequestExecutionScopeFactory(
+            self.resolve_credentials,
+            transfer_workers=transfer_workers,
+            download_rate_limit=self.options.download_rate_limit,
+            transfer_memory_limit=self.options.transfer_memory_limit,
+            session_pool=self.session_pool,
+            reserve_disk_space=self.options.reserve_disk_space,
+        )
+
+    def close(self) -> None:
+        """Close the idle sessions of the shared pool; lent ones close when their task returns them."""
+        self.session_pool.close()
 
     def resolve_credentials(self, request: DownloadRequest) -> AuthInfo | None:
         """Resolve one auth profile without attaching credentials to the request."""
@@ -12,6 +12,7 @@ from websockets.exceptions import ConnectionClosed
 from websockets.typing import Origin
 
 from yutto.__version__ import VERSION
+from yutto._native import runtime_stats as read_runtime_stats
 from yutto.core.request import DownloadRequest
 from yutto.runtime import TaskCapacityError
 from yutto.server.rpc import JsonRpcDispatcher, JsonRpcError, encode_notification
@@ -151,6 +152,7 @@ class YuttoWebSocketServer:
         prepare_request: Callable[[DownloadRequest], DownloadRequest] | None = None,
         parse_request: Callable[[object], DownloadRequest] | None = None,
         resolve_service: ResolveTaskApi | None = None,
+        on_close: Callable[[], None] | None = None,
     ):
         self._task_service = task_service
         self._resolve_service = resolve_service
@@ -158,6 +160,7 @@ class YuttoWebSocketServer:
         self._token_bytes = options.token.encode("utf-8")
         self._prepare_request = prepare_request or (lambda request: request)
         self._parse_request = parse_request or DownloadRequest.model_validate
+        self._on_close = on_close
         self._server: Server | None = None
 
     @property
@@ -198,12 +201,16 @@ class YuttoWebSocketServer:
     async def close(self, *, cancel_pending: bool = True) -> None:
         server = self._server
         self._server = None
-        if server is not None:
-            server.close()
-            await server.wait_closed()
-        if self._resolve_service is not None:
-            await self._resolve_service.close(cancel_pending=cancel_pending)
-        await self._task_service.close(cancel_pending=cancel_pending)
+        try:
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+            if self._resolve_service is not None:
+                await self._resolve_service.close(cancel_pending=cancel_pending)
+            await self._task_service.close(cancel_pending=cancel_pending)
+        finally:
+            if self._on_close is not None:
+                self._on_close()
 
     async def _handle_connection(self, connection: ServerConnection) -> None:
         authenticated = False
@@ -287,6 +294,7 @@ class YuttoWebSocketServer:
             "task.cancel",
             "task.subscribe",
             "task.unsubscribe",
+            "runtime.stats",
         ]
         if self._resolve_service is not None:
             capabilities.insert(1, "resolve.start")
@@ -300,6 +308,21 @@ class YuttoWebSocketServer:
                 "capabilities": list(capabilities),
             }
 
+        @dispatcher.method("runtime.stats")
+        async def runtime_stats() -> dict[str, object]:
+            stats = read_runtime_stats()
+            return {
+                "workers": stats.workers,
+                "alive_tasks": stats.alive_tasks,
+                "global_queue_depth": stats.global_queue_depth,
+                "worker_busy_seconds": stats.worker_busy_seconds,
+                "worker_park_counts": stats.worker_park_counts,
+                "blocking_threads": stats.blocking_threads,
+                "idle_blocking_threads": stats.idle_blocking_threads,
+                "blocking_queue_depth": stats.blocking_queue_depth,
+                "worker_mean_poll_seconds": stats.worker_mean_poll_seconds,
+            }
+
         @dispatcher.method("download.start")
         async def download_start(request: dict[str, object]) -> dict[str, object]:
             prepared = self._parse_and_prepare(request)
@@ -4,6 +4,7 @@ import asyncio
 import json
 import os
 import random
+import time
 from contextlib import asynccontextmanager, contextmanager
 from typing import TYPE_CHECKING, Any, TypeVar
 from urllib.parse import quote, unquote, urlparse
@@ -231,15 +232,15 @@ class Fetcher:
 
     @staticmethod
     @WithReconnect()
-    async def get_size(scope: ExecutionScope, url: str) -> int | None:
+    async def probe_resource(scope: ExecutionScope, url: str) -> tuple[int, str | None] | None:
         async with scope.fetch_guard():
             with trace_fetch("Fetch size", url) as trace:
-                size = await scope.session.probe_size(url)
-                if size is not None:
-                    trace.complete(f"{size} bytes")
+                resource = await scope.session.probe_resource(url)
+                if resource is not None:
+                    trace.complete(f"{resource[0]} bytes")
                 else:
                     trace.complete("size unknown")
-                return size
+                return resource
 
     @staticmethod
     @WithReconnect()
@@ -282,9 +283,25 @@ async def create_client(
     *,
     verify: bool = False,
 ) -> AsyncIterator[YuttoSession]:
+    session = _open_session(headers, cookies, trust_env, proxy, timeout, verify=verify)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def _open_session(
+    headers: Mapping[str, str] | None,
+    cookies: Mapping[str, str] | None,
+    trust_env: bool,
+    proxy: str | None,
+    timeout: float,
+    *,
+    verify: bool,
+) -> YuttoSession:
     ca_cert_file = os.environ.get("SSL_CERT_FILE") if trust_env and verify else None
     ca_cert_dir = os.environ.get("SSL_CERT_DIR") if trust_env and verify and not ca_cert_file else None
-    session = YuttoSession(
+    return YuttoSession(
         headers=dict(headers or {}),
         cookies=dict(cookies or {}),
         proxy=proxy,
@@ -295,7 +312,104 @@ async def create_client(
         read_timeout=timeout,
         connect_timeout=timeout,
     )
-    try:
-        yield session
-    finally:
-        session.close()
+
+
+SessionKey = tuple[tuple[tuple[str, str], ...], tuple[tuple[str, str], ...], bool, str | None, float, bool]
+
+
+class SessionPool:
+    """Lend warm sessions to request scopes so connections outlive a single request.
+
+    Sessions are keyed by everything their client is built from: headers,
+    cookies, proxy settings, timeout and TLS verification. A lent session
+    belongs to one borrower until it is returned, so concurrent requests never
+    share a cookie store, and a borrower that fails closes its session instead
+    of returning it. Idle sessions beyond ``max_idle_per_key`` are closed when
+    returned; those unused for ``idle_timeout`` seconds are closed on the next
+    lend or return, and the rest by `close`.
+    """
+
+    DEFAULT_IDLE_TIMEOUT = 60.0
+    DEFAULT_MAX_IDLE_PER_KEY = 4
+
+    def __init__(
+        self,
+        *,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_idle_per_key: int = DEFAULT_MAX_IDLE_PER_KEY,
+    ):
+        if idle_timeout <= 0:
+            raise ValueError("idle_timeout must be positive")
+        if max_idle_per_key < 1:
+            raise ValueError("max_idle_per_key must be at least 1")
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_key = max_idle_per_key
+        self._idle: dict[SessionKey, list[tuple[float, YuttoSession]]] = {}
+        self._closed = False
+
+    @asynccontextmanager
+    async def lend(
+        self,
+        headers: Mapping[str, str] | None = DEFAULT_HEADERS,
+        cookies: Mapping[str, str] | None = None,
+        trust_env: bool = DEFAULT_TRUST_ENV,
+        proxy: str | None = DEFAULT_PROXY,
+        timeout: float = 5,
+        *,
+        verify: bool = False,
+    ) -> AsyncIterator[YuttoSession]:
+        """Borrow a session like `create_client` would open one, reusing an idle one if possible."""
+        key: SessionKey = (
+            tuple(sorted((headers or {}).items())),
+            tuple(sorted((cookies or {}).items())),
+            trust_env,
+            proxy,
+            timeout,
+            verify,
+        )
+        session = self._take(key)
+        if session is None:
+            session = _open_session(headers, cookies, trust_env, proxy, timeout, verify=verify)
+        try:
+            yield session
+        except BaseException:
+            session.close()
+            raise
+        self._give_back(key, session)
+
+    def close(self) -> None:
+        """Close every idle session; sessions still lent out are closed when returned."""
+        self._closed = True
+        for entries in self._idle.values():
+            for _, session in entries:
+                session.close()
+        self._idle.clear()
+
+    def _take(self, key: SessionKey) -> YuttoSession | None:
+        self._evict_expired()
+        entries = self._idle.get(key)
+        while entries:
+            _, session = entries.pop()
+            if not session.is_closed:
+                return session
+        return None
+
+    def _give_back(self, key: SessionKey, session: YuttoSession) -> None:
+        if self._closed or session.is_closed:
+            session.close()
+            return
+        entries = self._idle.setdefault(key, [])
+        entries.append((time.monotonic(), session))
+        while len(entries) > self.max_idle_per_key:
+            _, evicted = entries.pop(0)
+            evicted.close()
+        self._evict_expired()
+
+    def _evict_expired(self) -> None:
+        deadline = time.monotonic() - self.idle_timeout
+        for key, entries in list(self._idle.items()):
+            while entries and entries[0][0] <= deadline:
+                _, evicted = entries.pop(0)
+                evicted.close()
+            if not entries:
+                del self._idle[key]
@@ -76,3 +76,26 @@ def write_chapter_info(title: str, chapter_info_data: list[ChapterInfoData], cha
             f.write(f"START={chapter['start']}\n")
             f.write(f"END={chapter['end']}\n")
             f.write(f"title={chapter['content']}\n")
+
+
+def read_chapter_info(chapter_path: Path) -> tuple[str, list[ChapterInfoData]]:
+    """Read back the title and chapters written by ``write_chapter_info``."""
+    title = ""
+    chapters: list[ChapterInfoData] = []
+    for line in chapter_path.read_text(encoding="utf-8").splitlines():
+        if line == "[CHAPTER]":
+            chapters.append(ChapterInfoData(start=0, end=0, content=""))
+            continue
+        key, separator, value = line.partition("=")
+        if not separator:
+            continue
+        if not chapters:
+            if key == "title":
+                title = value
+        elif key == "START":
+            chapters[-1]["start"] = int(value)
+        elif key == "END":
+            chapters[-1]["end"] = int(value)
+        elif key == "title":
+            chapters[-1]["content"] = value
+    return title, chapters
@@ -70,6 +70,10 @@ def validate_basic_arguments(args: argparse.Namespace):
         Logger.error(f"jobs 参数值（{args.jobs}）不满足要求哦（应为不小于 1 的整数）")
         sys.exit(ErrorCode.WRONG_ARGUMENT_ERROR.value)
 
+    if args.download_rate_limit is not None and args.download_rate_limit <= 0:
+        Logger.error(f"download_rate_limit 参数值（{args.download_rate_limit}）不满足要求哦（应为正数）")
+        sys.exit(ErrorCode.WRONG_ARGUMENT_ERROR.value)
+
     try:
         resolve_proxy(args.proxy)
     except ValueError as e:
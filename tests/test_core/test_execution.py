@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any, cast
 
 import pytest
@@ -9,6 +10,7 @@ from yutto.auth import AuthInfo
 from yutto.core.execution import ExecutionScope, RequestExecutionScopeFactory
 from yutto.core.request import DownloadRequest
 from yutto.types import UserInfo
+from yutto.utils.fetcher import SessionPool
 from yutto.utils.functional import as_sync
 
 pytestmark = pytest.mark.processor
@@ -46,7 +48,10 @@ async def test_scope_factory_opens_fresh_sessions_limiters_and_caches():
     async with factory.open(request) as first_scope:
         first_session = first_scope.session
         first_fetch_limiter = first_scope.fetch_limiter
+        first_transfer_limit = first_scope.transfer_limit
         assert first_scope.download_workers == 8
+        assert first_transfer_limit.capacity == 8
+        assert first_scope.transfer_rate_limit is None
         first_scope.user_info_cache = UserInfo(vip_status=True, is_login=True)
         first_scope.wbi_img_cache = {"img_key": "img", "sub_key": "sub"}
         first_scope.touched_urls.add("https://example.com")
@@ -56,12 +61,136 @@ async def test_scope_factory_opens_fresh_sessions_limiters_and_caches():
     async with factory.open(request) as second_scope:
         assert second_scope.session is not first_session
         assert second_scope.fetch_limiter is not first_fetch_limiter
+        assert second_scope.transfer_limit is not first_transfer_limit
         assert second_scope.download_workers == 8
         assert second_scope.user_info_cache is None
         assert second_scope.wbi_img_cache is None
         assert second_scope.touched_urls == set()
 
 
+@as_sync
+async def test_pooled_scope_factory_lends_warm_sessions_to_matching_requests():
+    pool = SessionPool()
+    auth_by_url = {"BV1first": AuthInfo(SESSDATA="first", bili_jct="csrf"), "BV1other": None}
+    factory = RequestExecutionScopeFactory(lambda request: auth_by_url.get(request.source.url), session_pool=pool)
+    first_request = DownloadRequest.model_validate({"source": {"url": "BV1first"}})
+    other_request = DownloadRequest.model_validate({"source": {"url": "BV1other"}})
+
+    async with factory.open(first_request) as first_scope:
+        first_session = first_scope.session
+        first_scope.touched_urls.add("https://example.com")
+    async with factory.open(first_request) as second_scope, factory.open(first_request) as concurrent_scope:
+        assert second_scope.session is first_session
+        assert second_scope.touched_urls == set()
+        assert concurrent_scope.session is not first_session
+        assert concurrent_scope.session.cookie("SESSDATA") == "first"
+    async with factory.open(other_request) as other_scope:
+        assert other_scope.session is not first_session
+        assert other_scope.session.cookie("SESSDATA") is None
+
+    assert not first_session.is_closed
+    pool.close()
+    assert first_session.is_closed
+
+
+@as_sync
+async def test_session_pool_evicts_idle_sessions_and_drops_failed_borrowers():
+    pool = SessionPool(idle_timeout=0.05, max_idle_per_key=1)
+
+    async with pool.lend() as kept, pool.lend() as surplus:
+        pass
+    # `surplus` is returned first and then pushed out by `kept` beyond the idle limit.
+    assert surplus.is_closed
+    assert not kept.is_closed
+
+    await asyncio.sleep(0.1)
+    async with pool.lend() as fresh:
+        assert fresh is not kept
+    assert kept.is_closed
+
+    with pytest.raises(RuntimeError, match="request failed"):
+        async with pool.lend() as failed:
+            assert failed is fresh
+            raise RuntimeError("request failed")
+    assert failed.is_closed
+    async with pool.lend() as replacement:
+        assert replacement is not failed
+    pool.close()
+
+    with pytest.raises(ValueError):
+        SessionPool(idle_timeout=0)
+    with pytest.raises(ValueError):
+        SessionPool(max_idle_per_key=0)
+
+
+@as_sync
+async def test_scope_factory_shares_one_transfer_budget_across_concurrent_scopes():
+    factory = RequestExecutionScopeFactory(transfer_workers=4)
+    request = make_request()
+
+    async with factory.open(request) as first_scope, factory.open(request) as second_scope:
+        assert first_scope.session is not second_scope.session
+        assert first_scope.download_workers == 8
+        assert first_scope.transfer_limit is second_scope.transfer_limit
+        assert first_scope.transfer_limit.capacity == 4
+
+
+def test_scope_factory_rejects_a_non_positive_transfer_budget():
+    with pytest.raises(ValueError):
+        RequestExecutionScopeFactory(transfer_workers=0)
+
+
+@as_sync
+async def test_scope_factory_shares_one_adjustable_rate_limit_across_scopes():
+    factory = RequestExecutionScopeFactory(download_rate_limit=1024)
+    request = make_request()
+
+    async with factory.open(request) as first_scope, factory.open(request) as second_scope:
+        assert first_scope.transfer_rate_limit is factory.transfer_rate_limit
+        assert second_scope.transfer_rate_limit is factory.transfer_rate_limit
+
+    assert factory.transfer_rate_limit is not None
+    factory.transfer_rate_limit.set_bytes_per_second(4096)
+    async with factory.open(request) as scope:
+        assert scope.transfer_rate_limit is not None
+        assert scope.transfer_rate_limit.bytes_per_second == 4096
+
+
+@as_sync
+async def test_scope_factory_reserves_disk_space_only_when_asked():
+    request = make_request()
+
+    async with RequestExecutionScopeFactory().open(request) as scope:
+        assert scope.disk_space is None
+
+    factory = RequestExecutionScopeFactory(reserve_disk_space=True)
+    async with factory.open(request) as first_scope, factory.open(request) as second_scope:
+        assert first_scope.disk_space is not None
+        assert first_scope.disk_space is second_scope.disk_space is factory.disk_space
+
+
+def test_scope_factory_rejects_a_non_positive_rate_limit():
+    with pytest.raises(ValueError):
+        RequestExecutionScopeFactory(download_rate_limit=0)
+
+
+@as_sync
+async def test_scope_factory_shares_one_memory_budget_across_scopes():
+    factory = RequestExecutionScopeFactory(transfer_memory_limit=8 * 1024 * 1024)
+    request = make_request()
+
+    async with factory.open(request) as first_scope, factory.open(request) as second_scope:
+        assert first_scope.transfer_memory_budget is factory.transfer_memory_budget
+        assert second_scope.transfer_memory_budget is factory.transfer_memory_budget
+
+    assert factory.transfer_memory_budget is not None
+    assert factory.transfer_memory_budget.capacity == 8 * 1024 * 1024
+    assert factory.transfer_memory_budget.used == 0
+    assert RequestExecutionScopeFactory().transfer_memory_budget is None
+    with pytest.raises(ValueError):
+        RequestExecutionScopeFactory(transfer_memory_limit=0)
+
+
 @as_sync
 async def test_scope_factory_closes_session_when_on_open_fails():
     sessions: list[Any] = []
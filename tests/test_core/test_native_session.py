@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+from hashlib import sha256
 
 import pytest
 
@@ -9,8 +10,13 @@ from yutto._native import (
     HttpStatusError,
     InvalidUrlError,
     SessionClosedError,
+    TransferGroup,
+    TransferRateLimit,
     UnsupportedProtocolError,
     YuttoSession,
+    configure_runtime,
+    configure_runtime_from_environment,
+    runtime_stats,
     wait_for_transfer,
 )
 from yutto.utils.functional import as_sync
@@ -46,15 +52,53 @@ async def test_yutto_session_probes_size_without_accepting_an_ignored_range():
     payload = b"media payload"
     with LocalRangeServer(payload) as server:
         session = YuttoSession(use_system_proxy=False)
-        size = await session.probe_size(server.url)
+        resource = await session.probe_resource(server.url)
         request = server.requests[-1]
 
+    assert resource is not None
+    size, validator = resource
     assert size == len(payload)
+    assert validator == server.etag
     assert request.range_header == "bytes=0-1"
 
     with LocalRangeServer(payload, faults=[((0, 1), RangeFault.IGNORE)]) as server:
         session = YuttoSession(use_system_proxy=False)
-        assert await session.probe_size(server.url) is None
+        assert await session.probe_resource(server.url) is None
+
+
+@as_sync
+async def test_yutto_session_accepts_explicit_connection_settings():
+    payload = b"media payload"
+    with LocalRangeServer(payload) as server:
+        session = YuttoSession(
+            use_system_proxy=False,
+            http2=False,
+            http2_adaptive_window=False,
+            pool_idle_timeout=None,
+            pool_max_idle_per_host=0,
+            tcp_nodelay=False,
+            tcp_keepalive=None,
+        )
+        response = await session.get(server.url)
+
+    assert response.body == payload
+    with pytest.raises(ValueError, match="pool_idle_timeout"):
+        YuttoSession(use_system_proxy=False, pool_idle_timeout=0)
+    with pytest.raises(ValueError, match="tcp_keepalive"):
+        YuttoSession(use_system_proxy=False, tcp_keepalive=0)
+
+
+@as_sync
+async def test_yutto_session_prewarms_each_origin_in_the_background():
+    with LocalRangeServer(b"media payload") as server:
+        session = YuttoSession(use_system_proxy=False)
+        assert session.prewarm([server.url, f"{server.url}?mirror", "not a URL"]) is None
+        async with asyncio.timeout(5):
+            while not server.completed_requests:
+                await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+
+    assert [request.range_header for request in server.requests] == ["bytes=0-0"]
 
 
 @as_sync
@@ -68,7 +112,9 @@ async def test_yutto_session_close_is_idempotent_and_rejects_new_work(tmp_path):
     with pytest.raises(SessionClosedError):
         await session.get("https://example.com")
     with pytest.raises(SessionClosedError):
-        await session.probe_size("https://example.com")
+        await session.probe_resource("https://example.com")
+    with pytest.raises(SessionClosedError):
+        session.prewarm(["https://example.com"])
     with pytest.raises(SessionClosedError):
         session.start_transfer(["https://example.com/media"], tmp_path / "media", 1)
 
@@ -100,6 +146,138 @@ async def test_yutto_session_starts_a_transfer_with_its_client(tmp_path):
 
     assert committed == len(payload)
     assert target.read_bytes() == payload
+    [source] = handle.snapshot().sources
+    assert source.url == server.url
+    assert source.received_bytes == len(payload)
+    assert source.throughput is not None
+
+
+@as_sync
+async def test_yutto_session_transfer_learns_the_size_from_its_first_range(tmp_path):
+    payload = b"native transfer"
+    target = tmp_path / "media"
+
+    with LocalRangeServer(payload) as server:
+        session = YuttoSession(use_system_proxy=False)
+        handle = session.start_transfer([server.url], target, overwrite=True, block_size=1024)
+        committed = await wait_for_transfer(handle)
+
+    assert committed == len(payload)
+    assert target.read_bytes() == payload
+    assert handle.snapshot().expected_bytes == len(payload)
+    assert [request.range_header for request in server.requests] == ["bytes=0-65535"]
+
+
+@as_sync
+async def test_transfer_group_pushes_aggregated_progress_until_every_transfer_is_done(tmp_path):
+    video_payload = b"video payload"
+    audio_payload = b"audio"
+
+    with LocalRangeServer(video_payload) as video_server, LocalRangeServer(audio_payload) as audio_server:
+        session = YuttoSession(use_system_proxy=False)
+        group = TransferGroup(interval=0.01)
+        handles = [
+            session.start_transfer([video_server.url], tmp_path / "video", overwrite=True, group=group),
+            session.start_transfer([audio_server.url], tmp_path / "audio", overwrite=True, group=group),
+        ]
+        updates = []
+        while (progress := await group.next_progress()) is not None:
+            updates.append(progress)
+        for handle in handles:
+            await wait_for_transfer(handle)
+
+    assert len(group) == 2
+    assert [update.done for update in updates].count(True) == 1
+    final = updates[-1]
+    assert final.done
+    assert final.expected_bytes == final.received_bytes == final.committed_bytes == len(video_payload + audio_payload)
+    assert final.buffered_bytes == 0
+    assert [transfer.committed_bytes for transfer in final.transfers] == [len(video_payload), len(audio_payload)]
+    assert await group.next_progress() is None
+
+    assert group.workers is None
+    assert TransferGroup(workers=2).workers == 2
+    with pytest.raises(ValueError):
+        TransferGroup(interval=0)
+    with pytest.raises(ValueError):
+        TransferGroup(workers=0)
+
+
+@as_sync
+async def test_yutto_session_transfer_restarts_a_file_journaled_for_another_resource(tmp_path):
+    payload = b"native transfer"
+    target = tmp_path / "media"
+    journal = tmp_path / "media.haya"
+    target.write_bytes(b"stale p")
+    journal.write_text(f'haya-journal 1\nsize {len(payload)}\nvalidator "old"\ncommitted 7\n')
+
+    with LocalRangeServer(payload) as server:
+        session = YuttoSession(use_system_proxy=False)
+        handle = session.start_transfer([server.url], target, len(payload), validator=server.etag)
+        committed = await wait_for_transfer(handle)
+
+    assert committed == len(payload)
+    assert target.read_bytes() == payload
+    assert not journal.exists()
+
+
+@as_sync
+async def test_yutto_session_transfer_can_write_ranges_at_their_offsets(tmp_path):
+    payload = bytes(range(256)) * 64
+    target = tmp_path / "media"
+
+    with LocalRangeServer(payload) as server:
+        session = YuttoSession(use_system_proxy=False)
+        handle = session.start_transfer(
+            [server.url], target, len(payload), overwrite=True, block_size=1024, positional_writes=True
+        )
+        committed = await wait_for_transfer(handle)
+
+    assert committed == len(payload)
+    assert target.read_bytes() == payload
+    assert not (tmp_path / "media.haya").exists()
+
+
+@as_sync
+async def test_yutto_session_transfer_hashes_the_resumed_prefix_and_the_new_bytes(tmp_path):
+    payload = bytes(range(256)) * 64
+    target = tmp_path / "media"
+    target.write_bytes(payload[:1000])
+
+    with LocalRangeServer(payload) as server:
+        session = YuttoSession(use_system_proxy=False)
+        handle = session.start_transfer([server.url], target, len(payload), block_size=1024, hash="sha256")
+        committed = await wait_for_transfer(handle)
+
+    assert committed == len(payload)
+    assert handle.snapshot().digest == f"sha256:{sha256(payload).hexdigest()}"
+    with pytest.raises(ValueError, match="hash algorithm"):
+        session.start_transfer([server.url], target, len(payload), hash="md5")  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match="in order"):
+        session.start_transfer([server.url], target, len(payload), hash="xxh3", positional_writes=True)
+
+
+@as_sync
+async def test_yutto_session_transfer_honors_a_shared_rate_limit(tmp_path):
+    payload = bytes(range(256)) * 1024
+    target = tmp_path / "media"
+    rate_limit = TransferRateLimit(1024)
+
+    with LocalRangeServer(payload) as server:
+        session = YuttoSession(use_system_proxy=False)
+        handle = session.start_transfer(
+            [server.url], target, len(payload), overwrite=True, block_size=64 * 1024, rate_limit=rate_limit
+        )
+        while not handle.snapshot().rate_limited:
+            await asyncio.sleep(0.01)
+        rate_limit.set_bytes_per_second(64 * 1024 * 1024)
+        committed = await asyncio.wait_for(wait_for_transfer(handle), timeout=5)
+
+    assert committed == len(payload)
+    assert target.read_bytes() == payload
+    assert not handle.snapshot().rate_limited
+    with pytest.raises(ValueError, match="rate limit"):
+        TransferRateLimit(0)
 
 
 @as_sync
@@ -133,3 +311,21 @@ async def test_wait_for_transfer_cancels_and_reaps_native_work(tmp_path):
     assert handle.done()
     with pytest.raises(RuntimeError, match="transfer was cancelled"):
         handle.result()
+
+
+def test_runtime_stats_describe_the_running_runtime_which_can_no_longer_be_configured():
+    stats = runtime_stats()
+
+    assert stats.workers >= 1
+    assert len(stats.worker_busy_seconds) == len(stats.worker_park_counts) == stats.workers
+    assert stats.global_queue_depth >= 0
+    with pytest.raises(ValueError):
+        configure_runtime(worker_threads=0)
+    with pytest.raises(RuntimeError, match="already running"):
+        configure_runtime(worker_threads=1)
+
+
+def test_runtime_configuration_from_environment_ignores_unset_variables_and_rejects_bad_values():
+    assert configure_runtime_from_environment({"YUTTO_RUNTIME_WORKER_THREADS": " "}) is False
+    with pytest.raises(ValueError, match="YUTTO_RUNTIME_EVENT_INTERVAL"):
+        configure_runtime_from_environment({"YUTTO_RUNTIME_EVENT_INTERVAL": "often"})
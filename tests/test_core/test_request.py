@@ -91,6 +91,7 @@ def test_namespace_adapter_preserves_download_semantics(tmp_path: Path):
                 "--output-format-audio-only",
                 "flac",
                 "--overwrite",
+                "--streaming-mux",
                 "--subpath-template",
                 "{title}/{name}",
                 "--metadata-format-premiered",
@@ -101,8 +102,14 @@ def test_namespace_adapter_preserves_download_semantics(tmp_path: Path):
                 "3",
                 "--num-workers",
                 "4",
+                "--adaptive-workers",
                 "--block-size",
                 "1.25",
+                "--adaptive-block-size",
+                "--hedged-requests",
+                "--work-stealing",
+                "--content-hash",
+                "sha256",
                 "--download-interval",
                 "5",
                 "--banned-mirrors-pattern",
@@ -169,6 +176,7 @@ def test_namespace_adapter_preserves_download_semantics(tmp_path: Path):
         "format": "mkv",
         "audio_only_format": "flac",
         "overwrite": True,
+        "streaming_mux": True,
         "subpath_template": "{title}/{name}",
         "metadata_format_premiered": "%Y",
     }
@@ -176,7 +184,12 @@ def test_namespace_adapter_preserves_download_semantics(tmp_path: Path):
         "proxy": "no",
         "fetch_workers": 3,
         "download_workers": 4,
+        "adaptive_workers": True,
         "block_size_bytes": 1_310_720,
+        "adaptive_block_size": True,
+        "hedged_requests": True,
+        "work_stealing": True,
+        "content_hash": "sha256",
         "download_interval": 5,
         "banned_mirrors_pattern": r"example\.com",
     }
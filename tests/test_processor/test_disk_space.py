@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+import pytest
+
+import yutto.downloader.disk_space as disk_space_module
+from yutto.downloader.disk_space import DiskSpaceReservations
+from yutto.exceptions import InsufficientDiskSpaceError
+from yutto.utils.functional import as_sync
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+pytestmark = pytest.mark.processor
+
+
+@as_sync
+async def test_disk_space_reservations_queue_items_until_earlier_ones_release(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    # 两个目录位于同一卷，共享 100 字节的剩余空间
+    monkeypatch.setattr(disk_space_module.shutil, "disk_usage", lambda _path: SimpleNamespace(free=100))
+    reservations = DiskSpaceReservations()
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    first_entered = asyncio.Event()
+    release_first = asyncio.Event()
+    order: list[str] = []
+
+    async def first() -> None:
+        async with reservations.reserve({tmp_path: 60}):
+            order.append("first-enter")
+            first_entered.set()
+            await release_first.wait()
+            order.append("first-exit")
+
+    async def overflowing() -> None:
+        await first_entered.wait()
+        async with reservations.reserve({tmp_path: 30, output_dir: 20}):
+            order.append("overflowing-enter")
+
+    async def fitting() -> None:
+        await first_entered.wait()
+        async with reservations.reserve({tmp_path: 40, output_dir: 0}):
+            order.append("fitting-enter")
+        release_first.set()
+
+    await asyncio.gather(first(), overflowing(), fitting())
+
+    assert order == ["first-enter", "fitting-enter", "first-exit", "overflowing-enter"]
+
+
+@as_sync
+async def test_disk_space_reservations_fail_fast_when_waiting_cannot_help(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(disk_space_module.shutil, "disk_usage", lambda _path: SimpleNamespace(free=100))
+    reservations = DiskSpaceReservations()
+
+    with pytest.raises(InsufficientDiskSpaceError, match="剩余空间不足"):
+        async with reservations.reserve({tmp_path: 101}):
+            pytest.fail("an oversized reservation should not be admitted")
+    async with reservations.reserve({tmp_path: 100}):
+        pass
+
+    with pytest.raises(ValueError):
+        DiskSpaceReservations(recheck_interval=0)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import os
 import subprocess
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, cast
@@ -8,11 +9,14 @@ from typing import TYPE_CHECKING, Any, cast
 import pytest
 
 import yutto.downloader.executor as executor_module
+import yutto.downloader.streaming as streaming_module
 from yutto.core.execution import ExecutionScope
 from yutto.core.request import DownloadRequest
 from yutto.core.result import Artifact, ArtifactKind, ItemResult, ItemSkipReason, ItemState, ResolvedItem
 from yutto.downloader.downloader import process_download
 from yutto.downloader.media_muxer import MediaMuxer
+from yutto.downloader.planner import DownloadPlanner
+from yutto.downloader.streaming import can_stream_media
 from yutto.exceptions import PostprocessingError
 from yutto.types import AId, CId
 from yutto.utils.danmaku import write_danmaku
@@ -59,6 +63,12 @@ def make_request(
     )
 
 
+def make_streaming_request(tmp_path: Path) -> DownloadRequest:
+    request_data = make_request(tmp_path, audio=True).model_dump()
+    request_data["output"]["streaming_mux"] = True
+    return DownloadRequest.model_validate(request_data)
+
+
 def make_resource_only_episode() -> EpisodeData:
     planned_path = Path("series/episode")
     return {
@@ -144,6 +154,7 @@ async def test_interrupted_mux_keeps_resume_inputs(
     muxer = MediaMuxer(InterruptedFFmpeg())
     monkeypatch.setattr(executor_module, "download_video_and_audio", write_audio_fragment)
     monkeypatch.setattr(executor_module, "MediaMuxer", lambda: muxer)
+    monkeypatch.setattr(executor_module, "prewarm_media_sources", lambda _scope, _plan: None)
     execution = asyncio.create_task(
         process_download(
             ExecutionScope(cast("Any", object())),
@@ -170,6 +181,105 @@ async def test_interrupted_mux_keeps_resume_inputs(
     assert not (output_dir / "episode.m4a").exists()
 
 
+requires_fifo = pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="named pipes are POSIX-only")
+
+
+class PipeReadingFFmpeg:
+    """Copy the single streamed input to the output like a remux would."""
+
+    def __init__(self) -> None:
+        self.inputs: list[Path] = []
+
+    async def exec_async(self, args: list[str]) -> subprocess.CompletedProcess[bytes]:
+        self.inputs = [Path(args[index + 1]) for index, arg in enumerate(args) if arg == "-i"]
+        data = await asyncio.to_thread(self.inputs[0].read_bytes)
+        Path(args[-1]).write_bytes(data)
+        return subprocess.CompletedProcess(args, 0, b"", b"")
+
+
+@requires_fifo
+@as_sync
+async def test_streaming_mux_feeds_ffmpeg_through_fifos_without_temporary_media(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+):
+    payload = b"streamed audio" * 4096
+
+    async def stream_audio(_scope: ExecutionScope, plan: DownloadPlan, *, streaming: bool) -> None:
+        assert streaming
+        await asyncio.to_thread(plan.paths.audio_pipe.write_bytes, payload)
+
+    ffmpeg = PipeReadingFFmpeg()
+    monkeypatch.setattr(streaming_module, "download_video_and_audio", stream_audio)
+    monkeypatch.setattr(executor_module, "MediaMuxer", lambda: MediaMuxer(ffmpeg))
+    monkeypatch.setattr(executor_module, "prewarm_media_sources", lambda _scope, _plan: None)
+
+    result = await process_download(
+        ExecutionScope(cast("Any", object())),
+        make_media_episode(),
+        make_streaming_request(tmp_path),
+    )
+
+    temporary_dir = tmp_path / "temporary/series"
+    assert result.state is ItemState.DONE
+    assert ffmpeg.inputs == [temporary_dir / "episode_audio.fifo"]
+    assert (tmp_path / "output/series/episode.m4a").read_bytes() == payload
+    assert not (temporary_dir / "episode_audio.m4s").exists()
+    assert not (temporary_dir / "episode_audio.fifo").exists()
+
+
+@requires_fifo
+@as_sync
+async def test_streaming_mux_releases_blocked_transfers_when_ffmpeg_fails(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+):
+    class FailingFFmpeg:
+        async def exec_async(self, args: list[str]) -> subprocess.CompletedProcess[bytes]:
+            return subprocess.CompletedProcess(args, 1, b"", b"ffmpeg failed")
+
+    async def stream_audio(_scope: ExecutionScope, plan: DownloadPlan, *, streaming: bool) -> None:
+        # Like a native transfer, the writer is reaped rather than abandoned on cancellation.
+        writer = asyncio.create_task(asyncio.to_thread(plan.paths.audio_pipe.write_bytes, b"audio" * 65536))
+        try:
+            await asyncio.shield(writer)
+        except asyncio.CancelledError:
+            await asyncio.gather(writer, return_exceptions=True)
+            raise
+
+    monkeypatch.setattr(streaming_module, "download_video_and_audio", stream_audio)
+    monkeypatch.setattr(executor_module, "MediaMuxer", lambda: MediaMuxer(FailingFFmpeg()))
+    monkeypatch.setattr(executor_module, "prewarm_media_sources", lambda _scope, _plan: None)
+
+    with pytest.raises(PostprocessingError):
+        await asyncio.wait_for(
+            process_download(
+                ExecutionScope(cast("Any", object())),
+                make_media_episode(),
+                make_streaming_request(tmp_path),
+            ),
+            timeout=10,
+        )
+
+    assert not (tmp_path / "temporary/series/episode_audio.fifo").exists()
+    assert not (tmp_path / "output/series/episode.m4a").exists()
+
+
+@requires_fifo
+def test_streaming_mux_falls_back_to_temporary_files_to_resume(tmp_path: Path):
+    request = make_streaming_request(tmp_path)
+    plan = DownloadPlanner().plan(make_media_episode(), request)
+    assert can_stream_media(plan)
+
+    plan.paths.temporary_dir.mkdir(parents=True)
+    plan.paths.audio.write_bytes(b"resumable audio")
+    assert not can_stream_media(plan)
+
+    request_data = request.model_dump()
+    request_data["output"]["overwrite"] = True
+    assert can_stream_media(DownloadPlanner().plan(make_media_episode(), DownloadRequest.model_validate(request_data)))
+
+
 @as_sync
 async def test_resource_only_download_returns_final_artifacts_without_temporary_files(tmp_path: Path):
     result = await process_download(
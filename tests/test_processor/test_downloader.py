@@ -5,24 +5,24 @@ import sys
 from typing import TYPE_CHECKING, Any, cast
 
 import pytest
-from returns.result import Failure, Success
 
 import yutto.downloader.transfer as transfer_module
 from tests.helpers.http_range_server import LocalRangeServer, RangeFault
 from tests.test_processor.test_download_result import make_request, make_resource_only_episode
-from yutto._native import TransferWorkerLimit
+from yutto._native import HttpError, TransferGroup, TransferWorkerLimit
 from yutto.core.events import DownloadEvent, DownloadProgress
 from yutto.core.execution import ExecutionScope
 from yutto.core.operation import bind_download_event_sink
 from yutto.downloader.planner import DownloadPlanner
 from yutto.downloader.progressbar import show_progress
 from yutto.downloader.transfer import (
-    _probe_media_size,
     _wait_for_native_transfers,
     download_video_and_audio,
+    estimate_media_disk_usage,
+    prewarm_media_sources,
 )
 from yutto.exceptions import MaxRetryError
-from yutto.utils.fetcher import Fetcher, create_client
+from yutto.utils.fetcher import WithReconnect, create_client
 from yutto.utils.functional import as_sync
 
 if TYPE_CHECKING:
@@ -58,45 +58,61 @@ class RecordingEventSink:
         self.events.append(event)
 
 
-@as_sync
-async def test_native_resume_progress_does_not_count_existing_bytes_as_speed():
-    page_size = 64 * 1024
+class ScriptedGroupProgress:
+    def __init__(
+        self,
+        expected_bytes: int,
+        received_bytes: int,
+        buffered_bytes: int,
+        speed: float,
+        *,
+        window_saturated: bool = False,
+    ):
+        self.expected_bytes = expected_bytes
+        self.received_bytes = received_bytes
+        self.buffered_bytes = buffered_bytes
+        self.speed = speed
+        self.window_saturated = window_saturated
 
-    class Snapshot:
-        def __init__(
-            self,
-            origin_bytes: int,
-            received_bytes: int,
-            committed_bytes: int,
-            *,
-            window_saturated: bool = False,
-        ):
-            self.origin_bytes = origin_bytes
-            self.received_bytes = received_bytes
-            self.committed_bytes = committed_bytes
-            self.window_saturated = window_saturated
 
-    class Handle:
-        snapshots = iter([Snapshot(0, 0, 0), Snapshot(page_size, page_size, page_size)])
+class ScriptedGroup:
+    def __init__(self, *updates: ScriptedGroupProgress):
+        self.updates = iter(updates)
 
-        def snapshot(self) -> Snapshot:
-            return next(self.snapshots)
+    async def next_progress(self) -> ScriptedGroupProgress | None:
+        return next(self.updates, None)
 
-        def done(self) -> bool:
-            return True
+
+@as_sync
+async def test_native_progress_reports_every_group_update_until_the_group_finishes():
+    page_size = 64 * 1024
+    group = ScriptedGroup(
+        ScriptedGroupProgress(2 * page_size, 0, 0, 0),
+        ScriptedGroupProgress(2 * page_size, page_size, page_size, 1024.5),
+        # 最后一个分块可能越过尚未得知的总大小，进度不应超过总量
+        ScriptedGroupProgress(2 * page_size, 3 * page_size, 4 * page_size, 2048),
+    )
 
     sink = RecordingEventSink()
     with bind_download_event_sink(sink):
-        await show_progress([Handle()], page_size * 2, item="video")
+        await show_progress(group, item="video")
 
     assert sink.events == [
+        DownloadProgress(current=0, total=2 * page_size, speed_per_second=0, buffered_bytes=0, item="video"),
         DownloadProgress(
             current=page_size,
-            total=page_size * 2,
-            speed_per_second=0,
-            buffered_bytes=0,
+            total=2 * page_size,
+            speed_per_second=1024.5,
+            buffered_bytes=page_size,
             item="video",
-        )
+        ),
+        DownloadProgress(
+            current=2 * page_size,
+            total=2 * page_size,
+            speed_per_second=2048,
+            buffered_bytes=2 * page_size,
+            item="video",
+        ),
     ]
 
 
@@ -104,25 +120,13 @@ async def test_native_resume_progress_does_not_count_existing_bytes_as_speed():
 @as_sync
 async def test_native_progress_uses_only_window_saturation_signal(window_saturated: bool):
     page_size = 64 * 1024
-
-    class Snapshot:
-        origin_bytes = 0
-        received_bytes = 3 * page_size
-        committed_bytes = page_size
-
-        def __init__(self) -> None:
-            self.window_saturated = window_saturated
-
-    class Handle:
-        def snapshot(self) -> Snapshot:
-            return Snapshot()
-
-        def done(self) -> bool:
-            return True
+    group = ScriptedGroup(
+        ScriptedGroupProgress(8 * page_size, 3 * page_size, 2 * page_size, 0, window_saturated=window_saturated)
+    )
 
     sink = RecordingEventSink()
     with bind_download_event_sink(sink):
-        await show_progress([Handle()], 8 * page_size)
+        await show_progress(group)
 
     assert len(sink.events) == 1
     assert isinstance(sink.events[0], DownloadProgress)
@@ -130,38 +134,6 @@ async def test_native_progress_uses_only_window_saturation_signal(window_saturat
     assert sink.events[0].is_congested is window_saturated
 
 
-@as_sync
-async def test_probe_media_size_preserves_probe_failures(monkeypatch: pytest.MonkeyPatch):
-    failures = {
-        "primary": MaxRetryError("primary failed"),
-        "mirror": MaxRetryError("mirror failed"),
-    }
-
-    async def get_size(_scope: ExecutionScope, url: str) -> Failure[MaxRetryError]:
-        return Failure(failures[url])
-
-    monkeypatch.setattr(Fetcher, "get_size", get_size)
-    scope = ExecutionScope(cast("Any", object()))
-    with pytest.raises(MaxRetryError) as single_failure:
-        await _probe_media_size(scope, "primary", [])
-    with pytest.raises(MaxRetryError) as multiple_failure:
-        await _probe_media_size(scope, "primary", ["mirror"])
-
-    assert single_failure.value is failures["primary"]
-    assert isinstance(multiple_failure.value.__cause__, ExceptionGroup)
-    assert set(multiple_failure.value.__cause__.exceptions) == set(failures.values())
-
-
-@as_sync
-async def test_probe_media_size_rejects_a_source_without_a_known_length(monkeypatch: pytest.MonkeyPatch):
-    async def get_size(_scope: ExecutionScope, _url: str) -> Success[None]:
-        return Success(None)
-
-    monkeypatch.setattr(Fetcher, "get_size", get_size)
-    with pytest.raises(MaxRetryError, match="未返回长度"):
-        await _probe_media_size(ExecutionScope(cast("Any", object())), "primary", [])
-
-
 @as_sync
 async def test_native_transfer_failure_uses_the_existing_cli_error_boundary():
     async def fail() -> int:
@@ -175,7 +147,7 @@ async def test_native_transfer_failure_uses_the_existing_cli_error_boundary():
 
 
 @as_sync
-async def test_known_size_resume_uses_existing_contiguous_prefix(tmp_path):
+async def test_resume_uses_existing_contiguous_prefix(tmp_path):
     page_size = 64 * 1024
     resume_offset = page_size + 7
     payload = b"A" * page_size + b"B" * page_size + b"C" * page_size
@@ -200,7 +172,7 @@ async def test_known_size_resume_uses_existing_contiguous_prefix(tmp_path):
             await download_video_and_audio(ExecutionScope(session), plan)
 
     assert [request.range_header for request in server.requests] == [
-        "bytes=0-1",
+        f"bytes=0-{plan.block_size - 1}",
         f"bytes={resume_offset}-{len(payload) - 1}",
     ]
     assert plan.paths.audio.read_bytes() == payload
@@ -212,8 +184,9 @@ async def test_out_of_order_ranges_commit_an_exact_contiguous_file(tmp_path):
     page_size = 64 * 1024
     payload = b"A" * page_size + b"B" * page_size + b"C" * page_size
     episode = make_resource_only_episode()
-    first_range = (0, page_size - 1)
-    later_range = (page_size, 2 * page_size - 1)
+    # The head range reveals the size, so an earlier range behind it waits for a later one.
+    first_range = (page_size, 2 * page_size - 1)
+    later_range = (2 * page_size, 3 * page_size - 1)
 
     with LocalRangeServer(payload, release_after={first_range: later_range}) as server:
         episode["audios"] = [
@@ -238,9 +211,7 @@ async def test_out_of_order_ranges_commit_an_exact_contiguous_file(tmp_path):
 
     assert plan.paths.audio.read_bytes() == payload
     assert plan.paths.audio.stat().st_size == len(payload)
-    completed_ranges = [
-        request.range_header for request in server.completed_requests if request.range_header != "bytes=0-1"
-    ]
+    completed_ranges = [request.range_header for request in server.completed_requests]
     first_range_header = f"bytes={first_range[0]}-{first_range[1]}"
     later_range_header = f"bytes={later_range[0]}-{later_range[1]}"
     assert completed_ranges.index(later_range_header) < completed_ranges.index(first_range_header)
@@ -275,7 +246,7 @@ async def test_native_transfer_resumes_by_default(tmp_path):
 
     assert plan.paths.audio.read_bytes() == payload
     range_headers = [request.range_header for request in server.requests]
-    assert range_headers.count("bytes=0-1") == 1
+    assert range_headers.count(f"bytes=0-{plan.block_size - 1}") == 1
     assert f"bytes={page_size}-{len(payload) - 1}" in range_headers
 
 
@@ -321,17 +292,11 @@ async def test_cancelling_rust_backend_stops_the_native_transfer(tmp_path):
 
 
 @as_sync
-async def test_native_transfer_reuses_the_scope_session_and_maps_workers(
-    monkeypatch: pytest.MonkeyPatch,
-    tmp_path: Path,
-):
+async def test_native_transfer_reuses_the_scope_session_and_maps_workers(tmp_path: Path):
     captured: dict[str, Any] = {}
 
-    class WorkerLimit:
-        def __init__(self, capacity: int) -> None:
-            self.capacity = capacity
-
     class Snapshot:
+        expected_bytes = 123
         origin_bytes = 0
         received_bytes = 123
         committed_bytes = 123
@@ -353,18 +318,12 @@ async def test_native_transfer_reuses_the_scope_session_and_maps_workers(
         def result(self) -> int:
             return 123
 
-    async def get_size(_scope: ExecutionScope, _url: str) -> Success[int]:
-        return Success(123)
-
     class FakeSession:
         def start_transfer(self, *args: object, **kwargs: object) -> Handle:
             captured["args"] = args
             captured["kwargs"] = kwargs
             return Handle()
 
-    monkeypatch.setattr(Fetcher, "get_size", get_size)
-    monkeypatch.setattr(transfer_module, "TransferWorkerLimit", WorkerLimit)
-
     episode = make_resource_only_episode()
     episode["audios"] = [
         {
@@ -390,36 +349,134 @@ async def test_native_transfer_reuses_the_scope_session_and_maps_workers(
     plan = DownloadPlanner().plan(episode, type(base_request).model_validate(request_data))
 
     session = FakeSession()
-    await download_video_and_audio(
-        ExecutionScope(cast("Any", session), download_workers=3),
-        plan,
-    )
+    scope = ExecutionScope(cast("Any", session), download_workers=3)
+    await download_video_and_audio(scope, plan)
 
     args = captured["args"]
     kwargs = captured["kwargs"]
     assert isinstance(args, tuple)
     assert isinstance(kwargs, dict)
     assert args[0] == ["https://primary.example/media", "https://mirror.example/media"]
-    assert args[2] == 123
+    assert len(args) == 2
+    assert "validator" not in kwargs
     assert kwargs["workers"] == 3
     assert kwargs["block_size"] == 64 * 1024
-    assert isinstance(kwargs["worker_limit"], WorkerLimit)
+    assert kwargs["worker_limit"] is scope.transfer_limit
     assert kwargs["worker_limit"].capacity == 3
+    assert kwargs["rate_limit"] is None
+    assert kwargs["adaptive_workers"] is False
+    assert kwargs["adaptive_block_size"] is False
+    assert kwargs["hedged_requests"] is False
+    assert kwargs["work_stealing"] is False
+    assert kwargs["streaming"] is False
+    assert kwargs["hash"] is None
+    assert isinstance(kwargs["group"], TransferGroup)
+    assert kwargs["group"].workers == 3
+
+
+def test_prewarm_connects_to_every_allowed_media_source(tmp_path: Path):
+    prewarmed: list[list[str]] = []
+
+    class FakeSession:
+        def prewarm(self, urls: list[str]) -> None:
+            prewarmed.append(urls)
+
+    episode = make_resource_only_episode()
+    episode["videos"] = [
+        {
+            "url": "https://video.example/media",
+            "mirrors": ["https://blocked.example/media", "https://mirror.example/media"],
+            "codec": "avc",
+            "width": 1920,
+            "height": 1080,
+            "quality": 80,
+        }
+    ]
+    episode["audios"] = [
+        {
+            "url": "https://audio.example/media",
+            "mirrors": [],
+            "codec": "mp4a",
+            "width": 0,
+            "height": 0,
+            "quality": 30280,
+        }
+    ]
+    base_request = make_request(tmp_path, video=True, audio=True)
+    request_data = base_request.model_dump()
+    request_data["network"]["banned_mirrors_pattern"] = "blocked"
+    plan = DownloadPlanner().plan(episode, type(base_request).model_validate(request_data))
+
+    prewarm_media_sources(ExecutionScope(cast("Any", FakeSession())), plan)
+
+    assert prewarmed == [["https://video.example/media", "https://mirror.example/media", "https://audio.example/media"]]
 
 
 @as_sync
-async def test_item_transfers_start_together_and_share_one_worker_limit(
-    monkeypatch: pytest.MonkeyPatch,
-    tmp_path: Path,
+async def test_disk_usage_estimate_covers_the_remaining_tracks_and_the_mux_output(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
 ):
+    monkeypatch.setattr(WithReconnect, "_retry_delay", staticmethod(lambda attempt: 0.0))
+    probed: list[str] = []
+    sizes = {"https://video.example/media": (1000, None), "https://audio.example/media": (200, None)}
+
+    class FakeSession:
+        async def probe_resource(self, url: str) -> tuple[int, str | None] | None:
+            probed.append(url)
+            if url not in sizes:
+                raise HttpError(f"connection reset: {url}")
+            return sizes[url]
+
+    episode = make_resource_only_episode()
+    episode["videos"] = [
+        {
+            "url": "https://video.example/media",
+            "mirrors": [],
+            "codec": "avc",
+            "width": 1920,
+            "height": 1080,
+            "quality": 80,
+        }
+    ]
+    episode["audios"] = [
+        {
+            "url": "https://audio.example/broken",
+            "mirrors": ["https://audio.example/media"],
+            "codec": "mp4a",
+            "width": 0,
+            "height": 0,
+            "quality": 30280,
+        }
+    ]
+    plan = DownloadPlanner().plan(episode, make_request(tmp_path, video=True, audio=True))
+    plan.paths.temporary_dir.mkdir(parents=True)
+    plan.paths.video.write_bytes(b"x" * 300)
+    scope = ExecutionScope(cast("Any", FakeSession()))
+
+    assert await estimate_media_disk_usage(scope, plan, streaming=False) == {
+        plan.paths.temporary_dir: 900,
+        plan.paths.output_dir: 1200,
+    }
+    assert await estimate_media_disk_usage(scope, plan, streaming=True) == {
+        plan.paths.temporary_dir: 0,
+        plan.paths.output_dir: 1200,
+    }
+    # 主源重试耗尽后改由镜像探测，而不是把音频按 0 字节预留
+    assert probed.count("https://audio.example/broken") == 2 * (WithReconnect.DEFAULT_MAX_RETRY + 1)
+    assert probed.count("https://audio.example/media") == probed.count("https://video.example/media") == 2
+
+    del sizes["https://audio.example/media"]
+    with pytest.raises(MaxRetryError):
+        await estimate_media_disk_usage(scope, plan, streaming=False)
+
+
+@as_sync
+async def test_item_transfers_start_together_and_share_the_scope_worker_limit(tmp_path: Path):
     started: list[tuple[object, dict[str, object]]] = []
     both_started = asyncio.Event()
 
-    class WorkerLimit:
-        def __init__(self, capacity: int) -> None:
-            self.capacity = capacity
-
     class Snapshot:
+        expected_bytes = 1
         origin_bytes = 0
         received_bytes = 1
         committed_bytes = 1
@@ -441,9 +498,6 @@ async def test_item_transfers_start_together_and_share_one_worker_limit(
         def result(self) -> int:
             return 1
 
-    async def get_size(_scope: ExecutionScope, _url: str) -> Success[int]:
-        return Success(1)
-
     class FakeSession:
         def start_transfer(self, *args: object, **kwargs: object) -> Handle:
             started.append((args[0], kwargs))
@@ -451,9 +505,6 @@ async def test_item_transfers_start_together_and_share_one_worker_limit(
                 both_started.set()
             return Handle()
 
-    monkeypatch.setattr(Fetcher, "get_size", get_size)
-    monkeypatch.setattr(transfer_module, "TransferWorkerLimit", WorkerLimit)
-
     episode = make_resource_only_episode()
     episode["videos"] = [
         {
@@ -478,31 +529,23 @@ async def test_item_transfers_start_together_and_share_one_worker_limit(
     base_request = make_request(tmp_path, video=True, audio=True)
     plan = DownloadPlanner().plan(episode, type(base_request).model_validate(base_request.model_dump()))
 
-    await download_video_and_audio(
-        ExecutionScope(cast("Any", FakeSession()), download_workers=2),
-        plan,
-    )
+    scope = ExecutionScope(cast("Any", FakeSession()), download_workers=2)
+    await download_video_and_audio(scope, plan)
 
     assert len(started) == 2
     limits = [kwargs["worker_limit"] for _, kwargs in started]
     assert limits[0] is limits[1]
-    assert isinstance(limits[0], WorkerLimit)
+    assert limits[0] is scope.transfer_limit
     assert limits[0].capacity == 2
     assert all(kwargs["workers"] == 2 for _, kwargs in started)
 
 
 @as_sync
-async def test_one_worker_preserves_serial_transfer_setup(
-    monkeypatch: pytest.MonkeyPatch,
-    tmp_path: Path,
-):
+async def test_one_worker_preserves_serial_transfer_setup(tmp_path: Path):
     started: list[str] = []
 
-    class WorkerLimit:
-        def __init__(self, capacity: int) -> None:
-            self.capacity = capacity
-
     class Snapshot:
+        expected_bytes = 1
         origin_bytes = 0
         received_bytes = 1
         committed_bytes = 1
@@ -527,17 +570,11 @@ async def test_one_worker_preserves_serial_transfer_setup(
         def result(self) -> int:
             return 1
 
-    async def get_size(_scope: ExecutionScope, _url: str) -> Success[int]:
-        return Success(1)
-
     class FakeSession:
         def start_transfer(self, sources: list[str], *_args: object, **_kwargs: object) -> Handle:
             started.append(sources[0])
             return Handle(sources[0])
 
-    monkeypatch.setattr(Fetcher, "get_size", get_size)
-    monkeypatch.setattr(transfer_module, "TransferWorkerLimit", WorkerLimit)
-
     episode = make_resource_only_episode()
     episode["videos"] = [
         {
@@ -570,6 +607,76 @@ async def test_one_worker_preserves_serial_transfer_setup(
     assert started == ["video", "audio"]
 
 
+@as_sync
+async def test_streaming_starts_every_track_together_into_its_fifo(tmp_path: Path):
+    started: list[tuple[object, dict[str, object]]] = []
+    both_started = asyncio.Event()
+
+    class Snapshot:
+        expected_bytes = 1
+        origin_bytes = 0
+        received_bytes = 1
+        committed_bytes = 1
+        window_saturated = False
+
+    class Handle:
+        async def wait(self) -> None:
+            await both_started.wait()
+
+        def done(self) -> bool:
+            return both_started.is_set()
+
+        def cancel(self) -> None:
+            raise AssertionError("completed handle must not be cancelled")
+
+        def snapshot(self) -> Snapshot:
+            return Snapshot()
+
+        def result(self) -> int:
+            return 1
+
+    class FakeSession:
+        def start_transfer(self, *args: object, **kwargs: object) -> Handle:
+            started.append((args[1], kwargs))
+            if len(started) == 2:
+                both_started.set()
+            return Handle()
+
+    episode = make_resource_only_episode()
+    episode["videos"] = [
+        {
+            "url": "video",
+            "mirrors": [],
+            "codec": "avc",
+            "width": 1920,
+            "height": 1080,
+            "quality": 80,
+        }
+    ]
+    episode["audios"] = [
+        {
+            "url": "audio",
+            "mirrors": [],
+            "codec": "mp4a",
+            "width": 0,
+            "height": 0,
+            "quality": 30280,
+        }
+    ]
+    base_request = make_request(tmp_path, video=True, audio=True)
+    plan = DownloadPlanner().plan(episode, type(base_request).model_validate(base_request.model_dump()))
+
+    # A single worker would otherwise download the tracks one after another.
+    await download_video_and_audio(
+        ExecutionScope(cast("Any", FakeSession()), download_workers=1),
+        plan,
+        streaming=True,
+    )
+
+    assert [target for target, _ in started] == [plan.paths.video_pipe, plan.paths.audio_pipe]
+    assert all(kwargs["streaming"] is True for _, kwargs in started)
+
+
 @as_sync
 async def test_rust_backend_reaps_a_started_handle_when_later_setup_fails(
     monkeypatch: pytest.MonkeyPatch,
@@ -589,9 +696,6 @@ async def test_rust_backend_reaps_a_started_handle_when_later_setup_fails(
     handle = Handle()
     starts = 0
 
-    async def get_size(_scope: ExecutionScope, _url: str) -> Success[int]:
-        return Success(123)
-
     async def wait_for_transfer(started_handle: Handle, **_kwargs: object) -> int:
         while not started_handle.cancelled:
             await asyncio.sleep(0)
@@ -607,7 +711,6 @@ async def test_rust_backend_reaps_a_started_handle_when_later_setup_fails(
                 raise RuntimeError("second setup failed")
             return handle
 
-    monkeypatch.setattr(Fetcher, "get_size", get_size)
     monkeypatch.setattr(transfer_module, "wait_for_transfer", wait_for_transfer)
 
     episode = make_resource_only_episode()
@@ -205,7 +205,14 @@ def configure_download_cli(
     replace_logger: bool = True,
 ) -> tuple[list[str], list[str]]:
     parser = SimpleNamespace(
-        parse_args=lambda args: SimpleNamespace(command="download", no_progress=True, jobs=1, ffmpeg_path="ffmpeg")
+        parse_args=lambda args: SimpleNamespace(
+            command="download",
+            no_progress=True,
+            jobs=1,
+            ffmpeg_path="ffmpeg",
+            download_rate_limit=None,
+            reserve_disk_space=False,
+        )
     )
     rendered_errors: list[str] = []
     rendered_info: list[str] = []
@@ -40,6 +40,60 @@ def test_serve_jobs_configures_download_runtime_workers():
     assert cast("DownloadTaskService", server._task_service).runtime.worker_count == 3
 
 
+def test_serve_max_transfer_workers_bounds_all_download_tasks():
+    args = cli().parse_args(["serve", "--max-transfer-workers", "5"])
+
+    server = build_server(
+        args,
+        "token",
+        ffmpeg=cast("Any", SimpleNamespace(video_encodecs=(), audio_encodecs=())),
+    )
+
+    scope_factory = cast("Any", cast("DownloadTaskService", server._task_service)._scope_factory)
+    assert scope_factory._transfer_limit.capacity == 5
+
+
+def test_serve_download_rate_limit_is_shared_by_all_download_tasks():
+    args = cli().parse_args(["serve", "--download-rate-limit", "1.5"])
+
+    server = build_server(
+        args,
+        "token",
+        ffmpeg=cast("Any", SimpleNamespace(video_encodecs=(), audio_encodecs=())),
+    )
+
+    scope_factory = cast("Any", cast("DownloadTaskService", server._task_service)._scope_factory)
+    assert scope_factory.transfer_rate_limit.bytes_per_second == 3 * 512 * 1024
+
+
+def test_serve_transfer_memory_limit_is_shared_by_all_download_tasks():
+    args = cli().parse_args(["serve", "--transfer-memory-limit", "64"])
+
+    server = build_server(
+        args,
+        "token",
+        ffmpeg=cast("Any", SimpleNamespace(video_encodecs=(), audio_encodecs=())),
+    )
+
+    scope_factory = cast("Any", cast("DownloadTaskService", server._task_service)._scope_factory)
+    assert scope_factory.transfer_memory_budget.capacity == 64 * 1024 * 1024
+
+
+def test_serve_closes_the_shared_session_pool_with_the_server():
+    args = cli().parse_args(["serve"])
+
+    server = build_server(
+        args,
+        "token",
+        ffmpeg=cast("Any", SimpleNamespace(video_encodecs=(), audio_encodecs=())),
+    )
+
+    scope_factory = cast("Any", cast("DownloadTaskService", server._task_service)._scope_factory)
+    assert server._on_close is not None
+    server._on_close()
+    assert scope_factory._session_pool._closed
+
+
 def test_serve_accepts_ffmpeg_path():
     assert cli().parse_args(["serve"]).ffmpeg_path == "ffmpeg"
     assert cli().parse_args(["serve", "--ffmpeg-path", "/opt/ffmpeg/ffmpeg"]).ffmpeg_path == "/opt/ffmpeg/ffmpeg"
@@ -62,6 +116,28 @@ def test_serve_configures_ffmpeg_path_at_command_boundary(monkeypatch: pytest.Mo
     assert recorded == ["/opt/ffmpeg/ffmpeg"]
 
 
+def test_malformed_runtime_environment_is_reported_at_startup(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    parser = SimpleNamespace(parse_args=lambda args: SimpleNamespace(command="serve"))
+
+    def unreachable_server(args: object) -> None:
+        raise AssertionError("the server must not start")
+
+    monkeypatch.setattr(main_module, "cli", lambda: parser)
+    monkeypatch.setattr(main_module.sys, "argv", ["yutto", "serve"])
+    monkeypatch.setattr(server_command_module, "run_server_command", unreachable_server)
+    monkeypatch.setenv("YUTTO_RUNTIME_WORKER_THREADS", "many")
+
+    with pytest.raises(SystemExit) as exc_info:
+        main_module.main()
+
+    captured = capsys.readouterr()
+    assert exc_info.value.code == ErrorCode.WRONG_ARGUMENT_ERROR.value
+    assert "YUTTO_RUNTIME_WORKER_THREADS must be an integer" in captured.out
+    assert "Traceback" not in captured.out + captured.err
+
+
 def test_serve_argument_error_is_rendered_without_traceback(
     monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
 ):
@@ -191,7 +191,7 @@ def test_policy_rejects_ffmpeg_save_codecs_outside_server_capabilities(tmp_path:
         policy.prepare_request(make_request(stream={"audio_save_codec": "flac"}))
 
 
-@pytest.mark.parametrize("field", ["max_fetch_workers", "max_download_workers"])
+@pytest.mark.parametrize("field", ["max_fetch_workers", "max_download_workers", "max_transfer_workers"])
 def test_options_reject_non_positive_worker_limits(tmp_path: Path, field: str):
     options = {
         "download_root": tmp_path / "downloads",
@@ -204,6 +204,26 @@ def test_options_reject_non_positive_worker_limits(tmp_path: Path, field: str):
         ServerPolicyOptions(**options)  # ty: ignore[invalid-argument-type]
 
 
+def test_options_reject_a_non_positive_download_rate_limit(tmp_path: Path):
+    with pytest.raises(ValueError, match="download_rate_limit must be at least 1"):
+        ServerPolicyOptions(
+            download_root=tmp_path / "downloads",
+            tmp_root=tmp_path / "temporary",
+            auth_file=tmp_path / "auth.toml",
+            download_rate_limit=0,
+        )
+
+
+def test_options_reject_a_non_positive_transfer_memory_limit(tmp_path: Path):
+    with pytest.raises(ValueError, match="transfer_memory_limit must be at least 1"):
+        ServerPolicyOptions(
+            download_root=tmp_path / "downloads",
+            tmp_root=tmp_path / "temporary",
+            auth_file=tmp_path / "auth.toml",
+            transfer_memory_limit=0,
+        )
+
+
 @as_sync
 async def test_scope_factory_applies_request_network_and_selected_auth_profile(
     monkeypatch: pytest.MonkeyPatch,
@@ -286,6 +306,34 @@ bili_jct = "csrf-value"
         )
 
 
+@as_sync
+async def test_scope_factory_shares_a_server_wide_transfer_budget(tmp_path: Path):
+    policy = make_policy(tmp_path, max_download_workers=6)
+    factory = policy.build_scope_factory()
+
+    async with (
+        factory.open(make_request(network={"download_workers": 2})) as first_scope,
+        factory.open(make_request(network={"download_workers": 6})) as second_scope,
+    ):
+        assert first_scope.transfer_limit is second_scope.transfer_limit
+        assert first_scope.transfer_limit.capacity == 6
+        assert (first_scope.download_workers, second_scope.download_workers) == (2, 6)
+
+
+@as_sync
+async def test_scope_factories_borrow_from_the_policy_session_pool_until_it_closes(tmp_path: Path):
+    policy = make_policy(tmp_path)
+    request = make_request()
+
+    async with policy.build_scope_factory().open(request) as first_scope:
+        session = first_scope.session
+    async with policy.build_scope_factory().open(request) as second_scope:
+        assert second_scope.session is session
+        policy.close()
+        assert not session.is_closed
+    assert session.is_closed
+
+
 def test_scope_factory_rejects_invalid_auth_profile_without_exposing_auth_file(tmp_path: Path):
     policy = make_policy(tmp_path)
 
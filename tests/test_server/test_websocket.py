@@ -277,6 +277,7 @@ async def test_server_info_and_exact_origin_allowlist():
             assert result["name"] == "yutto"
             assert result["protocol_version"] == 1
             assert "download.start" in result["capabilities"]
+            assert "runtime.stats" in result["capabilities"]
 
             await connection.send(rpc_request(3, "task.get", {"task_id": 123}))
             assert (await receive_json(connection))["error"] == {
@@ -300,6 +301,11 @@ async def test_server_info_and_exact_origin_allowlist():
                 "code": -32602,
                 "message": "Invalid params",
             }
+
+            await connection.send(rpc_request(5, "runtime.stats"))
+            stats = (await receive_json(connection))["result"]
+            assert stats["workers"] >= 1
+            assert len(stats["worker_busy_seconds"]) == stats["workers"]
     finally:
         await server.close()
 
@@ -143,23 +143,23 @@ class _StatusSession:
 
 
 @as_sync
-async def test_get_size_reports_started_and_completed_with_probe_result(monkeypatch: pytest.MonkeyPatch):
+async def test_probe_resource_reports_started_and_completed_with_probe_result(monkeypatch: pytest.MonkeyPatch):
     class SizeSession:
         def __init__(self):
-            self.sizes = [42, None]
+            self.resources: list[tuple[int, str | None] | None] = [(42, '"etag"'), None]
             self.urls: list[str] = []
 
-        async def probe_size(self, url: str) -> int | None:
+        async def probe_resource(self, url: str) -> tuple[int, str | None] | None:
             self.urls.append(url)
-            return self.sizes.pop(0)
+            return self.resources.pop(0)
 
     reports: list[str] = []
     monkeypatch.setattr(fetcher_module, "emit_download_report", lambda message, **_kwargs: reports.append(message))
     session = SizeSession()
     scope = ExecutionScope(cast("Any", session))
 
-    assert await Fetcher.get_size(scope, "https://example.com/known") == Success(42)
-    assert await Fetcher.get_size(scope, "https://example.com/unknown") == Success(None)
+    assert await Fetcher.probe_resource(scope, "https://example.com/known") == Success((42, '"etag"'))
+    assert await Fetcher.probe_resource(scope, "https://example.com/unknown") == Success(None)
     assert session.urls == ["https://example.com/known", "https://example.com/unknown"]
     assert reports == [
         "Fetch size started: https://example.com/known",
@@ -8,19 +8,23 @@ from typing import TYPE_CHECKING, cast
 
 import pytest
 
+import yutto.downloader.media_muxer as media_muxer_module
 import yutto.utils.ffmpeg as ffmpeg_module
+from yutto._native import RemuxError
 from yutto.core.request import DownloadRequest
 from yutto.core.result import ResolvedItem
-from yutto.downloader.media_muxer import MediaMuxer
+from yutto.downloader.media_muxer import MediaMuxer, can_remux_natively
 from yutto.downloader.planner import DownloadPlan, DownloadPlanner, should_attach_hvc1_tag
 from yutto.exceptions import PostprocessingError, WrongArgumentError
 from yutto.types import AId, CId
 from yutto.utils.ffmpeg import FFmpeg, FFmpegCommandBuilder
 from yutto.utils.functional import Singleton, as_sync
+from yutto.utils.metadata import read_chapter_info, write_chapter_info
 
 if TYPE_CHECKING:
     from yutto.media.codec import VideoCodec
     from yutto.types import AudioUrlMeta, EpisodeData, VideoUrlMeta
+    from yutto.utils.metadata import ChapterInfoData
 
 
 def make_ffmpeg(path: str) -> FFmpeg:
@@ -500,3 +504,78 @@ async def test_merge_cancellation_removes_partial_output(tmp_path: Path):
         await merging
 
     assert plan.paths.output.exists() is False
+
+
+class UnusedFFmpeg:
+    async def exec_async(self, args: list[str]) -> subprocess.CompletedProcess[bytes]:
+        raise AssertionError("FFmpeg should not run")
+
+
+def test_only_copied_tracks_are_remuxed_natively(tmp_path: Path):
+    assert can_remux_natively(make_audio_plan(tmp_path)) is True
+    assert can_remux_natively(make_audio_plan(tmp_path, audio_save_codec="flac")) is False
+
+
+@pytest.mark.processor
+@as_sync
+async def test_media_muxer_remuxes_copied_tracks_without_ffmpeg(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    calls: list[tuple[Path, dict[str, object]]] = []
+
+    async def remux_mp4(output: Path, **options: object) -> None:
+        calls.append((output, options))
+        output.write_bytes(b"merged output")
+
+    monkeypatch.setattr(media_muxer_module, "remux_mp4", remux_mp4)
+    plan = make_audio_plan(tmp_path)
+    await MediaMuxer(UnusedFFmpeg()).mux(plan)
+
+    assert calls == [
+        (
+            plan.paths.output,
+            {
+                "video": None,
+                "audio": plan.paths.audio,
+                "title": None,
+                "chapters": [],
+                "cover": None,
+                "hvc1_tag": False,
+            },
+        )
+    ]
+    assert plan.paths.output.read_bytes() == b"merged output"
+
+
+@pytest.mark.processor
+@as_sync
+async def test_media_muxer_falls_back_to_ffmpeg_for_unsupported_input(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    commands: list[list[str]] = []
+
+    async def remux_mp4(output: Path, **options: object) -> None:
+        output.write_bytes(b"partial output")
+        raise RemuxError("unsupported input: encrypted track")
+
+    class FakeFFmpeg:
+        async def exec_async(self, args: list[str]) -> subprocess.CompletedProcess[bytes]:
+            commands.append(args)
+            assert Path(args[-1]).exists() is False
+            Path(args[-1]).write_bytes(b"ffmpeg output")
+            return subprocess.CompletedProcess(args, 0, b"", b"")
+
+    monkeypatch.setattr(media_muxer_module, "remux_mp4", remux_mp4)
+    plan = make_audio_plan(tmp_path)
+    await MediaMuxer(FakeFFmpeg()).mux(plan)
+
+    assert len(commands) == 1
+    assert plan.paths.output.read_bytes() == b"ffmpeg output"
+
+
+def test_chapter_info_reads_back_what_was_written(tmp_path: Path):
+    chapter_path = tmp_path / "chapter_info.ini"
+    chapters: list[ChapterInfoData] = [
+        {"start": 0, "end": 90, "content": "开头"},
+        {"start": 90, "end": 600, "content": "正片 = 主体"},
+    ]
+
+    write_chapter_info("标题", chapters, chapter_path)
+
+    assert read_chapter_info(chapter_path) == ("标题", chapters)